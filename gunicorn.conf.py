@@ -45,3 +45,11 @@ def post_fork(server, worker):
         threading.Thread(target=_startup_once, daemon=True).start()
     except Exception as e:
         print(f"post_fork error: {e}")
+
+def worker_exit(server, worker):
+    # FIX v127: write-behind queue mein pending Supabase writes flush karo
+    try:
+        from main import _wb_flush
+        _wb_flush(10.0)
+    except Exception as e:
+        print(f"worker_exit flush error: {e}")
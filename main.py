@@ -1,5 +1,7 @@
 import os
 import signal as _signal
+import time as _imp_time
+_IMPORT_T0 = _imp_time.perf_counter()  # FIX v134: import time benchmark (/sys-stats startup.import_ms)
 
 # Global shutdown flag — SIGTERM pe set hoga, momentum threads gracefully exit honge
 _BOT_SHUTDOWN = False
@@ -13,7 +15,6 @@ _signal.signal(_signal.SIGTERM, _handle_sigterm)
 import re
 import gc
 from flask import Flask, render_template, request, jsonify
-from supabase import create_client
 import uuid
 from datetime import datetime, timedelta, timezone
 import requests
@@ -35,6 +36,7 @@ def _now_ist() -> str:
 import time
 import threading
 import json
+import heapq as _heapq
 import asyncio
 import websockets
 from web3 import Web3
@@ -381,50 +383,833 @@ def get_token_price_bnb_full(token_address: str) -> float:
     except: pass
     return 0.0
 
+# ══════════════════════════════════════════════════════
+# LAZY NETWORK CLIENTS
+# FIX v134: import pe hi w3.is_connected() (fail pe doosra RPC), Supabase client aur engine
+# bante the — gunicorn post_fork se pehle, worker boot + health check slow, aur bina network
+# module import hi nahi hota tha. Ab w3 / supabase placeholders hain: pehle use pe
+# (ya init() mein, jo _startup_once call karta hai) bante hain. Import = zero network.
+# ══════════════════════════════════════════════════════
+class _LazyClient:
+    """Pehle attribute access / truthiness check pe factory() — thread-safe, ek hi baar"""
+    __slots__ = ("_name", "_factory", "_obj", "_done", "_lock")
+
+    def __init__(self, name: str, factory):
+        self._name    = name
+        self._factory = factory
+        self._obj     = None
+        self._done    = False
+        self._lock    = threading.Lock()
+
+    def _get(self):
+        if not self._done:
+            with self._lock:
+                if not self._done:
+                    try:
+                        self._obj = self._factory()
+                    finally:
+                        self._done = True
+        return self._obj
+
+    def __getattr__(self, k):
+        o = self._get()
+        if o is None:
+            raise AttributeError(f"{self._name} not available")
+        return getattr(o, k)
+
+    def __bool__(self):
+        return self._get() is not None
+
 # ── BSC RPC: Chainstack primary + Ankr fallback ──
-w3 = Web3(Web3.HTTPProvider(BSC_RPC, request_kwargs={"timeout": 5}))
-if not w3.is_connected():
-    print(f"⚠️ Primary RPC failed — trying Ankr fallback...")
-    w3 = Web3(Web3.HTTPProvider("https://bsc-rpc.publicnode.com", request_kwargs={"timeout": 5}))
-threading.Thread(target=lambda: print(f"✅ BSC: {w3.is_connected()}"), daemon=True).start()
+def _make_w3():
+    _w = Web3(Web3.HTTPProvider(BSC_RPC, request_kwargs={"timeout": 5}))
+    if not _w.is_connected():
+        print(f"⚠️ Primary RPC failed — trying Ankr fallback...")
+        _w = Web3(Web3.HTTPProvider("https://bsc-rpc.publicnode.com", request_kwargs={"timeout": 5}))
+    print(f"✅ BSC: {_w.is_connected()}")
+    return _w
+
+w3 = _LazyClient("w3", _make_w3)
 
 # ══════════════════════════════════════════════════════
 # GLOBAL NONCE MANAGER — race condition + stale nonce fix
-# Har TX pe fresh chain nonce se sync, lock se thread-safe
+# FIX v124: Har TX pe get_transaction_count("pending") global lock ke andar hota tha — ek RPC
+# + lock convoy per send, aur _fm_snipe ka _pre_nonce alag se fetch hota tha (dono disagree).
+# Ab per-wallet local counter: RPC sirf pehli baar / stale / nonce error pe. Background loop
+# (latest + pending ek batch mein) in-flight nonces confirm karta hai aur gaps dhundta hai —
+# allocate hua par land nahi hua nonce = baaki sab stuck → 0-value self-transfer se gap-fill.
+# FIX v141: gap-fill sirf kabhi broadcast na hue nonce (released/unknown) pe — apna broadcast
+# hua TX atka ho to wahi payload bumped gas pe rebroadcast (speed-up), cancel nahi.
 # ══════════════════════════════════════════════════════
-_nonce_lock = threading.Lock()
-_nonce_state = {"val": -1, "wallet": ""}
+_NONCE_SYNC_SEC  = 2.0    # background resync
+_NONCE_STALE_SEC = 15.0   # isse purana sync = allocate se pehle RPC
+_NONCE_GAP_SEC   = 20.0   # lowest in-flight itni der land na ho = gap-fill / speed-up
+_NONCE_BUMP_MAX  = 3      # FIX v141: apne stuck TX ko max itni baar gas bump karke rebroadcast
+_nonce_lock      = threading.Lock()
+_nonce_wallets   = {}     # wallet_lower → {"next", "latest", "synced_ts", "inflight": {n: {...}}, "filled": {n: ts}}
+_nonce_started   = [False]
+_nonce_stats     = {"allocated": 0, "rpc_syncs": 0, "bg_syncs": 0, "resets": 0, "released": 0,
+                    "confirmed": 0, "gap_fills": 0, "speed_ups": 0, "adopted_external": 0}
+
+def _nonce_apply(wallet_lower: str, pending: int, latest=None, hard: bool = False):
+    """Chain counts local state pe apply — hard=True = chain pending hi sach (nonce error / retry)"""
+    with _nonce_lock:
+        st = _nonce_wallets.setdefault(wallet_lower, {"next": -1, "latest": -1, "synced_ts": 0.0,
+                                                      "inflight": {}, "filled": {}})
+        if hard or pending > st["next"]:
+            if 0 <= st["next"] < pending and not hard:
+                _nonce_stats["adopted_external"] += 1  # bahar se TX gaya (manual wallet use)
+            st["next"] = pending
+            if hard:
+                for n in [n for n in st["inflight"] if n >= pending]:
+                    st["inflight"].pop(n, None)  # chain pe nahi — dobara allocate hoga
+        if latest is not None:
+            st["latest"] = latest
+            for n in [n for n in st["inflight"] if n < latest]:
+                st["inflight"].pop(n, None)
+                _nonce_stats["confirmed"] += 1
+            for n in [n for n in st["filled"] if n < latest]:
+                st["filled"].pop(n, None)
+        st["synced_ts"] = time.time()
+
+def get_next_nonce(w3_instance, wallet_addr: str, fresh: bool = False) -> int:
+    """Local nonce counter — RPC sirf pehli baar / stale sync / fresh=True (retry) pe"""
+    _wl = wallet_addr.lower()
+    st  = _nonce_wallets.get(_wl)
+    if fresh or st is None or st["next"] < 0 or time.time() - st["synced_ts"] > _NONCE_STALE_SEC:
+        _nonce_apply(_wl, w3_instance.eth.get_transaction_count(Web3.to_checksum_address(wallet_addr), "pending"),
+                     hard=fresh)
+        _nonce_stats["rpc_syncs"] += 1
+    _ensure_nonce_sync()
+    with _nonce_lock:
+        st = _nonce_wallets[_wl]
+        n  = st["next"]
+        st["next"] += 1
+        st["inflight"][n] = {"ts": time.time(), "hash": "", "gas": 0, "sent": False}
+        _nonce_stats["allocated"] += 1
+        return n
+
+def _nonce_peek(wallet_addr: str) -> int:
+    """Next nonce bina allocate kiye (-1 = abhi sync nahi hua)"""
+    st = _nonce_wallets.get(wallet_addr.lower())
+    return st["next"] if st else -1
+
+def _nonce_warm(wallet_addr: str):
+    """Snipe prefetch — manager synced ho, allocate nahi (purana _pre_nonce isi se unify)"""
+    try:
+        if _nonce_peek(wallet_addr) < 0:
+            _w3n = _qw3()
+            _nonce_apply(wallet_addr.lower(),
+                         _w3n.eth.get_transaction_count(Web3.to_checksum_address(wallet_addr), "pending"))
+            _nonce_stats["rpc_syncs"] += 1
+        _ensure_nonce_sync()
+    except Exception:
+        pass
 
-def get_next_nonce(w3_instance, wallet_addr: str) -> int:
-    """Thread-safe nonce — chain se sync, increment karo"""
+def _nonce_sent(wallet_addr: str, nonce: int, tx_hash="", gas_price: int = 0, tx: dict = None):
+    """tx = unsigned payload — stuck hua to wahi payload bumped gas pe rebroadcast (FIX v141)"""
     with _nonce_lock:
-        chain_n = w3_instance.eth.get_transaction_count(wallet_addr, "pending")
-        if chain_n > _nonce_state["val"] or _nonce_state["wallet"] != wallet_addr.lower():
-            _nonce_state["val"]    = chain_n
-            _nonce_state["wallet"] = wallet_addr.lower()
-        result = _nonce_state["val"]
-        _nonce_state["val"] += 1
-        return result
+        st = _nonce_wallets.get(wallet_addr.lower())
+        if st is not None and nonce in st["inflight"]:
+            st["inflight"][nonce].update(hash=str(tx_hash), gas=int(gas_price), sent=True)
+            if tx is not None:
+                st["inflight"][nonce]["tx"] = dict(tx)
+
+def _nonce_release(wallet_addr: str, nonce: int):
+    """Send fail — last nonce tha to wapas lo, warna in-flight 'unsent' rehta hai → gap-fill"""
+    with _nonce_lock:
+        st = _nonce_wallets.get(wallet_addr.lower())
+        if st is None:
+            return
+        _nonce_stats["released"] += 1
+        if nonce == st["next"] - 1:
+            st["next"] -= 1
+            st["inflight"].pop(nonce, None)
+        elif nonce in st["inflight"]:
+            st["inflight"][nonce].update(sent=False, released=True)
 
 def reset_nonce(w3_instance, wallet_addr: str):
     """Nonce error aane pe hard reset — chain se fresh sync"""
+    _pn = w3_instance.eth.get_transaction_count(Web3.to_checksum_address(wallet_addr), "pending")
+    _nonce_apply(wallet_addr.lower(), _pn, hard=True)
+    _nonce_stats["resets"] += 1
+    print(f"🔄 Nonce reset: {_pn} (chain sync)")
+
+def _nonce_fill_gap(wallet_lower: str, nonce: int, prev_gas: int = 0):
+    """Stuck nonce pe 0-BNB self-transfer — replacement rule ke liye prev gas se 25% upar"""
+    acct = _txp_account()
+    if acct is None or acct.address.lower() != wallet_lower:
+        return
+    _gp = max(_gas_price("urgent"), int(prev_gas * 1.25))
+    signed = acct.sign_transaction({"to": acct.address, "value": 0, "gas": 21000, "gasPrice": _gp,
+                                    "nonce": nonce, "chainId": 56, "data": "0x"})
+    h = _broadcast_raw_tx(signed.raw_transaction, f"gap-fill n={nonce}")
+    _nonce_sent(acct.address, nonce, _rcpt_hex(h), _gp,
+                {"to": acct.address, "value": 0, "gas": 21000, "gasPrice": _gp, "nonce": nonce, "chainId": 56, "data": "0x"})
+    _track_tx(h, f"gap-fill n={nonce}", acct.address, nonce)
+    _nonce_stats["gap_fills"] += 1
+    print(f"🩹 [NONCE] Gap-fill nonce {nonce} @ {_gp/1e9:.2f} gwei: {_rcpt_hex(h)[:12]}")
+
+def _nonce_speed_up(wallet_lower: str, nonce: int, tx: dict, prev_gas: int = 0, prev_hash: str = ""):
+    """FIX v141: Apna real TX underpriced atka — cancel nahi, wahi payload 25% upar gas pe rebroadcast.
+    FIX v145: naya hash original tracker entry se link — mine ho to original ke callbacks/waiters confirmed"""
+    acct = _txp_account()
+    if acct is None or acct.address.lower() != wallet_lower:
+        return
+    _gp = max(_gas_price("urgent"), int(prev_gas * 1.25))
+    tx2 = dict(tx, gasPrice=_gp, nonce=nonce)
+    signed = acct.sign_transaction(tx2)
+    h = _broadcast_raw_tx(signed.raw_transaction, f"speed-up n={nonce}")
+    _nonce_sent(acct.address, nonce, _rcpt_hex(h), _gp, tx2)
+    if not (prev_hash and _rcpt_link(prev_hash, h)):
+        _track_tx(h, f"speed-up n={nonce}", acct.address, nonce)
+    _nonce_stats["speed_ups"] += 1
+    print(f"⏩ [NONCE] Speed-up nonce {nonce} @ {_gp/1e9:.2f} gwei: {_rcpt_hex(h)[:12]}")
+
+def _nonce_gap_check(wallet_lower: str):
+    now = time.time()
     with _nonce_lock:
-        _nonce_state["val"]    = w3_instance.eth.get_transaction_count(wallet_addr, "pending")
-        _nonce_state["wallet"] = wallet_addr.lower()
-        print(f"🔄 Nonce reset: {_nonce_state['val']} (chain sync)")
+        st = _nonce_wallets.get(wallet_lower)
+        if not st or st["latest"] < 0:
+            return
+        L = st["latest"]
+        if not any(n > L for n in st["inflight"]):
+            return  # peeche koi stuck nahi
+        e = st["inflight"].get(L)
+        if e and not e.get("released") and now - e["ts"] < _NONCE_GAP_SEC:
+            return  # abhi sign/mempool mein ho sakta hai
+        if now - st["filled"].get(L, 0) < _NONCE_GAP_SEC:
+            return
+        # FIX v141: broadcast ho chuka apna TX = gap nahi, underpriced hai — speed-up.
+        # Gap-fill (0-BNB self-transfer) sirf kabhi-broadcast-na-hue nonce (released/unknown) pe.
+        _sent = bool(e and e.get("sent") and not e.get("released"))
+        _tx   = e.get("tx") if _sent else None
+        if _sent:
+            if not _tx or e.get("bumps", 0) >= _NONCE_BUMP_MAX:
+                return  # payload nahi / bump limit — mempool pe chhodo, sell/buy retry khud sambhalega
+            e["bumps"] = e.get("bumps", 0) + 1
+        st["filled"][L] = now
+        _prev_gas = e["gas"] if e else 0
+        _prev_h   = e.get("hash", "") if e else ""
+    try:
+        if _sent:
+            _nonce_speed_up(wallet_lower, L, _tx, _prev_gas, _prev_h)
+        else:
+            _nonce_fill_gap(wallet_lower, L, _prev_gas)
+    except Exception as _ge:
+        print(f"⚠️ [NONCE] {'speed-up' if _sent else 'gap-fill'} error n={L}: {str(_ge)[:60]}")
+
+def _nonce_sync_loop():
+    print("🔢 Nonce manager sync loop started")
+    while True:
+        try:
+            _ws = list(_nonce_wallets.keys())
+            if _ws:
+                res = _rcpt_batch([("eth_getTransactionCount", [w, t]) for w in _ws for t in ("latest", "pending")])
+                for i, w in enumerate(_ws):
+                    _lt, _pn = res[2 * i], res[2 * i + 1]
+                    if _lt and _pn:
+                        _nonce_apply(w, int(_pn, 16), int(_lt, 16))
+                        _nonce_gap_check(w)
+                _nonce_stats["bg_syncs"] += 1
+        except Exception as _e:
+            if _nonce_stats["bg_syncs"] % 30 == 0:
+                print(f"⚠️ [NONCE] sync error: {str(_e)[:60]}")
+        time.sleep(_NONCE_SYNC_SEC)
+
+def _ensure_nonce_sync():
+    if _nonce_started[0]:
+        return
+    with _nonce_lock:
+        if _nonce_started[0]:
+            return
+        _nonce_started[0] = True
+    threading.Thread(target=_nonce_sync_loop, daemon=True).start()
+
+def _nonce_summary() -> dict:
+    with _nonce_lock:
+        _w = {k[:10]: {"next": v["next"], "latest": v["latest"], "inflight": len(v["inflight"]),
+                       "sync_age_s": round(time.time() - v["synced_ts"], 1)} for k, v in _nonce_wallets.items()}
+    return {**_nonce_stats, "wallets": _w}
 
 
 
 # ========== SUPABASE ==========
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = None
-if SUPABASE_URL and SUPABASE_KEY:
+
+def _make_supabase():
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return None
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        from supabase import create_client
+        _c = create_client(SUPABASE_URL, SUPABASE_KEY)
         print("✅ Supabase memory connected")
+        return _c
     except Exception as e:
         print(f"❌ Supabase failed: {e}")
+        return None
+
+supabase = _LazyClient("supabase", _make_supabase)  # FIX v134: lazy — `if supabase:` pehli baar banata hai
+
+# ══════════════════════════════════════════════════════
+# LOCAL STATE STORE — SQLite WAL (source of truth) + Supabase async mirror
+# FIX v129: Saara durable state Supabase memory rows mein tha — har restart/save pe network
+# latency, aur Supabase down = state save nahi. Ab har write pehle local SQLite (WAL, ms) mein,
+# Supabase sirf asynchronously replicate hota hai (unsynced rows local se retry — restart-safe).
+# Loaders pehle local padhte hain → instant restart; Supabase down ho to bhi bot chalta rehta hai.
+# Render pe persistent disk mount karke LOCAL_DB_PATH wahan point karo (warna deploy pe reset,
+# tab pehla boot Supabase mirror se seed hota hai).
+# ══════════════════════════════════════════════════════
+import sqlite3 as _sqlite3
+_LOCAL_DB_PATH   = os.getenv("LOCAL_DB_PATH", "mrblack_state.db")
+_LS_OUTBOX_MAX   = 50000  # unsynced inserts cap — Supabase lambe time down rahe to oldest drop
+_ls_lock         = threading.RLock()
+_ls_conn         = [None]
+_ls_stats        = {"path": "", "durable": False, "puts": 0, "logs": 0, "local_hits": 0,
+                    "remote_seeds": 0, "write_ms_max": 0.0}
+
+def _ls():
+    """Lazy connect — WAL + synchronous=NORMAL (crash-safe, fsync sirf checkpoint pe)"""
+    if _ls_conn[0] is not None:
+        return _ls_conn[0]
+    with _ls_lock:
+        if _ls_conn[0] is not None:
+            return _ls_conn[0]
+        try:
+            c = _sqlite3.connect(_LOCAL_DB_PATH, check_same_thread=False, isolation_level=None, timeout=5)
+            c.execute("PRAGMA journal_mode=WAL")
+            _ls_stats["durable"] = True
+        except Exception as _le:
+            print(f"⚠️ [LOCAL] {_LOCAL_DB_PATH} open fail ({str(_le)[:60]}) — in-memory store")
+            c = _sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("""CREATE TABLE IF NOT EXISTS kv (
+            tbl TEXT NOT NULL, key TEXT NOT NULL, row TEXT NOT NULL, oc TEXT NOT NULL,
+            updated REAL NOT NULL, ver INTEGER NOT NULL DEFAULT 1, synced INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0, due REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (tbl, key))""")
+        c.execute("CREATE INDEX IF NOT EXISTS kv_unsynced ON kv (synced, due)")
+        c.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, row TEXT NOT NULL,
+            ts REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, due REAL NOT NULL DEFAULT 0)""")
+        _ls_stats["path"] = _LOCAL_DB_PATH if _ls_stats["durable"] else ":memory:"
+        _ls_conn[0] = c
+        print(f"✅ Local store ready: {_ls_stats['path']} (WAL)")
+        return c
+
+def _local_put_many(items: list):
+    """[(tbl, key, row, on_conflict, synced)] — ek transaction. synced: 0 = replicate, 1 = mirror se aaya, 2 = local-only"""
+    if not items: return
+    _t0 = time.time()
+    now = _t0
+    with _ls_lock:
+        c = _ls()
+        c.execute("BEGIN")
+        try:
+            c.executemany("""INSERT INTO kv (tbl, key, row, oc, updated, synced, due) VALUES (?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT (tbl, key) DO UPDATE SET row=excluded.row, oc=excluded.oc, updated=excluded.updated,
+                ver=kv.ver+1, synced=excluded.synced, attempts=0, due=0""",
+                [(t, k, json.dumps(r, default=str), oc, now, sy) for t, k, r, oc, sy in items])
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    _ls_stats["puts"] += len(items)
+    _ls_stats["write_ms_max"] = max(_ls_stats["write_ms_max"], round((time.time() - _t0) * 1000, 2))
+
+def _local_log_many(items: list):
+    """[(tbl, row)] — append-only outbox (bot_decisions, fm_events)"""
+    if not items: return
+    now = time.time()
+    with _ls_lock:
+        c = _ls()
+        c.execute("BEGIN")
+        try:
+            c.executemany("INSERT INTO outbox (tbl, row, ts) VALUES (?, ?, ?)",
+                          [(t, json.dumps(r, default=str), now) for t, r in items])
+            _n = c.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            if _n > _LS_OUTBOX_MAX:
+                c.execute("DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)",
+                          (_n - _LS_OUTBOX_MAX,))
+                _wb_stats["dropped"] += _n - _LS_OUTBOX_MAX
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    _ls_stats["logs"] += len(items)
+
+def _local_delete_many(items: list):
+    """[(tbl, key)] — local-only rows hatao (collections ke evicted items)"""
+    if not items: return
+    with _ls_lock:
+        _ls().executemany("DELETE FROM kv WHERE tbl=? AND key=?", items)
+
+def _local_get(tbl: str, key: str):
+    with _ls_lock:
+        r = _ls().execute("SELECT row FROM kv WHERE tbl=? AND key=?", (tbl, key)).fetchone()
+    return json.loads(r[0]) if r else None
+
+def _local_rows(tbl: str, where: str = "", params: tuple = (), order: str = "", limit: int = 0) -> list:
+    """kv rows of a table — where/order SQL fragments json_extract(row, '$.col') pe"""
+    _sql = "SELECT row FROM kv WHERE tbl=?" + (f" AND {where}" if where else "") + (f" ORDER BY {order}" if order else "")
+    _args = (tbl,) + tuple(params)
+    if limit:
+        _sql += " LIMIT ?"
+        _args += (int(limit),)
+    with _ls_lock:
+        return [json.loads(r[0]) for r in _ls().execute(_sql, _args).fetchall()]
+
+def _local_count(tbl: str, where: str = "", params: tuple = ()) -> int:
+    with _ls_lock:
+        return _ls().execute("SELECT COUNT(*) FROM kv WHERE tbl=?" + (f" AND {where}" if where else ""),
+                             (tbl,) + tuple(params)).fetchone()[0]
+
+class _MemRes:
+    """supabase execute() jaisa shape — loaders ka .data code same rahe"""
+    def __init__(self, data):
+        self.data = data
+
+_mem_absent = set()   # FIX v133: prefetch ne confirm kiya — mirror pe bhi nahi, dobara round-trip nahi
+
+def _mem_prefetch(session_ids: list) -> int:
+    """Startup: local mein jo rows nahi, unke liye ek hi multi-row query (in_) — seed local"""
+    _miss = [s for s in session_ids if _local_get("memory", s) is None]
+    if not _miss:
+        return 0
+    if not supabase:
+        _mem_absent.update(_miss)
+        return 0
+    res = supabase.table("memory").select("*").in_("session_id", _miss).execute()
+    rows = [r for r in (res.data or []) if r.get("session_id")]
+    _local_put_many([("memory", r["session_id"], r, "session_id", 1) for r in rows])
+    _ls_stats["remote_seeds"] += len(rows)
+    _mem_absent.update(set(_miss) - {r["session_id"] for r in rows})
+    return len(rows)
+
+def _mem_fetch(session_id: str) -> _MemRes:
+    """memory row — local pehle, nahi mila to Supabase mirror se (aur local seed)"""
+    try:
+        _r = _local_get("memory", session_id)
+        if _r is not None:
+            _ls_stats["local_hits"] += 1
+            return _MemRes([_r])
+    except Exception as _le:
+        print(f"⚠️ [LOCAL] read error {session_id}: {str(_le)[:60]}")
+    if not supabase or session_id in _mem_absent:
+        return _MemRes([])
+    res = supabase.table("memory").select("*").eq("session_id", session_id).execute()
+    if res.data:
+        try:
+            _local_put_many([("memory", session_id, res.data[0], "session_id", 1)])
+            _ls_stats["remote_seeds"] += 1
+        except Exception:
+            pass
+    return res
+
+# ══════════════════════════════════════════════════════
+# WRITE-BEHIND PERSIST QUEUE — saare Supabase writes ek worker se
+# FIX v127: bot_decision / fm_event / notifs / session / positions / brain / cycle — har call
+# naya daemon thread + blocking network write tha. Ab ek queue: same key ke upserts coalesce
+# (row flush ke waqt build hoti hai = latest state, ek hi write), inserts per table batch,
+# fail pe exponential backoff retry. Depth/lag /sys-stats mein, shutdown pe flush.
+# FIX v129: flush = local store commit; Supabase replication kv/outbox ke unsynced rows se.
+# ══════════════════════════════════════════════════════
+import atexit as _atexit
+_WB_FLUSH_SEC    = 1.0    # batch window
+_WB_BATCH        = 200    # rows per insert/upsert call
+_WB_MAX_ATTEMPTS = 8      # backoff 1,2,4..30s → phir dead-letter (synced=-1)
+_wb_lock         = threading.Lock()
+_wb_cond         = threading.Condition(_wb_lock)
+_wb_flush_lock   = threading.Lock()
+_wb_upserts      = {}     # (table, key) → {"table", "on_conflict", "row" | "fn", "ts", "replicate"}
+_WB_DELETE       = object()  # fn ye return kare = local row delete (sirf replicate=False rows)
+_wb_inserts      = []     # [(table, row)]
+_wb_started      = [False]
+_wb_stats        = {"enqueued": 0, "coalesced": 0, "rows_written": 0, "calls": 0,
+                    "retries": 0, "dropped": 0, "dead_letter": 0, "errors": 0, "last_error": ""}
+_wb_local_fail   = {"n": 0, "due": 0.0}  # FIX v148: SQLite commit fail — backoff (loop path)
+_wb_on_upsert_error = {}  # FIX v143: table → fn(e) → True = rows local-only (synced=2), retry/dead-letter nahi
+
+def _wb_upsert(table: str, key: str, row=None, fn=None, on_conflict: str = "session_id", replicate: bool = True):
+    """Coalescing upsert — same (table, key) pending hai to replace, naya write nahi.
+    fn = row builder, flush ke waqt call hota hai (snapshot-type rows ke liye)"""
+    now = time.time()
+    with _wb_cond:
+        _old = _wb_upserts.get((table, key))
+        if _old:
+            _wb_stats["coalesced"] += 1
+        _wb_upserts[(table, key)] = {"table": table, "on_conflict": on_conflict, "row": row, "fn": fn,
+                                     "ts": _old["ts"] if _old else now, "replicate": replicate}
+        _wb_stats["enqueued"] += 1
+        _wb_cond.notify()
+    _ensure_wb_worker()
+
+def _wb_insert(table: str, row: dict):
+    """Append-only insert — per table batch mein jaata hai"""
+    with _wb_cond:
+        _wb_inserts.append((table, row))
+        _wb_stats["enqueued"] += 1
+        _wb_cond.notify()
+    _ensure_wb_worker()
+
+def _wb_patch_insert(table: str, match: dict, fields: dict) -> bool:
+    """FIX v142: Queued (abhi Supabase tak nahi gaya) insert row mein fields merge karo.
+    match = {col: value} (case-insensitive) — sabse naya row. True = queue/outbox mein mil gaya"""
+    _m = {k: str(v).lower() for k, v in match.items()}
+    with _wb_flush_lock:  # commit/replicate beech mein row move na kare
+        with _wb_cond:
+            for t, r in reversed(_wb_inserts):
+                if t == table and all(str(r.get(k, "")).lower() == v for k, v in _m.items()):
+                    r.update(fields)
+                    return True
+        _where = " AND ".join(f"lower(json_extract(row, '$.{k}'))=?" for k in _m)
+        with _ls_lock:
+            c = _ls()
+            _hit = c.execute(f"SELECT id, row FROM outbox WHERE tbl=? AND {_where} ORDER BY id DESC LIMIT 1",
+                             (table,) + tuple(_m.values())).fetchone()
+            if not _hit:
+                return False
+            _r = json.loads(_hit[1])
+            _r.update(fields)
+            c.execute("UPDATE outbox SET row=? WHERE id=?", (json.dumps(_r, default=str), _hit[0]))
+    return True
+
+def _wb_commit_local():
+    """Pending queue → local store (ek transaction). Yahi durable commit point hai."""
+    with _wb_cond:
+        ups = list(_wb_upserts.items())
+        ins = list(_wb_inserts)
+        _wb_upserts.clear()
+        _wb_inserts.clear()
+    _items, _dels = [], []
+    for (table, key), it in ups:
+        try:
+            _r = it["fn"]() if it["fn"] else it["row"]
+        except Exception as _be:
+            print(f"⚠️ [WB] row build error {table}: {str(_be)[:80]}")
+            continue
+        if _r is _WB_DELETE:
+            _dels.append((table, key))
+        elif _r is not None:
+            _items.append((table, key, _r, it["on_conflict"], 0 if it["replicate"] else 2))
+    # FIX v148: SQLite fail (locked 5s timeout, disk full) pe batch chupchaap gayab hota tha.
+    # Ab wapas queue mein — par jo key beech mein naye version se coalesce ho chuki, woh overwrite nahi.
+    _err = None
+    try:
+        _local_put_many(_items)
+        _local_delete_many(_dels)
+    except Exception as _pe:
+        _err = _pe
+        with _wb_cond:
+            for k, it in ups:
+                if k not in _wb_upserts:
+                    _wb_upserts[k] = it
+    try:
+        _local_log_many(ins)
+    except Exception as _le:
+        _err = _err or _le
+        with _wb_cond:
+            _wb_inserts[:0] = ins  # order same rahe
+    if _err is not None:
+        _wb_local_fail["n"] += 1
+        _wb_local_fail["due"] = _wb_backoff_sql(_wb_local_fail["n"])
+        _wb_stats["errors"] += 1
+        _wb_stats["retries"] += 1
+        _wb_stats["last_error"] = str(_err)[:120]
+        raise _err  # caller (journal compaction) ko pata chale — commit nahi hua
+    _wb_local_fail["n"] = 0
+    return len(_items) + len(_dels) + len(ins)
+
+def _wb_backoff_sql(attempts: int) -> float:
+    return time.time() + min(30.0, 2 ** attempts)
+
+def _wb_group(rows: list):
+    """Same keyset wali rows ek call mein — PostgREST bulk ko uniform keys chahiye"""
+    groups = {}
+    for it in rows:
+        groups.setdefault(tuple(sorted(it[-1].keys())), []).append(it)
+    return groups.values()
+
+def _wb_replicate(force: bool = False) -> int:
+    """Unsynced local rows → Supabase. Success = synced=1 (agar beech mein naya version nahi aaya)"""
+    if not supabase: return 0
+    now = 1e18 if force else time.time()
+    written = 0
+    with _ls_lock:
+        c = _ls()
+        kv = c.execute("SELECT tbl, key, oc, ver, attempts, row FROM kv WHERE synced=0 AND due<=? LIMIT 2000",
+                       (now,)).fetchall()
+        ob = c.execute("SELECT id, tbl, attempts, row FROM outbox WHERE due<=? ORDER BY id LIMIT 2000",
+                       (now,)).fetchall()
+    # ── upserts ──
+    _by = {}
+    for tbl, key, oc, ver, att, row in kv:
+        _by.setdefault((tbl, oc), []).append((key, ver, att, json.loads(row)))
+    for (tbl, oc), lst in _by.items():
+        for grp in _wb_group(lst):
+            for i in range(0, len(grp), _WB_BATCH):
+                _chunk = grp[i:i + _WB_BATCH]
+                try:
+                    supabase.table(tbl).upsert([r for _, _, _, r in _chunk], on_conflict=oc).execute()
+                    _wb_stats["calls"] += 1
+                    written += len(_chunk)
+                    with _ls_lock:
+                        _ls().executemany("UPDATE kv SET synced=1 WHERE tbl=? AND key=? AND ver=?",
+                                          [(tbl, k, v) for k, v, _, _ in _chunk])
+                except Exception as e:
+                    _wb_stats["errors"] += 1
+                    _wb_stats["last_error"] = str(e)[:120]
+                    _hook = _wb_on_upsert_error.get(tbl)
+                    if _hook and _hook(e):
+                        with _ls_lock:
+                            _ls().executemany("UPDATE kv SET synced=2 WHERE tbl=? AND key=? AND ver=?",
+                                              [(tbl, k, v) for k, v, _, _ in _chunk])
+                        continue
+                    _upd = []
+                    for k, v, a, _ in _chunk:
+                        if a + 1 >= _WB_MAX_ATTEMPTS:
+                            _wb_stats["dead_letter"] += 1
+                            _upd.append((-1, a + 1, 0, tbl, k, v))
+                        else:
+                            _wb_stats["retries"] += 1
+                            _upd.append((0, a + 1, _wb_backoff_sql(a), tbl, k, v))
+                    with _ls_lock:
+                        _ls().executemany("UPDATE kv SET synced=?, attempts=?, due=? WHERE tbl=? AND key=? AND ver=?", _upd)
+                    print(f"⚠️ [WB] upsert {tbl} failed ({len(_chunk)} rows): {str(e)[:80]}")
+    # ── inserts ──
+    _byt = {}
+    for _id, tbl, att, row in ob:
+        _byt.setdefault(tbl, []).append((_id, att, json.loads(row)))
+    for tbl, lst in _byt.items():
+        for grp in _wb_group(lst):
+            for i in range(0, len(grp), _WB_BATCH):
+                _chunk = grp[i:i + _WB_BATCH]
+                try:
+                    supabase.table(tbl).insert([r for _, _, r in _chunk]).execute()
+                    _wb_stats["calls"] += 1
+                    written += len(_chunk)
+                    with _ls_lock:
+                        _ls().executemany("DELETE FROM outbox WHERE id=?", [(_id,) for _id, _, _ in _chunk])
+                except Exception as e:
+                    _wb_stats["errors"] += 1
+                    _wb_stats["last_error"] = str(e)[:120]
+                    _dead = [(_id,) for _id, a, _ in _chunk if a + 1 >= _WB_MAX_ATTEMPTS]
+                    _wb_stats["dead_letter"] += len(_dead)
+                    _wb_stats["retries"] += len(_chunk) - len(_dead)
+                    with _ls_lock:
+                        _ls().executemany("UPDATE outbox SET attempts=attempts+1, due=? WHERE id=?",
+                                          [(_wb_backoff_sql(a), _id) for _id, a, _ in _chunk])
+                        _ls().executemany("DELETE FROM outbox WHERE id=?", _dead)
+                    print(f"⚠️ [WB] insert {tbl} failed ({len(_chunk)} rows): {str(e)[:80]}")
+    _wb_stats["rows_written"] += written
+    return written
+
+def _wb_flush_once(force: bool = False) -> int:
+    with _wb_flush_lock:
+        if force or time.time() >= _wb_local_fail["due"]:
+            try:
+                _wb_commit_local()
+            except Exception as _ce:
+                print(f"⚠️ [WB] local commit failed (retry #{_wb_local_fail['n']}, requeued): {str(_ce)[:80]}")
+        return _wb_replicate(force)
+
+def _wb_loop():
+    print("💾 Write-behind persist queue started")
+    while True:
+        try:
+            with _wb_cond:
+                if not _wb_upserts and not _wb_inserts:
+                    _wb_cond.wait(timeout=_WB_FLUSH_SEC * 5)
+            if _BOT_SHUTDOWN:
+                _wb_flush(timeout=10)
+                time.sleep(_WB_FLUSH_SEC)
+                continue
+            time.sleep(_WB_FLUSH_SEC)  # batch window — is beech aaye writes coalesce
+            _wb_flush_once()
+        except Exception as _e:
+            print(f"⚠️ [WB] loop error: {str(_e)[:80]}")
+            time.sleep(_WB_FLUSH_SEC)
+
+def _ensure_wb_worker():
+    if _wb_started[0]:
+        return
+    with _wb_lock:
+        if _wb_started[0]:
+            return
+        _wb_started[0] = True
+    threading.Thread(target=_wb_loop, daemon=True).start()
+
+def _wb_unsynced() -> tuple:
+    """(count, oldest_ts) — local store mein jo abhi Supabase tak nahi pahuncha"""
+    with _ls_lock:
+        c = _ls()
+        k = c.execute("SELECT COUNT(*), MIN(updated) FROM kv WHERE synced=0").fetchone()
+        o = c.execute("SELECT COUNT(*), MIN(ts) FROM outbox").fetchone()
+    _ts = [t for t in (k[1], o[1]) if t]
+    return k[0] + o[0], (min(_ts) if _ts else 0.0)
+
+def _wb_flush(timeout: float = 10.0):
+    """Shutdown / explicit flush — local commit turant, replication backoff ignore karke"""
+    _end = time.time() + timeout
+    try:
+        with _wb_flush_lock:
+            _wb_commit_local()
+    except Exception as _fe:
+        print(f"⚠️ [WB] local flush error: {str(_fe)[:80]}")
+    if not supabase: return
+    while time.time() < _end:
+        if _wb_unsynced()[0] == 0:
+            return
+        with _wb_flush_lock:
+            if _wb_replicate(force=True) == 0:
+                break
+    print(f"⚠️ [WB] flush incomplete — {_wb_unsynced()[0]} rows unsynced (local store mein safe)")
+
+def _wb_depth() -> int:
+    with _wb_cond:
+        return len(_wb_upserts) + len(_wb_inserts)
+
+def _wb_summary() -> dict:
+    now = time.time()
+    with _wb_cond:
+        _ts = [v["ts"] for v in _wb_upserts.values()]
+        _pending = len(_wb_upserts) + len(_wb_inserts)
+    try:
+        _un, _old = _wb_unsynced()
+        with _ls_lock:
+            _dead = _ls().execute("SELECT COUNT(*) FROM kv WHERE synced=-1").fetchone()[0]
+    except Exception:
+        _un, _old, _dead = -1, 0.0, -1
+    _all = _ts + ([_old] if _old else [])
+    return {**_wb_stats, "depth": _pending, "unsynced": _un, "dead_rows": _dead,
+            "lag_s": round(now - min(_all), 1) if _all else 0.0, "local": _ls_stats}
+
+_atexit.register(_wb_flush, 10.0)
+
+# ══════════════════════════════════════════════════════
+# COLLECTION STORE — rug DNA / smart wallets / dev blacklist alag alag
+# FIX v132: _brain_row teeno collections + brain ek JSON string mein likhta tha (har 10 min +
+# har trigger), aur startup pe poora parse. Ab har collection:
+#   • local store mein per-item rows (tbl "coll:<name>") — mutation pe sirf wahi item (change log)
+#   • Supabase mirror pe compact snapshot (zlib+base64, memory row MRBLACK_COLL:<name>) —
+#     sirf jab collection badla ho, brain save ke saath
+#   • lazy load — pehli baar use hone pe (ya startup warm thread), baaki startup block nahi
+# ══════════════════════════════════════════════════════
+import zlib as _zlib
+import base64 as _b64
+_COLL_PREFIX     = "MRBLACK_COLL:"
+_COLLS           = {}   # name → {"get", "items", "load", "lock", "loaded", "ver", "snap_ver", ...}
+_coll_legacy     = {}   # name → items — purane MRBLACK_BRAIN blob se (migration)
+
+def _coll_register(name: str, get, items, load):
+    """get(key) → item|None, items() → [(key, item)], load({key: item}) — RAM mein merge"""
+    _COLLS[name] = {"get": get, "items": items, "load": load, "lock": threading.Lock(),
+                    "loaded": False, "source": "", "ver": 0, "snap_ver": 0,
+                    "touches": 0, "snapshots": 0, "load_ms": 0.0, "size": 0}
+
+def _coll_touch(name: str, key: str):
+    """Item badla/hata — sirf wahi local row (flush pe latest value, gaya to delete)"""
+    c = _COLLS[name]
+    c["ver"] += 1
+    c["touches"] += 1
+    _wb_upsert("coll:" + name, key, fn=lambda: _coll_item_row(name, key), replicate=False)
+
+def _coll_item_row(name: str, key: str):
+    _v = _COLLS[name]["get"](key)
+    if _v is None:
+        return _WB_DELETE
+    return dict(_v) if isinstance(_v, dict) else _v
+
+def _coll_encode(items: dict) -> str:
+    return _b64.b64encode(_zlib.compress(json.dumps(items, separators=(",", ":"), default=str).encode(), 6)).decode()
+
+def _coll_decode(blob: str) -> dict:
+    return json.loads(_zlib.decompress(_b64.b64decode(blob)).decode())
+
+def _coll_snapshot_row(name: str) -> dict:
+    c = _COLLS[name]
+    _items = dict(c["items"]())
+    c["size"] = len(_items)
+    return {
+        "session_id": _COLL_PREFIX + name,
+        "role":       "system",
+        "content":    str(len(_items)),
+        "positions":  _coll_encode(_items),
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+def _coll_snapshot_dirty():
+    """Brain save ke saath — sirf badle hue (aur loaded) collections ka mirror snapshot"""
+    for name, c in _COLLS.items():
+        if c["loaded"] and c["ver"] != c["snap_ver"]:
+            c["snap_ver"] = c["ver"]
+            c["snapshots"] += 1
+            _wb_upsert("memory", _COLL_PREFIX + name, fn=lambda n=name: _coll_snapshot_row(n))
+
+def _coll_ensure(name: str):
+    """Lazy load: local items → mirror snapshot → legacy brain blob"""
+    c = _COLLS[name]
+    if c["loaded"]:
+        return
+    with c["lock"]:
+        if c["loaded"]:
+            return
+        _t0 = time.time()
+        items, src = {}, ""
+        try:
+            with _ls_lock:
+                _rs = _ls().execute("SELECT key, row FROM kv WHERE tbl=?", ("coll:" + name,)).fetchall()
+            items = {k: json.loads(r) for k, r in _rs}
+            src = "local" if items else ""
+            if not items:
+                _res = _mem_fetch(_COLL_PREFIX + name)
+                if _res.data and _res.data[0].get("positions"):
+                    items = _coll_decode(_res.data[0]["positions"])
+                    src = "snapshot"
+            if not items and _coll_legacy.get(name):
+                items = dict(_coll_legacy.pop(name))
+                src = "legacy"
+            if items:
+                c["load"](items)
+                if src != "local":
+                    _local_put_many([("coll:" + name, k, v, "key", 2) for k, v in items.items()])
+                if src == "legacy":
+                    c["ver"] += 1  # mirror pe naya snapshot banana hai
+        except Exception as _ce:
+            print(f"⚠️ [v132] {name} load error: {str(_ce)[:80]}")
+        c["loaded"] = True
+        c["source"] = src or "empty"
+        c["size"] = len(items)
+        c["load_ms"] = round((time.time() - _t0) * 1000, 1)
+        if items:
+            print(f"📦 [v132] {name} loaded ({src}): {len(items)} items in {c['load_ms']}ms")
+
+def _coll_migrate_legacy(name: str, items: dict):
+    """MRBLACK_BRAIN blob wale items — collection abhi load nahi hua to stash, empty load hua tha to merge"""
+    if not items or name not in _COLLS:
+        return
+    c = _COLLS[name]
+    with c["lock"]:
+        if not c["loaded"]:
+            _coll_legacy[name] = items
+            return
+        if c["source"] != "empty":
+            return
+        c["load"](items)
+        c["source"] = "legacy"
+    _local_put_many([("coll:" + name, k, v, "key", 2) for k, v in items.items()])
+    c["ver"] += 1
+    print(f"📦 [v132] {name} migrated (legacy): {len(items)} items")
+
+def _coll_warm():
+    for name in list(_COLLS):
+        _coll_ensure(name)
+
+def _coll_summary() -> dict:
+    return {n: {**{k: c[k] for k in ("loaded", "source", "ver", "touches", "snapshots", "load_ms")},
+                "size": len(c["items"]()) if c["loaded"] else c["size"]}
+            for n, c in _COLLS.items()}
 
 # ========== KNOWLEDGE BASE ==========
 knowledge_base = {
@@ -459,7 +1244,7 @@ class MrBlackChecklistEngine:
         self.trade_history = []
         print("✅ MrBlack Checklist Engine Initialized")
 
-bsc_engine = MrBlackChecklistEngine()
+bsc_engine = None  # FIX v134: init() mein banta hai
 
 # ========== MARKET CACHE (early init) ==========
 market_cache = {
@@ -474,7 +1259,6 @@ class DataGuard:
     PRICE_STALE_SEC = 90  # BNB loop har 30s mein fetch karta hai — 90s safe margin
     MIN_BNB_PRICE   = 100
     MAX_BNB_PRICE   = 5000
-    _gas_cache      = {"val": 0.0, "ts": 0}
 
     @staticmethod
     def bnb_price_ok():
@@ -506,37 +1290,8 @@ class DataGuard:
 
     @staticmethod
     def get_real_gas_bnb():
-        now = time.time()
-        if now - DataGuard._gas_cache["ts"] < 30 and DataGuard._gas_cache["val"] > 0:
-            return DataGuard._gas_cache["val"]
-        try:
-            _key = os.environ.get("NODEREAL_API_KEY", "")
-            if _key:
-                r = requests.post(
-                    f"https://bsc-mainnet.nodereal.io/v1/{_key}",
-                    json={"jsonrpc":"2.0","id":1,"method":"eth_gasPrice","params":[]},
-                    timeout=5
-                )
-                gwei_hex = r.json().get("result", "0x0")
-                gwei     = int(gwei_hex, 16) / 1e9
-                if 0.5 < gwei < 100:
-                    gas_bnb = (gwei * 1e9 * 200000) / 1e18  # FIX v_bug2: FourMeme ~200k gas (was 150k)
-                    DataGuard._gas_cache = {"val": gas_bnb, "ts": now}
-                    return gas_bnb
-        except Exception as e:
-            print(f"⚠️ Gas fetch error: {e}")
-        # w3 se gas fetch karo — NodeReal nahi hai toh bhi sahi value milegi
-        try:
-            _gp = w3.eth.gas_price  # wei mein
-            _gwei = _gp / 1e9
-            if 0.05 < _gwei < 100:
-                _gas_bnb = (_gp * 200000) / 1e18  # FIX v_bug2: FourMeme ~200k gas (was 150k)
-                DataGuard._gas_cache = {"val": _gas_bnb, "ts": now}
-                return _gas_bnb
-        except Exception:
-            pass
-        # Last resort fallback — 1 gwei x 150k gas
-        return round((1e9 * 200000) / 1e18, 6)  # FIX v_bug2: ~0.0002 BNB fallback (was 0.00015)
+        # FIX v122: gas oracle se — apna 30s cache + NodeReal/w3 fetch hataya
+        return (_gas_node_price() * 200000) / 1e18  # FIX v_bug2: FourMeme ~200k gas (was 150k)
 
     @staticmethod
     def trade_allowed(address, token_price_bnb):
@@ -563,10 +1318,8 @@ user_profile = {
 }
 
 def _load_user_profile():
-    if not supabase:
-        return
     try:
-        res = supabase.table("memory").select("*").eq("session_id", "MRBLACK_USER").execute()
+        res = _mem_fetch("MRBLACK_USER")
         if res.data:
             row = res.data[0]
             try:
@@ -607,15 +1360,13 @@ _profile_save_cache = {"last_save": 0}
 
 def _save_user_profile():
     import time as _t
-    if not supabase:
-        return
     if _t.time() - _profile_save_cache["last_save"] < 120:
         return
     _profile_save_cache["last_save"] = _t.time()
     try:
         user_profile["last_seen"] = datetime.utcnow().isoformat()
         user_profile["total_sessions"] = user_profile.get("total_sessions", 0) + 1
-        supabase.table("memory").upsert({
+        _wb_upsert("memory", "MRBLACK_USER", row={  # FIX v129: local store + async mirror
             "session_id": "MRBLACK_USER",
             "role":       "user",
             "content":    "",
@@ -632,7 +1383,7 @@ def _save_user_profile():
                 "user_rules":     user_profile.get("user_rules", [])[-30:]
 }),
             "updated_at": datetime.utcnow().isoformat()
-        }, on_conflict="session_id").execute()
+        })
     except Exception as e:
         print(f"User profile save error: {e}")
 
@@ -872,98 +1623,904 @@ def _anti_mev_slippage(buy_tax: float = 0.0, sell_tax: float = 0.0) -> int:
 
 
 
-def _get_dynamic_gas_price() -> int:
-    """
-    Dynamic gas price in wei — NodeReal ya w3 se fetch karo.
-    BSC real buy/sell/approve transactions ke liye gasPrice field.
-    Cached 30s via DataGuard._gas_cache (consistent).
-    Returns: int (wei) — e.g. 1_000_000_000 = 1 gwei
-    """
+# ========== GAS ORACLE (FIX v122) ==========
+# FIX v122: Gas price teen jagah fetch hota tha — _get_dynamic_gas_price (no cache, 4 sequential
+# fallbacks buy path pe), DataGuard.get_real_gas_bnb (30s cache), _fm_get_cached_gas (10s cache).
+# Ab ek background oracle: har block eth_gasPrice + eth_feeHistory ek batch mein, last
+# _GAS_WINDOW blocks ka rolling percentile view. Sab call sites memory se instant answer.
+# Urgency tiers: (feeHistory percentile, node gasPrice ka floor multiplier) — floors purane
+# 1.2x normal-exit / 3x emergency-sell multipliers jaise hi hain, hot market mein percentile upar le jaata hai.
+_GAS_WINDOW      = 20                       # rolling blocks
+_GAS_PCTS        = [50, 75, 90, 99]
+_GAS_TIERS       = {"normal": (50, 1.0), "fast": (75, 1.2), "urgent": (90, 1.5), "emergency": (99, 3.0)}
+_GAS_STALE_SEC   = 10.0                     # isse purana = cold-path sync fetch
+_GAS_IDLE_SEC    = 10.0                     # paper mode refresh — RPC budget bachao
+_GAS_FALLBACK    = int(1e9)                 # 1 gwei — BSC safe minimum
+_GAS_MIN_TX      = int(0.5e9)               # TX pricing: isse kam node value = 1 gwei (purana behaviour)
+_gas_lock        = threading.Lock()
+_gas_blocks      = deque(maxlen=_GAS_WINDOW)  # {"block", "base", 50: tip, 75: tip, ...}
+_gas_state       = {"node": 0, "ts": 0.0, "last_block": -1, "refreshes": 0, "errors": 0, "sync_fetches": 0}
+_gas_started     = [False]
+
+def _gas_fetch_sync() -> int:
+    """Cold path — oracle stale/na chala ho. QN → w3 → NodeReal → public RPC → 1 gwei"""
+    _gas_state["sync_fetches"] += 1
     # Primary: QuickNode (fastest, already connected)
     try:
         _w3qn = _get_w3q()
         if _w3qn:
-            gp   = _w3qn.eth.gas_price
-            gwei = gp / 1e9
-            if 0.5 < gwei < 100:
+            gp = _w3qn.eth.gas_price
+            if 0.05 < gp / 1e9 < 100:
                 return gp
     except Exception as _e:
-        print(f"⚠️ _get_dynamic_gas_price QN error: {_e}")
-
+        print(f"⚠️ gas sync QN error: {_e}")
     # Fallback: global w3
     try:
-        gp   = w3.eth.gas_price  # wei
-        gwei = gp / 1e9
-        if 0.5 < gwei < 100:
+        gp = w3.eth.gas_price  # wei
+        if 0.05 < gp / 1e9 < 100:
             return gp
     except Exception as _e:
-        print(f"⚠️ _get_dynamic_gas_price w3 error: {_e}")
+        print(f"⚠️ gas sync w3 error: {_e}")
+    # Fallback: NodeReal ya BSC public JSON-RPC
+    _key = os.environ.get("NODEREAL_API_KEY", "")
+    for _url in ([f"https://bsc-mainnet.nodereal.io/v1/{_key}"] if _key else []) + ["https://bsc-dataseed.bnbchain.org"]:
+        try:
+            r  = requests.post(_url, json={"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []}, timeout=5)
+            gp = int(r.json().get("result", "0x0"), 16)
+            if 0.05 < gp / 1e9 < 100:
+                return gp
+        except Exception as _e:
+            print(f"⚠️ gas sync RPC error: {str(_e)[:60]}")
+    print("⚠️ gas sync — all sources failed, using 1 gwei fallback")
+    return _GAS_FALLBACK
+
+def _gas_refresh_once():
+    """Ek batch: eth_gasPrice + eth_feeHistory(latest blocks) — naye blocks hi window mein"""
+    res = _rcpt_batch([("eth_gasPrice", []),
+                       ("eth_feeHistory", [hex(_GAS_WINDOW if _gas_state["last_block"] < 0 else 4), "latest", _GAS_PCTS])])
+    _node = int(res[0], 16) if res[0] else 0
+    _fh   = res[1] or {}
+    _rows = []
+    try:
+        _oldest = int(_fh.get("oldestBlock", "0x0"), 16)
+        _bases  = _fh.get("baseFeePerGas") or []
+        for _i, _rw in enumerate(_fh.get("reward") or []):
+            _row = {"block": _oldest + _i, "base": int(_bases[_i], 16) if _i < len(_bases) else 0}
+            for _p, _v in zip(_GAS_PCTS, _rw):
+                _row[_p] = int(_v, 16)
+            _rows.append(_row)
+    except Exception:
+        _rows = []  # feeHistory unsupported/garbled — node gasPrice floor kaafi hai
+    with _gas_lock:
+        for _row in _rows:
+            if _row["block"] > _gas_state["last_block"]:
+                _gas_blocks.append(_row)
+                _gas_state["last_block"] = _row["block"]
+        if 0.05 < _node / 1e9 < 100:
+            _gas_state["node"] = _node
+            _gas_state["ts"]   = time.time()
+    _gas_state["refreshes"] += 1
+
+def _gas_oracle_loop():
+    print("⛽ Gas oracle started")
+    while True:
+        try:
+            _gas_refresh_once()
+        except Exception as _e:
+            _gas_state["errors"] += 1
+            if _gas_state["errors"] % 30 == 1:
+                print(f"⚠️ Gas oracle error: {str(_e)[:80]}")
+        # Real mode = har block, paper = slow (sirf gas accounting ke liye)
+        time.sleep(_BSC_BLOCK_SEC if TRADE_MODE == "real" else _GAS_IDLE_SEC)
+
+def _ensure_gas_oracle():
+    if _gas_started[0]:
+        return
+    with _gas_lock:
+        if _gas_started[0]:
+            return
+        _gas_started[0] = True
+    threading.Thread(target=_gas_oracle_loop, daemon=True).start()
+
+def _gas_pct(p: int) -> int:
+    """Window ke har block ka (base + p-th percentile tip) → median across blocks"""
+    with _gas_lock:
+        vals = sorted(r["base"] + r.get(p, 0) for r in _gas_blocks)
+    return vals[len(vals) // 2] if vals else 0
+
+def _gas_node_price() -> int:
+    """Node eth_gasPrice (wei) — raw, gas accounting ke liye"""
+    _ensure_gas_oracle()
+    _node = _gas_state["node"]
+    if not _node or time.time() - _gas_state["ts"] > _GAS_STALE_SEC:
+        _node = _gas_fetch_sync()
+        with _gas_lock:
+            _gas_state["node"], _gas_state["ts"] = _node, time.time()
+    return _node
+
+def _gas_price(urgency: str = "normal") -> int:
+    """TX gas price (wei) — memory se. Tier = max(node gasPrice × floor, feeHistory percentile)"""
+    _node = _gas_node_price()
+    if _node < _GAS_MIN_TX:
+        _node = _GAS_FALLBACK
+    _pct, _floor = _GAS_TIERS.get(urgency, _GAS_TIERS["normal"])
+    return int(max(_node * _floor, _gas_pct(_pct)))
+
+def _gas_summary() -> dict:
+    now = time.time()
+    return {
+        "node_gwei":    round(_gas_state["node"] / 1e9, 3) if _gas_state["node"] else None,
+        "age_s":        round(now - _gas_state["ts"], 1) if _gas_state["ts"] else None,
+        "window":       len(_gas_blocks),
+        "last_block":   _gas_state["last_block"],
+        "tiers_gwei":   {t: round(_gas_price(t) / 1e9, 3) for t in _GAS_TIERS} if _gas_state["node"] else {},
+        "refreshes":    _gas_state["refreshes"],
+        "errors":       _gas_state["errors"],
+        "sync_fetches": _gas_state["sync_fetches"],
+    }
+
 
-    # Fallback 1: NodeReal JSON-RPC
+def _get_dynamic_gas_price() -> int:
+    """
+    Dynamic gas price in wei — BSC real buy/sell/approve transactions ke liye gasPrice field.
+    FIX v122: gas oracle se instant (normal tier). Returns: int (wei) — e.g. 1_000_000_000 = 1 gwei
+    """
+    return _gas_price("normal")
+
+
+
+# ========== TX PIPELINE (FIX v119) ==========
+# FIX v119: Buy hot path pe har baar from_key + get_balance + contract() + build_transaction
+# + gas_price RPC + nonce RPC hota tha — 4-5 round-trips decision ke baad.
+# Ab sab pre-warm: account/contract/selector cache, background mein balance sync, gas = oracle, nonce = manager.
+# Hot path = calldata encode + local sign + ek send_raw_transaction.
+from eth_abi import encode as _abi_encode
+
+_TXP_WARM_SEC   = 2.0    # background nonce/gas/balance refresh interval
+_TXP_FRESH_SEC  = 10.0   # isse purana cache = fallback to RPC
+_txp_lock       = threading.Lock()
+_txp_state      = {"account": None, "pk": "", "bal": 0.0, "bal_ts": 0.0,
+                   "warm_runs": 0, "warm_errors": 0}
+_txp_contracts  = {}     # (kind, id(w3)) → contract
+_txp_selectors  = {}     # signature → 4-byte selector
+_txp_submit_ms  = deque(maxlen=200)
+_txp_stats      = {"submits": 0, "send_failed": 0}
+
+def _txp_account():
+    """Cached LocalAccount — from_key sirf ek baar (key change pe dobara)"""
+    pk = REAL_PRIVATE_KEY or os.getenv("WALLET_PRIVATE_KEY", "") or os.getenv("PRIVATE_KEY", "")
+    if not pk:
+        return None
+    acct = _txp_state["account"]
+    if acct is None or _txp_state["pk"] != pk:
+        from eth_account import Account as _AccTxp
+        acct = _AccTxp.from_key(pk)
+        _txp_state["account"] = acct
+        _txp_state["pk"]      = pk
+    return acct
+
+def _txp_contract(kind: str, w3_instance):
+    """Router / FM factory contract object cache — per w3 instance"""
+    key = (kind, id(w3_instance))
+    c = _txp_contracts.get(key)
+    if c is None:
+        if kind == "router":
+            c = w3_instance.eth.contract(address=Web3.to_checksum_address(PANCAKE_ROUTER), abi=ROUTER_SWAP_ABI)
+        else:
+            c = w3_instance.eth.contract(address=Web3.to_checksum_address(_FM_FACTORY_ADDR), abi=_FM_BC_ABI)
+        _txp_contracts[key] = c
+    return c
+
+def _txp_selector(sig: str) -> bytes:
+    s = _txp_selectors.get(sig)
+    if s is None:
+        s = bytes(Web3.keccak(text=sig)[:4])
+        _txp_selectors[sig] = s
+    return s
+
+# Calldata templates — selector precomputed, sirf args encode hote hain
+_TXP_SIG_SWAP_ETH = "swapExactETHForTokensSupportingFeeOnTransferTokens(uint256,address[],address,uint256)"
+_TXP_SIG_FM_BUY   = "buyTokenAMAP(address,uint256,uint256)"
+
+def _txp_calldata_swap_eth(amount_out_min: int, path: list, wallet: str, deadline: int) -> str:
+    body = _abi_encode(["uint256", "address[]", "address", "uint256"],
+                       [int(amount_out_min), list(path), wallet, int(deadline)])
+    return "0x" + (_txp_selector(_TXP_SIG_SWAP_ETH) + body).hex()
+
+def _txp_calldata_fm_buy(token: str, funds: int, min_amount: int) -> str:
+    body = _abi_encode(["address", "uint256", "uint256"], [token, int(funds), int(min_amount)])
+    return "0x" + (_txp_selector(_TXP_SIG_FM_BUY) + body).hex()
+
+def _txp_next_nonce(w3_instance, wallet_addr: str) -> int:
+    """Local nonce counter — FIX v124: nonce manager (background sync, in-flight tracking)"""
+    return get_next_nonce(w3_instance, wallet_addr)
+
+def _txp_gas_price(urgency: str = "normal") -> int:
+    """Gas oracle (FIX v122) — memory se, stale ho to oracle khud sync fetch karta hai"""
+    return _gas_price(urgency)
+
+def _txp_balance(w3_instance, wallet_addr: str) -> float:
+    """Wallet BNB balance — warm cache (<TXP_FRESH_SEC) ya fresh RPC"""
+    if _txp_state["bal_ts"] and time.time() - _txp_state["bal_ts"] < _TXP_FRESH_SEC:
+        return _txp_state["bal"]
+    bal = float(w3_instance.eth.get_balance(wallet_addr)) / 1e18
+    _txp_state["bal"], _txp_state["bal_ts"] = bal, time.time()
+    return bal
+
+def _txp_spend(bnb: float):
+    """Submit ke baad cached balance turant ghatao — next buy stale balance pe pass na ho"""
+    with _txp_lock:
+        _txp_state["bal"] = max(0.0, _txp_state["bal"] - bnb)
+
+def _txp_submit(w3_instance, to_addr: str, data: str, value_wei: int, gas: int,
+                gas_price: int, nonce: int, decision_ts: float = 0.0):
+    """Local sign + ek send_raw_transaction. decision→submit ms record hota hai."""
+    acct = _txp_account()
+    tx = {"to": to_addr, "data": data, "value": int(value_wei), "gas": int(gas),
+          "gasPrice": int(gas_price), "nonce": int(nonce), "chainId": 56}
+    signed  = acct.sign_transaction(tx)
     try:
-        _key = os.environ.get("NODEREAL_API_KEY", "")
-        if _key:
-            r = requests.post(
-                f"https://bsc-mainnet.nodereal.io/v1/{_key}",
-                json={"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []},
-                timeout=5
-            )
-            gp_hex = r.json().get("result", "0x0")
-            gp     = int(gp_hex, 16)
-            gwei   = gp / 1e9
-            if 0.5 < gwei < 100:
-                return gp
+        tx_hash = _broadcast_raw_tx(signed.raw_transaction, f"submit n={nonce}")  # FIX v121: multi-endpoint
+    except Exception:
+        _txp_stats["send_failed"] += 1
+        _nonce_release(acct.address, nonce)  # FIX v124: gap na bane
+        raise
+    _nonce_sent(acct.address, nonce, _rcpt_hex(tx_hash), gas_price, tx)
+    _txp_stats["submits"] += 1
+    if decision_ts:
+        _ms = (time.time() - decision_ts) * 1000
+        _txp_submit_ms.append(_ms)
+        print(f"⏱️ [TXP] decision→submit {_ms:.1f}ms | nonce={nonce}")
+    return tx_hash
+
+def _txp_warm_loop():
+    """Background: balance har _TXP_WARM_SEC sync — hot path RPC-free rahe (gas = oracle, nonce = manager)"""
+    print("🔥 TX pipeline warm loop started")
+    while True:
+        try:
+            acct = _txp_account()
+            if acct is not None:
+                _w3t = _qw3()
+                _txp_contract("router", _w3t)
+                _txp_contract("fm", _w3t)
+                _nonce_warm(acct.address)  # FIX v124: nonce manager registered + sync loop chalu
+                _bal = float(_w3t.eth.get_balance(acct.address)) / 1e18
+                with _txp_lock:
+                    _txp_state["bal"], _txp_state["bal_ts"] = _bal, time.time()
+                _txp_state["warm_runs"] += 1
+        except Exception as _e:
+            _txp_state["warm_errors"] += 1
+            if _txp_state["warm_errors"] % 30 == 1:
+                print(f"⚠️ TX pipeline warm error: {str(_e)[:80]}")
+        time.sleep(_TXP_WARM_SEC)
+
+def _txp_summary() -> dict:
+    lat = sorted(_txp_submit_ms)
+    n = len(lat)
+    return {
+        **_txp_stats,
+        "warm_runs":      _txp_state["warm_runs"],
+        "warm_errors":    _txp_state["warm_errors"],
+        "submit_ms_p50":  round(lat[n // 2], 1) if n else None,
+        "submit_ms_p95":  round(lat[min(n - 1, int(n * 0.95))], 1) if n else None,
+        "submit_samples": n,
+    }
+
+
+
+# ========== RAW TX BROADCAST (FIX v121) ==========
+# FIX v121: Signed TX pehle sirf _qw3() se jaata tha — QuickNode slow/429 = rug-exit sell seconds atki.
+# Ab same raw TX saare HTTP endpoints pe parallel: QuickNode, BSC_RPC, BROADCAST_RPCS env
+# (local node / extra relays), stage-1 pool. Pehla ack jeetta hai.
+# "already known" = kisi aur endpoint/peer se mempool mein aa chuka → success.
+# "nonce too low" = tentative — koi aur ack na mile to tx hash lookup se confirm.
+import concurrent.futures as _cf_bcast
+
+_BCAST_TIMEOUT_SEC = 3.0
+_BCAST_KNOWN_ERRS  = ("already known", "known transaction", "already imported", "alreadyknown")
+_BCAST_NONCE_ERRS  = ("nonce too low",)
+_BCAST_MAX_SENDS   = 6    # FIX v146: itne broadcasts ek saath bina queue ke — pool = sends × endpoints
+_bcast_pool        = [None]  # lazy — endpoints count (env) pe size; threads on-demand bante hain
+_bcast_sessions    = {}   # url → requests.Session (keep-alive, TLS handshake bachao)
+_bcast_lock        = threading.Lock()
+_bcast_ack_ms      = deque(maxlen=200)
+_bcast_stats       = {"sent": 0, "acked": 0, "reconciled": 0, "failed": 0, "first_ack": {}, "endpoint_errors": {}}
+
+def _bcast_endpoints() -> list:
+    """Ordered, de-duplicated broadcast endpoints — fastest paid pehle"""
+    _eps = [os.getenv("QUICKNODE_HTTP", ""), BSC_RPC]
+    _eps += [u.strip() for u in os.getenv("BROADCAST_RPCS", "").split(",")]
+    _eps += _STAGE1_RPCS
+    _seen, _out = set(), []
+    for u in _eps:
+        if u and u.rstrip("/") not in _seen:
+            _seen.add(u.rstrip("/"))
+            _out.append(u)
+    return _out
+
+def _bcast_executor():
+    """FIX v146: Pehle fixed 12 workers — 9 endpoints × 2-3 concurrent sends pe rug-exit sell
+    queue mein seconds wait karti. Ab har concurrent send ko poora endpoint fan-out milta hai."""
+    if _bcast_pool[0] is None:
+        with _bcast_lock:
+            if _bcast_pool[0] is None:
+                _bcast_pool[0] = _cf_bcast.ThreadPoolExecutor(
+                    max_workers=_BCAST_MAX_SENDS * max(1, len(_bcast_endpoints())), thread_name_prefix="bcast")
+    return _bcast_pool[0]
+
+def _bcast_label(url: str) -> str:
+    if url == os.getenv("QUICKNODE_HTTP", ""): return "quicknode"
+    if url == BSC_RPC: return "bsc_rpc"
+    return url.split("//")[-1].split("/")[0]
+
+def _bcast_session(url: str):
+    with _bcast_lock:
+        s = _bcast_sessions.get(url)
+        if s is None:
+            s = requests.Session()
+            _bcast_sessions[url] = s
+        return s
+
+def _bcast_send_one(url: str, raw_hex: str):
+    """Ek endpoint pe eth_sendRawTransaction → ("ok"|"known"|"nonce"|"err", msg)"""
+    try:
+        r = _bcast_session(url).post(url, json={"jsonrpc": "2.0", "id": 1, "method": "eth_sendRawTransaction",
+                                                "params": [raw_hex]}, timeout=_BCAST_TIMEOUT_SEC)
+        body = r.json()
+        if body.get("result"):
+            return "ok", body["result"]
+        msg = str((body.get("error") or {}).get("message", body))[:120]
     except Exception as _e:
-        print(f"⚠️ _get_dynamic_gas_price NodeReal error: {_e}")
+        msg = str(_e)[:120]
+    low = msg.lower()
+    if any(k in low for k in _BCAST_KNOWN_ERRS):
+        return "known", msg
+    if any(k in low for k in _BCAST_NONCE_ERRS):
+        return "nonce", msg
+    return "err", msg
+
+def _broadcast_raw_tx(raw_tx, label: str = ""):
+    """
+    Signed raw TX saare endpoints pe parallel bhejo — pehla ack pe return.
+    Returns tx hash (HexBytes, send_raw_transaction jaisa). Koi ack na mile to ValueError
+    pehle real error message ke saath (callers ka nonce/gas/funds error handling same rahe).
+    """
+    raw     = bytes(raw_tx)
+    raw_hex = "0x" + raw.hex()
+    tx_hash = Web3.keccak(raw)
+    t0      = time.time()
+    _eps    = _bcast_endpoints()
+    _bcast_stats["sent"] += 1
+    futs    = {_bcast_executor().submit(_bcast_send_one, u, raw_hex): u for u in _eps}
+    _nonce_hint, _errs = False, []
+    try:
+        for f in _cf_bcast.as_completed(futs, timeout=_BCAST_TIMEOUT_SEC + 1):
+            url = futs[f]
+            kind, msg = f.result()
+            if kind in ("ok", "known"):
+                _ms = (time.time() - t0) * 1000
+                _bcast_ack_ms.append(_ms)
+                _who = _bcast_label(url)
+                with _bcast_lock:
+                    _bcast_stats["acked"] += 1
+                    _bcast_stats["first_ack"][_who] = _bcast_stats["first_ack"].get(_who, 0) + 1
+                    if kind == "known":
+                        _bcast_stats["reconciled"] += 1
+                print(f"📡 [BCAST] {label or tx_hash.hex()[:12]} first ack: {_who} ({kind}) {_ms:.0f}ms / {len(_eps)} eps")
+                return tx_hash
+            if kind == "nonce":
+                _nonce_hint = True
+            else:
+                _errs.append(msg)
+                with _bcast_lock:
+                    _k = _bcast_label(url)
+                    _bcast_stats["endpoint_errors"][_k] = _bcast_stats["endpoint_errors"].get(_k, 0) + 1
+    except _cf_bcast.TimeoutError:
+        pass
+    # "nonce too low" — shayad humara hi TX mine/propagate ho chuka; hash lookup se reconcile
+    if _nonce_hint:
+        try:
+            if _qw3().eth.get_transaction(tx_hash):
+                with _bcast_lock:
+                    _bcast_stats["acked"] += 1
+                    _bcast_stats["reconciled"] += 1
+                print(f"📡 [BCAST] {label or tx_hash.hex()[:12]} nonce-too-low reconciled — tx already on chain/mempool")
+                return tx_hash
+        except Exception:
+            pass
+        _errs.insert(0, "nonce too low")
+    _bcast_stats["failed"] += 1
+    raise ValueError(_errs[0] if _errs else "broadcast: no endpoint acknowledged")
+
+def _bcast_summary() -> dict:
+    lat = sorted(_bcast_ack_ms)
+    n = len(lat)
+    with _bcast_lock:
+        _st = {**_bcast_stats, "first_ack": dict(_bcast_stats["first_ack"]),
+               "endpoint_errors": dict(_bcast_stats["endpoint_errors"])}
+    _st["endpoints"]  = len(_bcast_endpoints())
+    _st["pool_workers"] = _bcast_pool[0]._max_workers if _bcast_pool[0] else 0
+    _st["ack_ms_p50"] = round(lat[n // 2]) if n else None
+    _st["ack_ms_p95"] = round(lat[min(n - 1, int(n * 0.95))]) if n else None
+    return _st
+
+
+# ========== RECEIPT TRACKER (FIX v120) ==========
+# FIX v120: Pehle har TX ka apna waiter thread tha — wait_for_transaction_receipt(60),
+# 2s/0.3s get_transaction_receipt polls, pre-approve fire-and-forget. Ab ek central registry:
+# naya block aate hi saare pending hashes + sender nonces EK JSON-RPC batch mein query,
+# outcome pe callback — confirmed / reverted / dropped / replaced. Latency ≤ 1 block.
+_RCPT_POLL_SEC    = 0.3    # eth_blockNumber poll (BSC block ~0.75s)
+_RCPT_TIMEOUT_SEC = 60.0   # receipt nahi mila to dropped
+_RCPT_CB_WORKERS  = 2      # core callback dispatchers — slow callback tracker ko block na kare
+_RCPT_CB_MAX      = 16     # FIX v147: sab busy (RPC-heavy callbacks) to extra dispatcher, itne tak
+_RCPT_CB_IDLE_SEC = 30.0   # extra dispatcher itna idle rahe to exit
+_rcpt_lock        = threading.Lock()
+_rcpt_pending     = {}     # hash_lower → {hash, key, alts, label, sender, nonce, sent_ts, timeout, cbs, inline, block0, repl_seen}
+_rcpt_wake        = threading.Event()
+_rcpt_cb_cond     = threading.Condition()
+_rcpt_cb_q        = deque()
+_rcpt_cb_pool     = {"threads": 0, "idle": 0, "spawned": 0}   # _rcpt_cb_cond ke under
+_rcpt_started     = [False]
+_rcpt_confirm_ms  = deque(maxlen=300)
+_rcpt_stats       = {"tracked": 0, "confirmed": 0, "reverted": 0, "dropped": 0, "replaced": 0,
+                     "blocks": 0, "batches": 0, "batch_errors": 0, "blocks_to_confirm": 0}
+
+def _rcpt_rpc_url() -> str:
+    return os.getenv("QUICKNODE_HTTP", "") or BSC_RPC
+
+def _rcpt_batch(calls: list) -> list:
+    """[(method, params), ...] → results list — ek HTTP round-trip. Missing/error = None"""
+    payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p} for i, (m, p) in enumerate(calls)]
+    r = requests.post(_rcpt_rpc_url(), json=payload, timeout=5)
+    body = r.json()
+    if isinstance(body, dict):  # provider ne batch reject kiya
+        raise ValueError(str(body.get("error", body))[:80])
+    out = [None] * len(calls)
+    for item in body:
+        _i = item.get("id")
+        if isinstance(_i, int) and 0 <= _i < len(out):
+            out[_i] = item.get("result")
+    return out
+
+def _rcpt_norm(rx):
+    """Raw JSON receipt → web3 jaisa shape (int status/gas, HexBytes topics/data) — purane parsers same chalein"""
+    if not rx or not isinstance(rx.get("status"), str):
+        return rx
+    from hexbytes import HexBytes
+    out = dict(rx)
+    for _k in ("status", "gasUsed", "effectiveGasPrice", "blockNumber", "cumulativeGasUsed", "transactionIndex"):
+        if isinstance(out.get(_k), str):
+            out[_k] = int(out[_k], 16)
+    out["logs"] = [dict(_lg, topics=[HexBytes(_t) for _t in _lg.get("topics", [])],
+                        data=HexBytes(_lg.get("data") or "0x"))
+                   for _lg in rx.get("logs", [])]
+    return out
+
+def _rcpt_hex(tx_hash) -> str:
+    h = tx_hash.hex() if isinstance(tx_hash, (bytes, bytearray)) else str(tx_hash)
+    return h if h.startswith("0x") else "0x" + h
+
+def _track_tx(tx_hash, label: str = "", sender: str = "", nonce=None,
+              on_confirmed=None, on_reverted=None, on_dropped=None, on_replaced=None,
+              timeout: float = _RCPT_TIMEOUT_SEC, inline: bool = False) -> str:
+    """
+    Pending TX register karo. Callbacks cb(tx_hash_hex, receipt_or_None) dispatcher pe chalte hain.
+    on_replaced na ho to on_dropped use hota hai. inline=True sirf cheap callbacks ke liye (Event.set).
+    sender+nonce diye hon to replaced detect hota hai (same nonce pe doosra TX mine hua).
+    """
+    h = _rcpt_hex(tx_hash)
+    entry = {"hash": h, "key": h.lower(), "alts": [], "label": label or h[:12], "sender": sender or "",
+             "nonce": nonce, "sent_ts": time.time(), "timeout": float(timeout), "inline": inline,
+             "cbs": {"confirmed": on_confirmed, "reverted": on_reverted,
+                     "dropped": on_dropped, "replaced": on_replaced or on_dropped},
+             "block0": 0, "repl_seen": 0}
+    with _rcpt_lock:
+        _rcpt_pending[h.lower()] = entry
+    _rcpt_stats["tracked"] += 1
+    _ensure_rcpt_tracker()
+    _rcpt_wake.set()
+    return h
+
+def _rcpt_link(prev_hash, new_hash) -> bool:
+    """FIX v145: Speed-up rebroadcast (same nonce, naya hash) ko original entry se jodo.
+    Kisi bhi hash ki receipt aaye → wahi outcome, callbacks ko mined hash milta hai.
+    Pehle naya hash alag track hota tha aur original 'replaced' fire karta — landed buy ghost-clean hota tha."""
+    p, h = _rcpt_hex(prev_hash).lower(), _rcpt_hex(new_hash)
+    with _rcpt_lock:
+        for e in _rcpt_pending.values():
+            if e["key"] == p or p in (a.lower() for a in e["alts"]):
+                e["alts"].append(h)
+                e["repl_seen"] = 0
+                return True
+    return False
+
+def _await_tx(tx_hash, timeout: float = _RCPT_TIMEOUT_SEC, label: str = "", sender: str = "", nonce=None):
+    """Sync callers (real_buy/real_sell/approve) ke liye — tracker outcome tak wait.
+    Returns (outcome, receipt) — outcome: confirmed/reverted/dropped/replaced/timeout"""
+    _ev, _box = threading.Event(), {}
+    def _mk(kind):
+        def _cb(_h, _rx):
+            _box["kind"], _box["rx"] = kind, _rx
+            _ev.set()
+        return _cb
+    _track_tx(tx_hash, label, sender, nonce, _mk("confirmed"), _mk("reverted"), _mk("dropped"),
+              _mk("replaced"), timeout=timeout, inline=True)
+    _ev.wait(timeout + 5)
+    return _box.get("kind", "timeout"), _box.get("rx")
+
+def _rcpt_fire(entry: dict, kind: str, rx=None):
+    _rcpt_stats[kind] += 1
+    cb = entry["cbs"].get(kind)
+    if kind in ("confirmed", "reverted"):
+        _ms = (time.time() - entry["sent_ts"]) * 1000
+        _rcpt_confirm_ms.append(_ms)
+        print(f"🧾 [RCPT] {entry['label']} {kind} in {_ms:.0f}ms")
+    else:
+        print(f"⏳ [RCPT] {entry['label']} {kind} — {entry['hash'][:12]}")
+    if cb is None:
+        return
+    if entry["inline"]:
+        try: cb(entry["hash"], rx)
+        except Exception as _e: print(f"⚠️ [RCPT] callback error: {str(_e)[:60]}")
+        return
+    with _rcpt_cb_cond:
+        _rcpt_cb_q.append((cb, entry["hash"], rx))
+        # FIX v147: FM buy/retry callbacks RPC pe block karte hain (get_transaction, getTokenInfo,
+        # send + balanceOf). Koi dispatcher free nahi to naya — emergency-sell confirm queue mein na atke.
+        if _rcpt_cb_pool["idle"] < len(_rcpt_cb_q) and _rcpt_cb_pool["threads"] < _RCPT_CB_MAX:
+            _rcpt_cb_spawn(core=False)
+        _rcpt_cb_cond.notify()
+
+def _rcpt_cb_spawn(core: bool):
+    """_rcpt_cb_cond ke under call karo"""
+    _rcpt_cb_pool["threads"] += 1
+    if not core:
+        _rcpt_cb_pool["spawned"] += 1
+    threading.Thread(target=_rcpt_cb_worker, args=(core,), daemon=True).start()
+
+def _rcpt_cb_worker(core: bool = True):
+    while True:
+        with _rcpt_cb_cond:
+            _rcpt_cb_pool["idle"] += 1
+            while not _rcpt_cb_q:
+                if core:
+                    _rcpt_cb_cond.wait()
+                elif not _rcpt_cb_cond.wait(_RCPT_CB_IDLE_SEC) and not _rcpt_cb_q:
+                    _rcpt_cb_pool["idle"]    -= 1
+                    _rcpt_cb_pool["threads"] -= 1
+                    return  # extra dispatcher — kaam khatam
+            _rcpt_cb_pool["idle"] -= 1
+            cb, h, rx = _rcpt_cb_q.popleft()
+        try:
+            cb(h, rx)
+        except Exception as _e:
+            print(f"⚠️ [RCPT] callback error {h[:12]}: {str(_e)[:60]}")
 
-    # Fallback 2: BSC public RPC
+def _rcpt_fetch(hashes: list, senders: list) -> tuple:
+    """Receipts + sender latest nonces — batch, fail ho to per-hash fallback"""
     try:
-        import requests as _req
-        _pub_rpc = "https://bsc-dataseed.bnbchain.org"
-        r2 = _req.post(
-            _pub_rpc,
-            json={"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []},
-            timeout=5
-        )
-        gp_hex2 = r2.json().get("result", "0x0")
-        gp2     = int(gp_hex2, 16)
-        gwei2   = gp2 / 1e9
-        if 0.5 < gwei2 < 100:
-            return gp2
+        res = _rcpt_batch([("eth_getTransactionReceipt", [h]) for h in hashes] +
+                          [("eth_getTransactionCount", [s, "latest"]) for s in senders])
+        _rcpt_stats["batches"] += 1
+        rx = {h.lower(): _rcpt_norm(r) for h, r in zip(hashes, res[:len(hashes)])}
+        nn = {s.lower(): int(r, 16) for s, r in zip(senders, res[len(hashes):]) if r}
+        return rx, nn
+    except Exception as _be:
+        _rcpt_stats["batch_errors"] += 1
+        if _rcpt_stats["batch_errors"] % 20 == 1:
+            print(f"⚠️ [RCPT] batch failed ({str(_be)[:50]}) — per-hash fallback")
+    _w3r, rx = _qw3(), {}
+    for h in hashes:
+        try: rx[h.lower()] = _w3r.eth.get_transaction_receipt(h)
+        except Exception: rx[h.lower()] = None
+    return rx, {}
+
+def _rcpt_loop():
+    print("🧾 Receipt tracker started")
+    _last_block = 0
+    while True:
+        with _rcpt_lock:
+            _has = bool(_rcpt_pending)
+        if not _has:
+            _rcpt_wake.wait()
+        _rcpt_wake.clear()
+        try:
+            _bn_hex = _rcpt_batch([("eth_blockNumber", [])])[0]
+            _bn = int(_bn_hex, 16) if _bn_hex else _last_block + 1
+        except Exception:
+            _bn = _last_block + 1  # blockNumber fail — timer pe chalao
+        _now = time.time()
+        with _rcpt_lock:
+            _pend = list(_rcpt_pending.values())
+            # naya TX ya timeout due — block ka wait mat karo
+            _fresh = any(e["block0"] == 0 or _now - e["sent_ts"] > e["timeout"] for e in _pend)
+        if _pend and (_bn != _last_block or _fresh):
+            if _bn != _last_block:
+                _rcpt_stats["blocks"] += 1
+            _last_block = _bn
+            _senders = sorted({e["sender"] for e in _pend if e["sender"] and e["nonce"] is not None})
+            try:
+                _rx_map, _nn_map = _rcpt_fetch([_h for e in _pend for _h in [e["hash"]] + e["alts"]], _senders)
+            except Exception:
+                _rx_map, _nn_map = {}, {}
+            _now = time.time()
+            for e in _pend:
+                if e["block0"] == 0:
+                    e["block0"] = _bn
+                _rx, _kind = _rx_map.get(e["hash"].lower()), None
+                for _alt in e["alts"]:  # FIX v145: speed-up hash mine hua ho sakta hai
+                    if _rx:
+                        break
+                    _rx = _rx_map.get(_alt.lower())
+                    if _rx:
+                        e["hash"] = _alt
+                if _rx:
+                    _kind = "confirmed" if _rx.get("status") == 1 else "reverted"
+                    if _kind == "confirmed":
+                        _rcpt_stats["blocks_to_confirm"] = max(0, int(_rx.get("blockNumber") or _bn) - e["block0"] + 1)
+                else:
+                    _latest = _nn_map.get(e["sender"].lower()) if e["sender"] else None
+                    if _latest is not None and e["nonce"] is not None and _latest > e["nonce"]:
+                        # Nonce use ho gaya par is hash ki receipt nahi — 2 observations pe replaced
+                        e["repl_seen"] += 1
+                        if e["repl_seen"] >= 2:
+                            _kind = "replaced"
+                    if not _kind and _now - e["sent_ts"] > e["timeout"]:
+                        _kind = "dropped"
+                if _kind:
+                    with _rcpt_lock:
+                        _rcpt_pending.pop(e["key"], None)
+                    _rcpt_fire(e, _kind, _rx)
+        time.sleep(_RCPT_POLL_SEC)
+
+def _ensure_rcpt_tracker():
+    if _rcpt_started[0]:
+        return
+    with _rcpt_lock:
+        if _rcpt_started[0]:
+            return
+        _rcpt_started[0] = True
+    threading.Thread(target=_rcpt_loop, daemon=True).start()
+    with _rcpt_cb_cond:
+        for _ in range(_RCPT_CB_WORKERS):
+            _rcpt_cb_spawn(core=True)
+
+def _rcpt_summary() -> dict:
+    lat = sorted(_rcpt_confirm_ms)
+    n = len(lat)
+    with _rcpt_lock:
+        _depth = len(_rcpt_pending)
+    with _rcpt_cb_cond:
+        _cbp = {"cb_" + k: v for k, v in _rcpt_cb_pool.items()}
+        _cbp["cb_queued"] = len(_rcpt_cb_q)
+    return {
+        **_rcpt_stats,
+        **_cbp,
+        "pending":         _depth,
+        "confirm_ms_p50":  round(lat[n // 2]) if n else None,
+        "confirm_ms_p95":  round(lat[min(n - 1, int(n * 0.95))]) if n else None,
+    }
+
+
+# ========== APPROVAL SERVICE (FIX v123) ==========
+# FIX v123: Har buy ke baad apna thread + sleep(2) + allowance RPC + approve; sell pe phir
+# allowance RPC; _fm_approved_cache sirf memory mein. Ab ek service:
+#   - (token, spender) allowance cache — infinite approvals Supabase mein persist (restart safe)
+#   - pre-approvals queue → ek worker, saare pending allowances EK eth_call batch mein check,
+#     approves shared TX pipeline (local nonce + gas oracle + broadcast) se, receipt tracker confirm kare
+#   - sell path: cache confident ho to allowance RPC skip — exit pe ek round-trip kam
+_APPROVE_MAX        = 2**256 - 1
+_APPROVE_INFINITE   = 2**255          # isse upar = infinite approve, spend se practically kabhi kam nahi
+_APPROVE_FINITE_TTL = 300.0           # finite allowance cache kitna trust karein
+_APPR_SESSION_ID    = "MRBLACK_ALLOWANCES"
+_TXP_SIG_APPROVE    = "approve(address,uint256)"
+_TXP_SIG_ALLOWANCE  = "allowance(address,address)"
+_appr_lock    = threading.Lock()
+_appr_cond    = threading.Condition(_appr_lock)
+_appr_cache   = {}       # "token:spender" (lower) → {"allow": int, "ts": float}
+_appr_jobs    = deque()  # (token, spender, label) — pre-approval queue
+_appr_pending = {}       # key → approve tx hash (in-flight)
+_appr_started = [False]
+_appr_loaded  = [False]
+_appr_stats   = {"cache_hits": 0, "rpc_checks": 0, "batch_checks": 0, "approves_sent": 0,
+                 "approves_ok": 0, "approves_failed": 0, "invalidated": 0}
+
+def _appr_key(token: str, spender: str) -> str:
+    return f"{token.lower()}:{spender.lower()}"
+
+def _txp_calldata_approve(spender: str, amount: int = _APPROVE_MAX) -> str:
+    body = _abi_encode(["address", "uint256"], [Web3.to_checksum_address(spender), int(amount)])
+    return "0x" + (_txp_selector(_TXP_SIG_APPROVE) + body).hex()
+
+def _allowance_confident(token: str, spender: str, amount: int = 0) -> bool:
+    """Cache pe bharosa? Infinite approve = hamesha, finite = TTL ke andar aur amount cover ho"""
+    with _appr_lock:
+        e = _appr_cache.get(_appr_key(token, spender))
+    if not e:
+        return False
+    if e["allow"] >= _APPROVE_INFINITE:
+        return True
+    return e["allow"] >= amount > 0 and time.time() - e["ts"] < _APPROVE_FINITE_TTL
+
+def _allowance_record(token: str, spender: str, allow: int):
+    _k = _appr_key(token, spender)
+    with _appr_lock:
+        _was_inf = _appr_cache.get(_k, {}).get("allow", 0) >= _APPROVE_INFINITE
+        _appr_cache[_k] = {"allow": int(allow), "ts": time.time()}
+    if (int(allow) >= _APPROVE_INFINITE) != _was_inf:
+        threading.Thread(target=_appr_save, daemon=True).start()
+
+def _allowance_invalidate(token: str, spender: str = ""):
+    """Sell revert / approve fail pe — cache galat ho sakta hai, agli baar chain se check"""
+    _tl = token.lower()
+    with _appr_lock:
+        _ks = [k for k in _appr_cache if k.startswith(_tl + ":") and (not spender or k.endswith(":" + spender.lower()))]
+        for k in _ks:
+            _appr_cache.pop(k, None)
+    if _ks:
+        _appr_stats["invalidated"] += len(_ks)
+        threading.Thread(target=_appr_save, daemon=True).start()
+
+def _allowance_get(w3_instance, token: str, spender: str, owner: str, amount: int = 0) -> int:
+    """Sell path — cache confident ho to 0 RPC, warna ek allowance call + cache update"""
+    if _allowance_confident(token, spender, amount):
+        _appr_stats["cache_hits"] += 1
+        with _appr_lock:
+            return _appr_cache[_appr_key(token, spender)]["allow"]
+    _appr_stats["rpc_checks"] += 1
+    _tc = w3_instance.eth.contract(address=Web3.to_checksum_address(token), abi=ERC20_ABI_APPROVE)
+    allow = _tc.functions.allowance(Web3.to_checksum_address(owner), Web3.to_checksum_address(spender)).call()
+    _allowance_record(token, spender, allow)
+    return allow
+
+def _appr_send(token: str, spender: str, gas_mult: float = 1.5, label: str = ""):
+    """Approve TX shared pipeline se — returns (tx_hash, nonce, sender)"""
+    acct  = _txp_account()
+    _w3a  = _qw3()
+    nonce = _txp_next_nonce(_w3a, acct.address)
+    h = _txp_submit(_w3a, Web3.to_checksum_address(token), _txp_calldata_approve(spender), 0, 100000,
+                    int(_fm_get_cached_gas() * gas_mult), nonce)  # FIX v23: was 3.0x
+    _appr_stats["approves_sent"] += 1
+    with _appr_lock:
+        _appr_pending[_appr_key(token, spender)] = _rcpt_hex(h)
+    print(f"📡 [APPROVE] {label or token[:10]} → {spender[:10]} sent n={nonce}: {_rcpt_hex(h)[:12]}")
+    return h, nonce, acct.address
+
+def _appr_done(token: str, spender: str, ok: bool):
+    with _appr_lock:
+        _appr_pending.pop(_appr_key(token, spender), None)
+    if ok:
+        _appr_stats["approves_ok"] += 1
+        _allowance_record(token, spender, _APPROVE_MAX)
+    else:
+        _appr_stats["approves_failed"] += 1
+
+def _approve_now(token: str, spender: str, gas_mult: float = 1.5, timeout: float = 15.0, label: str = ""):
+    """Sync approve (sell path) — confirm tak wait. Returns (confirmed, nonce)"""
+    h, nonce, sender = _appr_send(token, spender, gas_mult, label)
+    _out, _ = _await_tx(h, timeout, f"approve {label or token[:10]}", sender, nonce)
+    _appr_done(token, spender, _out == "confirmed")
+    return _out == "confirmed", nonce
+
+def _schedule_approve(token: str, spender: str, label: str = ""):
+    """Pre-approval queue mein daalo — non-blocking, buy path pe zero cost"""
+    if not _txp_account() or _allowance_confident(token, spender):
+        return
+    with _appr_cond:
+        if _appr_key(token, spender) in _appr_pending:
+            return
+        _appr_jobs.append((token, spender, label))
+        _appr_cond.notify()
+    _ensure_appr_worker()
+
+def _appr_batch_allowances(jobs: list, owner: str) -> dict:
+    """Saare jobs ka allowance ek eth_call batch mein — key → allowance (None = unknown)"""
+    _sel = _txp_selector(_TXP_SIG_ALLOWANCE)
+    calls = []
+    for _t, _s, _ in jobs:
+        _data = "0x" + (_sel + _abi_encode(["address", "address"], [Web3.to_checksum_address(owner),
+                                                                   Web3.to_checksum_address(_s)])).hex()
+        calls.append(("eth_call", [{"to": Web3.to_checksum_address(_t), "data": _data}, "latest"]))
+    _appr_stats["batch_checks"] += 1
+    res = _rcpt_batch(calls)
+    return {_appr_key(_t, _s): (int(r, 16) if r and r != "0x" else None) for (_t, _s, _), r in zip(jobs, res)}
+
+def _appr_worker():
+    print("🔑 Approval service started")
+    while True:
+        with _appr_cond:
+            while not _appr_jobs:
+                _appr_cond.wait()
+            _batch = list(_appr_jobs)
+            _appr_jobs.clear()
+        try:
+            acct = _txp_account()
+            if acct is None:
+                continue
+            _todo = [j for j in _batch if not _allowance_confident(j[0], j[1])]
+            try:
+                _allow = _appr_batch_allowances(_todo, acct.address) if _todo else {}
+            except Exception:
+                _allow = {}
+            for _t, _s, _lbl in _todo:
+                _a = _allow.get(_appr_key(_t, _s))
+                if _a is not None:
+                    _allowance_record(_t, _s, _a)
+                    if _a >= _APPROVE_INFINITE:
+                        print(f"✅ [APPROVE] Already approved: {_t[:10]} → {_s[:10]}")
+                        continue
+                try:
+                    h, nonce, sender = _appr_send(_t, _s, 1.5, _lbl)
+                    _track_tx(h, f"pre-approve {_lbl or _t[:10]}", sender, nonce,
+                              on_confirmed=lambda _h, _r, _t=_t, _s=_s: _appr_done(_t, _s, True),
+                              on_reverted=lambda _h, _r, _t=_t, _s=_s: _appr_done(_t, _s, False),
+                              on_dropped=lambda _h, _r, _t=_t, _s=_s: _appr_done(_t, _s, False),
+                              timeout=30)
+                except Exception as _se:
+                    print(f"⚠️ [APPROVE] send error {_t[:10]}: {str(_se)[:60]}")
+        except Exception as _e:
+            print(f"⚠️ [APPROVE] worker error: {str(_e)[:60]}")
+
+def _ensure_appr_worker():
+    if _appr_started[0]:
+        return
+    with _appr_lock:
+        if _appr_started[0]:
+            return
+        _appr_started[0] = True
+    threading.Thread(target=_appr_worker, daemon=True).start()
+
+def _appr_save():
+    """Sirf infinite approvals persist — wallet ke saath, wallet badle to load pe ignore"""
+    try:
+        acct = _txp_account()
+        with _appr_lock:
+            _inf = {k: round(v["ts"]) for k, v in _appr_cache.items() if v["allow"] >= _APPROVE_INFINITE}
+        _wb_upsert("memory", _APPR_SESSION_ID, row={  # FIX v127: write-behind
+            "session_id": _APPR_SESSION_ID,
+            "role":       "system",
+            "content":    "",
+            "history":    json.dumps([]),
+            "positions":  json.dumps({"wallet": acct.address.lower() if acct else "", "approved": _inf}),
+            "updated_at": datetime.utcnow().isoformat()
+        })
     except Exception as _e:
-        print(f"⚠️ _get_dynamic_gas_price public RPC error: {_e}")
+        print(f"⚠️ Allowance cache save error: {_e}")
 
-    # Last resort: BSC safe minimum 1 gwei
-    print("⚠️ _get_dynamic_gas_price — all sources failed, using 1 gwei fallback")
-    return int(1e9)  # 1 gwei in wei
+def _appr_load():
+    if _appr_loaded[0]: return
+    _appr_loaded[0] = True
+    try:
+        res = _mem_fetch(_APPR_SESSION_ID)
+        if res.data:
+            state = json.loads(res.data[0].get("positions") or "{}")
+            acct  = _txp_account()
+            if not acct or state.get("wallet") != acct.address.lower():
+                return
+            with _appr_lock:
+                for k, ts in (state.get("approved") or {}).items():
+                    _appr_cache.setdefault(k, {"allow": _APPROVE_MAX, "ts": float(ts)})
+            print(f"🔑 Allowance cache loaded: {len(state.get('approved') or {})} approvals")
+    except Exception as _e:
+        print(f"⚠️ Allowance cache load error: {_e}")
 
+def _appr_summary() -> dict:
+    with _appr_lock:
+        return {**_appr_stats, "cached": len(_appr_cache), "queued": len(_appr_jobs), "pending": len(_appr_pending)}
 
 def _pre_approve_after_buy(token_addr):
-    """Fix #10: Pre-approve after successful buy"""
-    try:
-        time.sleep(2)
-        _w3x = _qw3()  # FIX v65: QuickNode
-        token_c = _w3x.eth.contract(address=Web3.to_checksum_address(token_addr), abi=ERC20_ABI_APPROVE)
-        wallet = _w3x.eth.account.from_key(REAL_PRIVATE_KEY).address
-        allowance = token_c.functions.allowance(wallet, PANCAKE_ROUTER).call()
-        if allowance < 2**256 - 1:
-            approve_tx = token_c.functions.approve(PANCAKE_ROUTER, 2**256 - 1).build_transaction({
-                "from": wallet, "gas": 100000,
-                "gasPrice": _get_dynamic_gas_price(),
-                "nonce": get_next_nonce(_w3x, wallet)
-            })
-            signed = _w3x.eth.account.sign_transaction(approve_tx, REAL_PRIVATE_KEY)
-            _w3x.eth.send_raw_transaction(signed.raw_transaction)
-            print(f"✅ Pre-approved {token_addr[:10]}")
-    except Exception as e:
-        print(f"⚠️ Pre-approve error: {e}")
+    """Fix #10: Pre-approve after successful buy — FIX v123: approval service queue (no thread/sleep)"""
+    _schedule_approve(token_addr, PANCAKE_ROUTER, f"router {token_addr[:10]}")
 
 def real_buy_token(token_address: str, bnb_amount: float,
-                   buy_tax: float = 0.0, sell_tax: float = 0.0) -> dict:
+                   buy_tax: float = 0.0, sell_tax: float = 0.0, decision_ts: float = 0.0) -> dict:
     """
     Real BSC buy transaction with full anti-MEV protection.
+    FIX v119: TX pipeline — cached account/router, local nonce, background gas, local sign.
     Returns: {success, tx_hash, tokens_received, entry_price, gas_used, error}
     """
+    decision_ts = decision_ts or time.time()
     result = {"success": False, "tx_hash": "", "tokens_received": 0,
               "entry_price": 0.0, "gas_used": 0, "error": ""}
 
@@ -974,8 +2531,8 @@ def real_buy_token(token_address: str, bnb_amount: float,
     # Real wallet balance check — buy se pehle
     _w3x = _qw3()  # FIX v65: QuickNode — fastest RPC for all buy TX calls
     try:
-        _wallet_addr = _w3x.eth.account.from_key(REAL_PRIVATE_KEY).address
-        _wallet_bal  = float(_w3x.eth.get_balance(_wallet_addr)) / 1e18
+        _wallet_addr = _txp_account().address
+        _wallet_bal  = _txp_balance(_w3x, _wallet_addr)  # FIX v119: warm cache
         _gas_est     = 0.002  # ~0.002 BNB gas reserve
         if _wallet_bal < bnb_amount + _gas_est:
             result["error"] = f"Insufficient balance: {_wallet_bal:.4f} BNB < {bnb_amount + _gas_est:.4f} BNB needed"
@@ -986,9 +2543,9 @@ def real_buy_token(token_address: str, bnb_amount: float,
         print(f"⚠️ Balance check error: {_be}")
 
     try:
-        account  = _w3x.eth.account.from_key(REAL_PRIVATE_KEY)
+        account  = _txp_account()
         wallet   = account.address
-        router   = _w3x.eth.contract(address=Web3.to_checksum_address(PANCAKE_ROUTER), abi=ROUTER_SWAP_ABI)
+        router   = _txp_contract("router", _w3x)
         token_cs = Web3.to_checksum_address(token_address)
         wbnb_cs  = Web3.to_checksum_address(WBNB)
 
@@ -1046,29 +2603,19 @@ def real_buy_token(token_address: str, bnb_amount: float,
 
         # Deadline: 60 sec
         deadline  = int(time.time()) + 60
-        nonce     = get_next_nonce(_w3x, wallet)
-        gas_price = _get_dynamic_gas_price()
-
-        txn = router.functions.swapExactETHForTokensSupportingFeeOnTransferTokens(
-            amount_out_min,
-            _buy_path,
-            wallet,
-            deadline
-        ).build_transaction({
-            "from":     wallet,
-            "value":    bnb_wei,
-            "gas":      350000,
-            "gasPrice": gas_price,
-            "nonce":    nonce,
-            "chainId":  56
-        })
+        nonce     = _txp_next_nonce(_w3x, wallet)
+        gas_price = _txp_gas_price()
 
-        signed  = _w3x.eth.account.sign_transaction(txn, REAL_PRIVATE_KEY)
-        tx_hash = _w3x.eth.send_raw_transaction(signed.raw_transaction)
+        # FIX v119: build_transaction (eth_estimateGas/chainId RPC) hataya — template calldata + local sign
+        _data   = _txp_calldata_swap_eth(amount_out_min, _buy_path, wallet, deadline)
+        tx_hash = _txp_submit(_w3x, router.address, _data, bnb_wei, 350000, gas_price, nonce, decision_ts)
+        _txp_spend(bnb_wei / 1e18)
         print(f"🔴 REAL BUY TX: {tx_hash.hex()[:20]}... slippage={slippage_pct}%")
 
-        # Wait for receipt (30 sec max)
-        receipt = _w3x.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
+        # FIX v120: central receipt tracker — per-TX polling waiter nahi
+        _outcome, receipt = _await_tx(tx_hash, 60, f"buy {token_address[:10]}", wallet, nonce)
+        if _outcome not in ("confirmed", "reverted"):
+            raise TimeoutError(f"buy tx {_outcome} — timeout, not confirmed in 60s")
         if receipt["status"] == 1:
             result["success"]      = True
             result["tx_hash"]      = tx_hash.hex()
@@ -1076,6 +2623,7 @@ def real_buy_token(token_address: str, bnb_amount: float,
             # Entry price from on-chain
             result["entry_price"]  = get_token_price_bnb(token_address)
             print(f"✅ REAL BUY confirmed: {tx_hash.hex()[:20]}... gas={receipt['gasUsed']}")
+            _pre_approve_after_buy(token_address)  # FIX v123: sell se pehle router approve ready
         else:
             result["error"] = "Transaction reverted"
             print(f"❌ REAL BUY reverted: {tx_hash.hex()[:20]}")
@@ -1089,7 +2637,7 @@ def real_buy_token(token_address: str, bnb_amount: float,
             _push_notif("critical", "🔴 Buy Timeout", f"Transaction stuck — not confirmed in 30s | {_err_str}", token_address[:10], token_address)
         elif "nonce" in _err_str.lower():
             try:
-                _w_addr = _w3x.eth.account.from_key(REAL_PRIVATE_KEY).address
+                _w_addr = _txp_account().address
                 reset_nonce(_w3x, _w_addr)
             except Exception: pass
             _push_notif("critical", "🔴 Nonce Error", f"Nonce conflict — auto reset kiya | {_err_str}", token_address[:10], token_address)
@@ -1104,7 +2652,8 @@ def real_buy_token(token_address: str, bnb_amount: float,
 
 
 def real_sell_token(token_address: str, sell_pct: float = 100.0,
-                    buy_tax: float = 0.0, sell_tax: float = 0.0, gas_mult: float = 1.2) -> dict:
+                    buy_tax: float = 0.0, sell_tax: float = 0.0, gas_mult: float = 1.0,
+                    urgency: str = "fast") -> dict:
     result = {"success": False, "tx_hash": "", "bnb_received": 0.0,
               "gas_used": 0, "error": ""}
 
@@ -1114,9 +2663,9 @@ def real_sell_token(token_address: str, sell_pct: float = 100.0,
 
     try:
         _w3x = _qw3()  # FIX v65: QuickNode — fastest RPC for all sell TX calls
-        account  = _w3x.eth.account.from_key(REAL_PRIVATE_KEY)
+        account  = _txp_account()
         wallet   = account.address
-        router   = _w3x.eth.contract(address=Web3.to_checksum_address(PANCAKE_ROUTER), abi=ROUTER_SWAP_ABI)
+        router   = _txp_contract("router", _w3x)
         token_cs = Web3.to_checksum_address(token_address)
         wbnb_cs  = Web3.to_checksum_address(WBNB)
         token_c  = _w3x.eth.contract(address=token_cs, abi=ERC20_ABI_APPROVE)
@@ -1139,21 +2688,14 @@ def real_sell_token(token_address: str, sell_pct: float = 100.0,
             result["error"] = "Zero balance"
             return result
 
-        allowance = token_c.functions.allowance(wallet, Web3.to_checksum_address(PANCAKE_ROUTER)).call()
+        # FIX v123: approval service — cache confident ho to allowance RPC skip
+        allowance = _allowance_get(_w3x, token_address, PANCAKE_ROUTER, wallet, sell_amt)
         if allowance < sell_amt:
-            nonce_a = get_next_nonce(_w3x, wallet)
             # GAS FIX: Approve bhi 3x — approve slow toh sell delay hogi
-            approve_txn = token_c.functions.approve(
-                Web3.to_checksum_address(PANCAKE_ROUTER),
-                2**256 - 1
-            ).build_transaction({
-                "from": wallet, "gas": 100000,
-                "gasPrice": int(_get_dynamic_gas_price() * 1.5),  # FIX v23: was 3.0x
-                "nonce": nonce_a, "chainId": 56
-            })
-            signed_a = _w3x.eth.account.sign_transaction(approve_txn, REAL_PRIVATE_KEY)
-            tx_hash_a = _w3x.eth.send_raw_transaction(signed_a.raw_transaction)
-            _w3x.eth.wait_for_transaction_receipt(tx_hash_a, timeout=30)
+            _a_ok, _ = _approve_now(token_address, PANCAKE_ROUTER, 1.5, 30, token_address[:10])
+            if not _a_ok:
+                _allowance_invalidate(token_address, PANCAKE_ROUTER)
+                raise TimeoutError("approve tx not confirmed — timeout")
             print(f"✅ Approved token for sell")
 
         slippage_pct = _anti_mev_slippage_sell(buy_tax, sell_tax)
@@ -1163,7 +2705,7 @@ def real_sell_token(token_address: str, sell_pct: float = 100.0,
         nonce        = get_next_nonce(_w3x, wallet)
 
         # GAS FIX: Sell pe 3x gas — rug se pehle fast niklo
-        _sell_gas_price = int(_get_dynamic_gas_price() * gas_mult)  # FIX speed: reason-based gas
+        _sell_gas_price = int(_gas_price(urgency) * gas_mult)  # FIX v122: urgency tier (was reason-based mult)
         txn = router.functions.swapExactTokensForETHSupportingFeeOnTransferTokens(
             sell_amt, min_bnb,
             [token_cs, wbnb_cs],
@@ -1175,10 +2717,16 @@ def real_sell_token(token_address: str, sell_pct: float = 100.0,
         })
 
         signed  = _w3x.eth.account.sign_transaction(txn, REAL_PRIVATE_KEY)
-        tx_hash = _w3x.eth.send_raw_transaction(signed.raw_transaction)
+        try:
+            tx_hash = _broadcast_raw_tx(signed.raw_transaction, f"sell {token_address[:10]}")  # FIX v121
+        except Exception:
+            _nonce_release(wallet, nonce); raise  # FIX v124: unsent nonce wapas
+        _nonce_sent(wallet, nonce, tx_hash.hex(), _sell_gas_price, txn)
         print(f"🔴 REAL SELL TX: {tx_hash.hex()[:20]}... slippage={slippage_pct}%")
 
-        receipt = _w3x.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
+        _outcome, receipt = _await_tx(tx_hash, 60, f"sell {token_address[:10]}", wallet, nonce)  # FIX v120
+        if _outcome not in ("confirmed", "reverted"):
+            raise TimeoutError(f"sell tx {_outcome} — timeout, not confirmed in 60s")
         if receipt["status"] == 1:
             result["success"]      = True
             result["tx_hash"]      = tx_hash.hex()
@@ -1219,6 +2767,7 @@ def real_sell_token(token_address: str, sell_pct: float = 100.0,
             print(f"✅ REAL SELL confirmed: {tx_hash.hex()[:20]}... BNB received: {bnb_received:.6f}")
         else:
             result["error"] = "Sell reverted"
+            _allowance_invalidate(token_address, PANCAKE_ROUTER)  # FIX v123: cache galat ho sakta hai
             _push_notif("critical", "🔴 Sell Reverted", f"Sell transaction reverted — position still open!", token_address[:10], token_address)
 
     except Exception as e:
@@ -1366,6 +2915,7 @@ def _record_swap(token_addr: str, is_buy: bool, bnb_amount: float = 0.0):
         d["buy_times"]  = d["buy_times"][-500:]
         d["sell_times"] = d["sell_times"][-500:]
         _rt_swap_data[key] = d
+    _pm_signal(key, "swap")  # FIX v115: swap aggregates badle — position re-evaluate
 
 def _get_vol_pressure_rt(token_address: str) -> dict:
     """
@@ -1528,10 +3078,11 @@ def start_swap_monitor():
                                         already_alerted = True
                                     else:
                                         _lp_burn_alerts.add(token_addr)
+                                _pm_signal(token_addr, "lp_burn")
                                 if not already_alerted:
                                     print(f"🚨 LP BURN [{label}]: {token_addr[:10]} — INSTANT SELL!")
                                     _log("sell", token_addr[:10], "LP Burn — Rug Incoming 🚨", token_addr)
-                                    _auto_paper_sell(token_addr, "LP Burn 🚨 Rug Detected", 100.0)
+                                    _queue_sell(token_addr, "LP Burn 🚨 Rug Detected", 100.0, priority=_SELL_PRI_RUG)
                             continue
 
                         if event_topic != SWAP_TOPIC.lower():
@@ -1651,10 +3202,79 @@ WHALE_MIN_WIN_RATE  = 0.60    # 60%+ win rate
 WHALE_MIN_BNB_TXN   = 0.05    # minimum 0.05 BNB per transaction (noise filter)
 WHALE_MAX_WALLETS   = 500   # memory cap
 
+# FIX v138: Compact registry — _smart_wallets dict persistence/UI ke liye rehta hai,
+# par hot path (holder scan) 20-byte key → slot → array stats use karta hai.
+# Qualified set frozenset snapshot hai — readers bina lock ke ek hi call mein
+# poori holder list check kar lete hain.
+import array as _array
+_sw_slot: dict = {}                # addr20 (bytes) → slot
+_sw_addr: list = []                # slot → wallet_lower (None = free)
+_sw_wins   = _array.array("i")
+_sw_losses = _array.array("i")
+_sw_pnl    = _array.array("d")
+_sw_free: list = []
+_sw_qualified: frozenset = frozenset()   # addr20 set — update pe naya snapshot swap
+_sw_stats = {"batch_calls": 0, "batch_addrs": 0, "batch_hits": 0, "evictions": 0, "qual_rebuilds": 0}
+
+def _sw_key(wallet: str):
+    """0x + 40 hex → 20 bytes. Case-insensitive, invalid → None"""
+    if not wallet or len(wallet) != 42: return None
+    try:
+        return bytes.fromhex(wallet[2:])
+    except ValueError:
+        return None
+
+def _sw_publish(k: bytes, qualified: bool):
+    # Membership badli tabhi naya frozenset banao — baaki updates free
+    global _sw_qualified
+    if (k in _sw_qualified) != qualified:
+        _sw_qualified = (_sw_qualified | {k}) if qualified else (_sw_qualified - {k})
+        _sw_stats["qual_rebuilds"] += 1
+
+def _sw_index_put(w: str, d: dict):
+    k = _sw_key(w)
+    if k is None: return
+    slot = _sw_slot.get(k)
+    if slot is None:
+        if _sw_free:
+            slot = _sw_free.pop()
+            _sw_addr[slot] = w
+        else:
+            slot = len(_sw_addr)
+            _sw_addr.append(w); _sw_wins.append(0); _sw_losses.append(0); _sw_pnl.append(0.0)
+        _sw_slot[k] = slot
+    _sw_wins[slot]   = int(d.get("wins", 0) or 0)
+    _sw_losses[slot] = int(d.get("losses", 0) or 0)
+    _sw_pnl[slot]    = float(d.get("total_pnl", 0.0) or 0.0)
+    _sw_publish(k, bool(d.get("qualified", False)))
+
+def _sw_index_drop(w: str):
+    k = _sw_key(w)
+    slot = _sw_slot.pop(k, None)
+    if slot is None: return
+    _sw_addr[slot] = None
+    _sw_free.append(slot)
+    _sw_publish(k, False)
+
+def _sw_label_slot(slot: int) -> str:
+    return f"W:{_sw_wins[slot]} L:{_sw_losses[slot]} PnL:{_sw_pnl[slot]:+.0f}%"
+
+def _sw_load(items: dict):
+    with _smart_wallets_lock:
+        for k, v in items.items():
+            _smart_wallets.setdefault(k, v)
+        for k, v in _smart_wallets.items():
+            if isinstance(v, dict):
+                _sw_index_put(k, v)
+
+_coll_register("smart_wallets", get=lambda k: _smart_wallets.get(k),
+               items=lambda: list(_smart_wallets.items()), load=_sw_load)  # FIX v132
+
 def _update_whale_stats(wallet: str, win: bool, pnl_pct: float):
     """Wallet ka track record update karo"""
     if not wallet or len(wallet) != 42: return
     w = wallet.lower()
+    _coll_ensure("smart_wallets")
     # Skip zero/dead addresses
     if w in ("0x0000000000000000000000000000000000000000",
              "0x000000000000000000000000000000000000dead"): return
@@ -1673,23 +3293,54 @@ def _update_whale_stats(wallet: str, win: bool, pnl_pct: float):
         win_rate = d["wins"] / max(total, 1)
         d["qualified"] = (d["wins"] >= WHALE_MIN_WINS and win_rate >= WHALE_MIN_WIN_RATE)
         # Memory cap — remove worst performers first
+        # FIX v138: poora sort nahi — arrays se 10 worst nikaalo (nsmallest, O(n))
         if len(_smart_wallets) >= WHALE_MAX_WALLETS:
-            worst = sorted(_smart_wallets.items(),
-                           key=lambda x: x[1].get("wins",0) - x[1].get("losses",0))
-            for wk, _ in worst[:10]:
+            worst = _heapq.nsmallest(10, _sw_slot.values(), key=lambda s: _sw_wins[s] - _sw_losses[s])
+            for wk in [_sw_addr[s] for s in worst]:
                 _smart_wallets.pop(wk, None)
+                _sw_index_drop(wk)
+                _coll_touch("smart_wallets", wk)
+            _sw_stats["evictions"] += len(worst)
         _smart_wallets[w] = d
+        _sw_index_put(w, d)
+    _coll_touch("smart_wallets", w)
 
 def is_smart_wallet(wallet: str) -> bool:
     """Wallet qualified hai? (enough wins + win rate)"""
     if not wallet or len(wallet) != 42: return False
-    d = _smart_wallets.get(wallet.lower(), {})
-    return bool(d.get("qualified", False))
+    _coll_ensure("smart_wallets")
+    return _sw_key(wallet) in _sw_qualified
 
 def get_smart_wallet_label(wallet: str) -> str:
-    d = _smart_wallets.get(wallet.lower(), {})
-    if not d: return ""
-    return f"W:{d.get('wins',0)} L:{d.get('losses',0)} PnL:{d.get('total_pnl',0):+.0f}%"
+    _coll_ensure("smart_wallets")
+    slot = _sw_slot.get(_sw_key(wallet))
+    if slot is None: return ""
+    return _sw_label_slot(slot)
+
+def smart_wallets_among(addrs) -> list:
+    """
+    FIX v138: Batch check — holder list mein se qualified whales ek call mein.
+    Returns: [(addr, label), ...] input order mein
+    """
+    _coll_ensure("smart_wallets")
+    qual = _sw_qualified   # ek snapshot — beech mein swap ho to bhi consistent
+    out  = []
+    n    = 0
+    if qual:
+        for a in addrs:
+            n += 1
+            k = _sw_key(a)
+            if k in qual:
+                slot = _sw_slot.get(k)
+                out.append((a, _sw_label_slot(slot) if slot is not None else ""))
+    _sw_stats["batch_calls"] += 1
+    _sw_stats["batch_addrs"] += n
+    _sw_stats["batch_hits"]  += len(out)
+    return out
+
+def _sw_summary() -> dict:
+    return {"wallets": len(_sw_slot), "qualified": len(_sw_qualified), "slots": len(_sw_addr),
+            "free": len(_sw_free), **_sw_stats}
 
 
 def _fetch_early_buyers(token_address: str, entry_ts: float, max_buyers: int = 20) -> list:
@@ -1741,7 +3392,7 @@ def _learn_from_trade(token_address: str, win: bool, pnl_pct: float, entry_ts: f
             return
         for wallet in buyers:
             _update_whale_stats(wallet, win, pnl_pct)
-        qualified = sum(1 for w in buyers if is_smart_wallet(w))
+        qualified = len(smart_wallets_among(buyers))
         status = "WIN ✅" if win else "LOSS ❌"
         print(f"🧠 Learned: {token_address[:10]} {status} {pnl_pct:+.0f}% | "
               f"tracked {len(buyers)} wallets | {qualified} now qualified")
@@ -1806,6 +3457,7 @@ def _whale_follow_loop():
     while True:
         try:
             now = time.time()
+            _coll_ensure("smart_wallets")
             with _smart_wallets_lock:
                 qualified = [
                     (w, d) for w, d in _smart_wallets.items()
@@ -1869,12 +3521,7 @@ def _count_whales_in_token(token_address: str, goplus_data: dict) -> int:
     Token ke holders mein kitne qualified whales hain — score ke liye.
     """
     holders = goplus_data.get("holders", []) or []
-    count   = 0
-    for h in holders[:30]:
-        addr = h.get("address", "")
-        if addr and is_smart_wallet(addr):
-            count += 1
-    return count
+    return len(smart_wallets_among(h.get("address", "") for h in holders[:30]))
 
 
 
@@ -1915,20 +3562,13 @@ def detect_green_signals(token_address: str, goplus_data: dict, dex_data: dict)
     # GoPlus holders mein koi known profitable whale hai?
     holders = goplus_data.get("holders", [])
     creator = goplus_data.get("creator_address", "")
-    sm_found = []
-    for h in (holders or [])[:30]:
-        addr_h = h.get("address", "")
-        if is_smart_wallet(addr_h):
-            sm_found.append(get_smart_wallet_label(addr_h))
+    # FIX v138: holders ek hi batch call mein — pehle 2x loop + per-holder lookup tha
+    _sm_details = [lbl for _, lbl in smart_wallets_among(h.get("address", "") for h in (holders or [])[:30])]
+    sm_found = list(_sm_details)
     if is_smart_wallet(creator):
         sm_found.append(f"creator:{get_smart_wallet_label(creator)}")
         score += 2  # Creator khud profitable hai = extra conviction
     if sm_found:
-        _sm_details = []
-        for h in (holders or [])[:30]:
-            a = h.get("address","")
-            if is_smart_wallet(a):
-                _sm_details.append(get_smart_wallet_label(a))
         detail_str = " | ".join(_sm_details[:3]) if _sm_details else f"{len(sm_found)} wallets"
         whale_count = len(sm_found)
 
@@ -2021,155 +3661,738 @@ def detect_green_signals(token_address: str, goplus_data: dict, dex_data: dict)
 }
 
 
+# ══════════════════════════════════════════════
+# EXPIRING SET — hierarchical timer wheel (FIX v139)
+# Blacklists / dedup sets pehle lazy TTL check + size cross hone pe poora scan ya
+# wholesale clear karte the. Ab har entry apne expiry tick ke wheel slot mein —
+# add/discard O(1), expiry har tick sirf current slot, koi bulk clear nahi.
+# ══════════════════════════════════════════════
+_EXPSETS: list = []
+
+class ExpiringSet:
+    """key → value with TTL. `key in s` exact expiry check karta hai, wheel background
+    mein expired keys hatata hai (on_expire(keys) callback — persistence cleanup ke liye)"""
+    BITS   = 6
+    SLOTS  = 1 << BITS   # 64 slots per level
+    LEVELS = 4           # 64^4 ticks span — tick=1s pe ~194 din
+
+    def __init__(self, ttl: float, tick: float = 1.0, name: str = "", on_expire=None):
+        self.ttl       = float(ttl)
+        self.tick      = float(tick)
+        self.name      = name
+        self.on_expire = on_expire
+        self._lock     = threading.RLock()
+        self._exp      = {}   # key → (expire_ts, value)
+        self._where    = {}   # key → (level, slot)
+        self._wheel    = [[set() for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        self._now      = int(time.time() // self.tick)
+        self.stats     = {"adds": 0, "expired": 0, "cascades": 0, "rebuilds": 0}
+        if name:
+            _EXPSETS.append(self)
+
+    def _tick_of(self, exp_ts: float) -> int:
+        t = int(exp_ts // self.tick)
+        return t + 1 if t * self.tick < exp_ts else t
+
+    def _place(self, key, exp_ts: float):
+        t = max(self._tick_of(exp_ts), self._now + 1)
+        delta = t - self._now
+        lvl = 0
+        while lvl < self.LEVELS - 1 and delta >= (1 << (self.BITS * (lvl + 1))):
+            lvl += 1
+        slot = (t >> (self.BITS * lvl)) & (self.SLOTS - 1)
+        self._wheel[lvl][slot].add(key)
+        self._where[key] = (lvl, slot)
+
+    def _unplace(self, key):
+        w = self._where.pop(key, None)
+        if w is not None:
+            self._wheel[w[0]][w[1]].discard(key)
+
+    def _advance(self, now: float = None) -> list:
+        """Current tick tak wheel ghumao — expired keys return (lock ke andar call)"""
+        now = time.time() if now is None else now
+        target = int(now // self.tick)
+        if target <= self._now:
+            return []
+        gone = []
+        if target - self._now > self.SLOTS * self.SLOTS:
+            # Lamba gap (sleep/restart) — tick-by-tick ki jagah ek baar rebuild
+            self._now = target
+            self.stats["rebuilds"] += 1
+            for lvl in self._wheel:
+                for s in lvl:
+                    s.clear()
+            self._where.clear()
+            for k, (e, _) in list(self._exp.items()):
+                if e <= now:
+                    del self._exp[k]
+                    gone.append(k)
+                else:
+                    self._place(k, e)
+        else:
+            while self._now < target:
+                self._now += 1
+                T = self._now
+                # Lower bits zero → upper level ka slot neeche cascade karo
+                for lvl in range(1, self.LEVELS):
+                    if T & ((1 << (self.BITS * lvl)) - 1):
+                        break
+                    self._drain(self._wheel[lvl][(T >> (self.BITS * lvl)) & (self.SLOTS - 1)], now, gone)
+                    self.stats["cascades"] += 1
+                self._drain(self._wheel[0][T & (self.SLOTS - 1)], now, gone)
+        self.stats["expired"] += len(gone)
+        return gone
+
+    def _drain(self, bucket: set, now: float, gone: list):
+        keys = list(bucket)
+        bucket.clear()
+        for k in keys:
+            self._where.pop(k, None)
+            e = self._exp.get(k)
+            if e is None:
+                continue
+            if e[0] <= now:
+                del self._exp[k]
+                gone.append(k)
+            else:
+                self._place(k, e[0])   # abhi due nahi (upper level / alias) — sahi slot mein
+
+    def _fire(self, gone: list):
+        if gone and self.on_expire:
+            try:
+                self.on_expire(gone)
+            except Exception as e:
+                print(f"⚠️ [v139] {self.name} on_expire: {str(e)[:60]}")
+
+    def add(self, key, value=True, ttl: float = None, ts: float = None):
+        """ts = insert time (default abhi) — expiry = ts + ttl"""
+        ts = time.time() if ts is None else ts
+        exp_ts = ts + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            gone = self._advance()
+            self._unplace(key)
+            if exp_ts <= time.time():
+                self._exp.pop(key, None)
+            else:
+                self._exp[key] = (exp_ts, value)
+                self._place(key, exp_ts)
+                self.stats["adds"] += 1
+        self._fire(gone)
+
+    def discard(self, key):
+        with self._lock:
+            self._unplace(key)
+            self._exp.pop(key, None)
+
+    def get(self, key, default=None):
+        with self._lock:
+            gone = self._advance()
+            e = self._exp.get(key)
+            _v = e[1] if e is not None and e[0] > time.time() else default
+        self._fire(gone)
+        return _v
+
+    def expires_at(self, key):
+        e = self._exp.get(key)
+        return e[0] if e else None
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            gone = self._advance()
+            e = self._exp.get(key)
+            hit = e is not None and e[0] > time.time()
+        self._fire(gone)
+        return hit
+
+    def __len__(self) -> int:
+        with self._lock:
+            gone = self._advance()
+            n = len(self._exp)
+        self._fire(gone)
+        return n
+
+    def items(self) -> list:
+        with self._lock:
+            gone = self._advance()
+            out = [(k, e[1]) for k, e in self._exp.items()]
+        self._fire(gone)
+        return out
+
+    def row(self, key):
+        """Ek key ka persist row — {"exp": ts, "v": value}, expired/absent → None"""
+        e = self._exp.get(key)
+        return {"exp": e[0], "v": e[1]} if e is not None and e[0] > time.time() else None
+
+    def dump(self) -> dict:
+        """Persist ke liye — {key: {"exp": ts, "v": value}}"""
+        with self._lock:
+            return {k: {"exp": e[0], "v": e[1]} for k, e in self._exp.items()}
+
+    def load(self, d: dict):
+        """dump() ka ulta — expired entries skip, existing keys overwrite"""
+        now = time.time()
+        with self._lock:
+            for k, r in (d or {}).items():
+                try:
+                    exp_ts = float(r["exp"])
+                except Exception:
+                    continue
+                if exp_ts > now:
+                    self._unplace(k)
+                    self._exp[k] = (exp_ts, r.get("v", True))
+                    self._place(k, exp_ts)
+
+    def summary(self) -> dict:
+        return {"live": len(self), "ttl": self.ttl, "tick": self.tick, **self.stats}
+
+def _expset_summary() -> dict:
+    return {s.name: s.summary() for s in list(_EXPSETS)}
+
+def _expset_register(name: str, s: "ExpiringSet", load=None):
+    """Collection store mein persist — per-key row {"exp", "v"}, expire pe row delete"""
+    _coll_register(name, get=s.row, items=lambda: list(s.dump().items()), load=load or s.load)
+    s.on_expire = lambda keys: [_coll_touch(name, k) for k in keys]
+
 # ══════════════════════════════════════════════
 # DEV WALLET BLACKLIST — ruggers track karo
 # ══════════════════════════════════════════════
-_dev_blacklist: dict = {}   # {wallet_lower: {"reason": str, "rugs": int, "last_seen": iso}}
+# FIX v139: 300 cap pe arbitrary 1-rug entries hatti thi — ab TTL timer wheel pe.
+# 1 rug = 30 din, serial rugger (2+) = 1 saal; har naya rug TTL refresh karta hai.
+_DEV_BL_TTL        = 30 * 86400
+_DEV_BL_TTL_SERIAL = 365 * 86400
+_dev_blacklist = ExpiringSet(_DEV_BL_TTL, tick=60.0, name="dev_blacklist")  # {wallet_lower: {"reason": str, "rugs": int, "last_seen": iso}}
 _dev_blacklist_lock = threading.Lock()
 
+def _devbl_ttl(rugs: int) -> float:
+    return _DEV_BL_TTL_SERIAL if rugs >= 2 else _DEV_BL_TTL
+
+def _devbl_load(items: dict):
+    # Purane rows (v132 / brain blob) mein "exp" nahi — last_seen + TTL se nikaalo
+    rows = {}
+    for k, v in items.items():
+        if not isinstance(v, dict):
+            continue
+        if "exp" in v:
+            rows[k] = v
+            continue
+        try:
+            _ts = datetime.fromisoformat(str(v.get("last_seen"))).replace(tzinfo=timezone.utc).timestamp()
+        except Exception:
+            _ts = time.time()
+        rows[k] = {"exp": _ts + _devbl_ttl(int(v.get("rugs", 1) or 1)), "v": v}
+    with _dev_blacklist_lock:
+        _dev_blacklist.load({k: r for k, r in rows.items() if _dev_blacklist.row(k) is None})
+
+_expset_register("dev_blacklist", _dev_blacklist, load=_devbl_load)  # FIX v132 + v139
+
 def blacklist_dev(wallet: str, reason: str = "rug"):
     """Dev wallet ko blacklist karo — future tokens automatically skip honge"""
     if not wallet or len(wallet) != 42: return
     w = wallet.lower()
+    _coll_ensure("dev_blacklist")
     with _dev_blacklist_lock:
-        existing = _dev_blacklist.get(w, {"rugs": 0})
-        _dev_blacklist[w] = {
+        existing = _dev_blacklist.get(w) or {"rugs": 0}
+        _rugs = existing.get("rugs", 0) + 1
+        _dev_blacklist.add(w, {
             "reason":    reason,
-            "rugs":      existing.get("rugs", 0) + 1,
+            "rugs":      _rugs,
             "last_seen": datetime.utcnow().isoformat()
-        }
-        # Max 300 entries — purane (1 rug wale) hatao
-        if len(_dev_blacklist) > 300:
-            _single = [k for k, v in _dev_blacklist.items() if v.get("rugs", 1) <= 1]
-            for k in _single[:50]:
-                _dev_blacklist.pop(k, None)
+        }, ttl=_devbl_ttl(_rugs))
+    _coll_touch("dev_blacklist", w)
     print(f"🚫 Dev blacklisted: {wallet[:10]}... reason={reason}")
 
 def is_dev_blacklisted(wallet: str) -> bool:
     if not wallet or len(wallet) != 42: return False
+    _coll_ensure("dev_blacklist")
     return wallet.lower() in _dev_blacklist
 
 # ══════════════════════════════════════════════
 # TOKEN BLACKLIST — rug/SL tokens 24h block
 # ══════════════════════════════════════════════
-_token_blacklist: dict = {}  # {addr_lower: {"reason": str, "ts": float}}
 _TOKEN_BL_TTL = 691200  # 8 days blacklist TTL
+# FIX v139: lazy TTL check + 8000 pe full scan hata — timer wheel expire karta hai,
+# aur ab restart ke baad bhi blacklist persist rehti hai (collection store)
+_token_blacklist = ExpiringSet(_TOKEN_BL_TTL, tick=60.0, name="token_blacklist")  # {addr_lower: {"reason": str, "ts": float}}
+_expset_register("token_blacklist", _token_blacklist)
 
 def blacklist_token(token_address: str, reason: str = "rug"):
     """Token ko 8 days ke liye blacklist karo — 6h+ tokens bot skip karta hai"""
     if not token_address: return
-    _token_blacklist[token_address.lower()] = {
+    _coll_ensure("token_blacklist")
+    _k = token_address.lower()
+    _token_blacklist.add(_k, {
         "reason": reason,
         "ts":     time.time()
-    }
-    # Max 8000 entries — 8 day TTL ke saath cleanup
-    if len(_token_blacklist) > 8000:
-        cutoff = time.time() - _TOKEN_BL_TTL
-        stale = [k for k, v in _token_blacklist.items() if v["ts"] < cutoff]
-        for k in stale:
-            _token_blacklist.pop(k, None)
+    })
+    _coll_touch("token_blacklist", _k)
     print(f"🚫 Token blacklisted 8d: {token_address[:10]}... reason={reason}")
 
 def is_token_blacklisted(token_address: str) -> bool:
     if not token_address: return False
-    entry = _token_blacklist.get(token_address.lower())
-    if not entry: return False
-    # TTL check — expired toh remove
-    if time.time() - entry["ts"] > _TOKEN_BL_TTL:
-        _token_blacklist.pop(token_address.lower(), None)
-        return False
-    return True
+    _coll_ensure("token_blacklist")
+    return token_address.lower() in _token_blacklist
 
 # ══════════════════════════════════════════════
 # RUG DNA SYSTEM — rug fingerprint learn karo
 # Creator + tax pattern + liq = unique rug signature
 # Same DNA wala naya token → auto reject
 # ========== TRADE HISTORY — SUPABASE PERMANENT STORAGE ==========
-_TRADES_SESSION_ID      = "MRBLACK_TRADE_HISTORY"       # paper trades — memory table
-_REAL_TRADES_TABLE      = "real_trade_history"           # real trades — alag table
+# FIX v126: Pehle har trade pe poora history JSON (10k tak) ek memory row mein upsert hota tha +
+# session save mein last 500 bhi — MBs serialize/upload per trade. Ab append-only: har trade
+# apni row (trade_history table), trade_id pe idempotent upsert, naye trades batch mein.
+# Startup pe sirf recent window load, baaki _trade_history_page() se paginated.
+#   create table trade_history (trade_id text primary key, mode text, address text, token text,
+#     result text, pnl_bnb float8, sold_at text, data text, created_at timestamptz default now());
+#   create index on trade_history (mode, sold_at desc);
+_TRADES_SESSION_ID      = "MRBLACK_TRADE_HISTORY"       # legacy blob — migration / table missing fallback
+_REAL_TRADES_TABLE      = "real_trade_history"           # real trades — alag table (legacy)
+_TRADES_TABLE           = "trade_history"                # FIX v126: ek row per trade
+_TH_RECENT_WINDOW       = 500    # startup pe RAM mein itne (in-memory cap bhi yahi hai)
+_th_save_lock           = threading.Lock()
+_th_saved_ids: set      = set()  # trade_ids jo DB mein hain (sirf RAM window ke)
+_th_stats               = {"rows_written": 0, "migrated": 0, "db_total": 0, "legacy_fallback": False}
+
+def _trade_id(t: dict) -> str:
+    """Stable trade id — address + sold_at (load-time dedup key bhi yahi tha)"""
+    return t.get("trade_id") or f"{(t.get('address') or '').lower()}:{t.get('sold_at') or t.get('bought_at') or ''}"
+
+def _trade_row(t: dict) -> dict:
+    return {
+        "trade_id": _trade_id(t),
+        "mode":     t.get("mode") or "paper",
+        "address":  (t.get("address") or "").lower(),
+        "token":    str(t.get("token") or "")[:64],
+        "result":   t.get("result") or "",
+        "pnl_bnb":  float(t.get("pnl_bnb", 0) or 0),
+        "sold_at":  t.get("sold_at") or t.get("bought_at") or "",
+        "data":     json.dumps(t, default=str),
+    }
 
-def _save_trade_history_to_db():
-    """Har trade ke baad Supabase mein permanently save karo — 3 retries"""
-    if not supabase: return
-    for _attempt in range(3):
-        try:
-            all_hist = auto_trade_stats.get("trade_history", [])
-            supabase.table("memory").upsert({
-                "session_id":    _TRADES_SESSION_ID,
-                "role":          "user",
-                "content":       "",
-                "trade_history": json.dumps(all_hist[-10000:]),
-                "updated_at":    datetime.utcnow().isoformat()
-}, on_conflict="session_id").execute()
-            # FIX v30: mode None wali entries bhi sahi count mein dalo
-            paper_hist = [t for t in all_hist if (t.get("mode") or "paper") == "paper"]
-            real_hist  = [t for t in all_hist if (t.get("mode") or "") == "real"]
-            print(f"💾 Trade history saved: {len(all_hist)} total | {len(paper_hist)} paper | {len(real_hist)} real")
-            return  # success
-        except Exception as e:
-            if _attempt < 2:
-                time.sleep(2)  # 2s wait before retry
-            else:
-                print(f"⚠️ Trade history save error (3 retries failed): {e}")
+# ── FIX v135: indexed trade history ──
+# "Already traded" check har discovered token pe poori list any(...) se scan hoti thi, _fm_snipe
+# har call pe saare addresses ka set banata tha, /chat har pasted address pe rescan. Ab list
+# khud append pe indexes maintain karti hai (address / mode / sold date), aur
+# _th_traded_addrs all-time set hai (RAM window + local store) — saare checks O(1).
+_th_traded_addrs: set = set()   # lower addresses — kabhi bhi trade hua (RAM trim ke baad bhi)
+
+def _th_drop(lst: list, t: dict):
+    for i, x in enumerate(lst):
+        if x is t:
+            del lst[i]
+            return
 
-def _load_trade_history_from_db():
-    """FIX v46: memory table (main store) + real_trade_history — dono load karo"""
-    if not supabase: return
+# FIX v136: /auto-stats, /pnl-breakdown, /trade-history har poll (6–30s) pe poori history
+# regroup / fromisoformat / filter karte the. Ab har mode ke running aggregates append/trim pe
+# update hote hain (totals, per-position PnL, daily buckets, best/worst) — endpoints O(1) padhte hain.
+def _th_agg_new() -> dict:
+    return {"trades": 0, "wins": 0, "losses": 0, "pnl_bnb": 0.0, "invested": 0.0,
+            "best": None, "worst": None, "pos": {}, "pos_wins": 0, "pos_losses": 0, "days": {}}
+
+def _th_pnl(t: dict) -> float:
+    return float(t.get("pnl_bnb", 0) or 0)
+
+class TradeHistory(list):
+    """trade_history list + incremental indexes — by_addr / by_mode / by_day (mode, YYYY-MM-DD)
+    aur per-mode aggregates (agg) — list ke contents (RAM window) ke saath sync"""
+    __slots__ = ("by_addr", "by_mode", "by_day", "agg", "ver")
+
+    def __init__(self, rows=()):
+        super().__init__()
+        self.by_addr = {}
+        self.by_mode = {}
+        self.by_day  = {}
+        self.agg     = {}
+        self.ver     = 0
+        self.extend(rows)
+
+    def _agg_apply(self, t: dict, m: str, sign: int):
+        g = self.agg.setdefault(m, _th_agg_new())
+        pnl = _th_pnl(t)
+        _win = 1 if pnl > 0 else 0
+        g["trades"]   += sign
+        g["wins"]     += sign * _win
+        g["losses"]   += sign * (1 - _win)
+        g["pnl_bnb"]  += sign * pnl
+        g["invested"] += sign * float(t.get("size_bnb", AUTO_BUY_SIZE_BNB) or AUTO_BUY_SIZE_BNB)
+        # per-position (address|bought_at) — partial TP + SL ek hi position gine
+        _k = str(t.get("address", "")) + "|" + str(t.get("bought_at", ""))[:16]
+        _p = g["pos"].get(_k)
+        if _p:
+            g["pos_wins" if _p[0] > 0 else "pos_losses"] -= 1
+        _p = [(_p[0] if _p else 0.0) + sign * pnl, (_p[1] if _p else 0) + sign]
+        if _p[1] > 0:
+            g["pos"][_k] = _p
+            g["pos_wins" if _p[0] > 0 else "pos_losses"] += 1
+        else:
+            g["pos"].pop(_k, None)
+        _day = str(t.get("sold_at") or "")[:10]
+        if _day:
+            b = g["days"].setdefault(_day, {"trades": 0, "wins": 0, "losses": 0, "pnl_bnb": 0.0})
+            b["trades"] += sign; b["wins"] += sign * _win; b["losses"] += sign * (1 - _win); b["pnl_bnb"] += sign * pnl
+            if b["trades"] <= 0:
+                g["days"].pop(_day, None)
+        _pp = t.get("pnl_pct", 0) or 0
+        if sign > 0:
+            if g["best"] is None or _pp > (g["best"].get("pnl_pct", 0) or 0):
+                g["best"] = t
+            if g["worst"] is None or _pp < (g["worst"].get("pnl_pct", 0) or 0):
+                g["worst"] = t
+        elif g["best"] is t or g["worst"] is t:
+            # extreme hi trim hua — sirf tab mode partition se recompute
+            _rest = self.by_mode.get(m) or []
+            g["best"]  = max(_rest, key=lambda x: x.get("pnl_pct", 0) or 0, default=None)
+            g["worst"] = min(_rest, key=lambda x: x.get("pnl_pct", 0) or 0, default=None)
 
-    # Step 1: memory table se sab trades load karo (ye primary store hai)
+    @staticmethod
+    def _keys(t: dict) -> tuple:
+        # FIX v149: mode-less (legacy) trades apni None partition mein — query time pe resolve
+        # (/auto-stats, /pnl-breakdown = TRADE_MODE, FIX v30), "paper" default nahi
+        m = t.get("mode") or None
+        return str(t.get("address") or "").lower(), m, (m, str(t.get("sold_at") or "")[:10])
+
+    def append(self, t):
+        super().append(t)
+        if not isinstance(t, dict):
+            return
+        a, m, d = self._keys(t)
+        if a:
+            self.by_addr.setdefault(a, []).append(t)
+            _th_traded_addrs.add(a)
+        self.by_mode.setdefault(m, []).append(t)
+        self.by_day.setdefault(d, []).append(t)
+        self._agg_apply(t, m, 1)
+        self.ver += 1
+
+    def extend(self, rows):
+        for t in rows:
+            self.append(t)
+
+    def trim(self, n: int):
+        """Oldest hatao, sirf last n RAM mein (all-time address set same rehta hai)"""
+        if len(self) <= n:
+            return
+        _old = self[:len(self) - n]
+        del self[:len(self) - n]
+        for t in _old:
+            if not isinstance(t, dict):
+                continue
+            a, m, d = self._keys(t)
+            for _ix, _k in ((self.by_addr, a), (self.by_mode, m), (self.by_day, d)):
+                _l = _ix.get(_k)
+                if _l is not None:
+                    _th_drop(_l, t)
+                    if not _l:
+                        _ix.pop(_k, None)
+            self._agg_apply(t, m, -1)
+        self.ver += 1
+
+def _th_set(rows) -> "TradeHistory":
+    auto_trade_stats["trade_history"] = TradeHistory(rows if isinstance(rows, list) else [])
+    return auto_trade_stats["trade_history"]
+
+_th_agg_cache: dict = {}   # mode → (ver, history, merged agg) — sirf jab mode-less trades hon
+
+def _th_agg_merge(a: dict, b: dict) -> dict:
+    g = _th_agg_new()
+    for k in ("trades", "wins", "losses", "pnl_bnb", "invested"):
+        g[k] = a[k] + b[k]
+    for x in (a, b):
+        for _k, _p in x["pos"].items():
+            _q = g["pos"].get(_k)
+            g["pos"][_k] = [_p[0] + _q[0], _p[1] + _q[1]] if _q else list(_p)
+        for _d, _b in x["days"].items():
+            _c = g["days"].setdefault(_d, {"trades": 0, "wins": 0, "losses": 0, "pnl_bnb": 0.0})
+            for _f in _c:
+                _c[_f] += _b[_f]
+    g["pos_wins"]   = sum(1 for _p in g["pos"].values() if _p[0] > 0)
+    g["pos_losses"] = len(g["pos"]) - g["pos_wins"]
+    _ext = [t for t in (a["best"], a["worst"], b["best"], b["worst"]) if t is not None]
+    g["best"]  = max(_ext, key=lambda x: x.get("pnl_pct", 0) or 0, default=None)
+    g["worst"] = min(_ext, key=lambda x: x.get("pnl_pct", 0) or 0, default=None)
+    return g
+
+def _th_agg(mode: str) -> dict:
+    """mode ke aggregates — mode-less trades bhi isi mode mein gine (t.get("mode") or TRADE_MODE)"""
+    _h = auto_trade_stats.get("trade_history")
+    if not isinstance(_h, TradeHistory):
+        return _th_agg_new()
+    _own, _legacy = _h.agg.get(mode), _h.agg.get(None)
+    if not _legacy or not _legacy["trades"]:
+        return _own or _th_agg_new()
+    _hit = _th_agg_cache.get(mode)
+    if _hit and _hit[0] == _h.ver and _hit[1] is _h:
+        return _hit[2]
+    g = _th_agg_merge(_own or _th_agg_new(), _legacy)
+    _th_agg_cache[mode] = (_h.ver, _h, g)
+    return g
+
+def _th_bucket(g: dict, days: list) -> dict:
+    """Daily buckets ka sum → pnl-breakdown shape"""
+    _t = _w = _l = 0
+    _p = 0.0
+    for d in days:
+        b = g["days"].get(d)
+        if b:
+            _t += b["trades"]; _w += b["wins"]; _l += b["losses"]; _p += b["pnl_bnb"]
+    return {"trades": _t, "wins": _w, "losses": _l, "pnl_bnb": round(_p, 6),
+            "win_rate": round(_w / max(_w + _l, 1) * 100, 1)}
+
+def is_already_traded(address: str) -> bool:
+    return bool(address) and address.lower() in _th_traded_addrs
+
+def _th_trades_for(address: str) -> list:
+    """RAM window ke is address ke trades (index se)"""
+    _h = auto_trade_stats.get("trade_history")
+    if isinstance(_h, TradeHistory):
+        return list(_h.by_addr.get((address or "").lower(), []))
+    return [t for t in _h or [] if str(t.get("address", "")).lower() == (address or "").lower()]
+
+def _th_seed_addrs():
+    """Local store ke saare trade addresses — RAM window se bahar wale bhi"""
+    try:
+        with _ls_lock:
+            _rs = _ls().execute("SELECT DISTINCT json_extract(row, '$.address') FROM kv WHERE tbl=?",
+                                (_TRADES_TABLE,)).fetchall()
+        _th_traded_addrs.update(str(r[0]).lower() for r in _rs if r[0])
+    except Exception as _se:
+        print(f"⚠️ [v135] traded address seed error: {str(_se)[:60]}")
+
+def _th_table_missing(e) -> bool:
+    _m = str(e).lower()
+    return "does not exist" in _m or "could not find the table" in _m or "pgrst205" in _m
+
+def _trade_history_legacy_row() -> dict:
+    """Purana single-row blob — sirf jab trade_history table migrate nahi hui"""
+    return {
+        "session_id":    _TRADES_SESSION_ID,
+        "role":          "user",
+        "content":       "",
+        "trade_history": json.dumps(auto_trade_stats.get("trade_history", [])[-10000:]),
+        "updated_at":    datetime.utcnow().isoformat()
+}
+
+def _th_enqueue(trades: list):
+    """FIX v129: trade rows → local store (durable) + async mirror. Legacy mode = local + blob"""
+    _rep = not _th_stats["legacy_fallback"]
+    for t in trades:
+        _wb_upsert(_TRADES_TABLE, _trade_id(t), row=_trade_row(t), on_conflict="trade_id", replicate=_rep)
+    _th_stats["rows_written"] += len(trades)
+    if not _rep and supabase:
+        _wb_upsert("memory", _TRADES_SESSION_ID, fn=_trade_history_legacy_row)
+
+def _th_replicate_error(e) -> bool:
+    """FIX v143: Mirror pe trade_history table nahi — local rows hone se load-time check kabhi nahi
+    chalta tha, rows dead-letter mein jaati thi. Replication fail pe hi legacy blob mode pe switch."""
+    if not _th_table_missing(e):
+        return False
+    if not _th_stats["legacy_fallback"]:
+        _th_stats["legacy_fallback"] = True
+        print(f"⚠️ [v126] '{_TRADES_TABLE}' table nahi mili (replicate) — legacy blob mode")
+    with _ls_lock:
+        _ls().execute("UPDATE kv SET synced=2 WHERE tbl=? AND synced IN (0, -1)", (_TRADES_TABLE,))
+    if supabase:
+        _wb_upsert("memory", _TRADES_SESSION_ID, fn=_trade_history_legacy_row)
+    return True
+
+_wb_on_upsert_error[_TRADES_TABLE] = _th_replicate_error
+
+def _save_trade_history_to_db():
+    """Har trade ke baad — sirf naye trades rows ban ke jaate hain (batched, idempotent)"""
+    with _th_save_lock:
+        _hist = [t for t in list(auto_trade_stats.get("trade_history") or [])
+                 if isinstance(t, dict) and (t.get("token") or t.get("address"))]
+        _new = [t for t in _hist if _trade_id(t) not in _th_saved_ids]
+        if not _new:
+            return
+        _th_enqueue(_new)
+        _th_stats["db_total"] += len(_new)
+        # RAM window ke bahar wale ids ki zaroorat nahi — set bounded rehta hai
+        _live = {_trade_id(t) for t in _hist}
+        _th_saved_ids.update(_trade_id(t) for t in _new)
+        _th_saved_ids.intersection_update(_live)
+        print(f"💾 Trade history: {len(_new)} new row(s) saved | {len(_hist)} in RAM")
+
+def _th_load_legacy() -> list:
+    """memory blob + real_trade_history (FIX v46 sources) — migration ke liye"""
+    _hist = []
     try:
-        _mem_res = supabase.table("memory").select("trade_history").eq("session_id", _TRADES_SESSION_ID).execute()
+        _mem_res = _mem_fetch(_TRADES_SESSION_ID)
         if _mem_res.data:
             _raw = _mem_res.data[0].get("trade_history")
             if _raw:
-                _hist = json.loads(_raw) if isinstance(_raw, str) else _raw
-                if isinstance(_hist, list) and _hist:
-                    auto_trade_stats["trade_history"] = _hist
-                    wins   = sum(1 for t in _hist if t.get("result") == "win")
-                    losses = sum(1 for t in _hist if t.get("result") == "loss")
-                    auto_trade_stats["trade_count"] = len(_hist)
-                    auto_trade_stats["win_count"]   = wins
-                    auto_trade_stats["loss_count"]  = losses
-                    print(f"✅ [v46] memory table loaded: {len(_hist)} trades (W={wins} L={losses})")
+                _h = json.loads(_raw) if isinstance(_raw, str) else _raw
+                if isinstance(_h, list):
+                    _hist = [t for t in _h if isinstance(t, dict)]
     except Exception as _me:
         print(f"⚠️ [v46] memory table load skip: {str(_me)[:80]}")
-
-    # Step 2: real_trade_history se extra real trades merge karo
+    if not supabase:
+        return _hist
     try:
-        _REAL_TABLE = "real_trade_history"
-        _real_res = supabase.table(_REAL_TABLE).select("*").order("id", desc=True).limit(500).execute()
-        if _real_res.data:
-            _real_rows = []
-            for row in _real_res.data:
-                try:
-                    _entry = json.loads(row.get("data", "{}")) if isinstance(row.get("data"), str) else row
-                    if isinstance(_entry, dict) and _entry.get("token"):
-                        _entry["mode"] = "real"
-                        _real_rows.append(_entry)
-                except Exception:
-                    pass
-            if _real_rows:
-                _existing = auto_trade_stats.get("trade_history", [])
-                _existing_keys = {(t.get("address","").lower(), t.get("sold_at","")) for t in _existing}
-                _new_real = [t for t in _real_rows
-                             if (t.get("address","").lower(), t.get("sold_at","")) not in _existing_keys]
-                if _new_real:
-                    auto_trade_stats["trade_history"] = _existing + _new_real
-                    print(f"✅ [v46] real_trade_history merged: {len(_new_real)} extra entries")
+        _real_res = supabase.table(_REAL_TRADES_TABLE).select("*").order("id", desc=True).limit(500).execute()
+        _keys = {_trade_id(t) for t in _hist}
+        for row in (_real_res.data or []):
+            try:
+                _entry = json.loads(row.get("data", "{}")) if isinstance(row.get("data"), str) else row
+                if isinstance(_entry, dict) and _entry.get("token"):
+                    _entry["mode"] = "real"
+                    if _trade_id(_entry) not in _keys:
+                        _hist.append(_entry)
+                        _keys.add(_trade_id(_entry))
+            except Exception:
+                pass
     except Exception as _rle:
         print(f"⚠️ [v46] real_trade_history load skip: {str(_rle)[:80]}")
+    return _hist
+
+def _th_parse(rows: list) -> list:
+    out = []
+    for r in rows or []:
+        try:
+            _t = r.get("data") if isinstance(r, dict) and "data" in r and "trade_id" in r else r
+            _t = json.loads(_t) if isinstance(_t, str) else _t
+            if isinstance(_t, dict):
+                out.append(_t)
+        except Exception:
+            pass
+    return out
+
+def _th_count(result: str = "") -> int:
+    q = supabase.table(_TRADES_TABLE).select("trade_id", count="exact")
+    if result:
+        q = q.eq("result", result)
+    return int(q.limit(1).execute().count or 0)
+
+def _th_local_count(result: str = "") -> int:
+    if result:
+        return _local_count(_TRADES_TABLE, "json_extract(row, '$.result')=?", (result,))
+    return _local_count(_TRADES_TABLE)
+
+def _th_set_counts(total: int, wins: int, losses: int):
+    auto_trade_stats["trade_count"] = total
+    auto_trade_stats["win_count"]   = wins
+    auto_trade_stats["loss_count"]  = losses
+
+def _th_seed_local_bg(skip: int):
+    """Mirror se purani rows background mein local store mein — agle restart pe poora local"""
+    def _run():
+        _off, _n = skip, 0
+        while True:
+            try:
+                res = supabase.table(_TRADES_TABLE).select("*").order("sold_at", desc=True).range(_off, _off + 499).execute()
+            except Exception as _se:
+                print(f"⚠️ [v129] trade_history seed error: {str(_se)[:60]}")
+                return
+            _rows = res.data or []
+            if not _rows:
+                break
+            _local_put_many([(_TRADES_TABLE, r["trade_id"], r, "trade_id", 1) for r in _rows if r.get("trade_id")])
+            _th_traded_addrs.update(str(r.get("address") or "").lower() for r in _rows if r.get("address"))
+            _n += len(_rows)
+            _off += len(_rows)
+        if _n:
+            print(f"✅ [v129] trade_history local seed: {_n} older rows")
+    threading.Thread(target=_run, daemon=True).start()
+
+def _load_trade_history_from_db():
+    """FIX v126/v129: local store → trade_history table → legacy blob (migrate), recent window hi RAM mein"""
+    rows, _src = [], ""
+    try:
+        rows = _th_parse(_local_rows(_TRADES_TABLE, order="json_extract(row, '$.sold_at') DESC",
+                                     limit=_TH_RECENT_WINDOW))[::-1]
+        if rows:
+            _src = "local"
+            _total, _wins, _losses = _th_local_count(), _th_local_count("win"), _th_local_count("loss")
+    except Exception as _le:
+        print(f"⚠️ [v129] local trade_history read error: {str(_le)[:80]}")
+    if not rows and supabase:
+        try:
+            res  = supabase.table(_TRADES_TABLE).select("*").order("sold_at", desc=True).limit(_TH_RECENT_WINDOW).execute()
+            _raw = res.data or []
+            rows = _th_parse(_raw)[::-1]
+            if rows:
+                _src = "supabase"
+                _total, _wins, _losses = _th_count(), _th_count("win"), _th_count("loss")
+                _local_put_many([(_TRADES_TABLE, r["trade_id"], r, "trade_id", 1) for r in _raw if r.get("trade_id")])
+                if _total > len(rows):
+                    _th_seed_local_bg(len(_raw))
+        except Exception as e:
+            if _th_table_missing(e):
+                _th_stats["legacy_fallback"] = True
+                print(f"⚠️ [v126] '{_TRADES_TABLE}' table nahi mili — legacy blob mode")
+            else:
+                print(f"⚠️ [v126] trade_history load error: {str(e)[:80]}")
+                return
+    if rows:
+        _th_set(rows)
+        _th_seed_addrs()
+        with _th_save_lock:
+            _th_saved_ids.update(_trade_id(t) for t in rows)
+        _th_stats["db_total"] = _total
+        _th_set_counts(_total, _wins, _losses)
+        print(f"✅ [v129] trade_history loaded ({_src}): {len(rows)} recent of {_total} (W={_wins} L={_losses})")
+        return
+
+    # Local + table khaali (pehla boot) ya table missing — legacy sources
+    _hist = _th_load_legacy()
+    if not _hist:
+        return
+    _th_set(_hist[-_TH_RECENT_WINDOW:])
+    _th_traded_addrs.update(str(t.get("address") or "").lower() for t in _hist if t.get("address"))
+    _th_set_counts(len(_hist), sum(1 for t in _hist if t.get("result") == "win"),
+                   sum(1 for t in _hist if t.get("result") == "loss"))
+    print(f"✅ [v46] legacy history loaded: {len(_hist)} trades")
+    # One-time backfill — poori legacy history rows mein (local + mirror), RAM sirf recent window
+    with _th_save_lock:
+        _th_enqueue([t for t in _hist if t.get("token") or t.get("address")])
+        _th_saved_ids.update(_trade_id(t) for t in auto_trade_stats["trade_history"])
+    _th_stats["migrated"] = len(_hist)
+    _th_stats["db_total"] = len(_hist)
+    print(f"✅ [v126] Legacy history migrating: {len(_hist)} rows → {_TRADES_TABLE}")
+
+def _trade_history_page(offset: int = 0, limit: int = 50, mode: str = "", result: str = "") -> list:
+    """RAM window se purani history — local store se paginated (newest first), mirror fallback"""
+    _w, _p = [], []
+    if mode:
+        _w.append("json_extract(row, '$.mode')=?"); _p.append(mode)
+    if result:
+        _w.append("json_extract(row, '$.result')=?"); _p.append(result)
+    try:
+        with _ls_lock:
+            _rs = _ls().execute(
+                "SELECT row FROM kv WHERE tbl=?" + "".join(f" AND {x}" for x in _w) +
+                " ORDER BY json_extract(row, '$.sold_at') DESC LIMIT ? OFFSET ?",
+                (_TRADES_TABLE, *_p, max(1, limit), max(0, offset))).fetchall()
+        out = _th_parse([json.loads(r[0]) for r in _rs])
+        if out or not supabase:
+            return out
+    except Exception as _le:
+        print(f"⚠️ [v129] local page error: {str(_le)[:60]}")
+    if not supabase or _th_stats["legacy_fallback"]:
+        return []
+    q = supabase.table(_TRADES_TABLE).select("data")
+    if mode:
+        q = q.eq("mode", mode)
+    if result:
+        q = q.eq("result", result)
+    res = q.order("sold_at", desc=True).range(offset, offset + max(1, limit) - 1).execute()
+    return _th_parse([r.get("data") for r in (res.data or [])])
+
+def _th_summary() -> dict:
+    return {**_th_stats, "ram": len(auto_trade_stats.get("trade_history") or []), "saved_ids": len(_th_saved_ids),
+            "traded_addrs": len(_th_traded_addrs)}
 
 def _load_trade_history_from_db_ORIGINAL():
     """Startup pe Supabase se history load karo"""
     if not supabase: return
     try:
-        res = supabase.table("memory").select("trade_history").eq("session_id", _TRADES_SESSION_ID).execute()
+        res = _mem_fetch(_TRADES_SESSION_ID)
         if res.data:
             raw = res.data[0].get("trade_history")
             if raw:
                 hist = json.loads(raw) if isinstance(raw, str) else raw
                 if isinstance(hist, list) and hist:
-                    auto_trade_stats["trade_history"] = hist
+                    _th_set(hist)
                     # FIX v30: mode default "paper" tha — real history load pe count galat tha
                     wins   = sum(1 for t in hist if t.get("result") == "win" and (t.get("mode") or TRADE_MODE) == TRADE_MODE)
                     losses = sum(1 for t in hist if t.get("result") == "loss" and (t.get("mode") or TRADE_MODE) == TRADE_MODE)
@@ -2181,54 +4404,115 @@ def _load_trade_history_from_db_ORIGINAL():
         print(f"⚠️ Trade history load error: {e}")
 
 # ══════════════════════════════════════════════
-_rug_dna: list = []
+# FIX v137: _rug_dna ab insertion-ordered dict hai {creator:token → dna} — purana list
+# har snipe pe 2000 entries linear scan karta tha. Ab creator map + tax/liq grid index
+# se match O(1) hota hai, eviction heap se O(log n).
+_rug_dna: dict = {}
 
 # Stage2 info cache — 0.5s TTL for faster polling
 _info_cache: dict = {}  # {addr_lower: {'data': {...}, 'ts': float}}
-   # [{"creator": str, "buy_tax": float, "sell_tax": float, "liq_usd": float, "ts": float}]
+   # {"creator:token": {"creator": str, "token": str, "buy_tax": float, "sell_tax": float, "liq_band": str, "ts": float, ...}}
 _RUG_DNA_MAX = 2000  # memory cap
+_RUG_TAX_TOL = 2.0   # ±2% tax tolerance — grid cell ka size bhi yahi hai
+_rug_lock = threading.RLock()
+_rug_by_creator: dict = {}  # creator → set(keys)
+_rug_grid: dict = {}        # (buy_cell, sell_cell, liq_band) → set(keys)
+_rug_heap: list = []        # [(ts, key)] sirf single-rug entries — lazy deletion, pop pe validate
+_rug_stats = {"checks": 0, "creator_hits": 0, "grid_hits": 0, "cells_scanned": 0, "evictions": 0, "heap_rebuilds": 0}
+
+def _rug_dna_key(d: dict) -> str:
+    return f"{d.get('creator', '')}:{d.get('token', '')}"
+
+def _rug_cell(bt: float, st: float, liq_b: str) -> tuple:
+    return (int(bt // _RUG_TAX_TOL), int(st // _RUG_TAX_TOL), liq_b)
+
+def _rug_index_add(key: str, d: dict):
+    _rug_by_creator.setdefault(d.get("creator", ""), set()).add(key)
+    _rug_grid.setdefault(_rug_cell(d.get("buy_tax", 0), d.get("sell_tax", 0), d.get("liq_band", "")), set()).add(key)
+    if d.get("rug_count", 1) == 1:
+        _heapq.heappush(_rug_heap, (d.get("ts", 0), key))
+
+def _rug_index_drop(key: str, d: dict):
+    for idx, k in ((_rug_by_creator, d.get("creator", "")),
+                   (_rug_grid, _rug_cell(d.get("buy_tax", 0), d.get("sell_tax", 0), d.get("liq_band", "")))):
+        s = idx.get(k)
+        if s is not None:
+            s.discard(key)
+            if not s:
+                idx.pop(k, None)
+
+def _rug_heap_rebuild():
+    # Stale entries (rug_count badha / ts update / evicted) jama ho gaye — fresh heap banao
+    _rug_heap[:] = [(d.get("ts", 0), k) for k, d in _rug_dna.items() if d.get("rug_count", 1) == 1]
+    _heapq.heapify(_rug_heap)
+    _rug_stats["heap_rebuilds"] += 1
+
+def _rug_evict_one():
+    # Sirf 1-rug wale creators ki oldest entry hatao — serial ruggers (2+ rugs) safe rahenge
+    if len(_rug_heap) > 4 * _RUG_DNA_MAX:
+        _rug_heap_rebuild()
+    while _rug_heap:
+        ts, key = _heapq.heappop(_rug_heap)
+        d = _rug_dna.get(key)
+        if d is not None and d.get("rug_count", 1) == 1 and d.get("ts", 0) == ts:
+            break
+    else:
+        # Sab serial ruggers hain — sabse purana hatao (last resort)
+        key = next(iter(_rug_dna), None)
+        if key is None:
+            return
+    _rug_index_drop(key, _rug_dna.pop(key))
+    _rug_stats["evictions"] += 1
+    _coll_touch("rug_dna", key)
+
+def _rug_dna_load(items: dict):
+    with _rug_lock:
+        _rug_dna.clear(); _rug_by_creator.clear(); _rug_grid.clear(); _rug_heap.clear()
+        for d in sorted((d for d in items.values() if isinstance(d, dict)), key=lambda d: d.get("ts", 0)):
+            key = _rug_dna_key(d)
+            _rug_dna[key] = d
+            _rug_index_add(key, d)
+
+_coll_register("rug_dna", get=_rug_dna.get, items=lambda: list(_rug_dna.items()),
+               load=_rug_dna_load)  # FIX v132
 
 def _record_rug_dna(token_address: str, creator: str, buy_tax: float, sell_tax: float, liq_usd: float, reason: str = "", pnl_pct: float = 0.0):
     """Rug token ka DNA fingerprint save karo — smart dedup + smart cleanup"""
     if not creator or len(creator) != 42: return
+    _coll_ensure("rug_dna")
     creator_l = creator.lower()
     token_l   = token_address.lower()
+    key       = f"{creator_l}:{token_l}"
 
-    # Agar same creator + same token already hai → update karo, duplicate mat banao
-    for existing in _rug_dna:
-        if existing.get("creator") == creator_l and existing.get("token") == token_l:
+    with _rug_lock:
+        # Agar same creator + same token already hai → update karo, duplicate mat banao
+        existing = _rug_dna.get(key)
+        if existing is not None:
             existing["rug_count"] = existing.get("rug_count", 1) + 1
             existing["last_pnl"]  = round(pnl_pct, 1)
             existing["ts"]        = time.time()
             existing["reason"]    = reason or existing.get("reason", "SL/Rug")
+            _coll_touch("rug_dna", key)
             print(f"🧬 Rug DNA updated: creator={creator[:10]} rugs={existing['rug_count']}")
             return
 
-    dna = {
-        "token":     token_l,
-        "creator":   creator_l,
-        "buy_tax":   round(buy_tax,  1),
-        "sell_tax":  round(sell_tax, 1),
-        "liq_band":  _liq_band(liq_usd),
-        "reason":    reason or "SL/Rug",
-        "pnl_pct":   round(pnl_pct, 1),
-        "rug_count": 1,
-        "ts":        time.time()
-    }
-    _rug_dna.append(dna)
-
-    # Smart cleanup — sirf 1-rug wale creators ki oldest entry hatao
-    # Serial ruggers (2+ rugs) ke records hamesha safe rahenge
-    if len(_rug_dna) > _RUG_DNA_MAX:
-        # Sirf 1 rug wale entries sort by oldest
-        single_rug = [(i, d) for i, d in enumerate(_rug_dna) if d.get("rug_count", 1) == 1]
-        if single_rug:
-            # Sabse purana single-rug entry hatao
-            oldest_idx = min(single_rug, key=lambda x: x[1].get("ts", 0))[0]
-            _rug_dna.pop(oldest_idx)
-        else:
-            # Sab serial ruggers hain — sabse purana hatao (last resort)
-            _rug_dna.pop(0)
+        dna = {
+            "token":     token_l,
+            "creator":   creator_l,
+            "buy_tax":   round(buy_tax,  1),
+            "sell_tax":  round(sell_tax, 1),
+            "liq_band":  _liq_band(liq_usd),
+            "reason":    reason or "SL/Rug",
+            "pnl_pct":   round(pnl_pct, 1),
+            "rug_count": 1,
+            "ts":        time.time()
+        }
+        _rug_dna[key] = dna
+        _rug_index_add(key, dna)
+        _coll_touch("rug_dna", key)
+
+        if len(_rug_dna) > _RUG_DNA_MAX:
+            _rug_evict_one()
     print(f"🧬 Rug DNA recorded: creator={creator[:10]} tax={buy_tax:.0f}/{sell_tax:.0f}% liq_band={dna['liq_band']}")
 
 def _liq_band(liq_usd: float) -> str:
@@ -2239,35 +4523,54 @@ def _liq_band(liq_usd: float) -> str:
     if liq_usd < 50_000:   return "medium"
     return "large"
 
+def _rug_dna_similar(bt: float, st: float, liq_b: str, tol: float = _RUG_TAX_TOL) -> list:
+    """Grid se fuzzy match — sirf aas-paas ke cells dekho, poora _rug_dna nahi"""
+    r = max(1, int(-(-tol // _RUG_TAX_TOL)))
+    cb, cs, _ = _rug_cell(bt, st, liq_b)
+    out = []
+    with _rug_lock:
+        for i in range(cb - r, cb + r + 1):
+            for j in range(cs - r, cs + r + 1):
+                keys = _rug_grid.get((i, j, liq_b))
+                if not keys:
+                    continue
+                _rug_stats["cells_scanned"] += 1
+                for k in keys:
+                    d = _rug_dna.get(k)
+                    if d and abs(d["buy_tax"] - bt) <= tol and abs(d["sell_tax"] - st) <= tol:
+                        out.append(d)
+    return out
+
 def _check_rug_dna(creator: str, buy_tax: float, sell_tax: float, liq_usd: float) -> dict:
     """
     Naye token ka DNA existing rug fingerprints se match karo.
     Returns: {"match": bool, "confidence": int, "reason": str}
     """
+    _coll_ensure("rug_dna")
     if not creator or not _rug_dna:
         return {"match": False}
+    _rug_stats["checks"] += 1
 
     creator_l  = creator.lower()
-    liq_b      = _liq_band(liq_usd)
-    bt         = round(buy_tax,  1)
-    st         = round(sell_tax, 1)
-
-    creator_rugs = [d for d in _rug_dna if d["creator"] == creator_l]
-    tax_matches  = [d for d in _rug_dna
-                    if abs(d["buy_tax"] - bt) <= 2.0          # ±2% tax tolerance
-                    and abs(d["sell_tax"] - st) <= 2.0
-                    and d["liq_band"] == liq_b]
 
     # Creator ne pehle rug kiya — sabse strong signal
-    if creator_rugs:
+    n_creator = len(_rug_by_creator.get(creator_l, ()))
+    if n_creator:
+        _rug_stats["creator_hits"] += 1
         return {
             "match":      True,
             "confidence": 95,
-            "reason":     f"Creator ne {len(creator_rugs)}x pehle rug kiya ({creator[:10]})"
+            "reason":     f"Creator ne {n_creator}x pehle rug kiya ({creator[:10]})"
         }
 
+    liq_b      = _liq_band(liq_usd)
+    bt         = round(buy_tax,  1)
+    st         = round(sell_tax, 1)
+    tax_matches = _rug_dna_similar(bt, st, liq_b)
+
     # Same tax + same liq band = suspicious pattern
     if len(tax_matches) >= 2:
+        _rug_stats["grid_hits"] += 1
         return {
             "match":      True,
             "confidence": 70,
@@ -2276,6 +4579,10 @@ def _check_rug_dna(creator: str, buy_tax: float, sell_tax: float, liq_usd: float
 
     return {"match": False}
 
+def _rug_summary() -> dict:
+    return {"entries": len(_rug_dna), "creators": len(_rug_by_creator), "cells": len(_rug_grid),
+            "heap": len(_rug_heap), **_rug_stats}
+
 
 
 # _perf_tracker and _relationship removed — RAM optimization
@@ -2376,9 +4683,9 @@ def get_or_create_session(session_id: str) -> dict:
 
 
 def _load_session_from_db(session_id: str):
-    if not supabase: return
+    # FIX v129: local store pehle — supabase na ho to bhi load
     try:
-        res = supabase.table("memory").select("*").eq("session_id", session_id).execute()
+        res = _mem_fetch(session_id)
         if res.data:
             row = res.data[0]
             def _safe_json(val, default):
@@ -2420,7 +4727,9 @@ def _load_session_from_db(session_id: str):
                     for _t in _raw_hist:
                         if isinstance(_t, dict) and not _t.get("mode"):
                             _t["mode"] = "paper"
-                    auto_trade_stats["trade_history"]    = _raw_hist
+                    # FIX v126: history ab trade_history table mein — purani rows ka embed sirf fallback
+                    if _raw_hist and not auto_trade_stats.get("trade_history"):
+                        _th_set(_raw_hist)
                     # total_scanned restore
                     _sc = raw.get("total_scanned", 0)
                     if _sc > 0 and _sc > len(discovered_addresses):
@@ -2441,81 +4750,299 @@ def _load_session_from_db(session_id: str):
     except Exception as e:
         print(f"⚠️ Session load error: {e}")
 
+def _session_row(session_id: str) -> dict:
+    sess = sessions.get(session_id, {})
+    extra = {}
+    if session_id == AUTO_SESSION_ID:
+        extra["pattern_database"] = {
+            "total_buys":    auto_trade_stats.get("total_auto_buys", 0),
+            "total_sells":   auto_trade_stats.get("total_auto_sells", 0),
+            "pnl_total":     auto_trade_stats.get("auto_pnl_total", 0.0),
+            "last_action":   auto_trade_stats.get("last_action", ""),
+            "total_scanned": max(len(discovered_addresses), brain.get("total_tokens_discovered_ever", 0)),
+            "wins":          auto_trade_stats.get("wins", 0),
+            "losses":        auto_trade_stats.get("losses", 0),
+            "today_wins":    auto_trade_stats.get("today_wins",   0),
+            "today_losses":  auto_trade_stats.get("today_losses", 0),
+            "today_pnl":     auto_trade_stats.get("today_pnl",    0.0),
+            "today_date":    auto_trade_stats.get("today_date",   "")
+}
+    else:
+        extra["pattern_database"] = sess.get("pattern_database", [])
+    return {
+        "session_id":       session_id,
+        "role":             "user",
+        "content":          "",
+        "paper_balance":    sess.get("paper_balance",    5.0),
+        # FIX v130: AUTO positions ab per-position rows mein — session row mein blob nahi
+        "open_positions":   "{}" if session_id == AUTO_SESSION_ID else json.dumps(sess.get("open_positions", {})),
+        "real_balance":     sess.get("real_balance",     0.00),
+        "positions":        json.dumps(sess.get("positions",        [])),
+        "history":          json.dumps(sess.get("history",          [])[-20:]),
+        "pnl_24h":          sess.get("pnl_24h",          0.0),
+        "daily_loss":       sess.get("daily_loss",        0.0),
+        "trade_count":      sess.get("trade_count",       0),
+        "win_count":        sess.get("win_count",         0),
+        **extra,
+        "updated_at":       datetime.utcnow().isoformat()
+    }
+
 def _save_session_to_db(session_id: str):
-    if not supabase: return
-    for _attempt in range(3):
+    """FIX v127: write-behind — row flush pe build hoti hai, back-to-back saves coalesce"""
+    _wb_upsert("memory", session_id, fn=lambda: _session_row(session_id))
+
+# ══════════════════════════════════════════════════════
+# POSITION DELTA PERSISTENCE — per-position rows
+# FIX v130: _persist_positions poora open_positions dict rebuild karke poora session row
+# likhta tha — har buy / partial sell / TP pe. Ab har position apni memory row
+# (session_id = AUTO_POS:<addr>), sirf jo badli wahi enqueue hoti hai; close = tombstone
+# (content="closed"). Write-behind queue same key ke back-to-back changes coalesce karta hai.
+# Write volume ab activity ke hisaab se — portfolio size × history se nahi.
+# ══════════════════════════════════════════════════════
+_POS_ROW_PREFIX     = "AUTO_POS:"
+_POS_TOMBSTONE_TTL  = 86400   # closed rows 1 din baad local + mirror se hatao
+_pos_lock           = threading.Lock()
+_pos_last           = {}      # addr → last enqueued to_db() dict
+_pos_stats          = {"rows_written": 0, "unchanged": 0, "tombstones": 0, "migrated": 0, "pruned": 0}
+
+def _pos_key(address: str) -> str:
+    return _POS_ROW_PREFIX + address
+
+def _pos_row(address: str) -> dict:
+    """Flush ke waqt build — latest state jaati hai; position band ho chuki to tombstone"""
+    p = auto_trade_stats["running_positions"].get(address)
+    d = (p.to_db() if isinstance(p, Position) else Position.from_db(address, p).to_db()) if p is not None else None
+    return {
+        "session_id":     _pos_key(address),
+        "role":           "system",
+        "content":        "open" if d is not None else "closed",
+        "open_positions": json.dumps(d or {}),
+        "updated_at":     datetime.utcnow().isoformat()
+    }
+
+def _pos_mark_saved(address: str, d: dict):
+    """Restore ke baad — DB wali state baseline, same ho to dobara write nahi"""
+    with _pos_lock:
+        _pos_last[address] = d
+
+# ── Position journal — FIX v131 ──
+# Write-behind queue ~1s RAM mein rehta hai — buy ke turant baad kill = position gayab.
+# Ab har badli position (buy / partial sell / TP / SL / close) pehle ek local append-only
+# journal mein fsync hoti hai, tab _persist_positions return karta hai. Startup pe journal
+# snapshot (per-position rows) ke upar replay hota hai — Supabase round-trip ki zaroorat nahi.
+# Compaction: queue local store mein commit + checkpoint → purana journal delete.
+_POS_JOURNAL_PATH        = os.getenv("POS_JOURNAL_PATH", _LOCAL_DB_PATH + "-positions.journal")
+_POS_JOURNAL_COMPACT_SEC = 30
+_pos_jfile               = [None]
+_pos_jready              = [False]   # replay se pehle compaction nahi (purana journal safe rahe)
+_pos_jstats              = {"appends": 0, "records": 0, "fsync_ms_max": 0.0, "replayed": 0,
+                            "compactions": 0, "repairs": 0, "errors": 0}
+
+def _pos_journal_append(recs: list):
+    """_pos_lock ke andar call hota hai — write + fsync, phir hi ack"""
+    if not recs: return
+    _t0 = time.time()
+    try:
+        if _pos_jfile[0] is None:
+            _pos_jfile[0] = open(_POS_JOURNAL_PATH, "a", encoding="utf-8")
+            # FIX v144: purana torn tail (newline ke bina) — naya record uske saath na chipke
+            if _pos_jfile[0].tell() > 0:
+                with open(_POS_JOURNAL_PATH, "rb") as _rf:
+                    _rf.seek(-1, os.SEEK_END)
+                    if _rf.read(1) != b"\n":
+                        _pos_jfile[0].write("\n")
+        f = _pos_jfile[0]
+        f.write("".join(json.dumps(r, default=str) + "\n" for r in recs))
+        f.flush()
+        os.fsync(f.fileno())
+        _pos_jstats["appends"] += 1
+        _pos_jstats["records"] += len(recs)
+        _pos_jstats["fsync_ms_max"] = max(_pos_jstats["fsync_ms_max"], round((time.time() - _t0) * 1000, 2))
+    except Exception as _je:
+        _pos_jstats["errors"] += 1
+        print(f"⚠️ [v131] position journal write error: {str(_je)[:80]}")
+
+def _pos_journal_read() -> tuple:
+    """(records, clean) — clean=False = koi torn/bad line ya newline ke bina tail mila"""
+    recs, clean = [], True
+    for _path in (_POS_JOURNAL_PATH + ".old", _POS_JOURNAL_PATH):
         try:
-            sess = sessions.get(session_id, {})
-            extra = {}
-            if session_id == AUTO_SESSION_ID:
-                extra["pattern_database"] = {
-                    "total_buys":    auto_trade_stats.get("total_auto_buys", 0),
-                    "total_sells":   auto_trade_stats.get("total_auto_sells", 0),
-                    "pnl_total":     auto_trade_stats.get("auto_pnl_total", 0.0),
-                    "last_action":   auto_trade_stats.get("last_action", ""),
-                    "trade_history": list(auto_trade_stats.get("trade_history", []))[-500:],
-                    "total_scanned": max(len(discovered_addresses), brain.get("total_tokens_discovered_ever", 0)),
-                    "wins":          auto_trade_stats.get("wins", 0),
-                    "losses":        auto_trade_stats.get("losses", 0),
-                    "today_wins":    auto_trade_stats.get("today_wins",   0),
-                    "today_losses":  auto_trade_stats.get("today_losses", 0),
-                    "today_pnl":     auto_trade_stats.get("today_pnl",    0.0),
-                    "today_date":    auto_trade_stats.get("today_date",   "")
-}
-            else:
-                extra["pattern_database"] = sess.get("pattern_database", [])
-            supabase.table("memory").upsert({
-                "session_id":       session_id,
-                "role":             "user",
-                "content":          "",
-                "paper_balance":    sess.get("paper_balance",    5.0),
-                "open_positions":   json.dumps(sess.get("open_positions", {})),
-                "real_balance":     sess.get("real_balance",     0.00),
-                "positions":        json.dumps(sess.get("positions",        [])),
-                "history":          json.dumps(sess.get("history",          [])[-20:]),
-                "pnl_24h":          sess.get("pnl_24h",          0.0),
-                "daily_loss":       sess.get("daily_loss",        0.0),
-                "trade_count":      sess.get("trade_count",       0),
-                "win_count":        sess.get("win_count",         0),
-                **extra,
-                "updated_at":       datetime.utcnow().isoformat()
-            }, on_conflict="session_id").execute()
-            return  # success
-        except Exception as e:
-            if _attempt < 2:
-                time.sleep(2)
-            else:
-                print(f"⚠️ Session save error: {e}")
+            with open(_path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        clean = False  # torn tail — next append isi line pe chipakta
+                    try:
+                        _r = json.loads(line)
+                    except Exception:
+                        clean = False
+                        continue  # FIX v144: sirf bad line skip — uske baad wale acknowledged records bhi lo
+                    if isinstance(_r, dict):
+                        recs.append(_r)
+        except FileNotFoundError:
+            pass
+        except Exception as _re:
+            print(f"⚠️ [v131] journal read error {_path}: {str(_re)[:60]}")
+    return recs, clean
+
+def _pos_journal_rewrite(recs: list):
+    """FIX v144: Valid records se naya journal (tmp + fsync + rename) — torn bytes hamesha ke liye hatao.
+    _pos_lock ke andar call karo."""
+    if _pos_jfile[0] is not None:
+        _pos_jfile[0].close()
+        _pos_jfile[0] = None
+    _tmp = _POS_JOURNAL_PATH + ".tmp"
+    with open(_tmp, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r, default=str) + "\n" for r in recs))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(_tmp, _POS_JOURNAL_PATH)
+    if os.path.exists(_POS_JOURNAL_PATH + ".old"):
+        os.remove(_POS_JOURNAL_PATH + ".old")
+    _pos_jstats["records"] = len(recs)  # compaction ise rotate karega
+
+def _pos_journal_pending() -> bool:
+    return any(os.path.exists(p) and os.path.getsize(p) > 0
+               for p in (_POS_JOURNAL_PATH, _POS_JOURNAL_PATH + ".old"))
+
+def _pos_journal_replay(base: dict) -> dict:
+    """Snapshot ke upar journal — kill se pehle ki last acknowledged state"""
+    merged = dict(base or {})
+    with _pos_lock:
+        recs, _clean = _pos_journal_read()
+        if not _clean:
+            try:
+                _pos_journal_rewrite(recs)
+                _pos_jstats["repairs"] += 1
+                print(f"🩹 [v131] position journal repaired: torn/bad lines hataye, {len(recs)} records rakhe")
+            except Exception as _we:
+                _pos_jstats["errors"] += 1
+                print(f"⚠️ [v131] journal repair error: {str(_we)[:60]}")
+    for r in recs:
+        if r.get("op") == "put" and isinstance(r.get("d"), dict):
+            merged[r["a"]] = r["d"]
+        elif r.get("op") == "del":
+            merged.pop(r.get("a"), None)
+    _pos_jstats["replayed"] = len(recs)
+    _pos_jready[0] = True
+    if recs:
+        print(f"✅ [v131] position journal replayed: {len(recs)} records → {len(merged)} open")
+    return merged
+
+def _pos_journal_compact():
+    """Rotate → pending rows local store mein commit + checkpoint → purana journal delete"""
+    if not _pos_jready[0] or not _ls_stats["durable"]:
+        return
+    _old = _POS_JOURNAL_PATH + ".old"
+    try:
+        with _pos_lock:
+            if _pos_jstats["records"] == 0 and not os.path.exists(_old):
+                return
+            if not os.path.exists(_old):
+                if _pos_jfile[0] is not None:
+                    _pos_jfile[0].close()
+                    _pos_jfile[0] = None
+                if os.path.exists(_POS_JOURNAL_PATH):
+                    os.replace(_POS_JOURNAL_PATH, _old)
+                _pos_jstats["records"] = 0
+        with _wb_flush_lock:
+            _wb_commit_local()
+        with _ls_lock:
+            _ls().execute("PRAGMA wal_checkpoint(PASSIVE)")
+        if os.path.exists(_old):
+            os.remove(_old)
+        _pos_jstats["compactions"] += 1
+    except Exception as _ce:
+        _pos_jstats["errors"] += 1
+        print(f"⚠️ [v131] journal compact error: {str(_ce)[:80]}")
+
+def _pos_journal_loop():
+    while True:
+        time.sleep(_POS_JOURNAL_COMPACT_SEC)
+        _pos_journal_compact()
 
 def _persist_positions():
     """
-    running_positions ka FULL snapshot Supabase mein save karo.
+    running_positions ke sirf badle hue records DB mein (per-position rows).
     Restart ke baad tp_sold, sl_pct, size_bnb, bought_usd sab restore ho.
-    Har buy/sell ke baad yahi call karo.
+    Har buy/sell ke baad yahi call karo — diff in-memory hai, write sirf badli rows ka.
     """
     try:
-        _ss = get_or_create_session(AUTO_SESSION_ID)
-        _ss["open_positions"] = {
-            k: {
-                "token":          v.get("token", ""),
-                "entry":          v.get("entry", 0),
-                "size_bnb":       v.get("size_bnb", AUTO_BUY_SIZE_BNB),
-                "orig_size_bnb":  v.get("orig_size_bnb", v.get("size_bnb", AUTO_BUY_SIZE_BNB)),
-                "bought_usd":     v.get("bought_usd", 0.0),
-                "bought_at":      v.get("bought_at", ""),
-                "sl_pct":         v.get("sl_pct", 15.0),
-                "tp_sold":        v.get("tp_sold", 0.0),
-                "banked_pnl_bnb": v.get("banked_pnl_bnb", 0.0),  # ✅ partial sell profits
-                "mode":           v.get("mode", "paper")
-}
-            for k, v in auto_trade_stats["running_positions"].items()
-        }
-        sessions[AUTO_SESSION_ID] = _ss
-        threading.Thread(target=_save_session_to_db, args=(AUTO_SESSION_ID,), daemon=True).start()
-        print(f"💾 Positions persisted: {len(_ss['open_positions'])} positions saved to DB")
+        _rp = auto_trade_stats["running_positions"]
+        _n = 0
+        with _pos_lock:
+            _changed = []
+            for a in list(set(_rp) | set(_pos_last)):
+                p = _rp.get(a)
+                d = (p.to_db() if isinstance(p, Position) else Position.from_db(a, p).to_db()) if p is not None else None
+                if d == _pos_last.get(a):
+                    _pos_stats["unchanged"] += 1
+                    continue
+                _changed.append((a, d))
+            # FIX v131: pehle journal (fsync), phir queue
+            _pos_journal_append([{"op": "put" if d is not None else "del", "a": a, "d": d, "ts": time.time()}
+                                 for a, d in _changed])
+            for a, d in _changed:
+                if d is None:
+                    _pos_last.pop(a, None)
+                    _pos_stats["tombstones"] += 1
+                else:
+                    _pos_last[a] = d
+                _wb_upsert("memory", _pos_key(a), fn=lambda a=a: _pos_row(a))
+                _n += 1
+        _pos_stats["rows_written"] += _n
+        if _n:
+            print(f"💾 Positions persisted: {_n} changed of {len(_rp)} open")
     except Exception as _pe:
         print(f"⚠️ _persist_positions error: {_pe}")
 
+def _load_position_rows():
+    """Per-position rows → {addr: to_db dict}. None = abhi tak koi row nahi (legacy blob se migrate)"""
+    _like = (_POS_ROW_PREFIX + "%",)
+    rows = []
+    if _local_count("memory", "key LIKE ?", _like) > 0:
+        rows = _local_rows("memory", "key LIKE ?", _like)
+    elif supabase:
+        try:
+            res = supabase.table("memory").select("*").like("session_id", _POS_ROW_PREFIX + "%").execute()
+            rows = res.data or []
+            _local_put_many([("memory", r["session_id"], r, "session_id", 1) for r in rows])
+        except Exception as _le:
+            print(f"⚠️ [v130] position rows load error: {str(_le)[:80]}")
+    if not rows:
+        return None
+    out, _dead = {}, []
+    _cut = (datetime.utcnow() - timedelta(seconds=_POS_TOMBSTONE_TTL)).isoformat()
+    for r in rows:
+        _addr = str(r.get("session_id", ""))[len(_POS_ROW_PREFIX):]
+        if r.get("content") != "open":
+            if str(r.get("updated_at") or "") < _cut:
+                _dead.append(r["session_id"])
+            continue
+        try:
+            _d = json.loads(r.get("open_positions") or "{}")
+        except Exception:
+            continue
+        if _addr and isinstance(_d, dict) and _d:
+            out[_addr] = _d
+    if _dead:
+        _pos_prune_tombstones(_dead)
+    return out
+
+def _pos_prune_tombstones(keys: list):
+    """Purane closed rows — local mein sirf synced wale (mirror tak pahunch chuke), mirror se bhi"""
+    try:
+        with _ls_lock:
+            _ls().executemany("DELETE FROM kv WHERE tbl='memory' AND key=? AND synced=1", [(k,) for k in keys])
+        if supabase:
+            for i in range(0, len(keys), 100):
+                supabase.table("memory").delete().in_("session_id", keys[i:i + 100]).eq("content", "closed").execute()
+        _pos_stats["pruned"] += len(keys)
+    except Exception as _pe:
+        print(f"⚠️ [v130] tombstone prune error: {str(_pe)[:80]}")
+
+def _pos_summary() -> dict:
+    return {**_pos_stats, "tracked": len(_pos_last), "journal": _pos_jstats}
+
 
 # ========== NEW PAIRS ==========
 
@@ -2547,27 +5074,24 @@ def _push_notif(severity: str, title: str, detail: str, token: str = "", address
     _notifications.insert(0, notif)
     if len(_notifications) > _NOTIF_MAX:
         _notifications.pop()
-    # Save to Supabase in background
-    threading.Thread(target=_save_notifs_to_db, daemon=True).start()
+    # Save to Supabase in background — FIX v127: queue pe, thread nahi
+    _save_notifs_to_db()
 
 def _save_notifs_to_db():
-    if not supabase: return
-    try:
-        supabase.table("memory").upsert({
+    """FIX v127: write-behind queue — burst of notifs = ek hi upsert"""
+    _wb_upsert("memory", "MRBLACK_NOTIFICATIONS", fn=lambda: {
             "session_id": "MRBLACK_NOTIFICATIONS",
             "role":       "system",
             "content":    "",
-            "history":    __import__("json").dumps(_notifications[:_NOTIF_MAX]),
-            "updated_at": __import__("datetime").datetime.utcnow().isoformat()
-}, on_conflict="session_id").execute()
-    except Exception as _e:
-        pass  # Silent fail — notifications are best-effort
+            "history":    json.dumps(_notifications[:_NOTIF_MAX]),
+            "updated_at": datetime.utcnow().isoformat()
+})
 
 def _load_notifs_from_db():
     global _notifications
-    if not supabase: return
+    # FIX v129: local store pehle — supabase na ho to bhi load
     try:
-        res = supabase.table("memory").select("history").eq("session_id", "MRBLACK_NOTIFICATIONS").execute()
+        res = _mem_fetch("MRBLACK_NOTIFICATIONS")
         if res.data and res.data[0].get("history"):
             raw = res.data[0]["history"]
             loaded = __import__("json").loads(raw) if isinstance(raw, str) else raw
@@ -2599,10 +5123,140 @@ _goplus_sem       = threading.Semaphore(5)  # GoPlus: 5 parallel safe (was 2)
 DISCOVERY_TTL = 7200
 PAIR_CREATED_TOPIC = "0x0d3648bd0f6ba80134a33ba9275ac585d9d315f0ad8355cddefde31afa28d0e9"
 
+# ========== POSITION RECORD ==========
+# FIX v116: running_positions + monitored_positions ek hi typed record share karte hain.
+# __slots__ = per-position dict overhead nahi, hot path pe attribute lookup.
+# Dict-style access (get / [] / in / pop) purane call sites ke liye chalta rehta hai.
+_POS_MISSING = object()
+
+class Position:
+    __slots__ = (
+        # core — DB mein persist hote hain
+        "token", "address", "entry", "size_bnb", "orig_size_bnb", "bought_usd",
+        "bought_at", "sl_pct", "trail_pct", "tp_sold", "banked_pnl_bnb", "mode",
+        "source", "buy_reasoning", "buy_tax", "sell_tax", "entry_price_confirmed",
+        "ath_price", "pnl_high",
+        # monitor fields
+        "session_id", "current", "high", "stop_loss_pct", "alerts_sent", "added_at",
+        # manager scratch
+        "_price_refreshed", "_zero_price_count", "_wbnb_reserve", "_last_res_t",
+        "_fm_funds_hist", "_fm_price_hist", "_eg_price_hist", "_last_high_ts", "_pm_read_ts",
+        # baaki rare keys (FM entry analytics, tx parse results)
+        "_extra",
+    )
+    _DB_DEFAULTS = (
+        ("token", ""), ("entry", 0), ("size_bnb", 0.01), ("orig_size_bnb", None),
+        ("bought_usd", 0.0), ("bought_at", ""), ("sl_pct", 15.0), ("tp_sold", 0.0),
+        ("banked_pnl_bnb", 0.0), ("mode", "paper"),
+    )
+
+    def __init__(self, **fields):
+        self._extra = {}
+        for k, v in fields.items():
+            self[k] = v
+
+    # ── dict-style access ──
+    def __getitem__(self, k):
+        v = self.get(k, _POS_MISSING)
+        if v is _POS_MISSING:
+            raise KeyError(k)
+        return v
+
+    def __setitem__(self, k, v):
+        if k in _POS_FIELDS:
+            object.__setattr__(self, k, v)
+        else:
+            self._extra[k] = v
+
+    def __delitem__(self, k):
+        if self.pop(k, _POS_MISSING) is _POS_MISSING:
+            raise KeyError(k)
+
+    def __contains__(self, k):
+        return self.get(k, _POS_MISSING) is not _POS_MISSING
+
+    def __bool__(self):
+        return True
+
+    def get(self, k, default=None):
+        if k in _POS_FIELDS:
+            return getattr(self, k, default)
+        return self._extra.get(k, default)
+
+    def pop(self, k, default=None):
+        if k in _POS_FIELDS:
+            v = getattr(self, k, _POS_MISSING)
+            if v is _POS_MISSING:
+                return default
+            object.__delattr__(self, k)
+            return v
+        return self._extra.pop(k, default)
+
+    def setdefault(self, k, default=None):
+        v = self.get(k, _POS_MISSING)
+        if v is _POS_MISSING:
+            self[k] = default
+            return default
+        return v
+
+    def update(self, fields: dict):
+        for k, v in fields.items():
+            self[k] = v
+
+    def keys(self):
+        _ks = [k for k in _POS_FIELD_ORDER if hasattr(self, k)]
+        return _ks + list(self._extra.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    copy = to_dict
+
+    # ── DB shape (memory.open_positions) ──
+    def to_db(self) -> dict:
+        d = {k: self.get(k, dv) for k, dv in Position._DB_DEFAULTS}
+        if d["orig_size_bnb"] is None:
+            d["orig_size_bnb"] = d["size_bnb"]
+        return d
+
+    @classmethod
+    def from_db(cls, address: str, d: dict) -> "Position":
+        p = cls(address=address)
+        for k, dv in Position._DB_DEFAULTS:
+            p[k] = d.get(k, dv)
+        for k in ("entry", "size_bnb", "bought_usd", "sl_pct", "tp_sold", "banked_pnl_bnb"):
+            p[k] = float(p.get(k) or 0.0)
+        # orig_size_bnb: DB mein nahi toh tp_sold se back-calculate
+        _orig = float(d.get("orig_size_bnb", 0.0) or 0.0)
+        if _orig <= 0:
+            _orig = round(p.size_bnb / max(0.01, (100.0 - p.tp_sold) / 100.0), 6)
+        p.orig_size_bnb = _orig
+        if not p.token:
+            p.token = address[:10]
+        return p
+
+    def __repr__(self):
+        return f"Position({self.get('token', '?')} entry={self.get('entry', 0)} tp_sold={self.get('tp_sold', 0)})"
+
+_POS_FIELD_ORDER = tuple(k for k in Position.__slots__ if k != "_extra")
+_POS_FIELDS      = frozenset(_POS_FIELD_ORDER)
+
 # ========== MONITORED POSITIONS ==========
-monitored_positions: Dict[str, dict] = {}
+monitored_positions: Dict[str, Position] = {}
 monitor_lock = threading.Lock()
 
+def _new_position(address: str, **fields) -> Position:
+    """Running position banao — monitor ne pehle record banaya hai toh wahi reuse karo"""
+    with monitor_lock:
+        p = monitored_positions.get(address)
+    if not isinstance(p, Position):
+        p = Position(address=address)
+    p.update(fields)
+    return p
+
 # ========== AUTO TRADE STATS ==========  FIX 2: trade_history added
 AUTO_TRADE_ENABLED = True
 FM_SNIPER_ENABLED  = True   # FM Bonding Curve sniper
@@ -2614,9 +5268,9 @@ _pc_stop_event = threading.Event()
 def _load_sniper_state():
     """Supabase se sniper state load karo — restart pe same state rahega"""
     global FM_SNIPER_ENABLED
-    if not supabase: return
+    # FIX v129: local store pehle — supabase na ho to bhi load
     try:
-        res = supabase.table("memory").select("positions").eq("session_id", "SNIPER_STATE").execute()
+        res = _mem_fetch("SNIPER_STATE")
         if res.data:
             state = json.loads(res.data[0].get("positions") or "{}")
             FM_SNIPER_ENABLED = state.get("fm", True)
@@ -2625,17 +5279,16 @@ def _load_sniper_state():
         print(f"⚠️ Sniper state load error: {e}")
 
 def _save_sniper_state():
-    """Sniper state Supabase mein save karo"""
-    if not supabase: return
+    """Sniper state save karo — FIX v129: local store + async Supabase mirror"""
     try:
-        supabase.table("memory").upsert({
+        _wb_upsert("memory", "SNIPER_STATE", row={
             "session_id": "SNIPER_STATE",
             "role": "system",
             "content": "",
             "history": json.dumps([]),
             "positions": json.dumps({"pc": False, "fm": FM_SNIPER_ENABLED}),
             "updated_at": datetime.utcnow().isoformat()
-        }, on_conflict="session_id").execute()
+        })
     except Exception as e:
         print(f"⚠️ Sniper state save error: {e}")
 TRADE_MODE         = "paper"   # "paper" or "real"
@@ -2697,7 +5350,7 @@ auto_trade_stats = {
     "auto_pnl_total":    0.0,
     "running_positions": {},
     "last_action":       "",
-    "trade_history":     [],
+    "trade_history":     TradeHistory(),  # FIX v135: indexed
     "wins":              0,
     "losses":            0,
     "today_wins":        0,
@@ -2719,12 +5372,7 @@ def _process_new_token(token_address: str, pair_address: str, source: str = "web
     _liq_bnb = 0.0
     # ── Already traded token — dobara buy mat karo ──
     try:
-        _addr_lower = token_address.lower()
-        _already_traded = any(
-            t.get("address", "").lower() == _addr_lower
-            for t in auto_trade_stats.get("trade_history", [])
-        )
-        if _already_traded:
+        if is_already_traded(token_address):  # FIX v135: O(1) index
             print(f"⏭️ Already traded — skip: {token_address[:10]}")
             return
     except Exception:
@@ -2803,18 +5451,17 @@ def add_position_to_monitor(session_id, token_address, token_name, entry_price,
         if len(monitored_positions) >= 15 and token_address not in monitored_positions:
             print(f"⚠️ Monitor cap (15) reached — skipping {token_address[:10]}")
             return
-        monitored_positions[token_address] = {
-            "session_id":    session_id,
-            "token":         token_name,
-            "address":       token_address,
-            "entry":         entry_price,
-            "current":       entry_price,
-            "high":          entry_price,
-            "size_bnb":      size_bnb,
-            "stop_loss_pct": stop_loss_pct,
-            "alerts_sent":   [],
-            "added_at":      datetime.utcnow().isoformat()
-        }
+        # FIX v116: running position ka record already hai toh wahi share karo
+        _p = auto_trade_stats["running_positions"].get(token_address)
+        if not isinstance(_p, Position):
+            _p = Position(token=token_name, address=token_address, entry=entry_price, size_bnb=size_bnb)
+        _p.session_id    = session_id
+        _p.current       = entry_price
+        _p.high          = entry_price
+        _p.stop_loss_pct = stop_loss_pct
+        _p.alerts_sent   = []
+        _p.added_at      = datetime.utcnow().isoformat()
+        monitored_positions[token_address] = _p
     print(f"👁️ Monitoring: {token_name} @ {entry_price:.8f} BNB")
 
 def remove_position_from_monitor(token_address: str):
@@ -2823,6 +5470,158 @@ def remove_position_from_monitor(token_address: str):
             del monitored_positions[token_address]
     print(f"✅ Stopped monitoring: {token_address}")
 
+# ══════════════════════════════════════════════════════
+# PAPER FILL SIMULATOR — exact AMM / bonding curve fills
+# FIX v125: Paper fill flat entry*1.005 / current*0.995 tha — price impact, token tax aur
+# liquidity depth ignore → paper PnL real se hamesha better. Ab position size ke liye exact
+# constant-product output (PancakeSwap v2, 0.25% LP fee) mirrored / live reserves se, measured
+# buy/sell tax ke saath. FM tokens = helper ka tryBuy/trySell (curve math on-chain se).
+# Har fill ka simulated slippage position + trade history mein record hota hai.
+# ══════════════════════════════════════════════════════
+_SIM_PCS_FEE_BPS = 25      # PancakeSwap v2 LP fee
+_SIM_RES_MAX_AGE = 10.0    # monitor ka mirrored reserve isse purana = live fetch
+_SIM_FLAT_SLIP   = 0.5     # fallback (purana flat model) — sirf jab exact fill na ho sake
+_sim_lock        = threading.Lock()
+_sim_token0      = {}      # pair_lower → token0 == WBNB
+_sim_slips       = {"buy": deque(maxlen=200), "sell": deque(maxlen=200)}
+_sim_stats       = {"buys": 0, "sells": 0, "exact": 0, "flat": 0, "mirror_hits": 0, "live_fetches": 0}
+
+_FM_HELPER_SIM_ABI = [
+    {"name":"tryBuy","type":"function","stateMutability":"view",
+     "inputs":[{"name":"token","type":"address"},{"name":"amount","type":"uint256"},{"name":"funds","type":"uint256"}],
+     "outputs":[{"name":"tokenManager","type":"address"},{"name":"quote","type":"address"},
+                {"name":"estimatedAmount","type":"uint256"},{"name":"estimatedCost","type":"uint256"},
+                {"name":"estimatedFee","type":"uint256"},{"name":"amountMsgValue","type":"uint256"},
+                {"name":"amountApproval","type":"uint256"},{"name":"amountFunds","type":"uint256"}]},
+    {"name":"trySell","type":"function","stateMutability":"view",
+     "inputs":[{"name":"token","type":"address"},{"name":"amount","type":"uint256"}],
+     "outputs":[{"name":"tokenManager","type":"address"},{"name":"quote","type":"address"},
+                {"name":"funds","type":"uint256"},{"name":"fee","type":"uint256"}]},
+]
+
+def _sim_amm_out(amount_in: float, reserve_in: float, reserve_out: float, fee_bps: int = _SIM_PCS_FEE_BPS) -> float:
+    """UniswapV2 getAmountOut — x*y=k, fee input pe"""
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0.0
+    _in = amount_in * (10000 - fee_bps)
+    return _in * reserve_out / (reserve_in * 10000 + _in)
+
+def _sim_pc_reserves(address: str):
+    """(bnb_reserve, token_reserve) whole units — monitor ka mirror pehle, warna live getReserves"""
+    with monitor_lock:
+        _p = monitored_positions.get(address)
+        _m = _p.get("_sim_res") if _p else None
+    if _m and time.time() - _m[2] <= _SIM_RES_MAX_AGE and _m[0] > 0 and _m[1] > 0:
+        _sim_stats["mirror_hits"] += 1
+        return _m[0], _m[1]
+    pair = _get_pair_for_token(address)
+    if not pair:
+        return 0.0, 0.0
+    pc = _qw3().eth.contract(address=Web3.to_checksum_address(pair), abi=PAIR_ABI_PRICE)
+    _w0 = _sim_token0.get(pair)
+    if _w0 is None:
+        _w0 = pc.functions.token0().call().lower() == WBNB.lower()
+        with _sim_lock:
+            _sim_token0[pair] = _w0
+    r = pc.functions.getReserves().call()
+    _sim_stats["live_fetches"] += 1
+    _bnb, _tok = (r[0], r[1]) if _w0 else (r[1], r[0])
+    return _bnb / 1e18, _tok / (10 ** _get_dec(address))
+
+def _sim_mirror_reserves(pos, address: str, reserves, token0: str):
+    """Price monitor ke getReserves poll se mirror — sim ko alag RPC nahi chahiye"""
+    _w0 = token0 == WBNB.lower()
+    _bnb, _tok = (reserves[0], reserves[1]) if _w0 else (reserves[1], reserves[0])
+    pos["_sim_res"] = (_bnb / 1e18, _tok / (10 ** _get_dec(address)), time.time())
+
+def _sim_fm_quote(address: str, kind: str, amount: float):
+    """FM helper tryBuy (amount=BNB) / trySell (amount=tokens) → (out, fee) whole units"""
+    _w3s  = _get_w3q() or _fm_get_w3()
+    _help = _w3s.eth.contract(address=Web3.to_checksum_address(_FM_HELPER_ADDR), abi=_FM_HELPER_SIM_ABI)
+    _ta   = Web3.to_checksum_address(address)
+    _bnb_p = market_cache.get("bnb_price", 0) or 0
+    if kind == "buy":
+        r = _help.functions.tryBuy(_ta, 0, int(amount * 1e18)).call()
+        _quote = str(r[1]).lower()
+        if _quote not in ("", "0x0000000000000000000000000000000000000000"):
+            if _bnb_p <= 0:
+                return 0.0, 0.0
+            r = _help.functions.tryBuy(_ta, 0, int(amount * _bnb_p * 1e18)).call()
+        return r[2] / 1e18, r[4] / 1e18
+    r = _help.functions.trySell(_ta, int(amount * 1e18)).call()
+    _out, _fee = max(0, r[2] - r[3]) / 1e18, r[3] / 1e18  # fee alag — conservative: net = funds - fee
+    if str(r[1]).lower() not in ("", "0x0000000000000000000000000000000000000000"):
+        if _bnb_p <= 0:
+            return 0.0, 0.0
+        _out, _fee = _out / _bnb_p, _fee / _bnb_p
+    return _out, _fee
+
+def _sim_record(side: str, fill: dict) -> dict:
+    _sim_stats["buys" if side == "buy" else "sells"] += 1
+    _sim_stats[fill["model"]] += 1
+    if fill["model"] == "exact":
+        with _sim_lock:
+            _sim_slips[side].append(fill["slip_pct"])
+    return fill
+
+def _sim_fill_buy(address: str, size_bnb: float, mid_price: float, buy_tax: float = 0.0, fm: bool = False) -> dict:
+    """Paper buy fill — price = BNB per token (tax ke baad jo tokens haath aaye)"""
+    try:
+        if fm:
+            _tok, _fee = _sim_fm_quote(address, "buy", size_bnb)
+            _venue = "fm_curve"
+        else:
+            _rb, _rt = _sim_pc_reserves(address)
+            _tok = _sim_amm_out(size_bnb, _rb, _rt) * (1 - buy_tax / 100.0)
+            if _rb > 0 and _rt > 0:
+                mid_price = _rb / _rt
+            _venue = "pcs_v2"
+        if _tok > 0 and mid_price > 0:
+            _px = size_bnb / _tok
+            return _sim_record("buy", {"model": "exact", "venue": _venue, "price": _px, "tokens": _tok,
+                                       "mid": mid_price, "slip_pct": round((_px - mid_price) / mid_price * 100, 3)})
+    except Exception as _se:
+        print(f"⚠️ [SIM] buy fill error {address[:10]}: {str(_se)[:60]}")
+    _px = mid_price * (1 + _SIM_FLAT_SLIP / 100)
+    return _sim_record("buy", {"model": "flat", "venue": "", "price": _px,
+                               "tokens": size_bnb / _px if _px > 0 else 0.0,
+                               "mid": mid_price, "slip_pct": _SIM_FLAT_SLIP})
+
+def _sim_fill_sell(address: str, tokens: float, mid_price: float, sell_tax: float = 0.0, fm: bool = False) -> dict:
+    """Paper sell fill — price = BNB mila / tokens bech"""
+    try:
+        if tokens > 0:
+            if fm:
+                _bnb, _fee = _sim_fm_quote(address, "sell", tokens)
+                _venue = "fm_curve"
+            else:
+                _rb, _rt = _sim_pc_reserves(address)
+                _bnb = _sim_amm_out(tokens * (1 - sell_tax / 100.0), _rt, _rb)
+                if _rb > 0 and _rt > 0:
+                    mid_price = _rb / _rt
+                _venue = "pcs_v2"
+            if _bnb > 0 and mid_price > 0:
+                _px = _bnb / tokens
+                return _sim_record("sell", {"model": "exact", "venue": _venue, "price": _px, "bnb": _bnb,
+                                            "mid": mid_price, "slip_pct": round((mid_price - _px) / mid_price * 100, 3)})
+    except Exception as _se:
+        print(f"⚠️ [SIM] sell fill error {address[:10]}: {str(_se)[:60]}")
+    _px = mid_price * (1 - _SIM_FLAT_SLIP / 100)
+    return _sim_record("sell", {"model": "flat", "venue": "", "price": _px, "bnb": tokens * _px,
+                                "mid": mid_price, "slip_pct": _SIM_FLAT_SLIP})
+
+def _sim_summary() -> dict:
+    with _sim_lock:
+        _b, _s = list(_sim_slips["buy"]), list(_sim_slips["sell"])
+    _n = _sim_stats["exact"] + _sim_stats["flat"]
+    return {
+        **_sim_stats,
+        "exact_pct":         round(_sim_stats["exact"] / _n * 100, 1) if _n else 0.0,
+        "avg_buy_slip_pct":  round(sum(_b) / len(_b), 3) if _b else 0.0,
+        "avg_sell_slip_pct": round(sum(_s) / len(_s), 3) if _s else 0.0,
+        "max_sell_slip_pct": round(max(_s), 3) if _s else 0.0,
+    }
+
 # ========== AUTO PAPER BUY ==========
 def _auto_paper_buy(address, token_name, score, total, checklist_result):
     if not AUTO_TRADE_ENABLED:
@@ -2924,10 +5723,6 @@ def _auto_paper_buy(address, token_name, score, total, checklist_result):
         print(f"❌ Auto-buy BLOCKED: price too tiny={entry_price:.2e} for {address[:10]}")
         return
 
-    entry_price = entry_price * 1.005  # 0.5% buy slippage
-    if entry_price <= 0:
-        print(f"❌ BLOCKED: zero price after slippage for {address[:10]}")
-        return
     # ✅ Final DataGuard check — token price + BNB price both verified
     _ok, _msg = DataGuard.trade_allowed(address, entry_price)
     if not _ok:
@@ -2943,6 +5738,16 @@ def _auto_paper_buy(address, token_name, score, total, checklist_result):
     _buy_tax  = float((checklist_result.get("dex_data") or {}).get("buy_tax",  0) or 0)
     _sell_tax = float((checklist_result.get("dex_data") or {}).get("sell_tax", 0) or 0)
 
+    # FIX v125: flat 0.5% ki jagah exact AMM fill — size ka price impact + buy tax
+    _fill = {"model": "", "slip_pct": 0.0}
+    if TRADE_MODE != "real":
+        _fill = _sim_fill_buy(address, size_bnb, entry_price, _buy_tax)
+        entry_price = _fill["price"]
+        print(f"🧮 [SIM] Paper buy fill: {_fill['model']} {_fill['venue']} slip={_fill['slip_pct']:.2f}% @ {entry_price:.3e}")
+        if entry_price <= 0:
+            print(f"❌ BLOCKED: zero price after slippage for {address[:10]}")
+            return
+
     if TRADE_MODE == "real":
         _real_result = real_buy_token(address, size_bnb, _buy_tax, _sell_tax)
         if not _real_result.get("success"):
@@ -2973,22 +5778,25 @@ def _auto_paper_buy(address, token_name, score, total, checklist_result):
         "assumption":  f"Score {score}/{total} SAFE, signals: {', '.join(_buy_signals[:3]) if _buy_signals else 'checklist only'}",
         "ts":          datetime.utcnow().isoformat()
 }
-    auto_trade_stats["running_positions"][address] = {
-        "token":          token_name or address[:10],
-        "entry":          entry_price,
-        "size_bnb":       size_bnb,
-        "orig_size_bnb":  size_bnb,
-        "bought_usd":     round(size_bnb * _bnb_at_buy, 2),
-        "sl_pct":         CHECKLIST_SETTINGS.get("sl_new", 8.0),
-        "trail_pct":      20.0,
-        "tp_sold":        0.0,
-        "banked_pnl_bnb": 0.0,
-        "bought_at":      datetime.utcnow().isoformat(),
-        "mode":           TRADE_MODE,
-        "buy_reasoning":  _buy_reasoning,
-        "buy_tax":        _buy_tax,   # FIX2: sell slippage ke liye zaroori
-        "sell_tax":       _sell_tax,  # FIX2: sell slippage ke liye zaroori
-    }
+    auto_trade_stats["running_positions"][address] = _new_position(
+        address,
+        token          = token_name or address[:10],
+        entry          = entry_price,
+        size_bnb       = size_bnb,
+        orig_size_bnb  = size_bnb,
+        bought_usd     = round(size_bnb * _bnb_at_buy, 2),
+        sl_pct         = CHECKLIST_SETTINGS.get("sl_new", 8.0),
+        trail_pct      = 20.0,
+        tp_sold        = 0.0,
+        banked_pnl_bnb = 0.0,
+        bought_at      = datetime.utcnow().isoformat(),
+        mode           = TRADE_MODE,
+        buy_reasoning  = _buy_reasoning,
+        buy_tax        = _buy_tax,   # FIX2: sell slippage ke liye zaroori
+        sell_tax       = _sell_tax,  # FIX2: sell slippage ke liye zaroori
+        fill_model     = _fill["model"],     # FIX v125
+        sim_buy_slip_pct = _fill["slip_pct"],
+    )
     auto_trade_stats["total_auto_buys"] += 1
     auto_trade_stats["last_action"] = f"BUY {token_name or address[:10]}"
     _push_notif("success", f"🟢 Buy Executed", f"{token_name or address[:10]} @ {entry_price:.2e} BNB | Size: {size_bnb:.4f} BNB", token_name or address[:10], address)
@@ -3004,11 +5812,13 @@ def _auto_paper_buy(address, token_name, score, total, checklist_result):
     if len(sess["positions"]) > 20:
         sess["positions"] = sess["positions"][-20:]  # ✅ memory leak fix
     _persist_positions()  # ✅ FIX: full data save with tp_sold, sl_pct, bought_usd
+    _save_session_to_db(AUTO_SESSION_ID)  # FIX v130: buy stats — positions ab alag rows mein
     _scanner_stats["pc_bought"] += 1
     print(f"AUTO BUY: {address[:10]} @ {entry_price:.10f} size={size_bnb:.4f}")
 
 # ========== AUTO PAPER SELL ==========  FIX 3: All variable names fixed
-def _auto_paper_sell(address, reason, sell_pct=100.0):
+def _auto_paper_sell(address, reason, sell_pct=100.0, tp_credit=None):
+    """Sell execute karo — seedha call mat karo, _queue_sell use karo (FIX v118)"""
     if address not in auto_trade_stats["running_positions"]:
         return
 
@@ -3033,6 +5843,7 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
     if entry <= 0:
         return
 
+    _sell_fill_model, _sell_slip_pct = "", 0.0
     if current <= 0:
         current = 0
         pnl_pct    = -100.0
@@ -3040,9 +5851,19 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
         pnl_bnb    = -sell_size
         return_bnb = 0.0
     else:
-        current = current * 0.995
-        pnl_pct    = ((current - entry) / entry) * 100
         sell_size  = size * (sell_pct / 100.0)
+        if TRADE_MODE != "real":
+            # FIX v125: exact AMM / curve fill — tokens = sell_size / entry (entry = effective fill price)
+            _sfill = _sim_fill_sell(address, sell_size / entry, current, float(pos.get("sell_tax", 0) or 0),
+                                    fm="FM_BC" in (pos.get("source", "") or ""))
+            current = _sfill["price"]
+            _sell_fill_model = _sfill["model"]
+            _sell_slip_pct   = _sfill["slip_pct"]
+            pos["sim_sell_slip_pct"] = round(max(pos.get("sim_sell_slip_pct", 0.0) or 0.0, _sfill["slip_pct"]), 3)
+            print(f"🧮 [SIM] Paper sell fill: {_sfill['model']} {_sfill['venue']} slip={_sfill['slip_pct']:.2f}% @ {current:.3e}")
+        else:
+            current = current * 0.995
+        pnl_pct    = ((current - entry) / entry) * 100
         pnl_bnb    = sell_size * (pnl_pct / 100.0)
         return_bnb = sell_size * (1 + pnl_pct / 100.0)
 
@@ -3058,9 +5879,11 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
         _source     = pos.get("source", "") or pos.get("buy_reasoning", {}).get("source", "")
 
         # FIX speed: reason-based gas — emergency sells 3x, normal exits 1.2x
+        # FIX v122: multiplier → gas oracle urgency tier (emergency ≥3x node / p99, fast ≥1.2x / p75)
         _emergency = any(k in reason for k in ("SL", "Rug", "Dump", "PriceDrop", "FastDump", "EmergSL", "LiqDrop", "VolRug"))
-        _gas_mult  = 3.0 if _emergency else 1.2
-        print(f"⛽ Gas mult: {_gas_mult}x ({'emergency' if _emergency else 'normal'}) | {reason[:30]}")
+        _urgency   = "emergency" if _emergency else "fast"
+        _gas_mult  = 1.0
+        print(f"⛽ Gas tier: {_urgency} ({_gas_price(_urgency)/1e9:.2f} gwei) | {reason[:30]}")
 
         if "FM_BC" in _source:
             _w3_sell   = _get_w3q() or _fm_get_w3()
@@ -3069,7 +5892,7 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
             # NOTE: _fm_real_sell_bc internally calls getTokenInfo for version+manager — outer call was duplicate +300ms waste
 
             if not _graduated:
-                _real_sell = _fm_real_sell_bc(address, sell_pct, _fm_factory, _w3_sell, gas_mult=_gas_mult)
+                _real_sell = _fm_real_sell_bc(address, sell_pct, _fm_factory, _w3_sell, gas_mult=_gas_mult, urgency=_urgency)
                 if _real_sell.get("success"):
                     _rp_v97 = auto_trade_stats.get("running_positions", {})
                     if address in _rp_v97:
@@ -3083,9 +5906,9 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
                         f"{token} sell failed: {_fail_err_v97} — position still open", token, address)
                     return
             else:
-                _real_sell = real_sell_token(address, sell_pct, _buy_tax_s, _sell_tax_s, gas_mult=_gas_mult)
+                _real_sell = real_sell_token(address, sell_pct, _buy_tax_s, _sell_tax_s, gas_mult=_gas_mult, urgency=_urgency)
         else:
-            _real_sell = real_sell_token(address, sell_pct, _buy_tax_s, _sell_tax_s, gas_mult=_gas_mult)
+            _real_sell = real_sell_token(address, sell_pct, _buy_tax_s, _sell_tax_s, gas_mult=_gas_mult, urgency=_urgency)
         if _real_sell.get("success"):
             real_sell_success = True
             real_sell_result = _real_sell
@@ -3096,8 +5919,8 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
                        f"Real sell failed: {_fail_err} — position still open", token, address)
             # FIX v24: Failed sell bhi history mein save karo
             try:
-                if not isinstance(auto_trade_stats.get("trade_history"), list):
-                    auto_trade_stats["trade_history"] = []
+                if not isinstance(auto_trade_stats.get("trade_history"), TradeHistory):
+                    _th_set(auto_trade_stats.get("trade_history"))
                 _orig_sz_f  = pos.get("orig_size_bnb", size)
                 _buy_rsn_f  = pos.get("buy_reasoning", {}) or {}
                 auto_trade_stats["trade_history"].append({
@@ -3136,8 +5959,8 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
         pos["banked_pnl_bnb"] = round(_banked + pnl_bnb, 6)
         
         if sell_pct >= 100.0:
-            if not isinstance(auto_trade_stats.get("trade_history"), list):
-                auto_trade_stats["trade_history"] = []
+            if not isinstance(auto_trade_stats.get("trade_history"), TradeHistory):
+                _th_set(auto_trade_stats.get("trade_history"))
             _bnb_at_sell = market_cache.get("bnb_price", 0)
             _saved_bought_usd = auto_trade_stats["running_positions"].get(address, {}).get("bought_usd", 0)
             _orig_sz = pos.get("orig_size_bnb", size)
@@ -3203,10 +6026,14 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
                 "mc_usd_entry":        pos.get("mc_usd_entry", 0.0),
                 "liquidity_bnb_entry": pos.get("liquidity_bnb_entry", 0.0),
                 "entry_type":          pos.get("entry_type", ""),  # FIX v68: direct/waited
+                # FIX v125: paper fill model + simulated slippage
+                "fill_model":          ("exact" if (pos.get("fill_model"), _sell_fill_model) == ("exact", "exact") else "flat") if _sell_fill_model else "",
+                "sim_buy_slip_pct":    pos.get("sim_buy_slip_pct", 0.0),
+                "sim_sell_slip_pct":   pos.get("sim_sell_slip_pct", _sell_slip_pct),
 })
         if len(auto_trade_stats["trade_history"]) > 500:
             # FIX v50: in-memory 500 kaafi — Supabase mein full history hai
-            auto_trade_stats["trade_history"] = auto_trade_stats["trade_history"][-500:]
+            auto_trade_stats["trade_history"].trim(500)
         
         if sell_pct >= 100.0:
             try:
@@ -3303,7 +6130,7 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
             if not isinstance(sess.get("positions"), list):
                 sess["positions"] = []
             pos["size_bnb"]       = size * (1 - sell_pct / 100.0)
-            pos["tp_sold"]        = pos.get("tp_sold", 0) + sell_pct
+            pos["tp_sold"]        = pos.get("tp_sold", 0) + (sell_pct if tp_credit is None else tp_credit)
             pos["banked_pnl_bnb"] = round(pos.get("banked_pnl_bnb", 0.0) + pnl_bnb, 6)
             _bnb_at_tp = market_cache.get("bnb_price", 0) or market_cache.get("last_bnb_price", 660)
             _gas_bnb   = DataGuard.get_real_gas_bnb()
@@ -3346,7 +6173,7 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
                     _persist_positions()
         
         print(f"AUTO SELL {sell_pct:.0f}%: {address[:10]} PnL:{pnl_pct:+.1f}% [{reason}]")
-        threading.Thread(target=_save_session_to_db, args=(AUTO_SESSION_ID,), daemon=True).start()
+        _save_session_to_db(AUTO_SESSION_ID)
         
         if sell_pct >= 100:
             _unregister_position_pair(address)
@@ -3361,6 +6188,158 @@ def _auto_paper_sell(address, reason, sell_pct=100.0):
                 daemon=True
             ).start()
 
+# ========== PRIORITY SELL QUEUE ==========
+# FIX v118: har caller apne thread pe _auto_paper_sell inline chalata tha — rug exit
+# slow TP sell ya sequential "close all" ke peeche atak jaata tha.
+# Ab sab sells ek priority heap mein: Rug/LP burn > SL > TP > Manual.
+# Fixed worker pool, token pe dedup, partial sells coalesce. Worker #0 sirf
+# Rug/SL leta hai — emergency exit ke liye hamesha ek worker free.
+
+_SELL_PRI_RUG    = 0
+_SELL_PRI_SL     = 1
+_SELL_PRI_TP     = 2
+_SELL_PRI_MANUAL = 3
+_SELL_PRI_NAMES  = {0: "rug", 1: "sl", 2: "tp", 3: "manual"}
+_SELL_WORKERS    = 4
+
+_sell_heap:     list = []    # [(pri, seq, addr_lower)] — stale entries seq se skip
+_sell_pending:  dict = {}    # {addr_lower: {addr, reason, pct, credit, pri, ts, seq}}
+_sell_inflight: dict = {}    # {addr_lower: pct} — worker abhi execute kar raha hai
+_sell_cond    = threading.Condition()
+_sell_seq     = [0]
+_sell_started = [False]
+_sell_wait_ms: deque = deque(maxlen=500)
+_sell_stats:   dict  = {"queued": 0, "coalesced": 0, "dropped": 0, "done": 0, "errors": 0,
+                        "by_pri": {"rug": 0, "sl": 0, "tp": 0, "manual": 0}}
+
+def _sell_priority(reason: str) -> int:
+    _r = reason.lower()
+    if any(k in _r for k in ("rug", "lp burn", "liqdrop", "price=0")):
+        return _SELL_PRI_RUG
+    if "manual" in _r:
+        return _SELL_PRI_MANUAL
+    if _r.startswith("tp"):
+        return _SELL_PRI_TP
+    return _SELL_PRI_SL  # PriceDrop, FastDump, EntryGuard, MomDead, HardSL, EmergSL ...
+
+def _queue_sell(address: str, reason: str, sell_pct: float = 100.0, priority: int = None) -> bool:
+    """Sell decision queue mein daalo — execution worker pool karega. False = duplicate drop"""
+    if not address:
+        return False
+    _ensure_sell_workers()
+    _pm_record_decision(reason)  # FIX v115: decision yahi hai — latency isi waqt
+    key = address.lower()
+    pri = _sell_priority(reason) if priority is None else priority
+    with _sell_cond:
+        _inf = _sell_inflight.get(key)
+        if _inf is not None and (sell_pct < 100.0 or _inf >= 100.0):
+            # same trigger dobara aaya jab tak tp_sold/position update nahi hui — drop
+            _sell_stats["dropped"] += 1
+            return False
+        _cur = _sell_pending.get(key)
+        if _cur is None:
+            _cur = {"addr": address, "reason": reason, "pct": float(sell_pct),
+                    "credit": float(sell_pct), "pri": pri, "ts": time.time()}
+            _sell_pending[key] = _cur
+            _sell_stats["queued"] += 1
+            _sell_stats["by_pri"][_SELL_PRI_NAMES[pri]] += 1
+        elif sell_pct >= 100.0:
+            # full exit sab partials ko supersede karta hai
+            if _cur["pct"] < 100.0 or pri < _cur["pri"]:
+                _cur["reason"] = reason
+            _cur["pct"] = _cur["credit"] = 100.0
+            _cur["pri"] = min(_cur["pri"], pri)
+            _sell_stats["coalesced"] += 1
+        elif _cur["pct"] >= 100.0 or reason in _cur["reason"]:
+            _sell_stats["dropped"] += 1
+            return False
+        else:
+            # do partials (e.g. TP1 + TP2) — remaining pe compound, tp_sold credit add
+            _cur["pct"]    = round(100.0 * (1 - (1 - _cur["pct"] / 100.0) * (1 - sell_pct / 100.0)), 4)
+            _cur["credit"] = _cur["credit"] + sell_pct
+            _cur["reason"] = f"{_cur['reason']} + {reason}"
+            _cur["pri"]    = min(_cur["pri"], pri)
+            _sell_stats["coalesced"] += 1
+        _sell_seq[0] += 1
+        _cur["seq"] = _sell_seq[0]
+        _heapq.heappush(_sell_heap, (_cur["pri"], _cur["seq"], key))
+        _sell_cond.notify_all()
+    return True
+
+def _sell_exit_queued(address: str) -> bool:
+    """Full exit pending/in-flight hai? Manager is position ko dobara evaluate na kare"""
+    key = address.lower()
+    with _sell_cond:
+        _p = _sell_pending.get(key)
+        return (_p is not None and _p["pct"] >= 100.0) or _sell_inflight.get(key, 0) >= 100.0
+
+def _sell_take(emergency_only: bool):
+    """Heap se next job — _sell_cond ke andar call karo"""
+    _deferred = []
+    job = None
+    while _sell_heap:
+        pri, seq, key = _heapq.heappop(_sell_heap)
+        _p = _sell_pending.get(key)
+        if not _p or _p["seq"] != seq:
+            continue  # stale — coalesce ke baad naya entry push hua tha
+        if emergency_only and pri > _SELL_PRI_SL:
+            _deferred.append((pri, seq, key))
+            break
+        if key in _sell_inflight:
+            _deferred.append((pri, seq, key))  # same token ka sell chal raha — baad mein
+            continue
+        job = _sell_pending.pop(key)
+        job["key"] = key
+        _sell_inflight[key] = job["pct"]
+        break
+    for _d in _deferred:
+        _heapq.heappush(_sell_heap, _d)
+    return job
+
+def _sell_worker(idx: int):
+    _emergency_only = idx == 0
+    print(f"🧵 Sell worker #{idx} started{' (rug/SL only)' if _emergency_only else ''}")
+    while True:
+        with _sell_cond:
+            job = _sell_take(_emergency_only)
+            while job is None:
+                _sell_cond.wait(timeout=1.0)
+                job = _sell_take(_emergency_only)
+        _wait = round((time.time() - job["ts"]) * 1000, 1)
+        _sell_wait_ms.append(_wait)
+        try:
+            _auto_paper_sell(job["addr"], job["reason"], job["pct"], tp_credit=job["credit"])
+            _sell_stats["done"] += 1
+        except Exception as e:
+            _sell_stats["errors"] += 1
+            print(f"⚠️ Sell worker #{idx} error {job['addr'][:10]}: {e}")
+        finally:
+            with _sell_cond:
+                _sell_inflight.pop(job["key"], None)
+                _sell_cond.notify_all()
+
+def _ensure_sell_workers():
+    if _sell_started[0]:
+        return
+    with _sell_cond:
+        if _sell_started[0]:
+            return
+        _sell_started[0] = True
+    for _i in range(_SELL_WORKERS):
+        threading.Thread(target=_sell_worker, args=(_i,), daemon=True).start()
+
+def _sell_queue_summary() -> dict:
+    with _sell_cond:
+        _st = dict(_sell_stats)
+        _st["by_pri"]   = dict(_sell_stats["by_pri"])
+        _st["depth"]    = len(_sell_pending)
+        _st["inflight"] = len(_sell_inflight)
+        _w = sorted(_sell_wait_ms)
+    if _w:
+        _st["wait_p50_ms"] = _w[len(_w) // 2]
+        _st["wait_max_ms"] = _w[-1]
+    return _st
+
 def fetch_pancakeswap_data():
     try:
         r = requests.get("https://api.pancakeswap.info/api/v2/pairs", timeout=12)
@@ -3391,35 +6370,32 @@ _brain_loaded_from_db = False  # startup pe Supabase se load hua?
 
 def _save_brain_to_db():
     import time as _t
-    if not supabase: return
     if _t.time() - _brain_save_cache["last_save"] < 20: return
     _brain_save_cache["last_save"] = _t.time()
-    try:
-        with _smart_wallets_lock:
-            _sw_snapshot = dict(_smart_wallets)
-        supabase.table("memory").upsert({
-            "session_id": "MRBLACK_BRAIN",
-            "role":       "system",
-            "content":    "",
-            "history":    json.dumps([]),
-            "pattern_database": {"best_patterns": brain["trading"]["best_patterns"][-50:], "avoid_patterns": brain["trading"]["avoid_patterns"][-50:]},
-            "updated_at": datetime.utcnow().isoformat(),
-            "positions":  json.dumps({
-                "brain_trading":  {k: v[-30:] if isinstance(v, list) else v for k, v in brain["trading"].items()},
-                "brain_airdrop":  brain["airdrop"],
-                "brain_coding":   brain["coding"],
-                "cycles":         brain["total_learning_cycles"],
-                "total_tokens_discovered_ever": brain.get("total_tokens_discovered_ever", 0),
-                "smart_wallets":  _sw_snapshot,
-                "fm_filters":     _fm_filters,
-                "rug_dna":        _rug_dna[-10000:],
-                "dev_blacklist":  dict(_dev_blacklist),
-                "scanner_stats":  {k: v for k, v in _scanner_stats.items() if not k.startswith("_") and k != "history"}
+    _wb_upsert("memory", "MRBLACK_BRAIN", fn=_brain_row)  # FIX v127: write-behind
+    _coll_snapshot_dirty()  # FIX v132: collections alag snapshot — sirf badle hue
+    print(f"🧠 Brain save queued (cycle #{brain['total_learning_cycles']})")
+
+def _brain_row() -> dict:
+    """MRBLACK_BRAIN row — flush ke waqt build (latest brain state)
+    FIX v132: smart_wallets / rug_dna / dev_blacklist ab COLLECTION STORE mein"""
+    return {
+        "session_id": "MRBLACK_BRAIN",
+        "role":       "system",
+        "content":    "",
+        "history":    json.dumps([]),
+        "pattern_database": {"best_patterns": brain["trading"]["best_patterns"][-50:], "avoid_patterns": brain["trading"]["avoid_patterns"][-50:]},
+        "updated_at": datetime.utcnow().isoformat(),
+        "positions":  json.dumps({
+            "brain_trading":  {k: v[-30:] if isinstance(v, list) else v for k, v in brain["trading"].items()},
+            "brain_airdrop":  brain["airdrop"],
+            "brain_coding":   brain["coding"],
+            "cycles":         brain["total_learning_cycles"],
+            "total_tokens_discovered_ever": brain.get("total_tokens_discovered_ever", 0),
+            "fm_filters":     _fm_filters,
+            "scanner_stats":  {k: v for k, v in _scanner_stats.items() if not k.startswith("_") and k != "history"}
 })
-        }, on_conflict="session_id").execute()
-        print(f"🧠 Brain saved (cycle #{brain['total_learning_cycles']})")
-    except Exception as e:
-        print(f"⚠️ Brain save error: {e}")
+    }
 
 def _ensure_brain_structure():
     # Always ensure brain["trading"] is a dict, never string
@@ -3437,8 +6413,8 @@ def _ensure_brain_structure():
         if not isinstance(brain["trading"].get(key), list):
             brain["trading"][key] = []
     # Always ensure trade_history is a list
-    if not isinstance(auto_trade_stats.get("trade_history"), list):
-        auto_trade_stats["trade_history"] = []
+    if not isinstance(auto_trade_stats.get("trade_history"), TradeHistory):
+        _th_set(auto_trade_stats.get("trade_history"))
     for key in ["best_patterns","avoid_patterns","token_blacklist","token_whitelist","strategy_notes","market_insights"]:
         if not isinstance(brain["trading"].get(key), list):
             brain["trading"][key] = []
@@ -3447,9 +6423,9 @@ def _ensure_brain_structure():
             brain["airdrop"][key] = []
 
 def _load_brain_from_db():
-    if not supabase: return
+    # FIX v129: local store pehle — supabase na ho to bhi load
     try:
-        res = supabase.table("memory").select("*").eq("session_id", "MRBLACK_BRAIN").execute()
+        res = _mem_fetch("MRBLACK_BRAIN")
         if res.data:
             row = res.data[0]
             try:
@@ -3470,24 +6446,17 @@ def _load_brain_from_db():
             if stored.get("brain_coding"):  brain["coding"].update(stored["brain_coding"])
             brain["total_learning_cycles"] = stored.get("cycles", 0)
             brain["total_tokens_discovered_ever"] = stored.get("total_tokens_discovered_ever", 0)
-            # Load smart wallets
+            # FIX v132: smart wallets / rug DNA / dev blacklist — purane blob mein hon to sirf migration
+            # (collection store khaali ho tab), warna lazy load apne snapshot se
             _sw = stored.get("smart_wallets", {})
             if isinstance(_sw, dict) and _sw:
-                with _smart_wallets_lock:
-                    _smart_wallets.update(_sw)
-                print(f"🐋 Smart wallets loaded: {len(_sw)}")
-            # Load rug DNA — clear first to avoid duplicates on reload
+                _coll_migrate_legacy("smart_wallets", _sw)
             _rd = stored.get("rug_dna", [])
             if isinstance(_rd, list) and _rd:
-                _rug_dna.clear()
-                _rug_dna.extend(_rd)
-                print(f"☠️ Rug DNA loaded: {len(_rd)}")
-            # Load dev blacklist — permanent
+                _coll_migrate_legacy("rug_dna", {_rug_dna_key(d): d for d in _rd if isinstance(d, dict)})
             _db = stored.get("dev_blacklist", {})
             if isinstance(_db, dict) and _db:
-                with _dev_blacklist_lock:
-                    _dev_blacklist.update(_db)
-                print(f"🚫 Dev blacklist loaded: {len(_db)} devs")
+                _coll_migrate_legacy("dev_blacklist", _db)
             # Load fm_filters — restart pe persist
             _ff = stored.get("fm_filters", {})
             if isinstance(_ff, dict) and _ff:
@@ -3768,48 +6737,6 @@ def _learn_from_new_pairs():
     except Exception as e:
         print(f"_learn_from_new_pairs error: {e}")
 
-def _fm_bc_fast_price_loop():
-    """FM BC tokens ke liye dedicated 0.5s price update loop — fast dump detection"""
-    import time as _t
-    print("⚡ FM BC Fast Price Loop started (0.5s)")
-    while True:
-        try:
-            with monitor_lock:
-                _snap = list(monitored_positions.items())
-            for _addr, _mon in _snap:
-                try:
-                    _pos = auto_trade_stats.get("running_positions", {}).get(_addr, {})
-                    _src = _pos.get("source", "") or _pos.get("buy_reasoning", {}).get("source", "")
-                    if "FM_BC" not in _src:
-                        continue
-                    _w3f = _fm_get_w3()
-                    if not _w3f:
-                        continue
-                    _info = _fm_get_token_info(_addr, _w3f)
-                    if _info and _info.get("lastPrice", 0) > 0:
-                        _bnb_p = market_cache.get("bnb_price", 0)
-                        _quote = str(_info.get("quote", "")).lower()
-                        if "usdt" in _quote or "busd" in _quote or "usd" in _quote:
-                            _price = (_info["lastPrice"] / 1e18) / _bnb_p if _bnb_p > 0 else 0
-                        else:
-                            _price = _info["lastPrice"] / 1e18
-                        if _price > 0:
-                            with monitor_lock:
-                                if _addr in monitored_positions:
-                                    monitored_positions[_addr]["current"] = _price
-                                    monitored_positions[_addr]["_price_refreshed"] = True
-                                    if _price > monitored_positions[_addr].get("high", 0):
-                                        monitored_positions[_addr]["high"] = _price
-                                        _rp = auto_trade_stats["running_positions"].get(_addr)
-                                        if _rp:
-                                            _rp["ath_price"] = _price
-                except Exception:
-                    pass
-        except Exception:
-            pass
-        _t.sleep(0.5)
-
-
 def continuous_learning():
     print("🧠 Learning Engine started!")
     _load_brain_from_db()
@@ -3817,7 +6744,6 @@ def continuous_learning():
     cycle = brain.get("total_learning_cycles", 0)
     last_fast = last_deep = last_hour = last_bnb_check = 0
     print(f"📚 Learning from cycle #{cycle}")
-    _last_price_update = 0  # FIX4: price update tracker
 
     while True:
         try:
@@ -3825,63 +6751,8 @@ def continuous_learning():
             brain["total_learning_cycles"] = cycle
             now = time.time()
 
-            # ══ FIX4: monitored_positions price update — har 3s ══
-            # Root cause: WSS swap events se price update nahi hota
-            # Yahan har 3s pe get_token_price_bnb se fresh price lo
-            if now - _last_price_update >= 1:
-                _last_price_update = now
-                try:
-                    with monitor_lock:
-                        _mon_snap = list(monitored_positions.items())
-                    for _addr, _mon in _mon_snap:
-                        try:
-                            # FM BC tokens — getTokenInfo se lastPrice
-                            _pos_data = auto_trade_stats.get("running_positions", {}).get(_addr, {})
-                            _src = _pos_data.get("source", "") or _pos_data.get("buy_reasoning", {}).get("source", "")
-                            if "FM_BC" in _src:
-                                try:
-                                    # FIX v67: Chainstack (paid) use karo monitor pe — free RPC stale
-                                    # data deta tha jisse bot fake loss soch ke premature sell karta tha
-                                    _w3f = _get_w3q() or _fm_get_w3()
-                                    if _w3f:
-                                        _info = _fm_get_token_info(_addr, _w3f)
-                                        if _info and _info.get("lastPrice", 0) > 0:
-                                            _bnb_p = market_cache.get("bnb_price", 0)
-                                            _quote = str(_info.get("quote", "")).lower()
-                                            if "usdt" in _quote or "busd" in _quote or "usd" in _quote:
-                                                _price = (_info["lastPrice"] / 1e18) / _bnb_p if _bnb_p > 0 else 0
-                                            else:
-                                                _price = _info["lastPrice"] / 1e18
-                                            if _price > 0:
-                                                with monitor_lock:
-                                                    if _addr in monitored_positions:
-                                                        monitored_positions[_addr]["current"] = _price
-                                                        monitored_positions[_addr]["_price_refreshed"] = True
-                                                        if _price > monitored_positions[_addr].get("high", 0):
-                                                            monitored_positions[_addr]["high"] = _price
-                                                            _rp = auto_trade_stats["running_positions"].get(_addr)
-                                                            if _rp:
-                                                                _rp["ath_price"] = _price
-                                except Exception:
-                                    pass
-                            else:
-                                # PancakeSwap tokens — on-chain price
-                                _price = get_token_price_bnb(_addr)
-                                if _price > 0:
-                                    with monitor_lock:
-                                        if _addr in monitored_positions:
-                                            monitored_positions[_addr]["current"] = _price
-                                            monitored_positions[_addr]["_price_refreshed"] = True
-                                            if _price > monitored_positions[_addr].get("high", 0):
-                                                monitored_positions[_addr]["high"] = _price
-                                                _rp2 = auto_trade_stats["running_positions"].get(_addr)
-                                                if _rp2:
-                                                    _rp2["ath_price"] = _price
-                        except Exception:
-                            pass
-                except Exception as _pe:
-                    pass
-            # ══ FIX4 END ══
+            # FIX v117: FIX4 price update hataya — price_monitor_loop ka adaptive
+            # scheduler har position ko risk ke hisaab se refresh karta hai (RPC budget ke andar)
 
             # BNB price backup — har 30s check karo (dedicated loop se alag)
             if now - last_bnb_check >= 30:
@@ -3908,15 +6779,12 @@ def continuous_learning():
                 last_fast = now
                 _learn_trading_patterns()
                 _learn_from_new_pairs()
-                try:
-                    if supabase:
-                        supabase.table("memory").upsert({
-                            "session_id": "MRBLACK_CYCLE",
-                            "role":       "system",
-                            "content":    str(cycle),
-                            "updated_at": datetime.utcnow().isoformat()
-                        }, on_conflict="session_id").execute()
-                except Exception: pass
+                _wb_upsert("memory", "MRBLACK_CYCLE", row={  # FIX v127: write-behind
+                    "session_id": "MRBLACK_CYCLE",
+                    "role":       "system",
+                    "content":    str(cycle),
+                    "updated_at": datetime.utcnow().isoformat()
+                })
 
             # Deep LLM + brain save — har 10 min
             if now - last_deep >= 600:
@@ -3986,478 +6854,656 @@ def feedback_validation_loop():
         gc.collect()
         time.sleep(1800)  # MEM FIX: 3600→1800
 
-_pair_to_token: dict = {}  # {pair_lower: {token, pair, ts}}
+_pair_to_token: dict = {}  # {pair_lower: {token, pair, ts}}
+
+# ========== EVENT-DRIVEN POSITION MANAGER ==========
+# FIX v115: 0.05s spin loop hataya — har position sirf tab evaluate hoti hai jab
+# uska price/reserves/swap data badle (_pm_signal). Slow safety sweep time-based
+# exits (MomStall, EmergSL hold, zero-price count, reserves) ke liye.
+# CPU position count ke saath flat rehta hai.
+_PM_SAFETY_SEC = 1.0
+# FIX v140: debounce "readings" (_vwc / _egc counters, _fm_price_hist / _eg_price_hist)
+# pehle 0.05s spin ke har tick pe badhte the, v115 ke baad har event pe — threshold ka
+# matlab event rate pe depend karta tha. Ab ek reading = fixed _PM_READING_SEC, to
+# "N readings" = N seconds: FM MomDead 6s, PC MomDead 3s (+20s hold), EntryGuard 2s,
+# FMPriceDead 2s; FM price hist 6s window, EntryGuard hist 5s.
+_PM_READING_SEC = 1.0
+_pm_pending: dict = {}                  # {addr_lower: first_event_ts}
+_pm_cond   = threading.Condition()
+_pm_tls    = threading.local()          # evt_ts — decision latency ke liye
+_pm_latency_ms: deque = deque(maxlen=500)
+_pm_stats: dict = {"events": 0, "evals": 0, "sweeps": 0, "decisions": 0, "by_kind": {}}
+
+def _pm_signal(addr: str, kind: str = "price"):
+    """Position pe naya price/reserve/swap event aaya — manager ko jagao"""
+    if not addr:
+        return
+    key = addr.lower()
+    with _pm_cond:
+        if key not in _pm_pending:
+            _pm_pending[key] = time.time()  # pehle event ka ts — latency isi se
+        _pm_stats["events"] += 1
+        _pm_stats["by_kind"][kind] = _pm_stats["by_kind"].get(kind, 0) + 1
+        _pm_cond.notify()
+
+def _pm_record_decision(reason: str):
+    """_auto_paper_sell se call hota hai — event → sell decision latency record karo"""
+    _evt_ts = getattr(_pm_tls, "evt_ts", 0)
+    if not _evt_ts:
+        return
+    _pm_tls.evt_ts = 0  # ek event = ek decision
+    _ms = round((time.time() - _evt_ts) * 1000, 2)
+    with _pm_cond:
+        _pm_latency_ms.append(_ms)
+        _pm_stats["decisions"] += 1
+    print(f"⏱️ [PM] decision +{_ms}ms after event | {reason[:30]}")
+
+def _pm_latency_summary() -> dict:
+    with _pm_cond:
+        _l  = sorted(_pm_latency_ms)
+        _st = dict(_pm_stats)
+        _st["by_kind"] = dict(_pm_stats["by_kind"])
+        _st["pending"] = len(_pm_pending)
+    if _l:
+        _st["latency_p50_ms"] = _l[len(_l) // 2]
+        _st["latency_p95_ms"] = _l[min(len(_l) - 1, int(len(_l) * 0.95))]
+        _st["latency_max_ms"] = _l[-1]
+    return _st
+
+def _pm_lookup(rp: dict, key: str):
+    """Pending key lowercase hai — running_positions ki original key dhundo"""
+    if key in rp:
+        return key
+    for k in rp:
+        if k.lower() == key:
+            return k
+    return None
+
+
+def _pm_evaluate(addr, pos):
+    """Ek position ka exit evaluation — event ya safety sweep pe chalta hai"""
+    if _sell_exit_queued(addr):
+        return  # full exit already queue mein — dobara evaluate bekaar
+    try:
+        with monitor_lock:
+            mon = monitored_positions.get(addr, {})
+        current = mon.get("current", 0)
+        _pos_data = auto_trade_stats["running_positions"].get(addr, pos)
+        entry   = _pos_data.get("entry", 0)
+        high    = mon.get("high", entry)
+        # ── FIX v36 Bug1: ATH race condition — price_monitor ka wait mat karo ──
+        # Fast dump coins mein monitor pehla update karne se pehle HardSL fire
+        # hota tha. Same iteration mein high sync karo.
+        if current > 0 and current > high:
+            high = current
+            with monitor_lock:
+                if addr in monitored_positions:
+                    monitored_positions[addr]["high"] = current
+            _rp3 = auto_trade_stats["running_positions"].get(addr)
+            if _rp3:
+                _rp3["ath_price"] = current
+        tp_sold = _pos_data.get("tp_sold", 0.0)
+        sl_pct  = _pos_data.get("sl_pct", 15.0)
+        if entry <= 0:
+            return
+
+        if current <= 0:
+            _zero_count = _pos_data.get("_zero_price_count", 0) + 1
+            _pos_data["_zero_price_count"] = _zero_count
+            print(f"⚠️ Price=0: {addr[:10]} count={_zero_count}/3")
+            if _zero_count >= 3:
+                print(f"🚨 RUG: {addr[:10]} price=0 x3 → force close")
+                _queue_sell(addr, "🚨 RUG price=0", 100.0)
+            return
+        else:
+            _pos_data["_zero_price_count"] = 0
+
+        pnl     = ((current - entry) / entry) * 100
+        drop_hi = ((current - high) / high) * 100 if high > 0 else 0
+        _cs   = CHECKLIST_SETTINGS
+        _tp3  = _cs.get("tp3_pct", 100.0)
+        _tp4  = _cs.get("tp4_pct", 200.0)
+
+        _vol     = _get_vol_pressure_rt(addr)
+        _bv5     = _vol.get("buy_vol5",  0.0)
+        _sv5     = _vol.get("sell_vol5", 0.0)
+        _b5      = _vol.get("buys5",     0)
+        _s5      = _vol.get("sells5",    0)
+        _has_vol = (_bv5 > 0 or _sv5 > 0 or _b5 > 0 or _s5 > 0)
+
+        _trail_triggered = False
+
+        with _lp_burn_lock:
+            _burn_detected = addr.lower() in _lp_burn_alerts
+        if _burn_detected:
+            print(f"🚨 LP Burn confirmed sell: {addr[:10]}")
+            _queue_sell(addr, "LP Burn 🚨 Rug Confirmed", 100.0)
+            with _lp_burn_lock:
+                _lp_burn_alerts.discard(addr.lower())
+            return
 
-def auto_position_manager():
-    print("Auto Position Manager started!")
-    try:
-        _s = get_or_create_session(AUTO_SESSION_ID)
-        _dl = _s.get("daily_loss", 0)
-        _today = datetime.utcnow().strftime("%Y-%m-%d")
-        if _dl > 1.0 or _s.get("daily_loss_date", "") != _today:
-            print(f"🔄 Startup: daily_loss={_dl:.4f} → 0 (new day or stale)")
-            _s["daily_loss"] = 0.0
-            _s["daily_loss_date"] = _today
-    except Exception as _e:
-        print(f"⚠️ Startup reset error: {_e}")
-    if not isinstance(auto_trade_stats.get("trade_history"), list):
-        auto_trade_stats["trade_history"] = []
-    while True:
-        for addr, pos in list(auto_trade_stats["running_positions"].items()):
+        _now_t = time.time()
+        _last_res_t = _pos_data.get("_last_res_t", 0)
+        if _now_t - _last_res_t >= 3:
+            _pos_data["_last_res_t"] = _now_t
             try:
-                with monitor_lock:
-                    mon = monitored_positions.get(addr, {})
-                current = mon.get("current", 0)
-                _pos_data = auto_trade_stats["running_positions"].get(addr, pos)
-                entry   = _pos_data.get("entry", 0)
-                high    = mon.get("high", entry)
-                # ── FIX v36 Bug1: ATH race condition — price_monitor ka wait mat karo ──
-                # Fast dump coins mein monitor pehla update karne se pehle HardSL fire
-                # hota tha. Same iteration mein high sync karo.
-                if current > 0 and current > high:
-                    high = current
-                    with monitor_lock:
-                        if addr in monitored_positions:
-                            monitored_positions[addr]["high"] = current
-                    _rp3 = auto_trade_stats["running_positions"].get(addr)
-                    if _rp3:
-                        _rp3["ath_price"] = current
-                tp_sold = _pos_data.get("tp_sold", 0.0)
-                sl_pct  = _pos_data.get("sl_pct", 15.0)
-                if entry <= 0:
-                    continue
-
-                if current <= 0:
-                    _zero_count = _pos_data.get("_zero_price_count", 0) + 1
-                    _pos_data["_zero_price_count"] = _zero_count
-                    print(f"⚠️ Price=0: {addr[:10]} count={_zero_count}/3")
-                    if _zero_count >= 3:
-                        print(f"🚨 RUG: {addr[:10]} price=0 x3 → force close")
-                        _auto_paper_sell(addr, "🚨 RUG price=0", 100.0)
-                    continue
-                else:
-                    _pos_data["_zero_price_count"] = 0
-
-                pnl     = ((current - entry) / entry) * 100
-                drop_hi = ((current - high) / high) * 100 if high > 0 else 0
-                _cs   = CHECKLIST_SETTINGS
-                _tp3  = _cs.get("tp3_pct", 100.0)
-                _tp4  = _cs.get("tp4_pct", 200.0)
-
-                _vol     = _get_vol_pressure_rt(addr)
-                _bv5     = _vol.get("buy_vol5",  0.0)
-                _sv5     = _vol.get("sell_vol5", 0.0)
-                _b5      = _vol.get("buys5",     0)
-                _s5      = _vol.get("sells5",    0)
-                _has_vol = (_bv5 > 0 or _sv5 > 0 or _b5 > 0 or _s5 > 0)
-
-                _trail_triggered = False
-
-                with _lp_burn_lock:
-                    _burn_detected = addr.lower() in _lp_burn_alerts
-                if _burn_detected:
-                    print(f"🚨 LP Burn confirmed sell: {addr[:10]}")
-                    _auto_paper_sell(addr, "LP Burn 🚨 Rug Confirmed", 100.0)
-                    with _lp_burn_lock:
-                        _lp_burn_alerts.discard(addr.lower())
-                    continue
+                _pair_addr = _get_pair_for_token(addr)
+                if _pair_addr:
+                    _pc = _qw3().eth.contract(
+                        address=Web3.to_checksum_address(_pair_addr),
+                        abi=PAIR_ABI_PRICE
+                    )
+                    _res = _pc.functions.getReserves().call()
+                    _t0  = _pc.functions.token0().call().lower()
+                    _sim_mirror_reserves(_pos_data, addr, _res, _t0)  # FIX v125: paper fill sim mirror
+                    _wbnb_res = _res[0] if _t0 == WBNB.lower() else _res[1]
+                    _wbnb_bnb = _wbnb_res / 1e18
+                    _prev_wbnb = _pos_data.get("_wbnb_reserve", 0)
+                    if _prev_wbnb <= 0:
+                        _pos_data["_wbnb_reserve"] = _wbnb_bnb
+                    else:
+                        _drop_pct = ((_wbnb_bnb - _prev_wbnb) / _prev_wbnb) * 100
+                        if _drop_pct <= -50:
+                            print(f"🚨 RESERVES DROP: {addr[:10]} WBNB {_prev_wbnb:.3f}→{_wbnb_bnb:.3f} ({_drop_pct:.0f}%) → SELL!")
+                            _queue_sell(addr, f"LiqDrop {abs(_drop_pct):.0f}% 🚨 Rug", 100.0)
+                            return
+                        elif _wbnb_bnb > _prev_wbnb:
+                            _pos_data["_wbnb_reserve"] = _wbnb_bnb
+            except Exception:
+                pass
 
-                _now_t = time.time()
-                _last_res_t = _pos_data.get("_last_res_t", 0)
-                if _now_t - _last_res_t >= 3:
-                    _pos_data["_last_res_t"] = _now_t
-                    try:
-                        _pair_addr = _get_pair_for_token(addr)
-                        if _pair_addr:
-                            _pc = _qw3().eth.contract(
-                                address=Web3.to_checksum_address(_pair_addr),
-                                abi=PAIR_ABI_PRICE
+        if _has_vol:
+            if _bv5 > 0 or _sv5 > 0:
+                _ratio = _sv5 / max(_bv5, 0.0001)
+            else:
+                _ratio = _s5 / max(_b5, 1)
+            if _ratio >= 5.0 and _s5 >= 5 and pnl <= -8:
+                _queue_sell(addr, f"VolRug {_ratio:.1f}x 🚨", 100.0)
+                print(f"🚨 VolRug: {addr[:10]} ratio={_ratio:.1f}x sv={_sv5:.3f} bv={_bv5:.3f}")
+                _trail_triggered = True
+            elif _ratio >= 3.0 and _s5 >= 5 and pnl <= -10:
+                _queue_sell(addr, f"VolDump {_ratio:.1f}x", 100.0)
+                print(f"⚠️ VolDump: {addr[:10]} ratio={_ratio:.1f}x pnl={pnl:.1f}%")
+                _trail_triggered = True
+            # FIX 1: _auto_paper_sell real mode bhi handle karta hai internally
+
+        if not _trail_triggered:
+            # ── FIX v36 Bug2: pnl_high track karo (ATH bug fix ke baad sahi kaam karega) ──
+            _pnl_high = _pos_data.get("pnl_high", 0.0)
+            if pnl > _pnl_high:
+                _pos_data["pnl_high"] = pnl
+                _pnl_high = pnl
+                # FIX v62: New high bana → timestamp reset karo
+                _pos_data["_last_high_ts"] = time.time()
+
+            _entry_sl = _pos_data.get("sl_pct", 15.0)
+
+            # ── MomDead pre-calc: HardSL se pehle calculate karo taaki priority sahi rahe ──
+            _vol_live   = _vol  # same tick ka snapshot reuse — dobara lock nahi
+            _bv5_live   = _vol_live.get("buy_vol5", 0.0)
+            _b5_live    = _vol_live.get("buys5",    0)
+            _s5_live    = _vol_live.get("sells5",   0)
+
+            _bought_str  = _pos_data.get("bought_at", "")
+            try:
+                _hold_secs = (datetime.utcnow() - datetime.fromisoformat(_bought_str[:19])).total_seconds() if _bought_str else 999
+            except Exception:
+                _hold_secs = 999
+
+            # ── FM BC tokens: PancakeSwap pair nahi hota → bv5 hamesha 0 ──
+            # Isliye FM BC ke liye price momentum check karo instead of bv5
+            _src_check = _pos_data.get("source", "") or _pos_data.get("buy_reasoning", {}).get("source", "")
+            _is_fm_bc  = "FM_BC" in _src_check
+
+            _vwc = auto_trade_stats["vol_weak_count"]
+            # FIX v140: counters/hist sirf reading pe aage badhte hain (_PM_READING_SEC cadence)
+            _now_rd = time.time()
+            # 0.9x — 1s safety sweep ka jitter reading miss na karaye
+            _pm_reading = _now_rd - (_pos_data.get("_pm_read_ts", 0) or 0) >= _PM_READING_SEC * 0.9
+            if _pm_reading:
+                _pos_data["_pm_read_ts"] = _now_rd
+
+            if _is_fm_bc:
+                _fm_price_hist = _pos_data.get("_fm_price_hist", [])
+                if _pm_reading:
+                    _fm_price_hist.append(current)
+                    if len(_fm_price_hist) > 6: _fm_price_hist.pop(0)
+                    _pos_data["_fm_price_hist"] = _fm_price_hist
+
+                # Funds: FM price monitor thread se parallel update hota hai
+                _fm_funds_hist = _pos_data.get("_fm_funds_hist", [])
+
+                # ── LEADING: funds sudden drop ──
+                _instant_dump = False
+                if len(_fm_funds_hist) >= 2:
+                    _f_prev = _fm_funds_hist[-2]
+                    _f_curr = _fm_funds_hist[-1]
+                    _f_drop = (_f_prev - _f_curr) / _f_prev * 100 if _f_prev > 0 else 0
+                    if _f_drop >= 20:
+                        if tp_sold > 0:
+                            # TP ke baad — proper recovery check
+                            # 2 consecutive ticks upar + min 5% recovery
+                            _tick_up = (
+                                len(_fm_funds_hist) >= 3 and
+                                _fm_funds_hist[-1] > _fm_funds_hist[-2] and
+                                _fm_funds_hist[-2] > _fm_funds_hist[-3]
                             )
-                            _res = _pc.functions.getReserves().call()
-                            _t0  = _pc.functions.token0().call().lower()
-                            _wbnb_res = _res[0] if _t0 == WBNB.lower() else _res[1]
-                            _wbnb_bnb = _wbnb_res / 1e18
-                            _prev_wbnb = _pos_data.get("_wbnb_reserve", 0)
-                            if _prev_wbnb <= 0:
-                                _pos_data["_wbnb_reserve"] = _wbnb_bnb
-                            else:
-                                _drop_pct = ((_wbnb_bnb - _prev_wbnb) / _prev_wbnb) * 100
-                                if _drop_pct <= -50:
-                                    print(f"🚨 RESERVES DROP: {addr[:10]} WBNB {_prev_wbnb:.3f}→{_wbnb_bnb:.3f} ({_drop_pct:.0f}%) → SELL!")
-                                    _auto_paper_sell(addr, f"LiqDrop {abs(_drop_pct):.0f}% 🚨 Rug", 100.0)
-                                    continue
-                                elif _wbnb_bnb > _prev_wbnb:
-                                    _pos_data["_wbnb_reserve"] = _wbnb_bnb
-                    except Exception:
-                        pass
-
-                if _has_vol:
-                    if _bv5 > 0 or _sv5 > 0:
-                        _ratio = _sv5 / max(_bv5, 0.0001)
-                    else:
-                        _ratio = _s5 / max(_b5, 1)
-                    if _ratio >= 5.0 and _s5 >= 5 and pnl <= -8:
-                        _auto_paper_sell(addr, f"VolRug {_ratio:.1f}x 🚨", 100.0)
-                        print(f"🚨 VolRug: {addr[:10]} ratio={_ratio:.1f}x sv={_sv5:.3f} bv={_bv5:.3f}")
-                        _trail_triggered = True
-                    elif _ratio >= 3.0 and _s5 >= 5 and pnl <= -10:
-                        _auto_paper_sell(addr, f"VolDump {_ratio:.1f}x", 100.0)
-                        print(f"⚠️ VolDump: {addr[:10]} ratio={_ratio:.1f}x pnl={pnl:.1f}%")
-                        _trail_triggered = True
-                    # FIX 1: _auto_paper_sell real mode bhi handle karta hai internally
-
-                if not _trail_triggered:
-                    # ── FIX v36 Bug2: pnl_high track karo (ATH bug fix ke baad sahi kaam karega) ──
-                    _pnl_high = _pos_data.get("pnl_high", 0.0)
-                    if pnl > _pnl_high:
-                        _pos_data["pnl_high"] = pnl
-                        _pnl_high = pnl
-                        # FIX v62: New high bana → timestamp reset karo
-                        _pos_data["_last_high_ts"] = time.time()
-
-                    _entry_sl = _pos_data.get("sl_pct", 15.0)
-
-                    # ── MomDead pre-calc: HardSL se pehle calculate karo taaki priority sahi rahe ──
-                    _vol_live   = _get_vol_pressure_rt(addr)
-                    _bv5_live   = _vol_live.get("buy_vol5", 0.0)
-                    _b5_live    = _vol_live.get("buys5",    0)
-                    _s5_live    = _vol_live.get("sells5",   0)
-
-                    _bought_str  = _pos_data.get("bought_at", "")
-                    try:
-                        _hold_secs = (datetime.utcnow() - datetime.fromisoformat(_bought_str[:19])).total_seconds() if _bought_str else 999
-                    except Exception:
-                        _hold_secs = 999
-
-                    # ── FM BC tokens: PancakeSwap pair nahi hota → bv5 hamesha 0 ──
-                    # Isliye FM BC ke liye price momentum check karo instead of bv5
-                    _src_check = _pos_data.get("source", "") or _pos_data.get("buy_reasoning", {}).get("source", "")
-                    _is_fm_bc  = "FM_BC" in _src_check
-
-                    _vwc = auto_trade_stats["vol_weak_count"]
-
-                    if _is_fm_bc:
-                        _fm_price_hist = _pos_data.get("_fm_price_hist", [])
-                        _fm_price_hist.append(current)
-                        if len(_fm_price_hist) > 6: _fm_price_hist.pop(0)
-                        _pos_data["_fm_price_hist"] = _fm_price_hist
-
-                        # Funds: FM price monitor thread se parallel update hota hai
-                        _fm_funds_hist = _pos_data.get("_fm_funds_hist", [])
-
-                        # ── LEADING: funds sudden drop ──
-                        _instant_dump = False
-                        if len(_fm_funds_hist) >= 2:
-                            _f_prev = _fm_funds_hist[-2]
-                            _f_curr = _fm_funds_hist[-1]
-                            _f_drop = (_f_prev - _f_curr) / _f_prev * 100 if _f_prev > 0 else 0
-                            if _f_drop >= 20:
-                                if tp_sold > 0:
-                                    # TP ke baad — proper recovery check
-                                    # 2 consecutive ticks upar + min 5% recovery
-                                    _tick_up = (
-                                        len(_fm_funds_hist) >= 3 and
-                                        _fm_funds_hist[-1] > _fm_funds_hist[-2] and
-                                        _fm_funds_hist[-2] > _fm_funds_hist[-3]
-                                    )
-                                    _recovery_pct = (
-                                        (_fm_funds_hist[-1] - min(_fm_funds_hist[-2], _fm_funds_hist[-3]))
-                                        / max(_fm_funds_hist[-3], 0.001) * 100
-                                    ) if len(_fm_funds_hist) >= 3 else 0.0
-                                    _f_recovering = _tick_up and _recovery_pct >= 5.0
-                                    if not _f_recovering:
-                                        _instant_dump = True
-                                        print(f"🚨 [FM] Funds -{_f_drop:.1f}% dump + no real recovery (post-TP): {addr[:10]}")
-                                    else:
-                                        print(f"⚡ [FM] Funds -{_f_drop:.1f}% real recovery {_recovery_pct:.1f}% (post-TP) — HOLD: {addr[:10]}")
-                                else:
-                                    # TP se pehle — seedha exit
-                                    _instant_dump = True
-                                    print(f"🚨 [FM] Funds -{_f_drop:.1f}% instant dump (pre-TP): {addr[:10]}")
-                            elif _f_drop >= 5:
-                                _vwc[addr] = _vwc.get(addr, 0) + 1
-
-                        # ── LAGGING: price + funds both declining ──
-                        if not _instant_dump:
-                            if len(_fm_price_hist) >= 4:
-                                _fm_peak = max(_fm_price_hist)
-                                _fm_drawdown_pct = (_fm_peak - current) / _fm_peak * 100 if _fm_peak > 0 else 0
-                                _fm_declining = sum(
-                                    1 for i in range(1, len(_fm_price_hist))
-                                    if _fm_price_hist[i] < _fm_price_hist[i-1] * 0.985
-                                )
-                                _funds_also_dying = False
-                                if len(_fm_funds_hist) >= 3:
-                                    _funds_declining = sum(
-                                        1 for i in range(1, len(_fm_funds_hist))
-                                        if _fm_funds_hist[i] < _fm_funds_hist[i-1]
-                                    )
-                                    _funds_also_dying = _funds_declining >= 2
-                                _real_dump = (_fm_declining >= 3 or (_fm_declining >= 2 and _fm_drawdown_pct > 15)) and _funds_also_dying
-                                if _real_dump:
-                                    _vwc[addr] = _vwc.get(addr, 0) + 1
-                                else:
-                                    _vwc[addr] = 0
+                            _recovery_pct = (
+                                (_fm_funds_hist[-1] - min(_fm_funds_hist[-2], _fm_funds_hist[-3]))
+                                / max(_fm_funds_hist[-3], 0.001) * 100
+                            ) if len(_fm_funds_hist) >= 3 else 0.0
+                            _f_recovering = _tick_up and _recovery_pct >= 5.0
+                            if not _f_recovering:
+                                _instant_dump = True
+                                print(f"🚨 [FM] Funds -{_f_drop:.1f}% dump + no real recovery (post-TP): {addr[:10]}")
                             else:
-                                _vwc[addr] = 0
-                    else:
-                        # PancakeSwap tokens: original bv5 logic
-                        if _bv5_live < 0.5:
-                            _vwc[addr] = _vwc.get(addr, 0) + 1
+                                print(f"⚡ [FM] Funds -{_f_drop:.1f}% real recovery {_recovery_pct:.1f}% (post-TP) — HOLD: {addr[:10]}")
                         else:
-                            _vwc[addr] = 0
-
-                    # FM BC: 8 readings — consolidation survive kare, genuine downtrend exit
-                    # PC: 3 readings + 20s hold
-                    _vol_dying = _vwc.get(addr, 0) >= (6 if _is_fm_bc else 3)
-                    if _is_fm_bc:
-                        # FIX ATH: real peak — position level pe store, sirf 6 readings ka max nahi
-                        # _fm_price_hist sirf last 6 readings — fast dump mein peak history se bahar
-                        # ath_price position mein hamesha update hota hai (line ~3852)
-                        _fm_peak2 = _pos_data.get("ath_price", 0)
-                        if _fm_peak2 <= 0:
-                            # fallback: monitored_positions ka high ya price_hist max
-                            _fm_peak2 = max(
-                                mon.get("high", 0),
-                                max(_pos_data.get("_fm_price_hist", [current]), default=current),
-                                current
+                            # TP se pehle — seedha exit
+                            _instant_dump = True
+                            print(f"🚨 [FM] Funds -{_f_drop:.1f}% instant dump (pre-TP): {addr[:10]}")
+                    elif _f_drop >= 5 and _pm_reading:
+                        _vwc[addr] = _vwc.get(addr, 0) + 1
+
+                # ── LAGGING: price + funds both declining ──
+                if not _instant_dump and _pm_reading:
+                    if len(_fm_price_hist) >= 4:
+                        _fm_peak = max(_fm_price_hist)
+                        _fm_drawdown_pct = (_fm_peak - current) / _fm_peak * 100 if _fm_peak > 0 else 0
+                        _fm_declining = sum(
+                            1 for i in range(1, len(_fm_price_hist))
+                            if _fm_price_hist[i] < _fm_price_hist[i-1] * 0.985
+                        )
+                        _funds_also_dying = False
+                        if len(_fm_funds_hist) >= 3:
+                            _funds_declining = sum(
+                                1 for i in range(1, len(_fm_funds_hist))
+                                if _fm_funds_hist[i] < _fm_funds_hist[i-1]
                             )
-                        _drawdown_from_high = (_fm_peak2 - current) / _fm_peak2 * 100 if _fm_peak2 > 0 else 0
-                        if tp_sold >= 85:
-                            # TP3 ke baad moonbag — tightest exit
-                            # Coin 500%+ chal chuka — profit protect karo
-                            if _drawdown_from_high > 20:
-                                _mom_dead = True   # >20% drop from REAL ATH — turant exit
-                            elif _drawdown_from_high > 10:
-                                _mom_dead = _instant_dump or _vol_dying  # 10-20% — vol bhi check
-                            else:
-                                _mom_dead = _instant_dump  # <10% — sirf instant dump
-                        elif tp_sold >= 65:
-                            # TP2 ke baad (65% sold) — medium tight
-                            if _drawdown_from_high > 25:
-                                _mom_dead = True   # >25% drop from REAL ATH — turant exit
-                            elif _drawdown_from_high > 15:
-                                _mom_dead = _instant_dump or _vol_dying  # 15-25% — vol bhi check
-                            else:
-                                _mom_dead = _instant_dump  # <15% — sirf instant dump (runner ko room)
-                        elif tp_sold >= 40:
-                            # TP1 ke baad runner — real ATH se 30% gire toh exit
-                            if _drawdown_from_high > 30:
-                                _mom_dead = True   # >30% drop from REAL ATH — turant exit
-                            else:
-                                _mom_dead = _instant_dump  # <30% — runner ko room do
+                            _funds_also_dying = _funds_declining >= 2
+                        _real_dump = (_fm_declining >= 3 or (_fm_declining >= 2 and _fm_drawdown_pct > 15)) and _funds_also_dying
+                        if _real_dump:
+                            _vwc[addr] = _vwc.get(addr, 0) + 1
                         else:
-                            _mom_dead = _instant_dump or _vol_dying
+                            _vwc[addr] = 0
                     else:
-                        _mom_dead = _vol_dying and _hold_secs > 20
-
-                    # ── ENTRY GUARD v44: TP1 se pehle only, fake signal protection ──
-                    # Case 1: Seedha neeche — 3 consecutive no-buyer readings → min loss exit
-                    # Case 2: Thoda upar fir girna — tight trail, sell volume confirm
-                    # TP1 ke baad bilkul touch nahi — wo alag logic hai
-                    if tp_sold == 0:
-                        _egc = auto_trade_stats["entry_guard_count"]
-
-                        # ── FIX v64: Pure price exit — no volume, no hold time ──
-                        # Entry ke turant baad price -5% gaya aur kabhi pump nahi hua → exit
-                        if _pnl_high < 3.0 and pnl <= -5.0:
-                            _auto_paper_sell(addr, f"PriceDrop -{abs(pnl):.1f}% 🔴", 100.0)
-                            _egc.pop(addr, None)
-                            _trail_triggered = True
-                            print(f"🔴 PriceDrop: {addr[:10]} pnl={pnl:.1f}% high={_pnl_high:.1f}% hold={_hold_secs:.0f}s")
-                            continue
-
-                        # Case 1: No pump at all, buyers absent
-                        if _pnl_high < 3.0 and pnl <= -2.0:
-                            # FastDump: FM BC pe price declining, PC pe sell dominant
-                            _fm_price_dead = _is_fm_bc and _vwc.get(addr, 0) >= 2
-                            _sv5_fd = _get_vol_pressure_rt(addr).get("sell_vol5", 0.0) if not _is_fm_bc else 0.0
-                            _sell_dominant = _sv5_fd > _bv5_live * 2 and _sv5_fd > 0.001
-                            # FIX: FM BC pehle 5s mein -3% pe hi exit (fast dump catcher)
-                            _fd_threshold = -3.0 if (_is_fm_bc and _hold_secs < 5) else -5.0
-                            _fast_dump = (_sell_dominant or _fm_price_dead) and pnl <= _fd_threshold
-                            if _fast_dump:
-                                _reason = "FMPriceDead" if _fm_price_dead else f"SellDom sv={_sv5_fd:.3f}"
-                                _auto_paper_sell(addr, f"FastDump -{abs(pnl):.1f}% 🔵", 100.0)
-                                _egc.pop(addr, None)
-                                _trail_triggered = True
-                                print(f"🔵 FastDump [{_reason}]: {addr[:10]} pnl={pnl:.1f}% hold={_hold_secs:.0f}s")
-                                continue
+                        _vwc[addr] = 0
+            elif _pm_reading:
+                # PancakeSwap tokens: original bv5 logic
+                if _bv5_live < 0.5:
+                    _vwc[addr] = _vwc.get(addr, 0) + 1
+                else:
+                    _vwc[addr] = 0
+
+            # FM BC: 6 readings (~6s) — consolidation survive kare, genuine downtrend exit
+            # PC: 3 readings (~3s) + 20s hold
+            _vol_dying = _vwc.get(addr, 0) >= (6 if _is_fm_bc else 3)
+            if _is_fm_bc:
+                # FIX ATH: real peak — position level pe store, sirf 6 readings ka max nahi
+                # _fm_price_hist sirf last 6 readings — fast dump mein peak history se bahar
+                # ath_price position mein hamesha update hota hai (line ~3852)
+                _fm_peak2 = _pos_data.get("ath_price", 0)
+                if _fm_peak2 <= 0:
+                    # fallback: monitored_positions ka high ya price_hist max
+                    _fm_peak2 = max(
+                        mon.get("high", 0),
+                        max(_pos_data.get("_fm_price_hist", [current]), default=current),
+                        current
+                    )
+                _drawdown_from_high = (_fm_peak2 - current) / _fm_peak2 * 100 if _fm_peak2 > 0 else 0
+                if tp_sold >= 85:
+                    # TP3 ke baad moonbag — tightest exit
+                    # Coin 500%+ chal chuka — profit protect karo
+                    if _drawdown_from_high > 20:
+                        _mom_dead = True   # >20% drop from REAL ATH — turant exit
+                    elif _drawdown_from_high > 10:
+                        _mom_dead = _instant_dump or _vol_dying  # 10-20% — vol bhi check
+                    else:
+                        _mom_dead = _instant_dump  # <10% — sirf instant dump
+                elif tp_sold >= 65:
+                    # TP2 ke baad (65% sold) — medium tight
+                    if _drawdown_from_high > 25:
+                        _mom_dead = True   # >25% drop from REAL ATH — turant exit
+                    elif _drawdown_from_high > 15:
+                        _mom_dead = _instant_dump or _vol_dying  # 15-25% — vol bhi check
+                    else:
+                        _mom_dead = _instant_dump  # <15% — sirf instant dump (runner ko room)
+                elif tp_sold >= 40:
+                    # TP1 ke baad runner — real ATH se 30% gire toh exit
+                    if _drawdown_from_high > 30:
+                        _mom_dead = True   # >30% drop from REAL ATH — turant exit
+                    else:
+                        _mom_dead = _instant_dump  # <30% — runner ko room do
+                else:
+                    _mom_dead = _instant_dump or _vol_dying
+            else:
+                _mom_dead = _vol_dying and _hold_secs > 20
+
+            # ── ENTRY GUARD v44: TP1 se pehle only, fake signal protection ──
+            # Case 1: Seedha neeche — 3 consecutive no-buyer readings → min loss exit
+            # Case 2: Thoda upar fir girna — tight trail, sell volume confirm
+            # TP1 ke baad bilkul touch nahi — wo alag logic hai
+            if tp_sold == 0:
+                _egc = auto_trade_stats["entry_guard_count"]
+
+                # ── FIX v64: Pure price exit — no volume, no hold time ──
+                # Entry ke turant baad price -5% gaya aur kabhi pump nahi hua → exit
+                if _pnl_high < 3.0 and pnl <= -5.0:
+                    _queue_sell(addr, f"PriceDrop -{abs(pnl):.1f}% 🔴", 100.0)
+                    _egc.pop(addr, None)
+                    _trail_triggered = True
+                    print(f"🔴 PriceDrop: {addr[:10]} pnl={pnl:.1f}% high={_pnl_high:.1f}% hold={_hold_secs:.0f}s")
+                    return
 
-                            # FM BC: bv5=0 hamesha — price history use karo
-                            if _is_fm_bc:
-                                _eg_hist = _pos_data.get("_eg_price_hist", [])
-                                _eg_hist.append(current)
-                                if len(_eg_hist) > 5: _eg_hist.pop(0)
-                                _pos_data["_eg_price_hist"] = _eg_hist
-                                if len(_eg_hist) >= 3:
-                                    _eg_down = sum(1 for i in range(1, len(_eg_hist)) if _eg_hist[i] < _eg_hist[i-1] * 0.99)
-                                    if _eg_down >= 2: _egc[addr] = _egc.get(addr, 0) + 1
-                                    else: _egc[addr] = 0
-                                else: _egc[addr] = 0
-                            else:
-                                if _bv5_live < 0.3: _egc[addr] = _egc.get(addr, 0) + 1
-                                else: _egc[addr] = 0
-
-                            if _egc.get(addr, 0) >= 2:
-                                _auto_paper_sell(addr, f"EntryGuard NoMom -{abs(pnl):.1f}% 🔵", 100.0)
-                                _egc.pop(addr, None)
-                                _trail_triggered = True
-                                print(f"🔵 EntryGuard Case1: {addr[:10]} pnl={pnl:.1f}% fm_bc={_is_fm_bc}")
-                                continue
+                # Case 1: No pump at all, buyers absent
+                if _pnl_high < 3.0 and pnl <= -2.0:
+                    # FastDump: FM BC pe price declining, PC pe sell dominant
+                    _fm_price_dead = _is_fm_bc and _vwc.get(addr, 0) >= 2
+                    _sv5_fd = _get_vol_pressure_rt(addr).get("sell_vol5", 0.0) if not _is_fm_bc else 0.0
+                    _sell_dominant = _sv5_fd > _bv5_live * 2 and _sv5_fd > 0.001
+                    # FIX: FM BC pehle 5s mein -3% pe hi exit (fast dump catcher)
+                    _fd_threshold = -3.0 if (_is_fm_bc and _hold_secs < 5) else -5.0
+                    _fast_dump = (_sell_dominant or _fm_price_dead) and pnl <= _fd_threshold
+                    if _fast_dump:
+                        _reason = "FMPriceDead" if _fm_price_dead else f"SellDom sv={_sv5_fd:.3f}"
+                        _queue_sell(addr, f"FastDump -{abs(pnl):.1f}% 🔵", 100.0)
+                        _egc.pop(addr, None)
+                        _trail_triggered = True
+                        print(f"🔵 FastDump [{_reason}]: {addr[:10]} pnl={pnl:.1f}% hold={_hold_secs:.0f}s")
+                        return
+
+                    # FM BC: bv5=0 hamesha — price history use karo
+                    if not _pm_reading:
+                        pass  # FIX v140: reading ke beech counter same rehta hai
+                    elif _is_fm_bc:
+                        _eg_hist = _pos_data.get("_eg_price_hist", [])
+                        _eg_hist.append(current)
+                        if len(_eg_hist) > 5: _eg_hist.pop(0)
+                        _pos_data["_eg_price_hist"] = _eg_hist
+                        if len(_eg_hist) >= 3:
+                            _eg_down = sum(1 for i in range(1, len(_eg_hist)) if _eg_hist[i] < _eg_hist[i-1] * 0.99)
+                            if _eg_down >= 2: _egc[addr] = _egc.get(addr, 0) + 1
+                            else: _egc[addr] = 0
+                        else: _egc[addr] = 0
+                    else:
+                        if _bv5_live < 0.3: _egc[addr] = _egc.get(addr, 0) + 1
+                        else: _egc[addr] = 0
 
-                        # Case 2: Pumped then fading
-                        elif _pnl_high >= 3.0 and pnl < (_pnl_high - 8):
-                            if _is_fm_bc:
-                                _eg_hist2 = _pos_data.get("_eg_price_hist", [])
-                                _eg_hist2.append(current)
-                                if len(_eg_hist2) > 5: _eg_hist2.pop(0)
-                                _pos_data["_eg_price_hist"] = _eg_hist2
-                                if len(_eg_hist2) >= 3:
-                                    _eg_down2 = sum(1 for i in range(1, len(_eg_hist2)) if _eg_hist2[i] < _eg_hist2[i-1] * 0.99)
-                                    if _eg_down2 >= 2: _egc[addr] = _egc.get(addr, 0) + 1
-                                    else: _egc[addr] = 0
-                                else: _egc[addr] = 0
-                            else:
-                                _sv5_live = _get_vol_pressure_rt(addr).get("sell_vol5", 0.0)
-                                if _bv5_live < 0.3 and _sv5_live > _bv5_live: _egc[addr] = _egc.get(addr, 0) + 1
-                                else: _egc[addr] = 0
-
-                            if _egc.get(addr, 0) >= 2:
-                                _auto_paper_sell(addr, f"EntryGuard Faded -{abs(pnl):.1f}% 🔵", 100.0)
-                                _egc.pop(addr, None)
-                                _trail_triggered = True
-                                print(f"🔵 EntryGuard Case2: {addr[:10]} pnl={pnl:.1f}% high={_pnl_high:.1f}% fm_bc={_is_fm_bc}")
-                                continue
+                    if _egc.get(addr, 0) >= 2:
+                        _queue_sell(addr, f"EntryGuard NoMom -{abs(pnl):.1f}% 🔵", 100.0)
+                        _egc.pop(addr, None)
+                        _trail_triggered = True
+                        print(f"🔵 EntryGuard Case1: {addr[:10]} pnl={pnl:.1f}% fm_bc={_is_fm_bc}")
+                        return
+
+                # Case 2: Pumped then fading
+                elif _pnl_high >= 3.0 and pnl < (_pnl_high - 8):
+                    if not _pm_reading:
+                        pass  # FIX v140: reading ke beech counter same rehta hai
+                    elif _is_fm_bc:
+                        _eg_hist2 = _pos_data.get("_eg_price_hist", [])
+                        _eg_hist2.append(current)
+                        if len(_eg_hist2) > 5: _eg_hist2.pop(0)
+                        _pos_data["_eg_price_hist"] = _eg_hist2
+                        if len(_eg_hist2) >= 3:
+                            _eg_down2 = sum(1 for i in range(1, len(_eg_hist2)) if _eg_hist2[i] < _eg_hist2[i-1] * 0.99)
+                            if _eg_down2 >= 2: _egc[addr] = _egc.get(addr, 0) + 1
+                            else: _egc[addr] = 0
+                        else: _egc[addr] = 0
+                    else:
+                        _sv5_live = _get_vol_pressure_rt(addr).get("sell_vol5", 0.0)
+                        if _bv5_live < 0.3 and _sv5_live > _bv5_live: _egc[addr] = _egc.get(addr, 0) + 1
+                        else: _egc[addr] = 0
 
-                    # ── Hard SL: absolute exit at sl_pct%, no conditions ──
-                    # MomDead handles early exits (any %)
-                    # HardSL = hard floor, fires regardless of momentum
-                    if pnl <= -_entry_sl:
-                        _auto_paper_sell(addr, f"HardSL -{_entry_sl:.0f}% 🔴", 100.0)
-                        blacklist_token(addr, f"HardSL rebuy block")
+                    if _egc.get(addr, 0) >= 2:
+                        _queue_sell(addr, f"EntryGuard Faded -{abs(pnl):.1f}% 🔵", 100.0)
+                        _egc.pop(addr, None)
                         _trail_triggered = True
-                        print(f"🔴 HardSL: {addr[:10]} pnl={pnl:.1f}%")
-                        _pos_data = auto_trade_stats.get("running_positions", {}).get(addr, {})
-                        if not _pos_data.get("entry_price_confirmed", True):
-                            _push_notif("warning", "⚠️ HardSL on Unconfirmed Entry",
-                                f"{_pos_data.get('token','?')} | SL={pnl:.1f}% | Entry price confirmed nahi thi",
-                                _pos_data.get("token", ""), addr)
-                        continue
+                        print(f"🔵 EntryGuard Case2: {addr[:10]} pnl={pnl:.1f}% high={_pnl_high:.1f}% fm_bc={_is_fm_bc}")
+                        return
+
+            # ── Hard SL: absolute exit at sl_pct%, no conditions ──
+            # MomDead handles early exits (any %)
+            # HardSL = hard floor, fires regardless of momentum
+            if pnl <= -_entry_sl:
+                _queue_sell(addr, f"HardSL -{_entry_sl:.0f}% 🔴", 100.0)
+                blacklist_token(addr, f"HardSL rebuy block")
+                _trail_triggered = True
+                print(f"🔴 HardSL: {addr[:10]} pnl={pnl:.1f}%")
+                _pos_data = auto_trade_stats.get("running_positions", {}).get(addr, {})
+                if not _pos_data.get("entry_price_confirmed", True):
+                    _push_notif("warning", "⚠️ HardSL on Unconfirmed Entry",
+                        f"{_pos_data.get('token','?')} | SL={pnl:.1f}% | Entry price confirmed nahi thi",
+                        _pos_data.get("token", ""), addr)
+                return
 
-                    # Emergency SL: entry ke baad price drop → fast exit
-                    # FIX v63: removed `not _mom_dead`, hold 10s, pnl -5%, pnl_high 10%
-                    _emergency_sl = (
-                        _hold_secs > 10
-                        and pnl <= -5
-                        and tp_sold == 0
-                        and _pnl_high < 10.0
-                    )
+            # Emergency SL: entry ke baad price drop → fast exit
+            # FIX v63: removed `not _mom_dead`, hold 10s, pnl -5%, pnl_high 10%
+            _emergency_sl = (
+                _hold_secs > 10
+                and pnl <= -5
+                and tp_sold == 0
+                and _pnl_high < 10.0
+            )
 
-                    # ── FIX v37 A: TP1/TP2 independent — MomDead same iteration check ──
-                    # Pehle: elif chain — TP1 fire kiya toh MomDead skip
-                    # Ab: TP1/TP2 alag if, MomDead/EmergSL alag if — dono same iteration
-
-                    # ── TP1/TP2/TP3: sirf tab fire karo jab price monitor ne current update kiya ho ──
-                    # FIX v91: initial current=entry hota hai (stale) — TP us pe fire hota tha
-                    # _price_refreshed = True sirf tab jab price_monitor/continuous_learning ne lastPrice fetch kiya
-                    _price_fresh  = mon.get("_price_refreshed", False)
-                    _tp_fired_now = False  # FIX v92: TP fire hua is iteration — MomDead skip karo
-
-                    # ── TP1: +40% → 40% sell ──
-                    if pnl >= 40 and tp_sold < 40:
-                        if _price_fresh:
-                            _auto_paper_sell(addr, f"TP1 +40% 🔒", 40.0)
-                            print(f"🔒 TP1: {addr[:10]} pnl={pnl:.1f}%")
-                            tp_sold = auto_trade_stats["running_positions"].get(addr, {}).get("tp_sold", 40.0)
-                            _tp_fired_now = True
-                        else:
-                            print(f"⏳ [v91] TP1 skip — price not yet refreshed by monitor: {addr[:10]} pnl={pnl:.1f}%")
-
-                    # ── TP2: +200% → 25% sell (total 65% sold) ──
-                    elif pnl >= 200 and tp_sold < 65:
-                        if _price_fresh:
-                            _auto_paper_sell(addr, f"TP2 +200% 🔥", 25.0)
-                            print(f"🔥 TP2: {addr[:10]} pnl={pnl:.1f}%")
-                            tp_sold = auto_trade_stats["running_positions"].get(addr, {}).get("tp_sold", 65.0)
-                            _tp_fired_now = True
-                        else:
-                            print(f"⏳ [v91] TP2 skip — price not yet refreshed: {addr[:10]} pnl={pnl:.1f}%")
-
-                    # ── TP3: +500% → 20% sell (total 85% sold) ──
-                    elif pnl >= 500 and tp_sold < 85:
-                        if _price_fresh:
-                            _auto_paper_sell(addr, f"TP3 +500% 🚀", 20.0)
-                            print(f"🚀 TP3: {addr[:10]} pnl={pnl:.1f}%")
-                            tp_sold = auto_trade_stats["running_positions"].get(addr, {}).get("tp_sold", 85.0)
-                            _tp_fired_now = True
-                        else:
-                            print(f"⏳ [v91] TP3 skip — price not yet refreshed: {addr[:10]} pnl={pnl:.1f}%")
-
-                    # ── FIX v62: Momentum Stall — TP ke baad new high nahi bana X seconds mein ──
-                    _last_high_ts = _pos_data.get("_last_high_ts", 0)
-                    _stall_secs = time.time() - _last_high_ts if _last_high_ts > 0 else 0
-
-                    # Stall threshold per TP zone
-                    if tp_sold >= 85:
-                        _stall_threshold = 20   # TP3 ke baad moonbag — tight
-                    elif tp_sold >= 65:
-                        _stall_threshold = 45   # TP2 ke baad — thoda tight
-                    elif tp_sold >= 40:
-                        _stall_threshold = 90   # TP1 ke baad — room do
-                    else:
-                        _stall_threshold = 20   # Pre-TP — original
+            # ── FIX v37 A: TP1/TP2 independent — MomDead same iteration check ──
+            # Pehle: elif chain — TP1 fire kiya toh MomDead skip
+            # Ab: TP1/TP2 alag if, MomDead/EmergSL alag if — dono same iteration
+
+            # ── TP1/TP2/TP3: sirf tab fire karo jab price monitor ne current update kiya ho ──
+            # FIX v91: initial current=entry hota hai (stale) — TP us pe fire hota tha
+            # _price_refreshed = True sirf tab jab price_monitor/continuous_learning ne lastPrice fetch kiya
+            _price_fresh  = mon.get("_price_refreshed", False)
+            _tp_fired_now = False  # FIX v92: TP fire hua is iteration — MomDead skip karo
+
+            # ── TP1: +40% → 40% sell ──
+            if pnl >= 40 and tp_sold < 40:
+                if _price_fresh:
+                    _queue_sell(addr, f"TP1 +40% 🔒", 40.0)
+                    print(f"🔒 TP1: {addr[:10]} pnl={pnl:.1f}%")
+                    tp_sold = auto_trade_stats["running_positions"].get(addr, {}).get("tp_sold", 40.0)
+                    _tp_fired_now = True
+                else:
+                    print(f"⏳ [v91] TP1 skip — price not yet refreshed by monitor: {addr[:10]} pnl={pnl:.1f}%")
+
+            # ── TP2: +200% → 25% sell (total 65% sold) ──
+            elif pnl >= 200 and tp_sold < 65:
+                if _price_fresh:
+                    _queue_sell(addr, f"TP2 +200% 🔥", 25.0)
+                    print(f"🔥 TP2: {addr[:10]} pnl={pnl:.1f}%")
+                    tp_sold = auto_trade_stats["running_positions"].get(addr, {}).get("tp_sold", 65.0)
+                    _tp_fired_now = True
+                else:
+                    print(f"⏳ [v91] TP2 skip — price not yet refreshed: {addr[:10]} pnl={pnl:.1f}%")
+
+            # ── TP3: +500% → 20% sell (total 85% sold) ──
+            elif pnl >= 500 and tp_sold < 85:
+                if _price_fresh:
+                    _queue_sell(addr, f"TP3 +500% 🚀", 20.0)
+                    print(f"🚀 TP3: {addr[:10]} pnl={pnl:.1f}%")
+                    tp_sold = auto_trade_stats["running_positions"].get(addr, {}).get("tp_sold", 85.0)
+                    _tp_fired_now = True
+                else:
+                    print(f"⏳ [v91] TP3 skip — price not yet refreshed: {addr[:10]} pnl={pnl:.1f}%")
+
+            # ── FIX v62: Momentum Stall — TP ke baad new high nahi bana X seconds mein ──
+            _last_high_ts = _pos_data.get("_last_high_ts", 0)
+            _stall_secs = time.time() - _last_high_ts if _last_high_ts > 0 else 0
+
+            # Stall threshold per TP zone
+            if tp_sold >= 85:
+                _stall_threshold = 20   # TP3 ke baad moonbag — tight
+            elif tp_sold >= 65:
+                _stall_threshold = 45   # TP2 ke baad — thoda tight
+            elif tp_sold >= 40:
+                _stall_threshold = 90   # TP1 ke baad — room do
+            else:
+                _stall_threshold = 20   # Pre-TP — original
 
-                    # Sirf tab trigger karo jab meaningful profit ho
-                    _mom_stall = (
-                        _stall_secs >= _stall_threshold
-                        and _pnl_high >= 20.0
-                        and _last_high_ts > 0
-                    )
+            # Sirf tab trigger karo jab meaningful profit ho
+            _mom_stall = (
+                _stall_secs >= _stall_threshold
+                and _pnl_high >= 20.0
+                and _last_high_ts > 0
+            )
 
-                    # ── MomDead + EmergSL: INDEPENDENT if — TP ke baad bhi check ──
-                    # FIX v92: TP same iteration mein fire hua toh MomDead skip — double sell block
-                    if addr in auto_trade_stats["running_positions"] and not _trail_triggered and not _tp_fired_now:
-                        if _mom_dead or _mom_stall:
-                            _reason = "MomStall" if _mom_stall and not _mom_dead else "MomDead"
-                            _zone = "Moonbag" if tp_sold >= 85 else ("Post-TP2" if tp_sold >= 65 else ("Post-TP1" if tp_sold >= 40 else "Pre-TP"))
-                            _auto_paper_sell(addr, f"{_reason} {_zone} 📉", 100.0)
-                            _trail_triggered = True
-                            _vwc_cnt = auto_trade_stats["vol_weak_count"].get(addr, 0)
-                            print(f"📉 {_reason} [{_zone}]: {addr[:10]} pnl={pnl:.1f}% high={_pnl_high:.1f}% stall={_stall_secs:.0f}s hold={_hold_secs:.0f}s")
-                            auto_trade_stats["vol_weak_count"].pop(addr, None)  # FIX v43: cleanup
-                            auto_trade_stats["entry_guard_count"].pop(addr, None)  # memory fix
-
-                        elif _emergency_sl:
-                            _auto_paper_sell(addr, f"EmergSL -20% 🚨", 100.0)
-                            blacklist_token(addr, "EmergSL rebuy block")
-                            _trail_triggered = True
-                            print(f"🚨 EmergSL: {addr[:10]} pnl={pnl:.1f}% hold={_hold_secs:.0f}s bv5={_bv5_live:.3f}")
+            # ── MomDead + EmergSL: INDEPENDENT if — TP ke baad bhi check ──
+            # FIX v92: TP same iteration mein fire hua toh MomDead skip — double sell block
+            if addr in auto_trade_stats["running_positions"] and not _trail_triggered and not _tp_fired_now:
+                if _mom_dead or _mom_stall:
+                    _reason = "MomStall" if _mom_stall and not _mom_dead else "MomDead"
+                    _zone = "Moonbag" if tp_sold >= 85 else ("Post-TP2" if tp_sold >= 65 else ("Post-TP1" if tp_sold >= 40 else "Pre-TP"))
+                    _queue_sell(addr, f"{_reason} {_zone} 📉", 100.0)
+                    _trail_triggered = True
+                    _vwc_cnt = auto_trade_stats["vol_weak_count"].get(addr, 0)
+                    print(f"📉 {_reason} [{_zone}]: {addr[:10]} pnl={pnl:.1f}% high={_pnl_high:.1f}% stall={_stall_secs:.0f}s hold={_hold_secs:.0f}s")
+                    auto_trade_stats["vol_weak_count"].pop(addr, None)  # FIX v43: cleanup
+                    auto_trade_stats["entry_guard_count"].pop(addr, None)  # memory fix
+
+                elif _emergency_sl:
+                    _queue_sell(addr, f"EmergSL -20% 🚨", 100.0)
+                    blacklist_token(addr, "EmergSL rebuy block")
+                    _trail_triggered = True
+                    print(f"🚨 EmergSL: {addr[:10]} pnl={pnl:.1f}% hold={_hold_secs:.0f}s bv5={_bv5_live:.3f}")
 
-            except Exception as e:
-                print(f"Auto manager err {addr[:10]}: {e}")
-
-        _positions = auto_trade_stats["running_positions"]
-        if not _positions:
-            _sleep = 30
-        elif any(
-            ((monitored_positions.get(a, {}).get("current", 0) - v.get("entry", 1e-18)) / max(v.get("entry", 1e-18), 1e-18)) * 100 >= 10
-            for a, v in list(_positions.items())
-        ):
-            _sleep = 0.3
-        else:
-            _sleep = 0.05  # FIX v37 C: 0.2s → 0.05s — 4x faster, ~20 checks/sec
-        time.sleep(_sleep)
+    except Exception as e:
+        print(f"Auto manager err {addr[:10]}: {e}")
 
 
+def auto_position_manager():
+    print("Auto Position Manager started! (event-driven)")
+    try:
+        _s = get_or_create_session(AUTO_SESSION_ID)
+        _dl = _s.get("daily_loss", 0)
+        _today = datetime.utcnow().strftime("%Y-%m-%d")
+        if _dl > 1.0 or _s.get("daily_loss_date", "") != _today:
+            print(f"🔄 Startup: daily_loss={_dl:.4f} → 0 (new day or stale)")
+            _s["daily_loss"] = 0.0
+            _s["daily_loss_date"] = _today
+    except Exception as _e:
+        print(f"⚠️ Startup reset error: {_e}")
+    if not isinstance(auto_trade_stats.get("trade_history"), TradeHistory):
+        _th_set(auto_trade_stats.get("trade_history"))
+    _last_sweep = 0.0
+    while True:
+        # Event aane tak block — koi spin nahi. Safety timer pe full sweep.
+        with _pm_cond:
+            _wait = _PM_SAFETY_SEC - (time.time() - _last_sweep)
+            if not _pm_pending and _wait > 0:
+                _pm_cond.wait(timeout=_wait)
+            _batch = _pm_pending.copy()
+            _pm_pending.clear()
+        _rp = auto_trade_stats["running_positions"]
+        if time.time() - _last_sweep >= _PM_SAFETY_SEC:
+            _last_sweep = time.time()
+            _pm_stats["sweeps"] += 1
+            for addr, pos in list(_rp.items()):
+                _pm_tls.evt_ts = _batch.pop(addr.lower(), 0)
+                _pm_evaluate(addr, pos)
+                _pm_stats["evals"] += 1
+        for key, _evt_ts in _batch.items():
+            addr = _pm_lookup(_rp, key)
+            if addr is None:
+                continue
+            _pm_tls.evt_ts = _evt_ts
+            _pm_evaluate(addr, _rp[addr])
+            _pm_stats["evals"] += 1
+        _pm_tls.evt_ts = 0
+
+
+
+# ========== ADAPTIVE REFRESH SCHEDULER ==========
+# FIX v117: har position same 0.2s pe refresh nahi — SL/TP/trail trigger se doori
+# aur recent volatility dekh ke interval. Trigger ke paas = har block,
+# flat position = har kuch second. Total refresh rate _REFRESH_RPC_BUDGET ke andar.
+_BSC_BLOCK_SEC      = 0.75   # BSC block time — isse fast refresh bekaar hai
+_REFRESH_QUIET_SEC  = 4.0    # flat/quiet position
+_REFRESH_NEW_SEC    = 30     # buy ke baad itne sec har block (EntryGuard zone)
+_REFRESH_RPC_BUDGET = 10.0   # price refresh calls/sec — sab positions milake
+_refresh_state: dict = {}    # {addr: {due, iv, vol, last_p, last_t, t0}}
+
+def _refresh_interval(pos, st: dict, now: float) -> float:
+    """Position ka refresh interval — nearest trigger tak ka distance / volatility"""
+    entry = pos.get("entry", 0) or 0
+    cur   = pos.get("current", 0) or 0
+    if entry <= 0 or cur <= 0 or now - st["t0"] < _REFRESH_NEW_SEC:
+        return _BSC_BLOCK_SEC
+    pnl     = (cur - entry) / entry * 100
+    tp_sold = pos.get("tp_sold", 0.0) or 0.0
+    sl      = pos.get("sl_pct", pos.get("stop_loss_pct", 15.0)) or 15.0
+    _dists  = [pnl + sl]                                   # HardSL tak
+    if tp_sold == 0:
+        _dists.append(pnl + 5.0)                           # PriceDrop/EmergSL -5%
+    _next_tp = 40 if tp_sold < 40 else (200 if tp_sold < 65 else (500 if tp_sold < 85 else 0))
+    if _next_tp:
+        _dists.append(_next_tp - pnl)                      # next TP tak
+    _trail = 20 if tp_sold >= 85 else (25 if tp_sold >= 65 else (30 if tp_sold >= 40 else 0))
+    if _trail:
+        _ath = max(pos.get("ath_price", 0) or 0, pos.get("high", 0) or 0, cur)
+        _dists.append(_trail - (_ath - cur) / _ath * 100)  # post-TP drawdown exit tak
+    _d   = max(0.0, min(_dists))
+    _vol = max(st["vol"], 0.5)                             # %/sec, floor — flat bhi kabhi move karta hai
+    # trigger tak pahunchne mein ~4 samples chahiye
+    return min(_REFRESH_QUIET_SEC, max(_BSC_BLOCK_SEC, _d / _vol / 4))
+
+def _refresh_apply_budget(ivs: dict) -> dict:
+    """RPC budget — har position ko floor rate, bacha hua budget sabse risky ko pehle"""
+    if not ivs or sum(1.0 / iv for iv in ivs.values()) <= _REFRESH_RPC_BUDGET:
+        return ivs
+    _floor = 1.0 / _REFRESH_QUIET_SEC
+    _spare = _REFRESH_RPC_BUDGET - _floor * len(ivs)
+    _out = {}
+    for a, iv in sorted(ivs.items(), key=lambda x: x[1]):
+        _give = min(1.0 / iv - _floor, max(_spare, 0.0))
+        _spare -= _give
+        _out[a] = 1.0 / (_floor + _give)
+    return _out
+
+def _refresh_observe(st: dict, price: float, now: float):
+    """Volatility EWMA update — %/sec"""
+    if st["last_p"] > 0:
+        _dt = max(now - st["last_t"], 0.05)
+        _v  = abs(price - st["last_p"]) / st["last_p"] * 100 / _dt
+        st["vol"] = 0.7 * st["vol"] + 0.3 * _v
+    st["last_p"] = price
+    st["last_t"] = now
+
+def _refresh_summary() -> dict:
+    _st = list(_refresh_state.items())
+    return {
+        "positions": len(_st),
+        "rate_per_sec": round(sum(1.0 / v["iv"] for _, v in _st if v.get("iv")), 2),
+        "budget": _REFRESH_RPC_BUDGET,
+        "intervals": {a[:10]: round(v["iv"], 2) for a, v in _st},
+    }
+
 def price_monitor_loop():
-    print("📡 Price Monitor started")
+    print("📡 Price Monitor started (adaptive scheduler)")
     while True:
         with monitor_lock:
             _snap = list(monitored_positions.items())
+        now = time.time()
+        for _gone in [a for a in _refresh_state if a not in monitored_positions]:
+            _refresh_state.pop(_gone, None)
+        _ivs = {}
+        for addr, pos in _snap:
+            _st = _refresh_state.setdefault(addr, {"due": 0.0, "iv": _BSC_BLOCK_SEC, "vol": 0.0,
+                                                   "last_p": 0.0, "last_t": now, "t0": now})
+            _ivs[addr] = _refresh_interval(pos, _st, now)
+        _ivs = _refresh_apply_budget(_ivs)
         for addr, pos in _snap:
+            _st = _refresh_state.get(addr)
+            if not _st:
+                continue
+            _st["iv"] = _ivs.get(addr, _BSC_BLOCK_SEC)
+            if _st["due"] > now:
+                continue
+            _st["due"] = now + _st["iv"]
             try:
-                if pos.get("buy_reasoning", {}).get("source") == "FM_BC_v2":
+                # FIX v151: FM routing purane "FM_BC" in src check jaisa — source ya buy_reasoning.source
+                _src   = pos.get("source", "") or (pos.get("buy_reasoning") or {}).get("source", "") or ""
+                _is_fm = "FM_BC" in _src
+                if _is_fm:
                     try:
                         # FIX v69: Chainstack use karo — free RPC stale price deta tha
                         # jisse pos["current"] galat hota tha → fake SL/TP trigger
@@ -4486,16 +7532,24 @@ def price_monitor_loop():
                     current = get_token_price_bnb(addr)
                 if current <= 0:
                     continue
-                if pos["entry"] > 0 and current > pos["entry"] * 10000:
+                if pos.entry > 0 and current > pos.entry * 10000:
                     continue
-                pos["current"] = current
-                if current > pos["high"]:
-                    pos["high"] = current
-                entry          = pos["entry"]
+                # FIX v116: Position slots — attribute access, dict lookup nahi
+                _changed = current != pos.current
+                _refresh_observe(_st, current, time.time())
+                pos.current = current
+                if _startup_stats["first_monitored_s"] is None:
+                    _startup_mark("first_monitored_s")  # FIX v133: time to first monitored position
+                pos._price_refreshed = True  # TP fire ke liye fresh price mark
+                if current > pos.high:
+                    pos.high = current
+                if _changed or _is_fm:
+                    _pm_signal(addr, "price")  # FIX v115: manager ko sirf change pe jagao
+                entry          = pos.entry
                 pnl_pct        = ((current - entry) / entry) * 100 if entry > 0 else 0
-                drop_from_high = ((current - pos["high"]) / pos["high"]) * 100 if pos["high"] > 0 else 0
-                sl             = pos["stop_loss_pct"]
-                alerts_sent    = pos["alerts_sent"]
+                drop_from_high = ((current - pos.high) / pos.high) * 100 if pos.high > 0 else 0
+                sl             = pos.stop_loss_pct
+                alerts_sent    = pos.alerts_sent
 
                 if pnl_pct <= -sl and "stop_loss" not in alerts_sent:
                     alerts_sent.append("stop_loss")
@@ -4515,8 +7569,9 @@ def price_monitor_loop():
                     alerts_sent.append("dump_50")
             except Exception as e:
                 print(f"⚠️ Price monitor error ({addr}): {e}")
-        _sleep = 0.2 if monitored_positions else 15  # FIX v37 C: 1s → 0.2s price monitor
-        time.sleep(_sleep)
+        # FIX v117: agle due position tak so jao — fixed 0.2s nahi
+        _next_due = min((v["due"] for v in list(_refresh_state.values())), default=time.time() + 1.0)
+        time.sleep(min(15.0, max(0.05, _next_due - time.time())))
 
 
 def _memory_cleanup_loop():
@@ -4567,6 +7622,15 @@ _w3q_global = None
 _w3q_lock   = threading.Lock()
 
 # FIX v29: Stage 1 RPC pool — har snipe pe naya Web3 nahi
+# FIX v121: list module-level — raw TX broadcaster bhi yahi endpoints use karta hai
+_STAGE1_RPCS = [
+    "https://bsc-rpc.publicnode.com",
+    "https://bsc-dataseed.bnbchain.org",
+    "https://bsc-dataseed1.defibit.io",
+    "https://binance.llamarpc.com",
+    "https://bsc.drpc.org",
+    "https://1rpc.io/bnb",
+]
 _stage1_w3_pool = {}
 _stage1_pool_lock = threading.Lock()
 _stage1_rpc_idx = 0  # v86: round-robin index — load spread karo
@@ -4574,14 +7638,7 @@ _stage1_rpc_idx = 0  # v86: round-robin index — load spread karo
 def _get_stage1_w3():
     """Stage 1 ke liye RPC pool — v86: 6 RPCs + round-robin rotation"""
     global _stage1_rpc_idx
-    _rpcs = [
-        "https://bsc-rpc.publicnode.com",
-        "https://bsc-dataseed.bnbchain.org",
-        "https://bsc-dataseed1.defibit.io",
-        "https://binance.llamarpc.com",
-        "https://bsc.drpc.org",
-        "https://1rpc.io/bnb",
-    ]
+    _rpcs = _STAGE1_RPCS
     with _stage1_pool_lock:
         # v86: round-robin — har call pe next RPC use karo, rate limit spread hoga
         _start = _stage1_rpc_idx % len(_rpcs)
@@ -4717,26 +7774,12 @@ _FM_FACTORY_ADDRS = [
 ]
 _FM_FACTORY_ADDR = "0x5c952063c7fc8610ffdb798152d69f0b9550762b"
 
-# ── Gas price cache — buy ke time fast ──
-_fm_gas_cache = {"price": 0, "ts": 0}
-_fm_gas_lock  = threading.Lock()
+# ── Gas price — buy ke time fast ──
+_FM_MIN_GAS = 1_000_000_000  # 1 gwei minimum — FourMeme 'GW' error avoid
 
-def _fm_get_cached_gas(w3):
-    """Har 10s mein gas price update — buy ke time 0ms"""
-    import time as _t
-    _FM_MIN_GAS = 1_000_000_000  # 1 gwei minimum — FourMeme 'GW' error avoid
-    with _fm_gas_lock:
-        if _t.time() - _fm_gas_cache["ts"] < 10 and _fm_gas_cache["price"] > 0:
-            return max(_fm_gas_cache["price"], _FM_MIN_GAS)
-    try:
-        gp = w3.eth.gas_price
-        gp = max(gp, _FM_MIN_GAS)
-        with _fm_gas_lock:
-            _fm_gas_cache["price"] = gp
-            _fm_gas_cache["ts"]    = _t.time()
-        return gp
-    except:
-        return 3_000_000_000  # FIX v22: dead duplicate body removed
+def _fm_get_cached_gas(w3=None, urgency: str = "normal"):
+    """Gas oracle se 0ms — FIX v122: apna 10s cache hataya, w3 arg compat ke liye"""
+    return max(_gas_price(urgency), _FM_MIN_GAS)
 
 # ── ABIs ──
 # Official helper contract — TokenManagerHelper3
@@ -4855,16 +7898,17 @@ def _fm_get_unique_buyers(token_addr, w3=None):
         print(f"⚠️ [FM] buyers fetch error: {str(e)[:50]}")
         return 0, 0, {}, {}
 
-_fm_sniped      = set()
+# FIX v139: _fm_sniped + _seen ab timer-wheel ExpiringSet — 1000 pe wholesale clear nahi
+_FM_SNIPED_TTL  = 3600   # 1h — FIX v55 wala stale cutoff
+_FM_SEEN_TTL    = 600    # TokenCreate log dedup — workers/RPCs ke repeats
+_fm_sniped      = ExpiringSet(_FM_SNIPED_TTL, tick=1.0, name="fm_sniped")
 _fm_sniped_lock = threading.Lock()
-_fm_sniped_ts:  dict = {}  # FIX v50: timestamp per entry — stale cleanup ke liye
+_fm_seen        = ExpiringSet(_FM_SEEN_TTL, tick=1.0, name="fm_seen")
 
 # FIX v15: Sell dedup — ek token pe ek hi sell ek waqt mein
 _fm_selling_set  = set()
 _fm_selling_ts: dict = {}  # FIX v103: TTL — 90s ke baad lock auto-release
-# FIX v46: In-memory approve cache — sell pe allowance RPC skip karne ke liye
-# Key: "token_addr_lower:spender_addr_lower" → True agar approve confirmed hai
-_fm_approved_cache: dict = {}
+# FIX v46: approve cache — FIX v123: approval service (_appr_cache, persisted) mein move hua
 _fm_selling_lock = threading.Lock()
 
 # Dev history cache — on-chain results cache karo
@@ -5077,8 +8121,8 @@ def _fm_confirm_close(token_addr, sell_pct, reason, tx_hash_hex):
         # galat (24% = 60%*40%) amount add hota — skip karo.
 
         if sell_pct >= 100.0:
-            if not isinstance(auto_trade_stats.get("trade_history"), list):
-                auto_trade_stats["trade_history"] = []
+            if not isinstance(auto_trade_stats.get("trade_history"), TradeHistory):
+                _th_set(auto_trade_stats.get("trade_history"))
             _bnb_at_sell  = market_cache.get("bnb_price", 0)
             bought_at_str = pos.get("bought_at", "")
             _orig_sz      = pos.get("orig_size_bnb", size)
@@ -5128,7 +8172,7 @@ def _fm_confirm_close(token_addr, sell_pct, reason, tx_hash_hex):
             auto_trade_stats["running_positions"].pop(token_addr, None)
             remove_position_from_monitor(token_addr)
             # FIX v25: DB mein bhi position remove karo — redeploy pe wapis na aaye
-            threading.Thread(target=_persist_positions, daemon=True).start()
+            _persist_positions()
             if pnl_pct > 0:
                 auto_trade_stats["wins"]   = auto_trade_stats.get("wins", 0) + 1
             else:
@@ -5136,7 +8180,7 @@ def _fm_confirm_close(token_addr, sell_pct, reason, tx_hash_hex):
 
         _emoji = "🟢" if pnl_pct >= 0 else "🔴"
         _log("sell", token, f"{_emoji} REAL SELL {sell_pct:.0f}% confirmed · PnL {pnl_pct:+.1f}% · {reason}", token_addr)
-        threading.Thread(target=_save_session_to_db, args=(AUTO_SESSION_ID,), daemon=True).start()
+        _save_session_to_db(AUTO_SESSION_ID)
         threading.Thread(target=_save_trade_history_to_db, daemon=True).start()
         print(f"✅ [FM] State closed: {token_addr[:10]} PnL:{pnl_pct:+.1f}%")
 
@@ -5144,37 +8188,30 @@ def _fm_confirm_close(token_addr, sell_pct, reason, tx_hash_hex):
         print(f"⚠️ [FM] confirm close error: {_ce}")
 
 
-def _fm_track_sell_confirmation(tx_hash_hex, token_addr, token_name, w3, sell_pct=100.0, sell_reason="FM sell"):
-    """Background mein TX confirm hone tak track karo — confirm pe paper state close"""
-    try:
-        for _ in range(30):  # 60s max
-            try:
-                _receipt = w3.eth.get_transaction_receipt(tx_hash_hex)
-                if _receipt:
-                    if _receipt["status"] == 1:
-                        print(f"✅ [FM] Sell confirmed: {tx_hash_hex[:12]} — closing state")
-                        _push_notif("success", "✅ Sell Confirmed",
-                            f"{token_name} sell confirmed | TX: {tx_hash_hex[:12]}",
-                            token_name, token_addr)
-                        _fm_confirm_close(token_addr, sell_pct, sell_reason, tx_hash_hex)
-                    else:
-                        print(f"❌ [FM] Sell reverted: {tx_hash_hex[:12]} — position still open")
-                        _push_notif("critical", "🚨 Sell Reverted",
-                            f"{token_name} sell reverted — position still open! Manually sell karo! TX: {tx_hash_hex[:12]}",
-                            token_name, token_addr)
-                    return
-            except Exception:
-                pass
-            time.sleep(2)
+def _fm_track_sell_confirmation(tx_hash_hex, token_addr, token_name, w3=None, sell_pct=100.0, sell_reason="FM sell"):
+    """TX central receipt tracker pe register karo — confirm pe paper state close.
+    FIX v120: apna 2s poll thread nahi — w3 arg ab unused (compat ke liye rakha)."""
+    def _ok(_h, _r):
+        print(f"✅ [FM] Sell confirmed: {_h[:12]} — closing state")
+        _push_notif("success", "✅ Sell Confirmed",
+            f"{token_name} sell confirmed | TX: {_h[:12]}",
+            token_name, token_addr)
+        _fm_confirm_close(token_addr, sell_pct, sell_reason, _h)
+    def _rev(_h, _r):
+        print(f"❌ [FM] Sell reverted: {_h[:12]} — position still open")
+        _push_notif("critical", "🚨 Sell Reverted",
+            f"{token_name} sell reverted — position still open! Manually sell karo! TX: {_h[:12]}",
+            token_name, token_addr)
+    def _lost(_h, _r):
         _push_notif("critical", "⏳ Sell Still Pending",
-            f"{token_name} TX pending 60s — manually check! {tx_hash_hex[:12]}",
+            f"{token_name} TX pending 60s — manually check! {_h[:12]}",
             token_name, token_addr)
-        print(f"⏳ [FM] Still pending 60s: {tx_hash_hex[:12]}")
-    except Exception as _te:
-        print(f"⚠️ [FM] tracker error: {_te}")
+        print(f"⏳ [FM] Still pending 60s: {_h[:12]}")
+    _track_tx(tx_hash_hex, f"FM sell {token_name}", on_confirmed=_ok, on_reverted=_rev, on_dropped=_lost)
 
 
-def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=None, gas_mult: float = 1.2) -> dict:
+def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=None, gas_mult: float = 1.0,
+                     urgency: str = "fast") -> dict:
     """FM Bonding Curve pe real sell — background tracker + 3 retry + BC minFunds"""
     result = {"success": False, "tx_hash": "", "bnb_received": 0.0, "error": "", "status": ""}
 
@@ -5279,75 +8316,29 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
 
         # FIX v18: Approve dynamic tokenManager (factory nahi)
         # FIX v46: cache check pehle — allowance RPC call skip karo agar pehle approve ho chuka
-        # FIX v18: Approve dynamic tokenManager (factory nahi) — March 29 original logic
+        # FIX v123: approval service — persisted cache, approve shared nonce pipeline se
         try:
-            _tc_approve = _w3_fast.eth.contract(
-                address=Web3.to_checksum_address(token_addr), abi=_FM_ERC20_ABI)
-            _allowance = _tc_approve.functions.allowance(
-                wallet_cs, Web3.to_checksum_address(_dynamic_manager)).call()
+            _allowance = _allowance_get(_w3_fast, token_addr, _dynamic_manager, wallet_cs, _amt)
             if _allowance < _amt:
                 print(f"🔑 [FM] Approving Token Manager for sell...")
-                _approve_nonce = _w3_fast.eth.get_transaction_count(wallet_cs, "pending")
-                _approve_tx = _tc_approve.functions.approve(
-                    Web3.to_checksum_address(_dynamic_manager), 2**256 - 1
-                ).build_transaction({
-                    "from":     wallet_cs,
-                    "gas":      100000,
-                    "gasPrice": int(_fm_get_cached_gas(_w3_fast) * 1.5),
-                    "nonce":    _approve_nonce,
-                    "chainId":  56,
-                })
-                from eth_account import Account as _AccA
-                _signed_a = _AccA.sign_transaction(_approve_tx, pk)
-                _ah = _w3_fast.eth.send_raw_transaction(_signed_a.raw_transaction)
-                # FIX v22: instant poll — koi fixed sleep nahi, receipt milte hi action
                 import time as _t22a
-                _approve_confirmed = False
                 _ap_start = _t22a.time()
-                while _t22a.time() - _ap_start < 15:
-                    try:
-                        _rx2 = _w3_fast.eth.get_transaction_receipt(_ah)
-                        if _rx2 is not None:
-                            if _rx2["status"] == 1:
-                                _approve_confirmed = True
-                                print(f"✅ [FM] Approval confirmed ({_t22a.time()-_ap_start:.1f}s)")
-                            else:
-                                print(f"❌ [FM] Approval TX failed onchain")
-                            break
-                    except Exception:
-                        pass
-                    _t22a.sleep(0.3)
-                if not _approve_confirmed:
+                _approve_confirmed, _approve_nonce = _approve_now(
+                    token_addr, _dynamic_manager, 1.5, 15, f"FM {token_addr[:10]}")
+                if _approve_confirmed:
+                    print(f"✅ [FM] Approval confirmed ({_t22a.time()-_ap_start:.1f}s)")
+                else:
                     # FIX v22 Bug4: re-approve turant — higher gas, fresh nonce
                     print(f"⚠️ [FM] Approve not confirmed — re-approving higher gas...")
                     try:
-                        _ra_nonce = _w3_fast.eth.get_transaction_count(wallet_cs, "pending")
-                        _ra_tx = _tc_approve.functions.approve(
-                            Web3.to_checksum_address(_dynamic_manager), 2**256 - 1
-                        ).build_transaction({
-                            "from": wallet_cs, "gas": 100000,
-                            "gasPrice": int(_fm_get_cached_gas(_w3_fast) * 2.0),
-                            "nonce": _ra_nonce, "chainId": 56,
-                        })
-                        from eth_account import Account as _AccRA
-                        _rah = _w3_fast.eth.send_raw_transaction(
-                            _AccRA.sign_transaction(_ra_tx, pk).raw_transaction)
-                        print(f"🔁 [FM] Re-approve TX: {_rah.hex()[:12]}...")
                         _rap_start = _t22a.time()
-                        while _t22a.time() - _rap_start < 15:
-                            try:
-                                _rrx = _w3_fast.eth.get_transaction_receipt(_rah)
-                                if _rrx is not None:
-                                    if _rrx["status"] == 1:
-                                        _approve_confirmed = True
-                                        _approve_nonce = _ra_nonce
-                                        print(f"✅ [FM] Re-approve confirmed ({_t22a.time()-_rap_start:.1f}s)")
-                                    else:
-                                        print(f"❌ [FM] Re-approve failed onchain")
-                                    break
-                            except Exception:
-                                pass
-                            _t22a.sleep(0.3)
+                        _approve_confirmed, _ra_nonce = _approve_now(
+                            token_addr, _dynamic_manager, 2.0, 15, f"FM re {token_addr[:10]}")
+                        if _approve_confirmed:
+                            _approve_nonce = _ra_nonce
+                            print(f"✅ [FM] Re-approve confirmed ({_t22a.time()-_rap_start:.1f}s)")
+                        else:
+                            print(f"❌ [FM] Re-approve failed onchain")
                     except Exception as _rae:
                         print(f"⚠️ [FM] Re-approve error: {str(_rae)[:50]}")
                     if not _approve_confirmed:
@@ -5403,14 +8394,16 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
         tx_hash = None
         _sell_gas_mult = [gas_mult, gas_mult * 1.3, gas_mult * 1.7]  # FIX speed: reason-based gas, escalate on retry
         for _attempt in range(1, 4):
+            _nonce = None
             try:
                 # Restored March 29 (v22) logic: seedha chain se fresh nonce har attempt pe
+                # FIX v124: nonce manager — pehla attempt local counter, retry pe fresh=True chain resync
                 if _attempt > 1:
-                    _nonce = _w3_fast.eth.get_transaction_count(wallet_cs, "pending")
+                    _nonce = get_next_nonce(_w3_fast, wallet_cs, fresh=True)
                 elif _sell_nonce_base is not None:
                     _nonce = _sell_nonce_base
                 else:
-                    _nonce = _w3_fast.eth.get_transaction_count(wallet_cs, "pending")
+                    _nonce = get_next_nonce(_w3_fast, wallet_cs)
                 if is_grad:
                     # Pancake sell
                     pr = _w3_fast.eth.contract(address=_FM_PANCAKE_ROUTER, abi=[{"name":"swapExactTokensForETH","type":"function","stateMutability":"nonpayable","inputs":[{"name":"amountIn","type":"uint256"},{"name":"amountOutMin","type":"uint256"},{"name":"path","type":"address[]"},{"name":"to","type":"address"},{"name":"deadline","type":"uint256"}],"outputs":[{"name":"amounts","type":"uint256[]"}]}])
@@ -5422,7 +8415,7 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
                     ).build_transaction({
                         "from": wallet_cs,
                         "gas": 400000,
-                        "gasPrice": int(_fm_get_cached_gas(_w3_fast) * gas_mult),  # FIX speed: reason-based gas
+                        "gasPrice": int(_fm_get_cached_gas(_w3_fast, urgency) * gas_mult),  # FIX speed: reason-based gas
                         "nonce": _nonce,
                         "chainId": 56
 })
@@ -5448,11 +8441,11 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
                         ).build_transaction({
                             "from":     wallet_cs,
                             "gas":      400000,
-                            "gasPrice": int(_fm_get_cached_gas(_w3_fast) * _sell_gas_mult[_attempt-1]),  # FIX v101: escalate gas on retry
+                            "gasPrice": int(_fm_get_cached_gas(_w3_fast, urgency) * _sell_gas_mult[_attempt-1]),  # FIX v101: escalate gas on retry
                             "nonce":    _nonce,
                             "chainId":  56
 })
-                        print(f"[FM v18] Curve Sell V1 TX — Gwei:{int(_fm_get_cached_gas(_w3_fast)*_sell_gas_mult[_attempt-1])/1e9:.1f} attempt={_attempt}")
+                        print(f"[FM v18] Curve Sell V1 TX — Gwei:{int(_fm_get_cached_gas(_w3_fast, urgency)*_sell_gas_mult[_attempt-1])/1e9:.1f} attempt={_attempt}")
                     else:
                         # V2 — 7 params (with from)
                         tx = fc.functions.sellToken(
@@ -5466,14 +8459,15 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
                         ).build_transaction({
                             "from":     wallet_cs,
                             "gas":      400000,
-                            "gasPrice": int(_fm_get_cached_gas(_w3_fast) * _sell_gas_mult[_attempt-1]),  # FIX v101: escalate gas on retry
+                            "gasPrice": int(_fm_get_cached_gas(_w3_fast, urgency) * _sell_gas_mult[_attempt-1]),  # FIX v101: escalate gas on retry
                             "nonce":    _nonce,
                             "chainId":  56
 })
-                        print(f"[FM v18] Curve Sell V2 TX — Gwei:{int(_fm_get_cached_gas(_w3_fast)*_sell_gas_mult[_attempt-1])/1e9:.1f} attempt={_attempt}")
+                        print(f"[FM v18] Curve Sell V2 TX — Gwei:{int(_fm_get_cached_gas(_w3_fast, urgency)*_sell_gas_mult[_attempt-1])/1e9:.1f} attempt={_attempt}")
                 from eth_account import Account
                 signed  = Account.sign_transaction(tx, pk)
-                tx_hash = _w3_fast.eth.send_raw_transaction(signed.raw_transaction)
+                tx_hash = _broadcast_raw_tx(signed.raw_transaction, f"FM sell {token_addr[:10]}")  # FIX v121
+                _nonce_sent(wallet_cs, _nonce, tx_hash.hex(), tx.get("gasPrice", 0), tx)  # FIX v124 + v141
                 # FIX v45: TX successfully sent — ab lock add karo
                 with _fm_selling_lock:
                     _fm_selling_set.add(_t_lower)
@@ -5481,6 +8475,8 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
                 break  # TX sent — loop se niklo
             except Exception as _se:
                 print(f"⚠️ [FM] Sell attempt {_attempt} failed: {str(_se)[:60]}")
+                if _nonce is not None:
+                    _nonce_release(wallet_cs, _nonce)  # FIX v124: unsent nonce wapas
                 if _attempt == 3:
                     _push_notif("critical", "🚨 MANUAL SELL REQUIRED",
                         f"{token_addr[:10]} — 3 TX send fail! MANUALLY SELL KARO!",
@@ -5501,7 +8497,6 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
 
         def _bc_track_and_parse(_th_hex, _t_addr, _t_name, _w3t, _min_f):
             # FIX v22: instant poll — 0.3s interval, receipt milte hi action, revert = turant retry
-            import time as _ttr
             def _parse_bnb(_rcpt):
                 _bnb_got = _min_f / 1e18 if _min_f > 0 else 0.0
                 _wcs = Web3.to_checksum_address(BSC_WALLET or REAL_WALLET)
@@ -5539,8 +8534,8 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
                     _fc_r = _w3r.eth.contract(
                         address=Web3.to_checksum_address(_mgr_r),
                         abi=_FM_BC_ABI_V1 if _tv_r == 1 else _FM_BC_ABI)
-                    _nn_r = _w3r.eth.get_transaction_count(_wc_r, "pending")  # FIX v114: fresh chain nonce, get_next_nonce stale tha
-                    _gp_r = int(_fm_get_cached_gas(_w3r) * (1.2 + _attempt_num * 0.3))  # FIX v23: was 5.5+2.0x
+                    _nn_r = get_next_nonce(_w3r, _wc_r, fresh=True)  # FIX v114: fresh chain nonce; v124: manager resync
+                    _gp_r = int(_fm_get_cached_gas(_w3r, urgency) * (1.0 + _attempt_num * 0.3))  # FIX v23: was 5.5+2.0x; v122: tier floor 1.2x
                     _zero = "0x0000000000000000000000000000000000000000"
                     if _tv_r == 1:
                         _txr = _fc_r.functions.sellToken(0,Web3.to_checksum_address(_t_addr2),_amt_r,0,0,_zero
@@ -5549,112 +8544,116 @@ def _fm_real_sell_bc(token_addr: str, sell_pct: float, factory_addr: str, w3=Non
                         _txr = _fc_r.functions.sellToken(0,Web3.to_checksum_address(_t_addr2),_wc_r,_amt_r,0,0,_zero
                             ).build_transaction({"from":_wc_r,"gas":400000,"gasPrice":_gp_r,"nonce":_nn_r,"chainId":56})
                     from eth_account import Account as _AccR
-                    _hr = _w3r.eth.send_raw_transaction(_AccR.sign_transaction(_txr, _pk_r).raw_transaction)
+                    try:
+                        _hr = _broadcast_raw_tx(_AccR.sign_transaction(_txr, _pk_r).raw_transaction, f"FM retry #{_attempt_num}")  # FIX v121
+                    except Exception:
+                        _nonce_release(_wc_r, _nn_r); raise  # FIX v124
+                    _nonce_sent(_wc_r, _nn_r, _hr.hex(), _gp_r, _txr)
                     print(f"🔁 [FM BC] Retry sell #{_attempt_num}: {_hr.hex()[:12]}... gwei={_gp_r/1e9:.1f}")
                     return _hr
                 except Exception as _re:
                     print(f"⚠️ [FM BC] Retry #{_attempt_num} send error: {str(_re)[:60]}"); return None
 
-            try:
-                # v96: v92 simple tracker restored + QuickNode + v93 sell_pct
-                _w3_qn    = _get_w3q() or _w3t
-                _cur_hash = _th_hex
-                _max_retry = 3
-                _retries   = 0
-                while _retries <= _max_retry:
-                    _t_start = _ttr.time()
-                    _got_rx  = False
-                    while _ttr.time() - _t_start < 45:  # 45s — BSC ~3s block, headroom enough
-                        try:
-                            _rx = _w3_qn.eth.get_transaction_receipt(_cur_hash)
-                            if _rx:
-                                _got_rx = True
-                                if _rx["status"] == 1:
-                                    _bnb = _parse_bnb(_rx)
-                                    print(f"✅ [FM BC] Sell confirmed: {_cur_hash[:12]} | BNB: {_bnb:.6f}")
-                                    _push_notif("success", "✅ BC Sell Confirmed",
-                                        f"{_t_name} confirmed | BNB:{_bnb:.6f} | TX:{_cur_hash[:12]}", _t_name, _t_addr)
-                                    try:
-                                        _pos_upd = auto_trade_stats["running_positions"].get(_t_addr, {})
-                                        if _pos_upd:
-                                            _pos_upd["_actual_bnb_received"] = _bnb
-                                            try:
-                                                _gas_used_bc  = _rx.get("gasUsed", 0)
-                                                _gas_price_bc = _rx.get("effectiveGasPrice", 0) or _rx.get("gasPrice", 0)
-                                                if _gas_used_bc and _gas_price_bc:
-                                                    _gas_bnb_bc = round((_gas_used_bc * _gas_price_bc) / 1e18, 8)
-                                                    _gas_usd_bc = round(_gas_bnb_bc * market_cache.get("bnb_price", 0), 4)
-                                                    _pos_upd["_actual_gas_bnb"] = _gas_bnb_bc
-                                                    _pos_upd["_actual_gas_usd"] = _gas_usd_bc
-                                            except Exception: pass
-                                            for _lg in _rx["logs"]:
-                                                _tp = _lg.get("topics", [])
-                                                if len(_tp) >= 3:
-                                                    _d = _lg.get("data", "")
-                                                    _d = _d.hex() if isinstance(_d, bytes) else _d
-                                                    try:
-                                                        _tok_amt = int(_d, 16) / 1e18
-                                                        if _tok_amt > 1000:
-                                                            _pos_upd["_actual_tokens_sold"] = _tok_amt
-                                                            break
-                                                    except Exception: pass
-                                    except Exception as _upd_e:
-                                        print(f"⚠️ [FM v26] Position update error: {str(_upd_e)[:40]}")
-                                    _fm_confirm_close(_t_addr, sell_pct, "BC sell confirmed", _cur_hash)
-                                    with _fm_selling_lock: _fm_selling_set.discard(_t_addr.lower()); _fm_selling_ts.pop(_t_addr.lower(), None)
-                                    return
-                                else:
-                                    # Reverted — balance check before retry (v94 fix)
-                                    try:
-                                        _wc_rv = Web3.to_checksum_address(BSC_WALLET or REAL_WALLET)
-                                        _tc_rv = _w3_qn.eth.contract(address=Web3.to_checksum_address(_t_addr), abi=_FM_ERC20_ABI)
-                                        _cb_rv = _tc_rv.functions.balanceOf(_wc_rv).call()
-                                        if _cb_rv < int(_bal * 0.95):
-                                            print(f"✅ [FM v96] Revert but bal reduced — already sold")
-                                            _fm_confirm_close(_t_addr, sell_pct, "BC sell confirmed (bal check)", _cur_hash)
-                                            with _fm_selling_lock: _fm_selling_set.discard(_t_addr.lower()); _fm_selling_ts.pop(_t_addr.lower(), None)
-                                            return
-                                    except Exception: pass
-                                    _retries += 1
-                                    print(f"❌ [FM BC] Reverted: {_cur_hash[:12]} — retry #{_retries}")
-                                    if _retries > _max_retry: break
-                                    _nh = _retry_sell(_t_addr, _w3_qn, _retries)
-                                    if _nh: _cur_hash = _nh.hex()
-                                    else: _retries = _max_retry + 1
-                                break
-                        except Exception: pass
-                        _ttr.sleep(0.3)
-                    if not _got_rx:
-                        _retries += 1
-                        print(f"⏳ [FM BC] No receipt 45s — balance check before retry #{_retries}")
-                        if _retries > _max_retry: break
-                        # Balance check — agar TX already landed toh retry mat karo
-                        try:
-                            _wc_to = Web3.to_checksum_address(BSC_WALLET or REAL_WALLET)
-                            _tc_to = _w3_qn.eth.contract(address=Web3.to_checksum_address(_t_addr), abi=_FM_ERC20_ABI)
-                            _cb_to = _tc_to.functions.balanceOf(_wc_to).call()
-                            if _cb_to < int(_bal * 0.95):
-                                print(f"✅ [FM v96] No receipt but bal reduced — TX landed, skip retry")
-                                _fm_confirm_close(_t_addr, sell_pct, "BC sell confirmed (timeout bal)", _cur_hash)
-                                with _fm_selling_lock: _fm_selling_set.discard(_t_addr.lower()); _fm_selling_ts.pop(_t_addr.lower(), None)
-                                return
-                        except Exception: pass
-                        _nh = _retry_sell(_t_addr, _w3_qn, _retries)
-                        if _nh: _cur_hash = _nh.hex()
-                        else: break
+            # v96: v92 simple tracker restored + QuickNode + v93 sell_pct
+            # FIX v120: 0.3s poll loop → central receipt tracker callbacks (state machine)
+            _w3_qn     = _get_w3q() or _w3t
+            _max_retry = 3
+            _st        = {"cur": _th_hex, "retries": 0}
+
+            def _release():
+                with _fm_selling_lock: _fm_selling_set.discard(_t_addr.lower()); _fm_selling_ts.pop(_t_addr.lower(), None)
+
+            def _give_up():
                 print(f"🚨 [FM BC] Sell {_max_retry} retry fail — MANUALLY SELL!")
                 _push_notif("critical", "🚨 MANUAL SELL REQUIRED",
-                    f"{_t_name} sell {_max_retry}x fail! MANUALLY SELL! TX:{_cur_hash[:12]}", _t_name, _t_addr)
-                with _fm_selling_lock: _fm_selling_set.discard(_t_addr.lower()); _fm_selling_ts.pop(_t_addr.lower(), None)
-            except Exception as _te:
-                print(f"⚠️ [FM BC] tracker error: {_te}")
-                with _fm_selling_lock: _fm_selling_set.discard(_t_addr.lower()); _fm_selling_ts.pop(_t_addr.lower(), None)
-        import threading as _th
-        _th.Thread(
-            target=_bc_track_and_parse,
-            args=(tx_hash.hex(), token_addr, token_addr[:10], _w3_fast, _min_funds),
-            daemon=True
-        ).start()
+                    f"{_t_name} sell {_max_retry}x fail! MANUALLY SELL! TX:{_st['cur'][:12]}", _t_name, _t_addr)
+                _release()
+
+            def _bal_reduced() -> bool:
+                # Balance check — agar TX already landed toh retry mat karo
+                try:
+                    _wc_rv = Web3.to_checksum_address(BSC_WALLET or REAL_WALLET)
+                    _tc_rv = _w3_qn.eth.contract(address=Web3.to_checksum_address(_t_addr), abi=_FM_ERC20_ABI)
+                    return _tc_rv.functions.balanceOf(_wc_rv).call() < int(_bal * 0.95)
+                except Exception:
+                    return False
+
+            def _retry_or_give_up():
+                _nh = _retry_sell(_t_addr, _w3_qn, _st["retries"])
+                if _nh: _watch(_nh.hex())
+                else: _give_up()
+
+            def _on_ok(_h, _rx):
+                _bnb = _parse_bnb(_rx)
+                print(f"✅ [FM BC] Sell confirmed: {_h[:12]} | BNB: {_bnb:.6f}")
+                _push_notif("success", "✅ BC Sell Confirmed",
+                    f"{_t_name} confirmed | BNB:{_bnb:.6f} | TX:{_h[:12]}", _t_name, _t_addr)
+                try:
+                    _pos_upd = auto_trade_stats["running_positions"].get(_t_addr, {})
+                    if _pos_upd:
+                        _pos_upd["_actual_bnb_received"] = _bnb
+                        try:
+                            _gas_used_bc  = _rx.get("gasUsed", 0)
+                            _gas_price_bc = _rx.get("effectiveGasPrice", 0) or _rx.get("gasPrice", 0)
+                            if _gas_used_bc and _gas_price_bc:
+                                _gas_bnb_bc = round((_gas_used_bc * _gas_price_bc) / 1e18, 8)
+                                _gas_usd_bc = round(_gas_bnb_bc * market_cache.get("bnb_price", 0), 4)
+                                _pos_upd["_actual_gas_bnb"] = _gas_bnb_bc
+                                _pos_upd["_actual_gas_usd"] = _gas_usd_bc
+                        except Exception: pass
+                        for _lg in _rx["logs"]:
+                            _tp = _lg.get("topics", [])
+                            if len(_tp) >= 3:
+                                _d = _lg.get("data", "")
+                                _d = _d.hex() if isinstance(_d, bytes) else _d
+                                try:
+                                    _tok_amt = int(_d, 16) / 1e18
+                                    if _tok_amt > 1000:
+                                        _pos_upd["_actual_tokens_sold"] = _tok_amt
+                                        break
+                                except Exception: pass
+                except Exception as _upd_e:
+                    print(f"⚠️ [FM v26] Position update error: {str(_upd_e)[:40]}")
+                _fm_confirm_close(_t_addr, sell_pct, "BC sell confirmed", _h)
+                _release()
+
+            def _on_rev(_h, _rx):
+                # Reverted — balance check before retry (v94 fix)
+                if _bal_reduced():
+                    print(f"✅ [FM v96] Revert but bal reduced — already sold")
+                    _fm_confirm_close(_t_addr, sell_pct, "BC sell confirmed (bal check)", _h)
+                    _release(); return
+                _allowance_invalidate(_t_addr)  # FIX v123: approve cache galat ho sakta hai
+                _st["retries"] += 1
+                print(f"❌ [FM BC] Reverted: {_h[:12]} — retry #{_st['retries']}")
+                if _st["retries"] > _max_retry: _give_up(); return
+                _retry_or_give_up()
+
+            def _on_lost(_h, _rx):
+                _st["retries"] += 1
+                print(f"⏳ [FM BC] No receipt 45s — balance check before retry #{_st['retries']}")
+                if _st["retries"] > _max_retry: _give_up(); return
+                if _bal_reduced():
+                    print(f"✅ [FM v96] No receipt but bal reduced — TX landed, skip retry")
+                    _fm_confirm_close(_t_addr, sell_pct, "BC sell confirmed (timeout bal)", _h)
+                    _release(); return
+                _retry_or_give_up()
+
+            def _guard(_fn):
+                def _cb(_h, _rx):
+                    try: _fn(_h, _rx)
+                    except Exception as _te:
+                        print(f"⚠️ [FM BC] tracker error: {_te}")
+                        _release()
+                return _cb
+
+            def _watch(_h):
+                _st["cur"] = _h
+                _track_tx(_h, f"FM BC sell {_t_name}", on_confirmed=_guard(_on_ok),
+                          on_reverted=_guard(_on_rev), on_dropped=_guard(_on_lost), timeout=45)  # 45s — BSC ~3s block, headroom enough
+
+            _watch(_th_hex)
+        _bc_track_and_parse(tx_hash.hex(), token_addr, token_addr[:10], _w3_fast, _min_funds)
 
         # FIX v47: Partial sell (sell_pct < 100) ke baad lock turant release karo
         # Bug: TP1 40% sell TX send hota hai → _fm_selling_set mein lock rehta hai 20-60s
@@ -5722,6 +8721,27 @@ def _fm_honeypot_sim(token_addr, factory_addr, w3=None):
 
 # REMOVED: duplicate _fm_real_sell_bc (old buggy version with approve) — FIX A
 
+# FIX v142: BUY row write-behind se jaata hai (1s batch, Supabase down = outbox) — confirm pe
+# direct update aksar 0 rows match karta tha. Ab fill/timing fields queued row mein merge hote hain;
+# BUY row abhi bana hi nahi to patch yahan rukta hai aur insert ke waqt merge hota hai.
+_fm_evt_buys = ExpiringSet(3600, tick=10.0)   # token_lower — BUY row enqueue ho chuka
+_fm_evt_patch = ExpiringSet(600, tick=10.0)   # token_lower → fields — BUY row se pehle confirm aaya
+_fm_evt_lock = threading.Lock()
+
+def _fm_event_buy_patch(token_addr: str, fields: dict):
+    """Buy confirm ke fill/timing fields BUY fm_event row mein"""
+    _k = token_addr.lower()
+    with _fm_evt_lock:
+        if _k not in _fm_evt_buys:
+            _fm_evt_patch.add(_k, dict(_fm_evt_patch.get(_k) or {}, **fields))
+            return
+    if _wb_patch_insert("fm_events", {"token_address": _k, "result": "BUY"}, fields):
+        return
+    # Row Supabase tak pahunch chuka — ab update match karega
+    if supabase:
+        supabase.table("fm_events").update(fields).eq("token_address", token_addr).eq("result", "BUY") \
+            .order("detected_at", desc=True).limit(1).execute()
+
 def _save_fm_event(token_addr, liq_bnb, grad_price, snipe_price, pump_pct, result, skip_reason, time_ms,
                    buyers_at_entry=0, momentum_pct=0.0, volume_change=0.0, pump_at_entry=0.0, dev_wallet_pct=0.0, mc_usd=0.0, total_buys_at_entry=0,
                    # FIX v32: ye params pehle undefined the — NameError se har event fail hota tha
@@ -5731,15 +8751,8 @@ def _save_fm_event(token_addr, liq_bnb, grad_price, snipe_price, pump_pct, resul
     """FM event Supabase mein save karo — extra analytics data bhi"""
     try:
         if not supabase: return
-        try:
-            _cnt = supabase.table("fm_events").select("id", count="exact").execute()
-            if (_cnt.count or 0) >= 5000:
-                _old = supabase.table("fm_events").select("id").order("detected_at", desc=False).limit(500).execute()
-                _ids = [r["id"] for r in (_old.data or []) if r.get("id")]
-                if _ids:
-                    supabase.table("fm_events").delete().in_("id", _ids).execute()
-        except: pass
-        supabase.table("fm_events").insert({
+        # FIX v128: count(exact) + prune har event pe hatao — retention _fm_events_prune_loop karta hai
+        _evt = {
             "token_address":    token_addr,
             "token_short":      token_addr[:10],
             "detected_at":      datetime.now(_IST).isoformat(),
@@ -5768,7 +8781,17 @@ def _save_fm_event(token_addr, liq_bnb, grad_price, snipe_price, pump_pct, resul
             "actual_fill":         float(actual_fill or 0),
             "slippage_pct":        round(float(slippage_pct or 0), 2),
             "entry_type":          str(entry_type or ""),
-}).execute()
+}
+        if result == "BUY":
+            # FIX v142: confirm pehle aa gaya ho to uske fields isi row mein
+            _k = str(token_addr).lower()
+            with _fm_evt_lock:
+                _evt.update(_fm_evt_patch.get(_k) or {})
+                _fm_evt_patch.discard(_k)
+                _wb_insert("fm_events", _evt)  # FIX v127: batched write-behind
+                _fm_evt_buys.add(_k)
+        else:
+            _wb_insert("fm_events", _evt)  # FIX v127: batched write-behind
 
         # Post-skip tracking — 5 min baad price check karo
         if result == "SKIP" and skip_reason != "blacklisted":
@@ -5793,6 +8816,40 @@ def _save_fm_event(token_addr, liq_bnb, grad_price, snipe_price, pump_pct, resul
     except Exception as e:
         print(f"⚠️ [FM] event save error: {e}")
 
+# FIX v128: fm_events retention — har insert pe full count ki jagah periodic pruner.
+# Planner estimate (pg_class.reltuples) sasta hai; cap se upar ho tabhi oldest delete.
+_FM_EVENTS_MAX       = 5000
+_FM_EVENTS_PRUNE_SEC = 600
+_FM_EVENTS_DEL_CHUNK = 500
+_fm_prune_stats      = {"runs": 0, "deleted": 0, "last_estimate": 0, "errors": 0}
+
+def _fm_events_prune_once():
+    if not supabase: return
+    _est = supabase.table("fm_events").select("id", count="estimated").limit(1).execute().count or 0
+    _fm_prune_stats["last_estimate"] = int(_est)
+    _fm_prune_stats["runs"] += 1
+    _excess = int(_est) - _FM_EVENTS_MAX
+    while _excess > 0:
+        _old = supabase.table("fm_events").select("id").order("detected_at", desc=False).limit(
+            min(_FM_EVENTS_DEL_CHUNK, _excess)).execute()
+        _ids = [r["id"] for r in (_old.data or []) if r.get("id")]
+        if not _ids:
+            break
+        supabase.table("fm_events").delete().in_("id", _ids).execute()
+        _fm_prune_stats["deleted"] += len(_ids)
+        _excess -= len(_ids)
+    if _est > _FM_EVENTS_MAX:
+        print(f"🧹 [FM] fm_events pruned: est={_est} → cap {_FM_EVENTS_MAX}")
+
+def _fm_events_prune_loop():
+    while True:
+        try:
+            _fm_events_prune_once()
+        except Exception as _pe:
+            _fm_prune_stats["errors"] += 1
+            print(f"⚠️ [FM] fm_events prune error: {str(_pe)[:80]}")
+        time.sleep(_FM_EVENTS_PRUNE_SEC)
+
 def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
     """
     Four.meme Bonding Curve Sniper v2 — ULTIMATE OPTIMIZED
@@ -5886,9 +8943,8 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
         _ok, _msg = DataGuard.bnb_price_ok()
         if not _ok: _skip(f"DataGuard: {_msg}"); return
         if is_token_blacklisted(token_addr): _skip("blacklisted"); return
-        # FIX v29: O(1) set lookup — 10k list scan avoid karo
-        _th_addrs = {t.get("address","").lower() for t in auto_trade_stats.get("trade_history", [])}
-        if addr_lower in _th_addrs:
+        # FIX v29/v135: O(1) — index incremental hai, har call pe set rebuild nahi
+        if is_already_traded(addr_lower):
             _skip("already traded"); return
         if dev_addr and is_dev_blacklisted(dev_addr):
             _skip(f"dev blacklisted: {dev_addr[:10]}"); return
@@ -5906,7 +8962,6 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
         _info_res = [None]
         _dev_pct_res = [0.0]
         _pre_gas = [0]
-        _pre_nonce = [0]
         # FIX v29: _price1 baseline Stage 1 ke parallel — 500ms pehle momentum window shuru
         _price_baseline = [0]
         _funds_baseline = [0]
@@ -5941,7 +8996,8 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                     if TRADE_MODE == "real":
                         _wa = BSC_WALLET or REAL_WALLET
                         if _wa:
-                            _pre_nonce[0] = _w3pf.eth.get_transaction_count(_wa, "pending")
+                            # FIX v124: alag nonce fetch nahi — shared nonce manager warm karo
+                            _nonce_warm(_wa)
             except: pass
 
         def _fetch_price_baseline():
@@ -6483,14 +9539,12 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
             _f_prev     = _f_low
 
             # Pre-fetch nonce parallel mein — buy ke liye ready rehna
+            # FIX v124: shared nonce manager warm — alag get_transaction_count nahi
             _nonce_ready = [None]
             def _prefetch_nonce():
-                try:
-                    _w3n = _get_w3q() or _fm_get_w3()
-                    if _w3n and (BSC_WALLET or REAL_WALLET):
-                        _nonce_ready[0] = _w3n.eth.get_transaction_count(
-                            Web3.to_checksum_address(BSC_WALLET or REAL_WALLET), "pending")
-                except: pass
+                if BSC_WALLET or REAL_WALLET:
+                    _nonce_warm(BSC_WALLET or REAL_WALLET)
+                    _nonce_ready[0] = _nonce_peek(BSC_WALLET or REAL_WALLET)
 
             # Start: next tick fetch preflight
             _next_fut = [None]
@@ -6594,6 +9648,7 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
 
         # FIX v31: DEBUG — buy execute shuru — detect se yahan tak total time
         print(f"⏱️ [FM-DEBUG] BUY START | +{int((time.time()-_t_start)*1000)}ms | entry_price={entry:.6e} BNB | size={size_bnb:.4f}BNB | mode={TRADE_MODE}")
+        _t_decision = time.time()  # FIX v119: decision→submit timing
 
         if TRADE_MODE == "real":
             try:
@@ -6609,8 +9664,8 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                 _bal_check = 0.0
                 _fresh_nonce = 0
                 try:
-                    # Balance: fresh fetch (safety check — zaroori hai)
-                    _bal_check = _w3_buy.eth.get_balance(Web3.to_checksum_address(wallet_addr)) / 1e18
+                    # Balance: FIX v119 — TX pipeline warm cache (<10s), stale ho to fresh fetch
+                    _bal_check = _txp_balance(_w3_buy, Web3.to_checksum_address(wallet_addr))
                 except: pass
                 if _bal_check < size_bnb + 0.002:
                     _skip(f"insufficient wallet balance {_bal_check:.4f} BNB"); return
@@ -6618,37 +9673,32 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                 # Nonce: Stage1 prefetch reuse, sirf stale hone pe fresh fetch
                 # FIX: Buy time pe hamesha fresh nonce lo — prefetch stale ho jaata hai
                 try:
-                    _fresh_nonce = get_next_nonce(_w3_buy, Web3.to_checksum_address(wallet_addr))
+                    # FIX v119: background-synced local counter — RPC sirf sync stale hone pe
+                    _fresh_nonce = _txp_next_nonce(_w3_buy, Web3.to_checksum_address(wallet_addr))
                     print(f"⚡ [FM] Fresh nonce at buy time: {_fresh_nonce}")
                 except Exception as _ne:
-                    _fresh_nonce = _pre_nonce[0] if _pre_nonce[0] > 0 else 0
-                    print(f"⚠️ [FM] Nonce fallback to prefetch: {_fresh_nonce}")
-
-                fc = _w3_buy.eth.contract(address=Web3.to_checksum_address(_FM_FACTORY_ADDR), abi=_FM_BC_ABI)
-                tx = fc.functions.buyTokenAMAP(
-                    Web3.to_checksum_address(token_addr),
-                    int(size_bnb * 1e18),
-                    _min_tokens
-                ).build_transaction({
-                    "from": wallet_addr,
-                    "value": int(size_bnb * 1e18),
-                    "gas": 400000,
-                    "gasPrice": int((_pre_gas[0] or _fm_get_cached_gas(_w3_buy)) * 1.5),
-                    "nonce": _fresh_nonce,
-                    "chainId": 56
-})
-                from eth_account import Account
-                signed = Account.sign_transaction(tx, pk)
-                tx_hash = _w3_buy.eth.send_raw_transaction(signed.raw_transaction)
+                    # FIX v124: prefetch value unallocated hai — reuse = double nonce. Skip karo.
+                    _skip(f"nonce unavailable: {str(_ne)[:40]}"); return
+
+                # FIX v119: cached factory + calldata template + local sign — build_transaction RPC nahi
+                fc = _txp_contract("fm", _w3_buy)
+                _data = _txp_calldata_fm_buy(Web3.to_checksum_address(token_addr), int(size_bnb * 1e18), _min_tokens)
+                tx_hash = _txp_submit(_w3_buy, fc.address, _data, int(size_bnb * 1e18), 400000,
+                                      int((_pre_gas[0] or _fm_get_cached_gas()) * 1.5),
+                                      _fresh_nonce, _t_decision)
+                _txp_spend(size_bnb)
                 # FIX v32: Supabase ke liye buy submit ms
                 _dbg_buy_ms = int((time.time()-_t_start)*1000)
                 # FIX v31: DEBUG — TX blockchain pe submit — detect se yahan tak
                 print(f"✅ [FM] Real buy sent: {tx_hash.hex()}")
                 print(f"⏱️ [FM-DEBUG] TX SENT | +{_dbg_buy_ms}ms | tx={tx_hash.hex()[:16]} | entry={entry:.6e} BNB")
 
-                def _wait_receipt(_th, _w3b, _addr):
+                # FIX v120: wait_for_transaction_receipt thread hataya — central tracker callback
+                # _r=None (dropped/replaced) → neeche wala fallback/ghost-cleanup path
+                def _on_buy_receipt(_th, _w3b, _addr, _r=None, _lost=""):
                     try:
-                        _r = _w3b.eth.wait_for_transaction_receipt(_th, timeout=60)
+                        if _r is None:
+                            raise TimeoutError(f"buy tx {_lost or 'not found'} — no receipt in 60s")
                         if _r["status"] == 1:
                             print(f"✅ [FM] Buy confirmed: {_th.hex()[:12]}")
                             # FIX v91: TX logs se actual tokens received parse karo
@@ -6712,17 +9762,17 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                                     print(f"✅ [FM] Entry updated: {_real_entry:.10f} (was {entry:.10f})")
                                     print(f"⏱️ [FM-DEBUG] TX CONFIRMED | intended={entry:.6e} | actual_fill={_real_entry:.6e} | slippage={_slip:+.2f}% | tx={_th.hex()[:16]}")
                                     try:
-                                        if supabase:
-                                            # FIX v41 H: Restore timing data update — b54a874 ne delete kiya tha
-                                            supabase.table("fm_events").update({
-                                                "actual_fill":   float(_real_entry),
-                                                "slippage_pct":  float(_slip),
-                                                "buy_submit_ms": int(_dbg_buy_ms or 0),
-                                                "stage1_ms":     int(_dbg_stage1_ms or 0),
-                                                "stage2_ms":     int(_dbg_stage2_ms or 0),
-                                                "price1":        float(_dbg_price1 or 0),
-                                                "price2":        float(_dbg_price2 or 0),
-                                            }).eq("token_address", _addr).order("detected_at", desc=True).limit(1).execute()
+                                        # FIX v41 H: Restore timing data update — b54a874 ne delete kiya tha
+                                        # FIX v142: queued BUY row mein merge (write-behind ke baad direct update miss hota tha)
+                                        _fm_event_buy_patch(_addr, {
+                                            "actual_fill":   float(_real_entry),
+                                            "slippage_pct":  float(_slip),
+                                            "buy_submit_ms": int(_dbg_buy_ms or 0),
+                                            "stage1_ms":     int(_dbg_stage1_ms or 0),
+                                            "stage2_ms":     int(_dbg_stage2_ms or 0),
+                                            "price1":        float(_dbg_price1 or 0),
+                                            "price2":        float(_dbg_price2 or 0),
+                                        })
                                     except Exception as _dbu:
                                         print(f"⚠️ [FM] Supabase timing update error: {str(_dbu)[:50]}")
                             except Exception as _ep:
@@ -6750,48 +9800,9 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                                     except Exception as _te2:
                                         print(f"⚠️ [FM] Pre-approve getTokenInfo failed: {str(_te2)[:40]} — factory fallback")
 
-                                    _tc2 = _w3p.eth.contract(address=Web3.to_checksum_address(_addr2), abi=_FM_ERC20_ABI)
-                                    _allow = _tc2.functions.allowance(
-                                        Web3.to_checksum_address(_wa2),
-                                        Web3.to_checksum_address(_spender)
-                                    ).call()
-                                    if _allow > 0:
-                                        print(f"✅ [FM] Already approved: {_addr2[:10]}"); return
-                                    from eth_account import Account as _Acc
-                                    _atx = _tc2.functions.approve(
-                                        Web3.to_checksum_address(_spender),
-                                        2**256 - 1
-                                    ).build_transaction({
-                                        "from": _wa2,
-                                        "gas": 100000,
-                                        "gasPrice": int(_fm_get_cached_gas(_w3p) * 1.5),  # FIX v23: was 3.0x
-                                        "nonce": get_next_nonce(_w3p, _wa2)
-})
-                                    _sa = _Acc.sign_transaction(_atx, _pk2)
-                                    _ah = _w3p.eth.send_raw_transaction(_sa.raw_transaction)
-                                    print(f"📡 [FM] Pre-approve TX sent: {_ah.hex()[:12]}...")
-
-                                    # FIX v21: non-blocking poll — wait_for_receipt block karta tha 30s
-                                    # Ab 2s interval pe check karo, max 30s
-                                    import time as _t21
-                                    for _pi in range(15):
-                                        _t21.sleep(2)
-                                        try:
-                                            _rx = _w3p.eth.get_transaction_receipt(_ah)
-                                            if _rx is not None:
-                                                if _rx["status"] == 1:
-                                                    print(f"✅ [FM] Pre-approve confirmed ({_pi*2+2}s): {_addr2[:10]} → spender: {_spender[:10]}")
-                                                    # FIX v46: cache mein daal do — sell pe allowance RPC skip hogi
-                                                    _cache_key = f"{_addr2.lower()}:{_spender.lower()}"
-                                                    _fm_approved_cache[_cache_key] = True
-                                                    print(f"⚡ [FM] Approve cached: {_cache_key[:24]}")
-                                                else:
-                                                    print(f"⚠️ [FM] Pre-approve TX failed onchain: {_addr2[:10]}")
-                                                break
-                                        except Exception:
-                                            pass
-                                    else:
-                                        print(f"⚠️ [FM] Pre-approve not confirmed in 30s — sell pe runtime approve hoga")
+                                    # FIX v123: approval service — batched allowance check + shared nonce pipeline
+                                    # (confirm pe persisted cache update, sell pe allowance RPC skip)
+                                    _schedule_approve(_addr2, _spender, f"FM {_addr2[:10]}")
                                 except Exception as _pe:
                                     print(f"⚠️ [FM] Pre-approve error: {str(_pe)[:50]}")
                             threading.Thread(target=_pre_approve, args=(_addr,), daemon=True).start()
@@ -6825,11 +9836,15 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                             print(f"🗑️ [FM v66] Ghost position cleanup — TX unconfirmed: {_addr[:10]}")
                             auto_trade_stats["running_positions"].pop(_addr, None)
                             remove_position_from_monitor(_addr)
-                            threading.Thread(target=_persist_positions, daemon=True).start()
+                            _persist_positions()
                             _push_notif("critical", "🔴 FM TX Unconfirmed",
                                 f"Receipt nahi mila — position hataya | {str(_re)[:40]}",
                                 token_name, _addr)
-                threading.Thread(target=_wait_receipt, args=(tx_hash, _w3_buy, token_addr), daemon=True).start()
+                _track_tx(tx_hash, f"FM buy {token_name}", wallet_addr, _fresh_nonce,
+                          on_confirmed=lambda _h, _rx: _on_buy_receipt(tx_hash, _w3_buy, token_addr, _rx),
+                          on_reverted=lambda _h, _rx: _on_buy_receipt(tx_hash, _w3_buy, token_addr, _rx),
+                          on_dropped=lambda _h, _rx: _on_buy_receipt(tx_hash, _w3_buy, token_addr, None, "dropped"),
+                          on_replaced=lambda _h, _rx: _on_buy_receipt(tx_hash, _w3_buy, token_addr, None, "replaced"))
             except Exception as e:
                 _err = str(e)[:60]
                 if "insufficient funds" in _err.lower():
@@ -6847,6 +9862,10 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                 _skip(f"real buy error: {_err}"); return
         else:
             sess["paper_balance"] = round(sess.get("paper_balance",5.0) - size_bnb, 6)
+            # FIX v125: paper entry = curve ka exact fill (tryBuy) — lastPrice pe free fill nahi
+            _pfill = _sim_fill_buy(token_addr, size_bnb, entry, fm=True)
+            entry  = _pfill["price"]
+            print(f"🧮 [SIM] FM paper fill: {_pfill['model']} slip={_pfill['slip_pct']:.2f}% @ {entry:.3e}")
 
         ms = int((time.time() - _t_start) * 1000)
         try:
@@ -6863,7 +9882,7 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
             return
 
         add_position_to_monitor(AUTO_SESSION_ID, token_addr, token_name, entry, size_bnb, stop_loss_pct=float(_fm_filters['stop_loss']))
-        auto_trade_stats["running_positions"][token_addr] = {
+        auto_trade_stats["running_positions"][token_addr] = _new_position(token_addr, **{
             "token": token_name,
             "entry": entry,
             "size_bnb": size_bnb,
@@ -6897,7 +9916,12 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
             "liquidity_bnb_entry": round(float(_funds2 / 1e18 if _funds2 else 0), 4),
             "entry_type":          _entry_type,
             "entry_price_confirmed": False,  # background thread True karega
-        }
+        })
+        if TRADE_MODE != "real":
+            # FIX v125: sim fill hi paper ka final entry hai — bg balanceOf overwrite na kare
+            auto_trade_stats["running_positions"][token_addr].update({
+                "fill_model": _pfill["model"], "sim_buy_slip_pct": _pfill["slip_pct"],
+                "entry_price_confirmed": _pfill["model"] == "exact"})
         print(f"✅ [FM v76] Position registered instantly after TX | {ms}ms")
 
         # FIX v91: lastPrice + fee fetch — background thread mein (non-blocking)
@@ -6950,7 +9974,8 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
         threading.Thread(target=_bg_entry_update, args=(token_addr, size_bnb, entry, _w3a), daemon=True).start()
         auto_trade_stats["total_auto_buys"] += 1
         _scanner_stats["fm_bought"] = _scanner_stats.get("fm_bought", 0) + 1
-        threading.Thread(target=_persist_positions, daemon=True).start()
+        _persist_positions()
+        _save_session_to_db(AUTO_SESSION_ID)  # FIX v130: buy stats — positions ab alag rows mein
 
         def _fetch_token_name(ta):
             try:
@@ -6991,54 +10016,17 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
         print(f"✅ [FM] BC SNIPED: {token_name} mc=${_mc_usd:.0f} momentum=+{_momentum_pct:.1f}% {ms}ms")
 
         def _fm_price_monitor(ta, t_name):
-            """FM BC instant price monitor — har ~1s getTokenInfo se price update"""
-            print(f"📡 [FM] Price monitor started: {ta[:10]}")
-            _last_price = [0.0]
-            _no_change_count = [0]
+            """FM BC 30s buyers check — price refresh ab price_monitor_loop scheduler karta hai (FIX v117)"""
+            print(f"📡 [FM] Buyers watch started: {ta[:10]}")
             _start_time = time.time()
             _buyer_checked = [False]
 
-            while ta in auto_trade_stats.get("running_positions", {}):
+            while ta in auto_trade_stats.get("running_positions", {}) and not _buyer_checked[0]:
                 try:
                     _w3f = _get_w3q() or _fm_get_w3()
                     if not _w3f:
                         time.sleep(1); continue
 
-                    _info = _fm_get_token_info(ta, _w3f)
-                    if _info and _info.get("lastPrice", 0) > 0:
-                        _bnb_p = market_cache.get("bnb_price", 0)
-                        _quote  = str(_info.get("quote", "")).lower()
-                        if "usdt" in _quote or "busd" in _quote or "usd" in _quote:
-                            _price = (_info["lastPrice"] / 1e18) / _bnb_p if _bnb_p > 0 else 0
-                        else:
-                            _price = _info["lastPrice"] / 1e18
-
-                        if _price > 0:
-                            with monitor_lock:
-                                if ta in monitored_positions:
-                                    monitored_positions[ta]["current"] = _price
-                                    if _price > monitored_positions[ta].get("high", 0):
-                                        monitored_positions[ta]["high"] = _price
-
-                            # Funds parallel update — position manager ke liye
-                            _funds_now = _info.get("funds", 0) / 1e18
-                            if _funds_now > 0:
-                                _rp_fm = auto_trade_stats["running_positions"].get(ta)
-                                if _rp_fm is not None:
-                                    _fh = _rp_fm.get("_fm_funds_hist", [])
-                                    _fh.append(_funds_now)
-                                    if len(_fh) > 6: _fh.pop(0)
-                                    _rp_fm["_fm_funds_hist"] = _fh
-
-                            # Price change track karo
-                            if _last_price[0] > 0:
-                                _chg = abs(_price - _last_price[0]) / _last_price[0] * 100
-                                if _chg < 0.01:  # 0.01% se kam change
-                                    _no_change_count[0] += 1
-                                else:
-                                    _no_change_count[0] = 0
-                            _last_price[0] = _price
-
                     # 30s baad buyers check karo — sirf ek baar
                     if not _buyer_checked[0] and (time.time() - _start_time) >= 30:
                         _buyer_checked[0] = True
@@ -7063,7 +10051,7 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                                     new_buyers.add(_to)
                             if len(new_buyers) < 2:
                                 print(f"⚠️ [FM] No buyers 30s — force exit: {ta[:10]}")
-                                _auto_paper_sell(ta, "FM No buyers 30s ❌", 100.0)
+                                _queue_sell(ta, "FM No buyers 30s ❌", 100.0)
                             else:
                                 print(f"✅ [FM] {len(new_buyers)} buyers 30s — holding: {ta[:10]}")
                         except Exception:
@@ -7072,9 +10060,9 @@ def _fm_snipe(token_addr, dev_addr="", detected_at=0.0):
                 except Exception as _fe:
                     pass
 
-                time.sleep(0.1)  # FIX v37 C: 0.2s → 0.1s — FM price 10x/sec
+                time.sleep(1)
 
-            print(f"📡 [FM] Price monitor stopped: {ta[:10]}")
+            print(f"📡 [FM] Buyers watch stopped: {ta[:10]}")
 
         threading.Thread(target=_fm_price_monitor, args=(token_addr, token_name), daemon=True).start()
 
@@ -7101,8 +10089,7 @@ def poll_four_meme_v2():
          "TokenCreate(address,address,uint256,uint256)"),
     ]
 
-    _seen      = set()
-    _seen_lock = threading.Lock()
+    _seen      = _fm_seen  # FIX v139: module-level ExpiringSet — restart pe bhi ek hi instance
     _active_topic = [None]
 
     # 3 different RPCs — each worker uses own RPC
@@ -7121,17 +10108,7 @@ def poll_four_meme_v2():
             if _al in _seen: return
             _seen.add(_al)
             _fm_sniped.add(_al)  # turant add — koi doosra thread aage nahi nikal sakta
-            _fm_sniped_ts[_al] = time.time()
-            # FIX v55: _seen clear hone pe _fm_sniped bhi sync karo
-            # _seen.clear() ke baad _fm_sniped mein stale entries block karti thi
-            if len(_seen) > 1000:
-                _seen.clear()
-                # _fm_sniped bhi clear karo — 1h se purane hi rakho
-                _now_ts = time.time()
-                _stale = [k for k, t in _fm_sniped_ts.items() if _now_ts - t > 3600]
-                for _sk in _stale:
-                    _fm_sniped.discard(_sk)
-                    _fm_sniped_ts.pop(_sk, None)
+            # FIX v139: expiry timer wheel karta hai (_seen 10m, _fm_sniped 1h) — bulk clear nahi
 
         if not FM_SNIPER_ENABLED: return
 
@@ -7800,7 +10777,7 @@ def scan_bsc_token(address): return run_full_sniper_checklist(address)
 
 # ========== BOT DECISION LOGGER ==========
 def _save_bot_decision(data: dict):
-    """Har decision Supabase bot_decisions table mein save karo — background thread"""
+    """Har decision Supabase bot_decisions table mein save karo — write-behind queue (FIX v127)"""
     if not supabase:
         return
     try:
@@ -7840,7 +10817,7 @@ def _save_bot_decision(data: dict):
             "market_condition":     data.get("market_condition", "unknown"),
             "exit_type":            data.get("exit_type")
 }
-        supabase.table("bot_decisions").insert(row).execute()
+        _wb_insert("bot_decisions", row)  # FIX v127: batched write-behind
     except Exception as e:
         print(f"⚠️ bot_decision save error: {e}")
 
@@ -7882,7 +10859,7 @@ def log_trade_internal(session_id: str, trade: dict):
     if token_addr:
         remove_position_from_monitor(token_addr)
     
-    threading.Thread(target=_save_session_to_db, args=(session_id,), daemon=True).start()
+    _save_session_to_db(session_id)
     return lesson
 
 def check_paper_to_real_readiness(session_id: str) -> Dict:
@@ -7892,12 +10869,31 @@ def check_paper_to_real_readiness(session_id: str) -> Dict:
     daily_loss  = sess.get("daily_loss",  0.0)
     win_rate    = round((win_count / trade_count * 100), 1) if trade_count > 0 else 0.0
     _bal_check  = sess.get("paper_balance", 5.0) or 5.0
-    ready       = trade_count >= 30 and win_rate >= 70.0 and daily_loss < (_bal_check * 0.15)
+    # FIX v125: WR tabhi meaningful jab paper fills exact (impact + tax) the — flat 0.5% fills optimistic
+    _paper_closed = [t for t in (auto_trade_stats.get("trade_history") or [])[-30:]
+                     if isinstance(t, dict) and t.get("mode", "paper") != "real" and t.get("result") in ("win", "loss")]
+    _exact_n    = sum(1 for t in _paper_closed if t.get("fill_model") == "exact")
+    _exact_pct  = round(_exact_n / len(_paper_closed) * 100, 1) if _paper_closed else 0.0
+    _slips      = [float(t.get("sim_buy_slip_pct", 0) or 0) + float(t.get("sim_sell_slip_pct", 0) or 0)
+                   for t in _paper_closed if t.get("fill_model") == "exact"]
+    _loss_cap   = _bal_check * 0.15
+    ready       = trade_count >= 30 and win_rate >= 70.0 and daily_loss < _loss_cap and _exact_pct >= 80.0
+    # FIX v150: message wahi condition bataye jo sach mein fail hui (pehle daily-loss block pe bhi "Need 30+ trades")
+    if ready:
+        _msg = "✅ Ready!"
+    elif trade_count < 30 or win_rate < 70.0:
+        _msg = f"📝 Need 30+ trades ({trade_count}) & 70% WR ({win_rate:.0f}%)."
+    elif daily_loss >= _loss_cap:
+        _msg = f"📝 Daily loss {daily_loss:.2f} BNB limit ({_loss_cap:.2f}) pe — kal try karo."
+    else:
+        _msg = f"📝 Sirf {_exact_pct:.0f}% paper trades exact fill pe — 80% chahiye."
     return {
         "ready": ready, "stop_trading": daily_loss >= (sess.get("paper_balance", 5.0) * 0.15),
         "trade_count": trade_count, "win_count": win_count,
         "win_rate": win_rate, "daily_loss": round(daily_loss, 2),
-        "message": "✅ Ready!" if ready else f"📝 Need 30+ trades ({trade_count}) & 70% WR ({win_rate:.0f}%).",
+        "exact_fill_pct": _exact_pct,
+        "avg_roundtrip_slip_pct": round(sum(_slips) / len(_slips), 2) if _slips else 0.0,
+        "message": _msg,
         "transition": {"week_1": "25%", "week_2": "50%", "week_3": "75%", "week_4": "100%"}
     }
 
@@ -8081,11 +11077,8 @@ def get_llm_reply(user_message: str, history: list, session_data: dict) -> str:
 # ========== FLASK ROUTES ==========
 def _persist_settings():
     """Sari current settings ek saath DB mein save karo"""
-    if not supabase:
-        print("⚠️ _persist_settings: supabase not connected — settings not saved!")
-        return
     try:
-        supabase.table("memory").upsert({
+        _wb_upsert("memory", "MRBLACK_SETTINGS", row={  # FIX v129: local store + async mirror
             "session_id": "MRBLACK_SETTINGS",
             "role":       "system",
             "content": json.dumps({
@@ -8096,24 +11089,21 @@ def _persist_settings():
                 "checklist":     CHECKLIST_SETTINGS
 }),
             "updated_at": datetime.utcnow().isoformat()
-        }, on_conflict="session_id").execute()
+        })
     except Exception as e:
         print(f"⚠️ Settings persist error: {e}")
 
 def _load_all_settings_from_db():
     """Startup pe Supabase se sari settings load karo — restart ke baad bhi persist rahe"""
     global AUTO_BUY_SIZE_BNB, AUTO_MAX_POSITIONS, CHECKLIST_SETTINGS, TRADE_MODE, REAL_WALLET
-    if not supabase:
-        print("⚠️ _load_all_settings_from_db: supabase not connected")
-        return
     try:
         import time as _t
         rows = []
         for _attempt in range(3):  # 3 retries
-            res = supabase.table("memory").select("*").eq("session_id", "MRBLACK_SETTINGS").execute()
+            res = _mem_fetch("MRBLACK_SETTINGS")
             rows = res.data if res and res.data else []
-            if rows:
-                break
+            if rows or "MRBLACK_SETTINGS" in _mem_absent:
+                break  # FIX v133: prefetch ne confirm kiya row hai hi nahi — retry bekaar
             print(f"⚙️ Settings not found (attempt {_attempt+1}/3) — retrying in 2s...")
             _t.sleep(2)
         if not rows:
@@ -8144,6 +11134,45 @@ def _load_all_settings_from_db():
 
 _startup_done = False
 _startup_lock = threading.Lock()
+_init_done    = [False]
+
+def init():
+    """FIX v134: network clients + engine — import pe nahi, worker start pe (idempotent)"""
+    global bsc_engine
+    if _init_done[0]:
+        return
+    _init_done[0] = True
+    _t0 = time.time()
+    if bsc_engine is None:
+        bsc_engine = MrBlackChecklistEngine()
+    bool(supabase)
+    bool(w3)
+    _startup_stats["init_ms"] = round((time.time() - _t0) * 1000, 1)
+
+# ── FIX v133: startup readiness barrier ──
+# Pehle loaders ek ke baad ek (har ek blocking query), _startup_restore AUTO row dobara
+# query karta tha, aur trading loops fixed 10–30s sleep pe start hote the — state ready ho
+# ya na ho. Ab: saari memory rows ek multi-row query se prefetch, independent loaders
+# parallel, restore ke baad _state_ready set — loops isi pe wait karte hain.
+_STATE_READY_TIMEOUT = 60
+_state_ready         = threading.Event()
+_startup_stats       = {"t0": 0.0, "import_ms": None, "init_ms": None, "prefetch_ms": 0.0, "prefetched": 0, "loaders_ms": {},
+                        "state_ready_s": None, "first_monitored_s": None}
+
+def _startup_mark(key: str):
+    if _startup_stats.get(key) is None and _startup_stats["t0"]:
+        _startup_stats[key] = round(time.time() - _startup_stats["t0"], 2)
+        print(f"⏱️ Startup {key}: {_startup_stats[key]}s")
+
+def _after_ready(fn, delay: float = 0.0):
+    """Loop wrapper — state ready hone tak ruko (timeout pe bhi chalu, log ke saath)"""
+    def _wrap():
+        if not _state_ready.wait(_STATE_READY_TIMEOUT):
+            print(f"⚠️ [v133] state not ready after {_STATE_READY_TIMEOUT}s — starting {fn.__name__} anyway")
+        if delay:
+            time.sleep(delay)
+        fn()
+    return _wrap
 
 def _startup_once():
     """
@@ -8156,45 +11185,58 @@ def _startup_once():
         if _startup_done: return
         _startup_done = True
         import time as _time
+        _startup_stats["t0"] = _time.time()
+        init()
         def _delayed(fn, delay):
             def _wrap():
                 _time.sleep(delay)
                 fn()
             return _wrap
 
+        def _bg_step(name, *fns):
+            _t0 = _time.time()
+            for fn in fns:
+                try:
+                    fn()
+                except Exception as e:
+                    print(f"{name} load error: {e}")
+            _startup_stats["loaders_ms"][name] = round((_time.time() - _t0) * 1000, 1)
+
+        def _load_auto_session():
+            # AUTO session pre-warm — DB se load karo turant (race condition fix)
+            if AUTO_SESSION_ID in sessions:
+                _load_session_from_db(AUTO_SESSION_ID)  # paper_balance DB se lo — 5.0 default nahi
+            else:
+                get_or_create_session(AUTO_SESSION_ID)  # naya session khud DB se load karta hai
+            print(f"✅ AUTO session ready | balance={sessions.get(AUTO_SESSION_ID, {}).get('paper_balance', 5.0):.4f} BNB")
+
         def _bg_init():
+            # FIX v133: ek multi-row prefetch → loaders parallel (sab local store se) → restore → ready
+            _t0 = _time.time()
             try:
-                _load_all_settings_from_db()  # pehle — TRADE_MODE set hoga
-            except Exception as e:
-                print(f"Settings load error: {e}")
-            try:
-                _load_trade_history_from_db()  # baad mein — sahi TRADE_MODE pe
-            except Exception as e:
-                print(f"Trade history load error: {e}")
-            try:
-                _load_user_profile()
-                print("Profile loaded")
-            except Exception as e:
-                print(f"Profile error: {e}")
-            try:
-                _load_brain_from_db()
-                _ensure_brain_structure()
-                print("Brain loaded")
+                _startup_stats["prefetched"] = _mem_prefetch([
+                    "MRBLACK_SETTINGS", "MRBLACK_USER", "MRBLACK_BRAIN", "MRBLACK_NOTIFICATIONS",
+                    _APPR_SESSION_ID, "SNIPER_STATE", AUTO_SESSION_ID])
             except Exception as e:
-                print(f"Brain error: {e}")
-            try:
-                _load_notifs_from_db()
-            except Exception as e:
-                print(f"Notif load error: {e}")
-            try:
-                # AUTO session pre-warm — DB se load karo turant (race condition fix)
-                get_or_create_session(AUTO_SESSION_ID)
-                _load_session_from_db(AUTO_SESSION_ID)  # paper_balance DB se lo — 5.0 default nahi
-                print(f"✅ AUTO session ready | balance={sessions.get(AUTO_SESSION_ID, {}).get('paper_balance', 5.0):.4f} BNB")
-            except Exception as e:
-                print(f"Session error: {e}")
-
-        threading.Thread(target=_bg_init, daemon=True).start()
+                print(f"⚠️ [v133] state prefetch error: {str(e)[:80]} — loaders khud fetch karenge")
+            _startup_stats["prefetch_ms"] = round((_time.time() - _t0) * 1000, 1)
+            import concurrent.futures as _cf_start
+            with _cf_start.ThreadPoolExecutor(max_workers=7) as _ex:
+                for _f in [
+                    # settings pehle — TRADE_MODE set hoga, phir trade history sahi mode pe
+                    _ex.submit(_bg_step, "Settings+history", _load_all_settings_from_db, _load_trade_history_from_db),
+                    _ex.submit(_bg_step, "Profile", _load_user_profile),
+                    _ex.submit(_bg_step, "Brain", _load_brain_from_db, _ensure_brain_structure),
+                    _ex.submit(_bg_step, "Notif", _load_notifs_from_db),
+                    _ex.submit(_bg_step, "Allowance cache", _appr_load),  # FIX v123: persisted allowance cache
+                    _ex.submit(_bg_step, "Sniper state", _load_sniper_state),
+                    _ex.submit(_bg_step, "Session", _load_auto_session),
+                ]:
+                    _f.result()
+            _bg_step("Restore", _startup_restore)
+            _mem_absent.clear()
+            _state_ready.set()
+            _startup_mark("state_ready_s")
 
         # ✅ Dedicated BNB price loop — tries every 30s until price is live
         def _bnb_price_loop():
@@ -8307,118 +11349,121 @@ def _startup_once():
             threading.Thread(target=_run, daemon=True).start()
 
         # threading.Thread(target=_delayed(poll_new_pairs, 10), daemon=True).start()  # PC only — disabled
-        # Load sniper state from DB — restart pe same ON/OFF state
-        _load_sniper_state()
-
-        if FM_SNIPER_ENABLED:
-            threading.Thread(target=_delayed(poll_four_meme_v2, 15), daemon=True).start()  # 🎓 FM v2
-        else:
-            print("🛑 FM Sniper OFF (saved state) — skipping WSS")
+        # Sniper state (restart pe same ON/OFF) _bg_init mein load hota hai — FIX v133: ready ke baad decide
+        def _fm_start():
+            if FM_SNIPER_ENABLED:
+                poll_four_meme_v2()  # 🎓 FM v2
+            else:
+                print("🛑 FM Sniper OFF (saved state) — skipping WSS")
+        threading.Thread(target=_after_ready(_fm_start), daemon=True).start()
         # ⚡ PC Fast Sniper — background mein chalta hai, _pc_add_to_snipe_queue se trigger hota hai
         # threading.Thread(target=_delayed(start_swap_monitor, 20), daemon=True).start()  # PC only — disabled
 
         # ── Queue Workers Start ──────────────────────────────────
 
-        threading.Thread(target=_delayed(price_monitor_loop,    15),  daemon=True).start()
-        threading.Thread(target=_delayed(_fm_bc_fast_price_loop, 10), daemon=True).start()  # FM BC 0.5s price
-        threading.Thread(target=_delayed(continuous_learning,   25),  daemon=True).start()
-        threading.Thread(target=_delayed(auto_position_manager, 30),  daemon=True).start()
+        # FIX v133: trading loops fixed sleep ki jagah readiness barrier pe
+        threading.Thread(target=_after_ready(price_monitor_loop),         daemon=True).start()
+        threading.Thread(target=_after_ready(continuous_learning, 10),    daemon=True).start()
+        threading.Thread(target=_after_ready(auto_position_manager),      daemon=True).start()
         threading.Thread(target=_delayed(_memory_cleanup_loop,  60),  daemon=True).start()  # MEM FIX
+        threading.Thread(target=_delayed(_fm_events_prune_loop, 90),  daemon=True).start()  # FIX v128
+        threading.Thread(target=_delayed(_pos_journal_loop, 60),     daemon=True).start()  # FIX v131
+        threading.Thread(target=_delayed(_coll_warm, 20),            daemon=True).start()  # FIX v132
+        if REAL_PRIVATE_KEY:
+            threading.Thread(target=_delayed(_txp_warm_loop, 5), daemon=True).start()  # FIX v119: TX pipeline
+        threading.Thread(target=_delayed(_ensure_gas_oracle, 5), daemon=True).start()  # FIX v122: gas oracle
         # threading.Thread(target=_delayed(_whale_follow_loop, 120), daemon=True).start()  # PC only — disabled
 
 
         def _startup_restore():
             try:
-                if supabase:
-                    _db_res = supabase.table("memory").select("open_positions,paper_balance,trade_count,win_count,pattern_database").eq("session_id", AUTO_SESSION_ID).order("updated_at", desc=True).limit(1).execute()
-                    if _db_res.data:
-                        _row = _db_res.data[0]
+                # FIX v129: local store se bhi restore (supabase optional)
+                _db_res = _mem_fetch(AUTO_SESSION_ID)
+                # FIX v131: session row save hone se pehle kill hua ho to bhi journal replay
+                if _db_res.data or _pos_journal_pending():
+                    _row = _db_res.data[0] if _db_res.data else {}
+                    # FIX v130: per-position rows pehle — nahi mile to legacy open_positions blob (migrate)
+                    _saved = _load_position_rows()
+                    _legacy = _saved is None
+                    if _legacy:
                         _raw = _row.get("open_positions", "{}")
                         try:
                             _saved = json.loads(_raw) if isinstance(_raw, str) else (_raw or {})
                         except:
                             _saved = {}
-                        _sess = get_or_create_session(AUTO_SESSION_ID)
-                        _sess["open_positions"] = _saved
-                        if _row.get("paper_balance"):
-                            _sess["paper_balance"] = float(_row["paper_balance"])
-                        if _row.get("trade_count"):
-                            _sess["trade_count"] = int(_row["trade_count"])
-                        if _row.get("win_count"):
-                            _sess["win_count"] = int(_row["win_count"])
-                        try:
-                            _pdb_raw = _row.get("pattern_database", "{}")
-                            _pdb = json.loads(_pdb_raw) if isinstance(_pdb_raw, str) else (_pdb_raw or {})
-                            if isinstance(_pdb, dict):
-                                # ✅ FIX: Stats overwrite nahi karo — _load_session_from_db pehle se sahi load kar chuka hai
-                                # Sirf trade_history fallback karo agar RAM mein kuch nahi
-                                _th = _pdb.get("trade_history", [])
-                                if not auto_trade_stats.get("trade_history") and isinstance(_th, list) and _th:
-                                    auto_trade_stats["trade_history"] = list(_th)
-                                # Sirf total_scanned update karo agar zyada hai
-                                _sc = _pdb.get("total_scanned", 0)
-                                if _sc > 0 and _sc > brain.get("total_tokens_discovered_ever", 0):
-                                    brain["total_tokens_discovered_ever"] = _sc
-                                print(f"✅ Positions restore done | history={len(auto_trade_stats['trade_history'])} wins={auto_trade_stats['wins']} losses={auto_trade_stats['losses']}")
-                        except Exception as _pdb_err:
-                            print(f"⚠️ Auto stats restore error: {_pdb_err}")
                         if _saved:
-                            _restored = 0
-                            _skipped  = 0
-                            _MAX_RESTORE = 200  # All open positions restore karo
-                            _sorted_saved = sorted(_saved.items(), key=lambda x: x[1].get("bought_at",""), reverse=True)
-                            for _addr, _pd in _sorted_saved:
-                                if _restored >= _MAX_RESTORE:
+                            _pos_stats["migrated"] = len(_saved)
+                    else:
+                        # Snapshot = DB mein jo hai; journal wali changes diff se dobara likhi jaayengi
+                        for _a, _d in _saved.items():
+                            _pos_mark_saved(_a, _d)
+                    _saved = _pos_journal_replay(_saved)
+                    _sess = get_or_create_session(AUTO_SESSION_ID)
+                    _sess["open_positions"] = _saved
+                    if _row.get("paper_balance"):
+                        _sess["paper_balance"] = float(_row["paper_balance"])
+                    if _row.get("trade_count"):
+                        _sess["trade_count"] = int(_row["trade_count"])
+                    if _row.get("win_count"):
+                        _sess["win_count"] = int(_row["win_count"])
+                    try:
+                        _pdb_raw = _row.get("pattern_database", "{}")
+                        _pdb = json.loads(_pdb_raw) if isinstance(_pdb_raw, str) else (_pdb_raw or {})
+                        if isinstance(_pdb, dict):
+                            # ✅ FIX: Stats overwrite nahi karo — _load_session_from_db pehle se sahi load kar chuka hai
+                            # Sirf trade_history fallback karo agar RAM mein kuch nahi
+                            _th = _pdb.get("trade_history", [])
+                            if not auto_trade_stats.get("trade_history") and isinstance(_th, list) and _th:
+                                _th_set(_th)
+                            # Sirf total_scanned update karo agar zyada hai
+                            _sc = _pdb.get("total_scanned", 0)
+                            if _sc > 0 and _sc > brain.get("total_tokens_discovered_ever", 0):
+                                brain["total_tokens_discovered_ever"] = _sc
+                            print(f"✅ Positions restore done | history={len(auto_trade_stats['trade_history'])} wins={auto_trade_stats['wins']} losses={auto_trade_stats['losses']}")
+                    except Exception as _pdb_err:
+                        print(f"⚠️ Auto stats restore error: {_pdb_err}")
+                    if _saved:
+                        _restored = 0
+                        _skipped  = 0
+                        _MAX_RESTORE = 200  # All open positions restore karo
+                        _sorted_saved = sorted(_saved.items(), key=lambda x: x[1].get("bought_at",""), reverse=True)
+                        for _addr, _pd in _sorted_saved:
+                            if _restored >= _MAX_RESTORE:
+                                _skipped += 1
+                                continue
+                            if _addr not in auto_trade_stats["running_positions"]:
+                                _entry = float(_pd.get("entry", 0) or 0)
+                                if _entry <= 0:
                                     _skipped += 1
                                     continue
-                                if _addr not in auto_trade_stats["running_positions"]:
-                                    _entry = float(_pd.get("entry", 0) or 0)
-                                    if _entry <= 0:
-                                        _skipped += 1
-                                        continue
-                                    # ✅ FIX: Full position data restore — tp_sold, sl_pct, bought_usd sab wapas
-                                    _tp_sold   = float(_pd.get("tp_sold",    0.0))
-                                    _sl_pct    = float(_pd.get("sl_pct",    15.0))
-                                    _size_bnb  = float(_pd.get("size_bnb",  AUTO_BUY_SIZE_BNB))
-                                    _bought_usd= float(_pd.get("bought_usd", 0.0))
-                                    # orig_size_bnb: DB se lo, warna tp_sold se back-calculate karo
-                                    _orig_sz = float(_pd.get("orig_size_bnb", 0.0))
-                                    if _orig_sz <= 0:
-                                        _rem_frac = max(0.01, (100.0 - _tp_sold) / 100.0)
-                                        _orig_sz  = round(_size_bnb / _rem_frac, 6)
-                                    _banked = float(_pd.get("banked_pnl_bnb", 0.0))
-                                    auto_trade_stats["running_positions"][_addr] = {
-                                        "token":          _pd.get("token", _addr[:10]),
-                                        "entry":          _entry,
-                                        "size_bnb":       _size_bnb,
-                                        "orig_size_bnb":  _orig_sz,
-                                        "bought_usd":     _bought_usd,
-                                        "bought_at":      _pd.get("bought_at", ""),
-                                        "sl_pct":         _sl_pct,
-                                        "tp_sold":        _tp_sold,
-                                        "banked_pnl_bnb": _banked,
-                                        "mode":           _pd.get("mode", TRADE_MODE)
-}
-                                    add_position_to_monitor(AUTO_SESSION_ID, _addr, _pd.get("token", _addr[:10]), _entry, _size_bnb, _sl_pct)
-                                    _restored += 1
-                                    print(f"  ↳ Restored {_pd.get('token',_addr[:10])}: tp_sold={_tp_sold:.0f}% size={_size_bnb:.4f} sl={_sl_pct:.0f}%")
-                            if _skipped:
-                                print(f"🧹 Skipped {_skipped} positions (invalid entry price)")
-                            print(f"✅ Restored {_restored} positions from Supabase")
-                            # ✅ FIX: Turant complete data DB mein overwrite karo
-                            # (purane records mein tp_sold missing tha — ye ek baar fix kar deta hai)
-                            time.sleep(2)  # monitor thread start hone do pehle
-                            _persist_positions()
-                            print("💾 Startup: positions re-saved with complete fields (tp_sold, sl_pct)")
-                        else:
-                            print("ℹ️ No saved positions found")
+                                # ✅ FIX: Full position data restore — tp_sold, sl_pct, bought_usd sab wapas
+                                # FIX v116: Position.from_db — orig_size_bnb back-calc bhi wahi karta hai
+                                _pobj = Position.from_db(_addr, {"size_bnb": AUTO_BUY_SIZE_BNB, "mode": TRADE_MODE, **_pd})
+                                _tp_sold  = _pobj.tp_sold
+                                _sl_pct   = _pobj.sl_pct
+                                _size_bnb = _pobj.size_bnb
+                                auto_trade_stats["running_positions"][_addr] = _pobj
+                                add_position_to_monitor(AUTO_SESSION_ID, _addr, _pd.get("token", _addr[:10]), _entry, _size_bnb, _sl_pct)
+                                _restored += 1
+                                print(f"  ↳ Restored {_pd.get('token',_addr[:10])}: tp_sold={_tp_sold:.0f}% size={_size_bnb:.4f} sl={_sl_pct:.0f}%")
+                        if _skipped:
+                            print(f"🧹 Skipped {_skipped} positions (invalid entry price)")
+                        print(f"✅ Restored {_restored} positions from Supabase")
+                        # ✅ FIX: Turant complete data DB mein overwrite karo
+                        # (purane records mein tp_sold missing tha — ye ek baar fix kar deta hai)
+                        # FIX v130: sirf jin rows ke fields incomplete/legacy the wahi likhe jaate hain
+                        _persist_positions()
+                        print("💾 Startup: positions re-saved with complete fields (tp_sold, sl_pct)")
                     else:
-                        print("ℹ️ No DB record found for AUTO_TRADER")
+                        _persist_positions()  # FIX v131: journal ne sab close kiye ho to tombstones
+                        print("ℹ️ No saved positions found")
+                    _pos_journal_compact()
                 else:
-                    print("⚠️ Supabase not connected — skipping restore")
+                    _pos_journal_replay({})  # kuch pending nahi — compaction enable
+                    print("ℹ️ No DB record found for AUTO_TRADER")
             except Exception as _rpe:
                 print(f"⚠️ Position restore error: {_rpe}")
-        threading.Thread(target=_startup_restore, daemon=True).start()
+        threading.Thread(target=_bg_init, daemon=True).start()
         print("✅ All background threads started")
         # MEM FIX: trim knowledge base
         try:
@@ -8456,15 +11501,13 @@ def admin_reset_positions():
         count  = len(closed)
 
         # Har position ko properly sell karo — trade history mein save hoga
+        # FIX v118: manual priority pe queue — rug/SL exits iske peeche nahi atakte
         for addr in closed:
-            try:
-                _auto_paper_sell(addr, "Manual Close All 🔴", 100.0)
-            except Exception as _ce:
-                print(f"⚠️ Close position error {addr[:10]}: {_ce}")
+            _queue_sell(addr, "Manual Close All 🔴", 100.0, priority=_SELL_PRI_MANUAL)
 
         auto_trade_stats["last_action"] = "Manual reset"
-        print(f"🔄 Admin reset: closed {count} positions")
-        return jsonify({"status": "ok", "closed": count, "addresses": closed})
+        print(f"🔄 Admin reset: queued {count} positions for close")
+        return jsonify({"status": "ok", "closed": count, "queued": True, "addresses": closed})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -8551,8 +11594,7 @@ def chat():
             _ca_cs = None
         if _ca_cs:
             # Check if already in trade history
-            _hist = auto_trade_stats.get("trade_history", [])
-            _past = [t for t in _hist if t.get("address","").lower() == _ca.lower()]
+            _past = _th_trades_for(_ca)  # FIX v135: address index
             # Check if currently open
             _open = auto_trade_stats.get("running_positions", {}).get(_ca_cs, {})
             # Run checklist
@@ -8682,7 +11724,7 @@ def chat():
     if len(sess["history"]) > 20:
         sess["history"] = sess["history"][-20:]  # ✅ trim after both appends
     threading.Thread(target=learn_from_message, args=(user_msg, reply, session_id), daemon=True).start()
-    threading.Thread(target=_save_session_to_db, args=(session_id,), daemon=True).start()
+    _save_session_to_db(session_id)
     return jsonify({"reply": reply, "session_id": session_id,
                     "trading": {"paper": f"{sess['paper_balance']:.3f}", "pnl": f"+{sess['pnl_24h']:.1f}%"}})
 
@@ -8803,7 +11845,7 @@ def notifications_read():
             if n.get("id") == nid:
                 n["read"] = True
                 break
-    threading.Thread(target=_save_notifs_to_db, daemon=True).start()
+    _save_notifs_to_db()
     return jsonify({"status": "ok"})
 
 @app.route("/notifications/delete", methods=["POST"])
@@ -8815,17 +11857,41 @@ def notifications_delete():
         _notifications = []
     else:
         _notifications = [n for n in _notifications if n.get("id") != nid]
-    threading.Thread(target=_save_notifs_to_db, daemon=True).start()
+    _save_notifs_to_db()
     return jsonify({"status": "ok", "remaining": len(_notifications)})
 
+_th_resp_cache = {}  # (mode, filter, q, hour) → (TradeHistory.ver, json body) — FIX v136
+
 @app.route("/trade-history", methods=["GET"])
 def trade_history_route():
-    # FIX v30: mode default "paper" tha — real mode trades miss hoti thi
-    # Ab: agar mode field hi nahi hai toh TRADE_MODE se match karo (both ways safe)
-    hist   = [t for t in auto_trade_stats.get("trade_history", [])
-              if isinstance(t, dict) and (t.get("mode") or "paper") == TRADE_MODE]
+    # FIX v126: ?page=N — RAM window se purani history DB se paginated
+    _page = request.args.get("page", type=int)
+    if _page:
+        _per  = max(1, min(request.args.get("per_page", 50, type=int), 200))
+        _filt = request.args.get("filter", "all")
+        try:
+            _rows = _trade_history_page((_page - 1) * _per, _per + 1, mode=TRADE_MODE,
+                                        result=_filt if _filt in ("win", "loss") else "")
+        except Exception as _pe:
+            return jsonify({"error": str(_pe)[:120], "history": [], "page": _page}), 500
+        return jsonify({"history": _rows[:_per], "page": _page, "per_page": _per,
+                        "has_more": len(_rows) > _per, "source": "db"})
     filt   = request.args.get("filter", "all")
     search = request.args.get("q", "").lower()
+    # FIX v136: response history version pe cache — naya trade close / trim hone tak same JSON
+    _th  = auto_trade_stats.get("trade_history")
+    _ver = _th.ver if isinstance(_th, TradeHistory) else -1
+    _now_hr = datetime.utcnow().strftime("%Y-%m-%dT%H")  # today/week/month filters ghante se zyada stale na hon
+    _ck  = (TRADE_MODE, filt, search, _now_hr)
+    _hit = _th_resp_cache.get(_ck)
+    if _hit and _hit[0] == _ver and _ver >= 0:
+        return app.response_class(_hit[1], mimetype="application/json")
+    # FIX v30: mode default "paper" tha — real mode trades miss hoti thi
+    # Ab: agar mode field hi nahi hai toh TRADE_MODE se match karo (both ways safe)
+    if isinstance(_th, TradeHistory) and not (TRADE_MODE == "paper" and _th.by_mode.get(None)):
+        hist = [t for t in _th.by_mode.get(TRADE_MODE, []) if isinstance(t, dict)]
+    else:  # mode-less legacy trades = "paper" — list order ke liye full scan
+        hist = [t for t in _th or [] if isinstance(t, dict) and (t.get("mode") or "paper") == TRADE_MODE]
     from datetime import datetime as _dt
     now = _dt.utcnow()
     filtered = []
@@ -8854,7 +11920,7 @@ def trade_history_route():
     losses = [x for x in filtered if x.get("result") == "loss"]
     best   = max(filtered, key=lambda x: x.get("pnl_pct", 0), default={})
     worst  = min(filtered, key=lambda x: x.get("pnl_pct", 0), default={})
-    return jsonify({
+    _body = json.dumps({
         "history":       filtered,
         "total":         len(filtered),
         "wins":          len(wins),
@@ -8863,7 +11929,11 @@ def trade_history_route():
         "total_pnl_bnb": round(sum(x.get("pnl_bnb",0) for x in filtered), 4),
         "best_trade":    best,
         "worst_trade":   worst
-})
+}, default=str)
+    if len(_th_resp_cache) > 64:
+        _th_resp_cache.clear()  # search strings se unbounded na ho
+    _th_resp_cache[_ck] = (_ver, _body)
+    return app.response_class(_body, mimetype="application/json")
 
 # FIX 5: /airdrops route properly defined (was missing def line)
 @app.route("/airdrops", methods=["GET"])
@@ -8935,21 +12005,10 @@ def auto_stats_route():
     sess        = get_or_create_session(AUTO_SESSION_ID)
     # BUG FIX: wins/losses trade_history se calculate karo grouped by position
     # (partial TP ke baad SL pe counter galat tha — ab total pnl_bnb per position se)
-    _all_hist = auto_trade_stats.get("trade_history", [])
-    # Sirf current mode ki trades
-    # FIX v30: mode default "paper" tha — real mode pe count zero aata tha
-    _mode_hist = [t for t in _all_hist if (t.get("mode") or TRADE_MODE) == TRADE_MODE]
-    _pos_pnl  = {}
-    for _t in _mode_hist:
-        _key = _t.get("address", "") + "|" + _t.get("bought_at", "")[:16]
-        _pos_pnl[_key] = _pos_pnl.get(_key, 0) + float(_t.get("pnl_bnb", 0) or 0)
-    if _pos_pnl:
-        wins   = sum(1 for v in _pos_pnl.values() if v > 0)
-        losses = sum(1 for v in _pos_pnl.values() if v <= 0)
-    else:
-        # Real mode mein 0 — paper counter use nahi karna
-        wins   = 0
-        losses = 0
+    # FIX v136: per-position grouping TradeHistory aggregates mein incremental — yahan sirf read
+    _agg   = _th_agg(TRADE_MODE)
+    wins   = _agg["pos_wins"]
+    losses = _agg["pos_losses"]
     trade_count = wins + losses
     win_rate    = round(wins / trade_count * 100, 1) if trade_count > 0 else 0.0
 
@@ -9001,14 +12060,9 @@ def auto_stats_route():
     # Total PNL = Realized (closed trades) + Unrealized (open positions)
     # % = Total PNL BNB / Total Invested BNB × 100
 
-    _hist_all = auto_trade_stats.get("trade_history", [])
-    # Sirf current mode ki trades use karo PNL ke liye
-    # FIX v30: mode default bug — real mode PNL zero aata tha
-    _hist = [t for t in _hist_all if (t.get("mode") or TRADE_MODE) == TRADE_MODE]
-
-    # Realized — closed trades
-    _realized_pnl_bnb  = sum(float(t.get("pnl_bnb", 0) or 0) for t in _hist)
-    _realized_invested = sum(float(t.get("size_bnb", AUTO_BUY_SIZE_BNB) or AUTO_BUY_SIZE_BNB) for t in _hist)
+    # Realized — closed trades (FIX v136: running totals)
+    _realized_pnl_bnb  = _agg["pnl_bnb"]
+    _realized_invested = _agg["invested"]
 
     # Unrealized — open positions
     _unrealized_pnl_bnb  = sum(float(p.get("pnl_bnb", 0) or 0) for p in open_trades)
@@ -9054,10 +12108,10 @@ def auto_stats_route():
         "today_losses":    auto_trade_stats.get("today_losses", 0),
         "today_pnl":       round(auto_trade_stats.get("today_pnl", 0.0), 4),
         # Intelligence stats
-        "qualified_whales":   sum(1 for d in _smart_wallets.values() if d.get("qualified")),
+        "qualified_whales":   len(_sw_qualified),
         "total_wallets":      len(_smart_wallets),
         "rug_dna_patterns":   len(_rug_dna),
-        "tokens_blacklisted": sum(1 for v in _token_blacklist.values() if time.time() - v["ts"] < _TOKEN_BL_TTL),
+        "tokens_blacklisted": len(_token_blacklist),
         "devs_blacklisted":   len(_dev_blacklist),
         "brain_best":         len(brain["trading"].get("best_patterns", [])),
         "brain_avoid":        len(brain["trading"].get("avoid_patterns", [])),
@@ -9135,7 +12189,25 @@ def sys_stats():
 },
             "trade_mode": TRADE_MODE,
             "plan_name":  plan_name,
-            "total_mb":   total_mb
+            "pos_manager": _pm_latency_summary(),
+            "refresh_sched": _refresh_summary(),
+            "sell_queue": _sell_queue_summary(),
+            "tx_pipeline": _txp_summary(),
+            "receipts": _rcpt_summary(),
+            "broadcast": _bcast_summary(),
+            "gas_oracle": _gas_summary(),
+            "approvals": _appr_summary(),
+            "nonce": _nonce_summary(),
+            "paper_sim": _sim_summary(),
+            "trade_rows": _th_summary(),
+            "persist_queue": _wb_summary(),
+            "fm_events_prune": _fm_prune_stats,
+            "positions_persist": _pos_summary(),
+            "collections": _coll_summary(),
+            "rug_dna": _rug_summary(),
+            "smart_wallets": _sw_summary(),
+            "expiring_sets": _expset_summary(),
+            "startup": _startup_stats
 })
     except Exception as e:
         return jsonify({"error": str(e), "rss_mb": 0, "used_pct": 0})
@@ -9144,7 +12216,8 @@ def sys_stats():
 def rug_dna_route():
     """Latest 100 rug DNA fingerprints"""
     try:
-        data = list(reversed(_rug_dna[-10000:]))  # latest first
+        _coll_ensure("rug_dna")
+        data = list(reversed(list(_rug_dna.values())[-10000:]))  # latest first
         result = []
         for d in data:
             ts = d.get("ts", 0)
@@ -9203,6 +12276,7 @@ def brain_insights():
 def whale_detail():
     """Return top qualified whale wallets with stats"""
     try:
+        _coll_ensure("smart_wallets")
         with _smart_wallets_lock:
             wallets = dict(_smart_wallets)
         result = []
@@ -9384,7 +12458,7 @@ def set_fm_filters():
         _fm_filters["momentum_window_sec"] = 90
     if "momentum_interval_sec" not in _fm_filters:
         _fm_filters["momentum_interval_sec"] = 0.1
-    threading.Thread(target=_save_brain_to_db, daemon=True).start()
+    _save_brain_to_db()
     return jsonify({"ok": True, "filters": _fm_filters})
 
 @app.route("/get-settings", methods=["GET"])
@@ -9415,7 +12489,7 @@ def close_one_position():
         addr, pos = sorted(positions.items(), key=_get_pnl)[0]
     tok = pos.get("token", addr[:8])
     remaining = len(positions) - 1
-    threading.Thread(target=_auto_paper_sell, args=(addr, "Manual close via UI", 100.0), daemon=True).start()
+    _queue_sell(addr, "Manual close via UI", 100.0, priority=_SELL_PRI_MANUAL)
     print(f"🔴 Manual close: {tok} ({addr[:10]})")
     return jsonify({"status": "closing", "address": addr, "token": tok, "remaining": remaining})
 
@@ -9465,8 +12539,8 @@ def force_close_position():
         bought_at_str = pos.get("bought_at", "")
 
         # Trade history mein save karo
-        if not isinstance(auto_trade_stats.get("trade_history"), list):
-            auto_trade_stats["trade_history"] = []
+        if not isinstance(auto_trade_stats.get("trade_history"), TradeHistory):
+            _th_set(auto_trade_stats.get("trade_history"))
         auto_trade_stats["trade_history"].append({
             "token":        token,
             "address":      target_addr,
@@ -9495,7 +12569,7 @@ def force_close_position():
         remove_position_from_monitor(target_addr)
 
         # DB save
-        threading.Thread(target=_save_session_to_db,    args=(AUTO_SESSION_ID,), daemon=True).start()
+        _save_session_to_db(AUTO_SESSION_ID)
         threading.Thread(target=_save_trade_history_to_db,                       daemon=True).start()
         _persist_positions()
 
@@ -9699,7 +12773,7 @@ def health():
     return jsonify({
         "status":        "ok",
         "bsc_connected": True,
-        "supabase":      supabase is not None,
+        "supabase":      bool(supabase),
         "bnb_price":     market_cache.get("bnb_price", 0),
         "fear_greed":    market_cache.get("fear_greed", 50),
         "new_pairs":     len(new_pairs_queue),
@@ -10024,23 +13098,19 @@ def wallet_info():
 def pnl_breakdown():
     """PNL breakdown — today, week, all time — current mode filtered"""
     try:
-        hist = auto_trade_stats.get("trade_history", [])
-        # Sirf current mode ke trades
-        hist = [t for t in hist if (t.get("mode") or "paper") == TRADE_MODE]
+        # FIX v136: per-mode daily buckets + totals — har poll pe parse/scan nahi
+        _g   = _th_agg(TRADE_MODE)
         now  = datetime.utcnow()
-        def _calc(trades):
-            wins   = sum(1 for t in trades if float(t.get("pnl_bnb", 0) or 0) > 0)
-            losses = sum(1 for t in trades if float(t.get("pnl_bnb", 0) or 0) <= 0)
-            pnl    = round(sum(float(t.get("pnl_bnb", 0) or 0) for t in trades), 6)
-            wr     = round(wins / max(wins+losses, 1) * 100, 1)
-            return {"trades": len(trades), "wins": wins, "losses": losses, "pnl_bnb": pnl, "win_rate": wr}
-        today = [t for t in hist if t.get("sold_at","")[:10] == now.strftime("%Y-%m-%d")]
-        week  = [t for t in hist if t.get("sold_at") and (now - datetime.fromisoformat(t["sold_at"][:19])).days <= 7]
+        _all = {"trades": _g["trades"], "wins": _g["wins"], "losses": _g["losses"],
+                "pnl_bnb": round(_g["pnl_bnb"], 6),
+                "win_rate": round(_g["wins"] / max(_g["wins"] + _g["losses"], 1) * 100, 1)}
         return jsonify({
-            "today":    _calc(today),
-            "week":     _calc(week),
-            "all_time": _calc(hist),
+            "today":    _th_bucket(_g, [now.strftime("%Y-%m-%d")]),
+            "week":     _th_bucket(_g, [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(8)]),
+            "all_time": _all,
             "bnb_price": market_cache.get("bnb_price", 0)
         })
     except Exception as e:
         return jsonify({"error": str(e)[:60]})
+
+_startup_stats["import_ms"] = round((_imp_time.perf_counter() - _IMPORT_T0) * 1000, 1)  # FIX v134